@@ -3,20 +3,48 @@ API Server pentru integrarea cu POSnet.
 Oferă endpoints pentru preluarea comenzilor și confirmarea/anularea acestora.
 """
 
-from flask import Flask, jsonify, request
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
+from flask import Flask, Response, g, jsonify, make_response, request
 from functools import wraps
+import hmac
 import json
+import math
 import os
+import re
+import time
 import shutil
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from app.config import (
     COMENZI_NOI, COMENZI_PROCESATE, COMENZI_ANULATE, 
-    API_HOST, API_PORT, API_DEBUG, API_KEY, API_RATE_LIMIT
+    API_HOST, API_PORT, API_DEBUG, API_KEY, METRICS_TOKEN, DISPATCH_MODE, PROFILING, PROFILE_MAX_SECONDS,
+    ORDER_LONG_POLL_MAX, ORDER_LONG_POLL_RECHECK, CHANGE_LOG_PAGE_SIZE, CHANGE_LOG_PAGE_MAX
 )
-from app.logging_config import get_logger
+from app.logging_config import get_logger, LazyJSON
+from app.services.parse_memo import content_key, get_parse_memo
+from app.services.quarantine import get_quarantine
+from app.services.notification_throttle import collect_throttle_stats
+from app.services.webhook_outbox import get_webhook_outbox
+from app.services.rate_limiter import get_rate_limiter
+from app.services.io_offload import offload
+from app.services.order_dispatch import get_order_leases
+from app.services.order_events import get_order_events, on_orders_saved
+from app.services.ingest import ingest_pid
+from app.services.memory_watchdog import load_memory_report
+from app.services.tracing import span, start_trace
+from app.services.profiler import (
+    ProfilingMiddleware, active_profile, install_signal_handler, master_pid, signal_process, start_sampling
+)
+from app.services.order_timeline import (
+    INTERVALS, OUTCOME_CONFIRMED, OUTCOME_CANCELLED, get_order_timeline, mark_order_served, mark_order_finished
+)
+from app.services.metrics import (
+    HTTP_REQUEST_SECONDS, ORDER_LOOKUP_SECONDS, ORDERS_PENDING, collect_metrics, render_metrics
+)
+from app.services.idempotency import (
+    get_idempotency_cache, request_fingerprint, NEW, REPLAY, MISMATCH
+)
+from app.services.change_log import EVENT_CONFIRMED, EVENT_CANCELLED, get_change_log, record_order_change
+from app.services.order_export import EXPORT_FORMATS, export_chunks, iter_orders
 import logging
 
 # Obține logger-ul pentru API server
@@ -27,13 +55,145 @@ app = Flask(__name__)
 # Configurare pentru a păstra ordinea cheilor din JSON (esențial pentru POSnet)
 app.json.sort_keys = False
 
-# Configurare Rate Limiting
-limiter = Limiter(
-    app=app,
-    key_func=get_remote_address,
-    default_limits=[API_RATE_LIMIT],
-    storage_uri="memory://"
-)
+# Profilare la cerere (PROFILING): semnalul PROFILE_SIGNAL și header-ul X-Profile
+if PROFILING:
+    install_signal_handler()
+    app.wsgi_app = ProfilingMiddleware(app.wsgi_app, API_KEY)
+
+
+def get_remote_address() -> str:
+    """Adresa IP a clientului."""
+    return request.remote_addr or "127.0.0.1"
+
+
+def terminal_client() -> str:
+    """
+    Terminalul POS declarat în header-ul X-Terminal-Id, altfel adresa IP: deținătorul
+    rezervărilor, domeniul cheilor de idempotență, terminalul din trace-uri.
+    """
+    terminal = request.headers.get('X-Terminal-Id')
+    if terminal:
+        return f"terminal:{terminal}"
+    return f"ip:{get_remote_address()}"
+
+
+def rate_limit_client() -> str:
+    """
+    Identitatea clientului pentru rate limiting: terminalul POS (header X-Terminal-Id) doar
+    după verificarea API Key-ului, altfel adresa IP. Fără API_KEY setat, header-ul nu este
+    verificat - un client și-ar alege bucket-ul (și cota) trimițând alt X-Terminal-Id.
+    """
+    if API_KEY and request.headers.get('X-API-Key') == API_KEY:
+        return terminal_client()
+    return f"ip:{get_remote_address()}"
+
+
+@app.before_request
+def start_request_timer():
+    """Momentul începerii request-ului (înaintea rate limiting-ului), pentru metrici."""
+    g.request_started = time.perf_counter()
+
+
+@app.before_request
+def subscribe_order_events():
+    """Socket-ul evenimentelor "comenzi salvate" al worker-ului, deschis la primul request."""
+    get_order_events()
+
+
+@app.after_request
+def record_request_duration(response):
+    """Durata request-ului, per metodă, endpoint (regula URL, nu calea) și status."""
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        HTTP_REQUEST_SECONDS.labels(request.method, endpoint, response.status_code).observe(
+            time.perf_counter() - started
+        )
+    return response
+
+
+@app.after_request
+def finish_order_trace(response):
+    """Închide span-ul request-ului pentru o comandă (vezi _trace_order) și trimite trace ID-ul."""
+    trace_span = g.pop('trace_span', None)
+    if trace_span is not None:
+        trace_span.set(status=response.status_code)
+        response.headers['X-Trace-Id'] = trace_span.trace_id
+        trace_span.__exit__(None, None, None)
+    return response
+
+
+@app.teardown_request
+def abandon_order_trace(error=None):
+    """Span-ul unui request încheiat cu o excepție netratată (after_request nu a rulat)."""
+    trace_span = g.pop('trace_span', None)
+    if trace_span is not None:
+        trace_span.__exit__(type(error) if error is not None else None, error, None)
+
+
+# Trace ID-urile comenzilor deja căutate în order_timeline (per proces)
+_order_traces = {}
+ORDER_TRACES_CACHE_SIZE = 10000
+
+
+def _trace_order(order_id) -> None:
+    """
+    Continuă trace-ul ingestiei comenzii pentru restul request-ului: căutările în foldere
+    devin span-uri ale lui, iar liniile de log sunt prefixate cu trace ID-ul.
+    """
+    if g.get('trace_span') is not None:
+        return
+    order_id = str(order_id)
+    trace_id = _order_traces.get(order_id)
+    if trace_id is None:
+        timeline = get_order_timeline()
+        trace_id = timeline.trace_of(order_id) if timeline is not None else None
+        if trace_id is not None:
+            if len(_order_traces) >= ORDER_TRACES_CACHE_SIZE:
+                _order_traces.clear()
+            _order_traces[order_id] = trace_id
+    trace_span = start_trace(f"api.{request.method.lower()}", trace_id, order=order_id, terminal=terminal_client())
+    g.trace_span = trace_span.__enter__()  # Închis în finish_order_trace
+
+
+def _forget_order_traces(order_ids) -> None:
+    """O comandă salvată din nou (ex. reprocesată din carantină) are un trace nou."""
+    for order_id in order_ids:
+        _order_traces.pop(order_id, None)
+
+
+on_orders_saved(_forget_order_traces)
+
+
+def _lookup(operation, func, *args):
+    """Rulează o căutare în folderele comenzilor (prin offload) și îi înregistrează durata."""
+    with ORDER_LOOKUP_SECONDS.labels(operation).time(), span(f"api.{operation}"):
+        return offload(func, *args)
+
+
+@app.before_request
+def apply_rate_limit():
+    """
+    Rate limiting (API_RATE_LIMIT, cote individuale în API_RATE_LIMIT_QUOTAS), partajat de
+    toți worker-ii Gunicorn - limita este exactă indiferent de numărul lor.
+    """
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return None
+    
+    client = rate_limit_client()
+    allowed, retry_after = limiter.acquire(client)
+    if allowed:
+        return None
+    
+    logger.warning(f"🚦 Rate limit depășit pentru {client}")
+    response = jsonify({
+        "error": "Prea multe request-uri",
+        "message": f"Limita de request-uri pentru {client} a fost depășită",
+        "retry_after": math.ceil(retry_after)
+    })
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response, 429
 
 
 def require_api_key(f):
@@ -71,6 +231,98 @@ def require_api_key(f):
     return decorated_function
 
 
+def require_metrics_token(f):
+    """
+    Decorator pentru GET /metrics.
+    Acceptă header-ul "Authorization: Bearer <METRICS_TOKEN>" (scrape Prometheus) sau un X-API-Key
+    valid. Cu METRICS_TOKEN setat, endpoint-ul nu este deschis nici dacă API_KEY lipsește.
+    """
+    protected = require_api_key(f)
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if METRICS_TOKEN:
+            expected = f"Bearer {METRICS_TOKEN}".encode('utf-8')
+            if hmac.compare_digest(request.headers.get('Authorization', '').encode('utf-8'), expected):
+                return f(*args, **kwargs)
+            if not API_KEY:
+                logger.warning(f"❌ Request /metrics fără token valid de la {get_remote_address()}")
+                return jsonify({
+                    "error": "Token lipsește sau este invalid",
+                    "message": "Adaugă header-ul 'Authorization: Bearer <METRICS_TOKEN>'"
+                }), 401
+        return protected(*args, **kwargs)
+
+    return decorated_function
+
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Răspunsuri care depind de starea altor request-uri: nu sunt păstrate, reîncercarea rulează din nou
+# (404: comanda poate fi salvată de Email Listener între reîncercări)
+IDEMPOTENCY_TRANSIENT_STATUSES = {404, 409, 429}
+
+
+def idempotent(f):
+    """
+    Decorator pentru header-ul Idempotency-Key la POST.
+    
+    Primul request cu o cheie este executat și răspunsul lui este păstrat (cache partajat
+    de worker-i); reîncercările cu aceeași cheie primesc același răspuns, fără a atinge
+    fișierele. Cheile sunt separate per terminal (sau IP). Erorile 5xx și răspunsurile
+    tranzitorii (409, 429) nu sunt păstrate.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if request.method != 'POST' or not key:
+            return f(*args, **kwargs)
+        
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return jsonify({
+                "error": f"Idempotency-Key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters"
+            }), 400
+        
+        cache = get_idempotency_cache()
+        if cache is None:
+            return f(*args, **kwargs)
+        
+        scoped_key = f"{terminal_client()}:{key}"
+        fingerprint = request_fingerprint(request.method, request.path, request.get_data())
+        with ORDER_LOOKUP_SECONDS.labels("idempotency").time():
+            outcome, stored = cache.wait(scoped_key, fingerprint)
+        
+        if outcome == REPLAY:
+            status, body, mimetype = stored
+            logger.info(f"🔁 Idempotency-Key {key}: replaying stored response ({status})")
+            response = make_response(body, status)
+            response.mimetype = mimetype
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        if outcome == MISMATCH:
+            logger.warning(f"❌ Idempotency-Key {key} reused for a different request (sending 422)")
+            return jsonify({
+                "error": "Idempotency-Key was already used for a different request"
+            }), 422
+        if outcome != NEW:
+            return jsonify({
+                "error": "A request with this Idempotency-Key is still in progress"
+            }), 409
+        
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            cache.abandon(scoped_key)
+            raise
+        
+        if response.status_code >= 500 or response.status_code in IDEMPOTENCY_TRANSIENT_STATUSES:
+            cache.abandon(scoped_key)
+        else:
+            cache.complete(scoped_key, response.status_code, response.get_data(), response.mimetype)
+        return response
+    
+    return decorated_function
+
+
 @app.route('/', methods=['GET'])
 def root():
     """Root endpoint cu informații despre API."""
@@ -79,9 +331,18 @@ def root():
         "version": "1.4",
         "endpoints": {
             "health": "/api/health",
-            "comenzi": "/api/comenzi [GET/POST]",
+            "comenzi": "/api/comenzi[?asteapta=<secunde>] [GET/POST]",
             "comanda": "/api/comanda/<id_comanda>",
             "statistici": "/api/statistici",
+            "timpi": "/api/timpi[?fereastra=<secunde>]",
+            "timpi_comanda": "/api/timpi/<id_comanda>",
+            "changes": "/api/changes?since=<seq>[&limit=N]",
+            "export": "/api/export?from=<YYYY-MM-DD>&to=<YYYY-MM-DD>[&format=ndjson|csv]",
+            "carantina": "/api/carantina",
+            "metrics": "/metrics",
+            "reprocesare": "/api/carantina/<id>/reproceseaza [POST]",
+            "memorie": "/api/memorie",
+            "profil": "/api/admin/profil [POST]",
             "webhook_test": "/api/webhook/test [POST]"
         },
         "timestamp": datetime.now().isoformat()
@@ -94,18 +355,161 @@ def health_check():
     return jsonify({
         "status": "ok",
         "timestamp": datetime.now().isoformat(),
-        "service": "eeatingh-automation"
+        "service": "eeatingh-automation",
+        # Notificări de eroare trimise/suprimate (agregat pe procese)
+        "notificari_eroare": collect_throttle_stats()
     }), 200
 
 
+def _next_processing_order():
+    """
+    Prima comandă nouă cu statusul "processing" (FIFO, după numele fișierului).
+    
+    Returns:
+        Datele comenzii sau None dacă nu există
+    """
+    # Search for the first order with status "processing". FIFO implementation added
+    # 1. Colectăm doar fișierele .json
+    files = [f for f in os.listdir(COMENZI_NOI) if f.endswith('.json')]
+    
+    # 2. Le sortăm alfabetic (implicit cronologic datorită numelui)
+    files.sort()
+
+    # 3. Iterăm prin lista curată și sortată
+    for filename in files:
+        filepath = COMENZI_NOI / filename
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                comanda_data = json.load(f)
+            # Verify structure and status
+            if comanda_data.get("comanda", {}).get("status_comanda") == "processing":
+                return comanda_data
+        except Exception as e:
+            logger.error(f"Error reading file {filename}: {e}")
+    return None
+
+
+ORDER_FILENAME_ID = re.compile(r'comanda_(.+)\.json$')
+
+
+def _order_id_from_filename(filename):
+    """ID-ul comenzii din numele fișierului (<timestamp>_comanda_<id>.json)."""
+    match = ORDER_FILENAME_ID.search(filename)
+    return match.group(1) if match else filename
+
+
+def _claim_next_order(leases, terminal):
+    """
+    Rezervă pentru terminal prima comandă "processing" nerezervată de alt terminal (FIFO).
+    
+    O comandă deja rezervată de același terminal (GET repetat fără confirmare) este
+    returnată din nou, cu rezervarea reînnoită. Comenzile rezervate de alte terminale sunt
+    sărite doar după numele fișierului, fără a fi citite.
+    
+    Returns:
+        (datele comenzii, momentul expirării rezervării) sau (None, None)
+    """
+    active = leases.active()
+    files = sorted(f for f in os.listdir(COMENZI_NOI) if f.endswith('.json'))
+    own = [f for f in files if active.get(_order_id_from_filename(f)) == terminal]
+    free = [f for f in files if _order_id_from_filename(f) not in active]
+    
+    for filename in own + free:
+        try:
+            with open(COMENZI_NOI / filename, 'r', encoding='utf-8') as f:
+                comanda_data = json.load(f)
+        except FileNotFoundError:
+            continue  # Confirmată între timp de alt terminal
+        except Exception as e:
+            logger.error(f"Error reading file {filename}: {e}")
+            continue
+        if comanda_data.get("comanda", {}).get("status_comanda") != "processing":
+            continue
+        expires_at = leases.claim(_order_id_from_filename(filename), terminal)
+        if expires_at is not None:
+            return comanda_data, expires_at
+    return None, None
+
+
+def _move_order_file(source, destination):
+    """
+    Mută fișierul comenzii: rename atomic (același sistem de fișiere), altfel shutil.move.
+    
+    Dintre două request-uri concurente pentru aceeași comandă, exact unul reușește;
+    celălalt primește FileNotFoundError.
+    """
+    try:
+        os.rename(source, destination)
+    except OSError as e:
+        if isinstance(e, FileNotFoundError):
+            raise
+        shutil.move(str(source), str(destination))
+
+
+def _find_order_file(id_comanda, folders):
+    """
+    Caută fișierul unei comenzi, în ordinea folderelor date.
+    
+    Returns:
+        Calea fișierului sau None dacă nu a fost găsit
+    """
+    for folder in folders:
+        if folder.exists():
+            for filename in os.listdir(folder):
+                if filename.endswith('.json') and f"comanda_{id_comanda}.json" in filename:
+                    return folder / filename
+    return None
+
+
+def _read_order_file(filepath):
+    """Citește datele unei comenzi din fișier."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _serve_next_order():
+    """
+    Următoarea comandă pentru terminalul care a făcut request-ul GET /api/comenzi.
+    
+    Returns:
+        Răspunsul cu comanda, sau None dacă nu există comenzi noi
+    """
+    # Mai multe terminale: fiecare primește o comandă rezervată doar pentru el
+    leases = get_order_leases() if DISPATCH_MODE == "lease" else None
+    if leases is not None:
+        terminal = terminal_client()
+        comanda_data, expires_at = _lookup("claim", _claim_next_order, leases, terminal)
+        if comanda_data is not None:
+            _trace_order(comanda_data['comanda'].get('id_intern_comanda'))
+            logger.info(f"✅ Returning order #{comanda_data['comanda'].get('id_intern_comanda', 'unknown')} "
+                        f"to {terminal}")
+            mark_order_served(comanda_data['comanda'].get('id_intern_comanda'))
+            response = jsonify(comanda_data)
+            response.headers['X-Eeatingh-Lease-Terminal'] = terminal
+            response.headers['X-Eeatingh-Lease-Expires'] = str(int(expires_at))
+            return response, 200
+    else:
+        # Scanarea folderului rulează în afara event loop-ului în modul gevent
+        comanda_data = _lookup("next", _next_processing_order)
+        if comanda_data is not None:
+            # Return the entire order object directly
+            _trace_order(comanda_data['comanda'].get('id_intern_comanda'))
+            logger.info(f"✅ Returning order #{comanda_data['comanda'].get('id_intern_comanda', 'unknown')}")
+            mark_order_served(comanda_data['comanda'].get('id_intern_comanda'))
+            return jsonify(comanda_data), 200
+    return None
+
+
 @app.route('/api/comenzi', methods=['GET', 'POST'])
 @require_api_key
+@idempotent
 def handle_comenzi():
     """
     Endpoint unificat pentru preluarea și procesarea comenzilor.
     
     GET Request:
         Return the first new unprocessed order with status "processing".
+        With ?asteapta=<secunde> (max ORDER_LONG_POLL_MAX), wait for a new order when there is none.
     
     POST Request:
         Process an order (confirm or cancel) OR acknowledge updates for processed orders.
@@ -119,27 +523,28 @@ def handle_comenzi():
                     "status": "empty"
                 }), 200
             
-            # Search for the first order with status "processing". FIFO implementation added
-            # 1. Colectăm doar fișierele .json
-            files = [f for f in os.listdir(COMENZI_NOI) if f.endswith('.json')]
+            wait_seconds = request.args.get('asteapta', '')
+            if wait_seconds and (not wait_seconds.isdigit() or int(wait_seconds) > ORDER_LONG_POLL_MAX):
+                return jsonify({
+                    "error": f"Parametrul 'asteapta' trebuie să fie un număr între 0 și {ORDER_LONG_POLL_MAX}"
+                }), 400
             
-            # 2. Le sortăm alfabetic (implicit cronologic datorită numelui)
-            files.sort()
-
-            # 3. Iterăm prin lista curată și sortată
-            for filename in files:
-                filepath = COMENZI_NOI / filename
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        comanda_data = json.load(f)
-                            # Verify structure and status
-                        comanda_inner = comanda_data.get("comanda", {})
-                        if comanda_inner.get("status_comanda") == "processing":
-                                # Return the entire order object directly
-                            logger.info(f"✅ Returning order #{comanda_inner.get('id_intern_comanda', 'unknown')}")
-                            return jsonify(comanda_data), 200
-                except Exception as e:
-                    logger.error(f"Error reading file {filename}: {e}")
+            # Long-poll (?asteapta=<secunde>): fără comenzi, request-ul așteaptă evenimentul
+            # "comenzi salvate" de la procesul de ingestie (re-verificând și periodic)
+            deadline = time.monotonic() + int(wait_seconds or 0)
+            events = get_order_events() if wait_seconds else None
+            while True:
+                version = events.version if events is not None else 0
+                response = _serve_next_order()
+                if response is not None:
+                    return response
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if events is not None:
+                    events.wait(version, min(remaining, ORDER_LONG_POLL_RECHECK))
+                else:
+                    time.sleep(min(remaining, ORDER_LONG_POLL_RECHECK))
             
             # No orders with "processing" status found
             return jsonify({
@@ -167,7 +572,7 @@ def handle_comenzi():
             
             # --- CAPCANA PENTRU POS ---
             # Logăm payload-ul ca să vedem ce trimite POS-ul la "Start Livrare"
-            logger.info(f"🕵️ POST RECEIVED (PAYLOAD): {json.dumps(data, ensure_ascii=False)}")
+            logger.info("🕵️ POST RECEIVED (PAYLOAD): %s", LazyJSON(data))
             # --------------------------
 
             id_comanda = data.get('id_comanda')
@@ -178,26 +583,17 @@ def handle_comenzi():
                 return jsonify({
                     "error": "Parameter 'id_comanda' is required"
                 }), 400
+            _trace_order(id_comanda)
             
             # --- LOGICA NOUĂ DE CĂUTARE ---
             found_path = None
             found_folder_type = None # 'noi' sau 'procesate'
 
             # 1. Căutăm întâi în comenzi NOI
-            if COMENZI_NOI.exists():
-                for filename in os.listdir(COMENZI_NOI):
-                    if filename.endswith('.json') and f"comanda_{id_comanda}.json" in filename:
-                        found_path = COMENZI_NOI / filename
-                        found_folder_type = 'noi'
-                        break
-            
             # 2. Dacă nu e nouă, căutăm în PROCESATE (pentru update-uri de la POS)
-            if not found_path and COMENZI_PROCESATE.exists():
-                for filename in os.listdir(COMENZI_PROCESATE):
-                    if filename.endswith('.json') and f"comanda_{id_comanda}.json" in filename:
-                        found_path = COMENZI_PROCESATE / filename
-                        found_folder_type = 'procesate'
-                        break
+            found_path = _lookup("find", _find_order_file, id_comanda, [COMENZI_NOI, COMENZI_PROCESATE])
+            if found_path is not None:
+                found_folder_type = 'noi' if found_path.parent == COMENZI_NOI else 'procesate'
 
             if not found_path:
                 logger.warning(f"❌ Order #{id_comanda} not found anywhere (sending 404)")
@@ -222,6 +618,18 @@ def handle_comenzi():
                     "error": "Parameter 'operatiune' must be 'CONFIRMA' or 'ANULEAZA'"
                 }), 400
             
+            # Comanda rezervată de alt terminal nu poate fi confirmată/anulată de acesta
+            leases = get_order_leases() if DISPATCH_MODE == "lease" else None
+            if leases is not None:
+                with ORDER_LOOKUP_SECONDS.labels("lease").time():
+                    holder = leases.holder(str(id_comanda))
+                if holder is not None and holder != terminal_client():
+                    logger.warning(f"🔒 Order #{id_comanda} is claimed by {holder} (sending 409)")
+                    return jsonify({
+                        "error": f"Order #{id_comanda} is claimed by another terminal",
+                        "terminal": holder
+                    }), 409
+            
             # Determine destination based on operation
             if operatiune == 'CONFIRMA':
                 dest_folder = COMENZI_PROCESATE
@@ -237,7 +645,26 @@ def handle_comenzi():
             
             # Move file
             dest_path = dest_folder / found_path.name
-            shutil.move(str(found_path), str(dest_path))
+            try:
+                _lookup("move", _move_order_file, found_path, dest_path)
+            except FileNotFoundError:
+                # Un request concurent a mutat comanda între căutare și mutare. Dacă a făcut
+                # aceeași operație (duplicat), răspunsul este același ca pentru original.
+                if not dest_path.exists():
+                    logger.warning(f"⚠️ Order #{id_comanda} was already moved by another request (sending 409)")
+                    return jsonify({
+                        "error": f"Order #{id_comanda} was already processed"
+                    }), 409
+                logger.info(f"ℹ️ Order #{id_comanda} was moved by a concurrent duplicate request")
+            else:
+                # O singură schimbare per comandă: duplicatul concurent nu o mai înregistrează
+                if operatiune == 'CONFIRMA':
+                    record_order_change(id_comanda, EVENT_CONFIRMED, {"timp_livrare": timp_livrare})
+                else:
+                    record_order_change(id_comanda, EVENT_CANCELLED)
+            if leases is not None:
+                leases.release(str(id_comanda))
+            mark_order_finished(id_comanda, OUTCOME_CONFIRMED if operatiune == 'CONFIRMA' else OUTCOME_CANCELLED)
             
             logger.info(status_message)
             
@@ -271,15 +698,10 @@ def get_comanda(id_comanda):
         # Search in all folders
         folders = [COMENZI_NOI, COMENZI_PROCESATE, COMENZI_ANULATE]
         
-        for folder in folders:
-            if folder.exists():
-                for filename in os.listdir(folder):
-                    if filename.endswith('.json') and f"comanda_{id_comanda}.json" in filename:
-                        filepath = folder / filename
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            comanda_data = json.load(f)
-                        
-                        return jsonify(comanda_data), 200
+        filepath = _lookup("find", _find_order_file, id_comanda, folders)
+        if filepath is not None:
+            comanda_data = _lookup("read", _read_order_file, filepath)
+            return jsonify(comanda_data), 200
         
         return jsonify({
             "error": "Order not found",
@@ -319,6 +741,27 @@ def get_statistici():
                 stats[key] = count
                 stats["total"] += count
         
+        # Contoarele memo-ului de parsare (emailuri re-livrate)
+        memo = get_parse_memo()
+        if memo is not None:
+            stats["memo_parsare"] = memo.stats()
+        
+        # Rezervările comenzilor per terminal (DISPATCH_MODE="lease")
+        if DISPATCH_MODE == "lease":
+            leases = get_order_leases()
+            if leases is not None:
+                stats["rezervari"] = leases.stats()
+        
+        # Răspunsurile păstrate pentru Idempotency-Key
+        idempotency = get_idempotency_cache()
+        if idempotency is not None:
+            stats["idempotenta"] = idempotency.stats()
+        
+        # Livrările webhook către POS (outbox)
+        outbox = get_webhook_outbox()
+        if outbox is not None:
+            stats["webhook"] = outbox.stats()
+        
         return jsonify(stats), 200
         
     except Exception as e:
@@ -329,6 +772,346 @@ def get_statistici():
         }), 500
 
 
+@app.route('/api/timpi', methods=['GET'])
+@require_api_key
+def get_timpi():
+    """
+    Percentilele p50/p95/p99 ale timpilor dintre etapele comenzilor (email, sosire IMAP,
+    parsare, salvare, preluare de POS, confirmare/anulare), pentru comenzile salvate în
+    ultimele `fereastra` secunde (implicit ORDER_TIMELINE_WINDOW).
+    """
+    try:
+        timeline = get_order_timeline()
+        if timeline is None:
+            return jsonify({"error": "Timpii comenzilor nu sunt disponibili"}), 503
+        
+        window = request.args.get('fereastra')
+        if window is None:
+            return jsonify(timeline.summary()), 200
+        if not window.isdigit() or int(window) == 0:
+            return jsonify({"error": "Parameter 'fereastra' must be a positive number of seconds"}), 400
+        return jsonify(timeline.summary(int(window))), 200
+        
+    except Exception as e:
+        logger.error(f"Error calculating order timings: {e}", exc_info=True)
+        return jsonify({
+            "error": str(e),
+            "message": "Error calculating order timings"
+        }), 500
+
+
+@app.route('/api/timpi/<id_comanda>', methods=['GET'])
+@require_api_key
+def get_timpi_comanda(id_comanda):
+    """
+    Momentele etapelor unei comenzi și duratele dintre ele.
+    
+    Args:
+        id_comanda: Order ID
+    """
+    try:
+        timeline = get_order_timeline()
+        if timeline is None:
+            return jsonify({"error": "Timpii comenzilor nu sunt disponibili"}), 503
+        
+        stages = timeline.timeline(id_comanda)
+        if stages is None:
+            return jsonify({"error": "Order not found", "id_comanda": id_comanda}), 404
+        
+        outcome = stages.pop("outcome")
+        trace_id = stages.pop("trace_id")
+        durations = {}
+        for name, start, end, required in INTERVALS:
+            if stages[start] is not None and stages[end] is not None and required in (None, outcome):
+                durations[name] = round(max(0.0, stages[end] - stages[start]), 3)
+        return jsonify({
+            "id_comanda": id_comanda,
+            "rezultat": outcome,
+            "trace_id": trace_id,
+            "etape": {stage: datetime.fromtimestamp(at).isoformat() if at is not None else None
+                      for stage, at in stages.items()},
+            "durate": durations
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error fetching timings for order {id_comanda}: {e}", exc_info=True)
+        return jsonify({
+            "error": str(e),
+            "message": "Error fetching order timings"
+        }), 500
+
+
+@app.route('/api/changes', methods=['GET'])
+@require_api_key
+def get_changes():
+    """
+    Schimbările comenzilor (created, confirmed, cancelled) de după cursorul `since`, în ordinea
+    numerelor de secvență, și cursorul următor (`next`) pentru sincronizarea incrementală.
+    Un cursor mai vechi decât compactarea jurnalului primește 410 (resincronizare completă).
+    """
+    try:
+        change_log = get_change_log()
+        if change_log is None:
+            return jsonify({"error": "Jurnalul schimbărilor nu este disponibil"}), 503
+        
+        since = request.args.get('since', '0')
+        limit = request.args.get('limit', str(CHANGE_LOG_PAGE_SIZE))
+        if not since.isdigit():
+            return jsonify({"error": "Parameter 'since' must be a sequence number (0 for a full sync)"}), 400
+        if not limit.isdigit() or not 1 <= int(limit) <= CHANGE_LOG_PAGE_MAX:
+            return jsonify({"error": f"Parameter 'limit' must be a number between 1 and {CHANGE_LOG_PAGE_MAX}"}), 400
+        
+        result = change_log.since(int(since), int(limit))
+        if result is None:
+            logger.warning(f"⚠️ Cursor {since} outside the change log (sending 410)")
+            return jsonify({
+                "error": "Cursor 'since' is outside the change log (compacted or unknown) - full resync required",
+                "horizon": change_log.horizon(),
+                "latest": change_log.latest()
+            }), 410
+        changes, next_seq, has_more = result
+        return jsonify({
+            "changes": changes,
+            "next": next_seq,
+            "has_more": has_more
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error fetching order changes: {e}", exc_info=True)
+        return jsonify({
+            "error": str(e),
+            "message": "Error fetching order changes"
+        }), 500
+
+
+def _export_bound(value, inclusive_day=False):
+    """
+    Limita unui interval de export: o dată (YYYY-MM-DD) sau un moment ISO.
+    O dată folosită ca sfârșit de interval include toată ziua; un moment cu fus orar este
+    convertit în ora locală (numele fișierelor comenzilor folosesc ora locală).
+    """
+    if len(value) == 10:
+        moment = datetime.strptime(value, "%Y-%m-%d")
+        return moment + timedelta(days=1) if inclusive_day else moment
+    moment = datetime.fromisoformat(value)
+    return moment.astimezone().replace(tzinfo=None) if moment.tzinfo is not None else moment
+
+
+@app.route('/api/export', methods=['GET'])
+@require_api_key
+def export_comenzi():
+    """
+    Exportul comenzilor salvate în intervalul [from, to] (folderele curente și arhiva), în ordine
+    cronologică, ca NDJSON (o comandă per linie) sau CSV (un rând per produs).
+
+    Răspunsul este trimis în flux (chunked): comenzile sunt citite și formatate pe măsură ce
+    clientul le primește, deci memoria worker-ului nu crește cu intervalul exportat. Worker-ii
+    gthread/gevent (și modul "sync" implicit, cu GUNICORN_THREADS > 1, rulează ca gthread)
+    semnalează master-ului și în timpul unui răspuns lung: GUNICORN_TIMEOUT nu îl întrerupe.
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Parameter 'format' must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        start = _export_bound(request.args['from']) if request.args.get('from') else None
+        end = _export_bound(request.args['to'], inclusive_day=True) if request.args.get('to') else None
+    except ValueError:
+        return jsonify({"error": "Parameters 'from' and 'to' must be dates (YYYY-MM-DD) or ISO timestamps"}), 400
+    if start is not None and end is not None and start >= end:
+        return jsonify({"error": "Parameter 'from' must be before 'to'"}), 400
+    
+    chunks = export_chunks(iter_orders(start, end), fmt)
+    
+    def stream():
+        try:
+            while True:
+                # Citirea fișierelor/arhivelor prin offload (sub gevent nu blochează worker-ul)
+                chunk = offload(next, chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        except Exception as e:
+            # Statusul a fost deja trimis: excepția propagată face serverul să închidă conexiunea
+            # fără ultimul chunk, deci clientul vede un răspuns incomplet, nu un export mai scurt
+            logger.error(f"Error exporting orders: {e}", exc_info=True)
+            raise
+        finally:
+            chunks.close()
+    
+    logger.info(f"📤 Export comenzi ({fmt}): {start or 'început'} → {end or 'prezent'}")
+    filename = f"comenzi_{start:%Y%m%d}" if start else "comenzi"
+    response = Response(stream(), mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+@require_metrics_token
+def metrics():
+    """
+    Metrici în format text Prometheus: latențe per endpoint, căutări în foldere, IMAP,
+    parsare, notificări - agregate peste procesul de ingestie (Email Listener, Cleanup) și toți
+    worker-ii API.
+    """
+    try:
+        pending = len([f for f in os.listdir(COMENZI_NOI) if f.endswith('.json')]) if COMENZI_NOI.exists() else 0
+        ORDERS_PENDING.set(pending)
+        return Response(render_metrics(collect_metrics()), mimetype='text/plain; version=0.0.4')
+    except Exception as e:
+        logger.error(f"Error collecting metrics: {e}", exc_info=True)
+        return jsonify({
+            "error": str(e),
+            "message": "Error collecting metrics"
+        }), 500
+
+
+@app.route('/api/carantina', methods=['GET'])
+@require_api_key
+def get_carantina():
+    """Lista emailurilor din dead-letter și a celor aflate încă în reîncercare."""
+    quarantine = get_quarantine()
+    if quarantine is None:
+        return jsonify({"error": "Carantina nu este disponibilă"}), 503
+    
+    dead_letter = quarantine.dead_letters()
+    in_retry = quarantine.pending()
+    return jsonify({
+        "dead_letter": dead_letter,
+        "in_reincercare": in_retry,
+        "total": len(dead_letter) + len(in_retry)
+    }), 200
+
+
+@app.route('/api/carantina/<letter_id>/reproceseaza', methods=['POST'])
+@require_api_key
+def reproceseaza_carantina(letter_id):
+    """
+    Reprocesează un email din dead-letter (de ex. după o corecție a parserului).
+    
+    Emailul este parsat din nou (fără memo), iar comenzile noi sunt salvate. La succes,
+    intrarea este ștearsă din dead-letter; la eșec rămâne acolo și se returnează motivul.
+    
+    Args:
+        letter_id: ID-ul intrării din dead-letter (vezi GET /api/carantina)
+    """
+    # Import local: parserul nu este necesar în worker-ii API în afara reprocesării
+    import email
+    from app.services.email_listener import extract_html_from_message
+    from app.services.order_service import parse_orders, save_orders_batch, filter_new_orders
+    
+    try:
+        quarantine = get_quarantine()
+        if quarantine is None:
+            return jsonify({"error": "Carantina nu este disponibilă"}), 503
+        
+        letter = quarantine.load_dead_letter(letter_id)
+        if letter is None:
+            return jsonify({"error": "Intrare inexistentă în dead-letter", "id": letter_id}), 404
+        
+        html_content = extract_html_from_message(email.message_from_bytes(letter["raw_email"]))
+        if not html_content:
+            return jsonify({"success": False, "id": letter_id, "motiv": "Niciun conținut HTML"}), 422
+        
+        orders = parse_orders(html_content)
+        if not orders:
+            return jsonify({"success": False, "id": letter_id, "motiv": "Parsare eșuată - nicio comandă extrasă"}), 422
+        
+        new_orders = filter_new_orders(orders)
+        if new_orders and not save_orders_batch(new_orders):
+            return jsonify({"success": False, "id": letter_id, "motiv": "Salvare eșuată"}), 500
+        
+        quarantine.remove_dead_letter(letter_id, letter["key"])
+        # Un email re-livrat cu același conținut nu mai este parsat
+        memo = get_parse_memo()
+        if memo is not None:
+            memo.put(content_key(html_content), {"orders": orders})
+        
+        saved_ids = [order["comanda"]["id_intern_comanda"] for order in new_orders]
+        logger.info(f"✅ Email {letter_id} reprocesat din dead-letter: {saved_ids}")
+        return jsonify({
+            "success": True,
+            "id": letter_id,
+            "comenzi_salvate": saved_ids,
+            "comenzi_existente": len(orders) - len(new_orders)
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Eroare la reprocesarea {letter_id}: {e}", exc_info=True)
+        return jsonify({
+            "error": str(e),
+            "message": "Eroare la reprocesarea emailului"
+        }), 500
+
+
+@app.route('/api/memorie', methods=['GET'])
+@require_api_key
+def get_memorie():
+    """
+    Ultimul raport al watchdog-ului de memorie din procesul de ingestie: RSS, memoria urmărită de
+    tracemalloc, locațiile de alocare și tipurile de obiecte cu cea mai mare creștere.
+    """
+    report = load_memory_report()
+    if report is None:
+        return jsonify({
+            "error": "Niciun raport de memorie",
+            "message": "Watchdog-ul rulează în procesul de ingestie cu MEMORY_WATCHDOG=true"
+        }), 404
+    return jsonify(report), 200
+
+
+@app.route('/api/admin/profil', methods=['POST'])
+@require_api_key
+def start_profil():
+    """
+    Pornește un profil CPU prin eșantionare (PROFILING=true), scris în PROFILE_DIR.
+    
+    Parametri (query):
+        secunde: Durata profilului (implicit PROFILE_SECONDS, maxim PROFILE_MAX_SECONDS)
+        proces: "worker" (implicit, worker-ul care servește request-ul), "ingest" (Email Listener,
+                Cleanup) sau "master" (supervizorul Gunicorn) - ultimele două cu durata PROFILE_SECONDS
+    """
+    if not PROFILING:
+        return jsonify({"error": "Profilarea este dezactivată (PROFILING=false)"}), 404
+    if not API_KEY:
+        return jsonify({"error": "Profilarea necesită API_KEY"}), 403
+    
+    seconds = request.args.get('secunde', '')
+    if seconds and (not seconds.isdigit() or not 0 < int(seconds) <= PROFILE_MAX_SECONDS):
+        return jsonify({
+            "error": "Parametrul 'secunde' trebuie să fie un număr între 1 și " + str(PROFILE_MAX_SECONDS)
+        }), 400
+    
+    process = request.args.get('proces', 'worker')
+    if process in ('master', 'ingest'):
+        pid = master_pid() if process == 'master' else ingest_pid()
+        if pid is None:
+            return jsonify({"error": f"Procesul {process} nu este cunoscut (nu rulează sau nu sub Gunicorn)"}), 409
+        try:
+            signal_process(pid)
+        except OSError as e:
+            logger.error(f"❌ Semnalul de profilare nu a putut fi trimis procesului {process} {pid}: {e}")
+            return jsonify({"error": str(e)}), 500
+        logger.info(f"🔬 Profilare cerută pentru procesul {process} {pid}")
+        return jsonify({"status": "pornit", "proces": process, "pid": pid}), 202
+    if process != 'worker':
+        return jsonify({"error": "Parametrul 'proces' trebuie să fie 'worker', 'ingest' sau 'master'"}), 400
+    
+    profiler = start_sampling(int(seconds) if seconds else None)
+    if profiler is None:
+        running = active_profile()
+        return jsonify({
+            "error": "Un profil rulează deja în acest proces",
+            "fisier": running.path.name if running is not None else None
+        }), 409
+    return jsonify({
+        "status": "pornit",
+        "proces": "worker",
+        "pid": os.getpid(),
+        "secunde": profiler.seconds,
+        "fisier": profiler.path.name
+    }), 202
+
+
 @app.route('/api/webhook/test', methods=['POST'])
 def webhook_test():
     """
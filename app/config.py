@@ -1,29 +1,61 @@
 """
 Configurație centralizată pentru aplicația Eeatingh.
 Toate setările, constantele și căile sunt definite aici.
+
+Importul nu are efecte în afara citirii variabilelor de mediu (și a fișierului .env, dacă
+există): directoarele sunt create de create_directories(), iar credențialele email sunt
+verificate de require_email_credentials(), apelate de punctele de pornire care le folosesc.
 """
 
 import os
 from pathlib import Path
 from typing import Optional
-import dotenv
-
-# Încarcă variabilele de mediu din .env
-dotenv.load_dotenv()
 
 # Directoare de bază
 BASE_DIR = Path(__file__).resolve().parent.parent
 APP_DIR = BASE_DIR / "app"
 
+
+def _load_dotenv() -> None:
+    """Încarcă primul .env găsit în app/ sau în directoarele părinte (ca dotenv.find_dotenv)."""
+    for directory in (APP_DIR, *APP_DIR.parents):
+        env_file = directory / ".env"
+        if env_file.is_file():
+            # Import local: fără .env (ex. Docker cu env_file) pachetul nu este încărcat
+            import dotenv
+            dotenv.load_dotenv(env_file)
+            return
+
+
+# Încarcă variabilele de mediu din .env
+_load_dotenv()
+
 # Directoare pentru comenzi
 COMENZI_DIR = BASE_DIR / "comenzi"
 COMENZI_NOI = COMENZI_DIR / "noi"
 COMENZI_PROCESATE = COMENZI_DIR / "procesate"
 COMENZI_ANULATE = COMENZI_DIR / "anulate"
+# Emailuri care nu au putut fi procesate după toate reîncercările (vezi QUARANTINE_*)
+COMENZI_DEAD_LETTER = COMENZI_DIR / "dead_letter"
+COMENZI_ARHIVA = COMENZI_DIR / "arhiva"  # Comenzile procesate/anulate vechi (NDJSON gzip, per lună)
 
 # Directoare pentru logs
-LOGS_DIR = BASE_DIR / "logs"
+LOGS_DIR = Path(os.getenv("LOGS_DIR", str(BASE_DIR / "logs")))
 LOG_FILE = LOGS_DIR / "app.log"
+# "queue" - handler-ele (fișier, stdout) rulează într-un thread de background, apelantul doar
+#           pune înregistrarea într-o coadă; "sync" - scriere directă din thread-ul apelant
+LOG_MODE = os.getenv("LOG_MODE", "queue").lower()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = 10000  # Înregistrări în așteptare (peste limită sunt renunțate și numărate)
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # Rotație la 10 MB (0 = fără)
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight").lower()  # "midnight", "hourly" sau "" (doar după dimensiune)
+LOG_BACKUP_COUNT = 14  # Fișiere rotite păstrate (cele mai vechi sunt șterse)
+LOG_COMPRESS = os.getenv("LOG_COMPRESS", "true").lower() == "true"  # gzip în background pentru fișierele rotite
+LOG_DEBUG_SAMPLE_RATE = int(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1"))  # Păstrează 1 din N mesaje DEBUG per linie de cod
+
+# Director pentru starea persistentă a serviciilor (cache-uri, cozi); benchmark-urile folosesc
+# un director temporar
+DATA_DIR = Path(os.getenv("DATA_DIR", str(BASE_DIR / "data")))
 
 # Fișiere
 ORDER_COUNTER_FILE = LOGS_DIR / "order_counter.txt"
@@ -33,24 +65,81 @@ EMAIL_USER: Optional[str] = os.getenv("EMAIL_USER")
 EMAIL_PASS: Optional[str] = os.getenv("EMAIL_PASS")
 NOTIFICATION_RECIPIENT: Optional[str] = os.getenv("NOTIFICATION_RECIPIENT")
 
-# Validare credențiale
-if not EMAIL_USER or not EMAIL_PASS:
-    raise ValueError("EMAIL_USER și EMAIL_PASS trebuie definite în fișierul .env")
-
 # Configurări Email
 IMAP_SERVER = "imap.gmail.com"
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"  # false doar pentru un server SMTP local
+SMTP_TIMEOUT = 30  # Timeout pentru operațiile SMTP (secunde)
+
+# Notificări: trimise în background de un singur thread, pe o sesiune SMTP persistentă
+NOTIFICATION_QUEUE_SIZE = 100  # Notificări în așteptare; peste limită sunt renunțate (apelantul nu se blochează)
+NOTIFICATION_MAX_RETRIES = 3  # Reîncercări după o trimitere eșuată
+NOTIFICATION_RETRY_DELAY = 5  # Pauza înainte de prima reîncercare, dublată la fiecare eșec (secunde)
+NOTIFICATION_SMTP_IDLE = 5 * 60  # Sesiunea SMTP este închisă după 5 minute fără trimiteri
+# Digest: notificările sosite într-o fereastră de N secunde sunt trimise într-un singur email (0 = dezactivat)
+NOTIFICATION_DIGEST_WINDOW = float(os.getenv("NOTIFICATION_DIGEST_WINDOW", "0"))
+
+# Control al avalanșelor de notificări de eroare (per proces)
+NOTIFICATION_ERROR_DEDUP_WINDOW = 15 * 60  # Aceeași eroare (context + tip) este trimisă cel mult o dată la 15 minute
+NOTIFICATION_ERROR_BUDGET = 20  # Notificări de eroare pe oră (token bucket); restul intră în rezumat
+NOTIFICATION_SUMMARY_INTERVAL = 15 * 60  # Rezumatul erorilor suprimate este trimis la 15 minute după prima suprimare
+NOTIFICATION_STATS_DIR = DATA_DIR / "notifications"  # Statisticile fiecărui proces, pentru /api/health
 
 # Configurări Email Listener
 IDLE_TIMEOUT = 20 * 60  # 20 minute
 EMAIL_SENDER = "orders@eeatingh.ro"  # Expeditorul așteptat pentru comenzi
 
+# Configurări Parsare
+# "auto" - lxml dacă este instalat, altfel BeautifulSoup
+# "lxml" - ca "auto", dar avertizează dacă lxml lipsește
+# "bs4"  - doar BeautifulSoup (motorul de referință)
+PARSER_ENGINE = os.getenv("PARSER_ENGINE", "auto").lower()
+# Parsează doar zona comenzii din emailurile forwardate (rezultat identic cu parsarea completă);
+# doar cu BeautifulSoup - lxml parsează documentul întreg mai repede decât verificările decupării
+PARSER_PRETRIM = os.getenv("PARSER_PRETRIM", "true").lower() == "true"
+
+# Cache de șabloane: căile nodurilor învățate per structură de email
+TEMPLATE_CACHE_ENABLED = os.getenv("TEMPLATE_CACHE_ENABLED", "true").lower() == "true"
+TEMPLATE_CACHE_FILE = DATA_DIR / "template_cache.json"
+TEMPLATE_CACHE_MAX_ENTRIES = 32  # Șabloane păstrate (LRU)
+TEMPLATE_CACHE_SAVE_INTERVAL = 200  # Salvează ordinea LRU și statisticile la fiecare N căutări
+
+# Memo al rezultatelor parsării, indexat după hash-ul HTML-ului (emailuri re-livrate)
+PARSE_MEMO_ENABLED = os.getenv("PARSE_MEMO_ENABLED", "true").lower() == "true"
+PARSE_MEMO_FILE = DATA_DIR / "parse_memo.sqlite3"
+PARSE_MEMO_MAX_BYTES = 5 * 1024 * 1024  # Dimensiunea maximă a rezultatelor păstrate (LRU peste limită)
+PARSE_MEMO_MAX_AGE = 7 * 24 * 60 * 60  # Rezultatele mai vechi de 7 zile (secunde) sunt eliminate
+
+# Carantină pentru emailurile care nu pot fi procesate: reîncercări cu backoff exponențial,
+# apoi mutare în COMENZI_DEAD_LETTER
+QUARANTINE_FILE = DATA_DIR / "quarantine.sqlite3"
+QUARANTINE_MAX_ATTEMPTS = 5  # Încercări înainte de dead-letter
+QUARANTINE_BASE_DELAY = 60  # Prima reîncercare după 1 minut, apoi 2, 4, 8... (secunde)
+QUARANTINE_MAX_DELAY = 60 * 60  # Pauza maximă între reîncercări (1 oră)
+
+# Webhook-uri: comenzile noi sunt trimise (POST) către abonați imediat după salvare
+# WEBHOOK_SUBSCRIBERS - URL-uri separate prin virgulă (gol = dezactivat)
+WEBHOOK_SUBSCRIBERS = [url.strip() for url in os.getenv("WEBHOOK_SUBSCRIBERS", "").split(",") if url.strip()]
+WEBHOOK_SECRET: Optional[str] = os.getenv("WEBHOOK_SECRET")  # Cheia HMAC-SHA256 pentru semnătura livrărilor
+WEBHOOK_OUTBOX_FILE = DATA_DIR / "webhook_outbox.sqlite3"  # Livrările în așteptare (supraviețuiesc repornirilor)
+WEBHOOK_TIMEOUT = 10  # Timeout per livrare (secunde)
+WEBHOOK_MAX_ATTEMPTS = 10  # Încercări înainte ca livrarea să fie marcată eșuată
+WEBHOOK_RETRY_DELAY = 2  # Pauza după primul eșec, dublată la fiecare eșec (secunde)
+WEBHOOK_MAX_DELAY = 10 * 60  # Pauza maximă între reîncercări (10 minute)
+WEBHOOK_POLL_INTERVAL = 60  # Verificare outbox pentru livrările adăugate de alte procese (secunde)
+
 # Configurări Cleanup
 CLEANUP_THRESHOLD = 15  # Rulează cleanup la fiecare 15 comenzi
 CLEANUP_DAYS_OLD = 3    # Șterge emailuri mai vechi de 3 zile
 CLEANUP_FILES_DAYS_OLD = 7  # Șterge fișiere comenzi mai vechi de 7 zile
 CLEANUP_FILES_INTERVAL = 24 * 60 * 60  # Interval de curățare fișiere (24 ore în secunde)
+# Comenzile mai vechi de CLEANUP_FILES_DAYS_OLD sunt mutate în COMENZI_ARHIVA (pentru export)
+# în loc să fie șterse; false pentru ștergere
+CLEANUP_ARCHIVE = os.getenv("CLEANUP_ARCHIVE", "true").lower() == "true"
+
+# Exportul comenzilor (GET /api/export, export_orders.py): NDJSON sau CSV, citit în flux
+EXPORT_CHUNK_BYTES = 64 * 1024  # Dimensiunea unei bucăți a răspunsului (chunked)
 
 # Configurări API Server
 API_HOST = "0.0.0.0"
@@ -59,29 +148,153 @@ API_DEBUG = False
 
 # Securitate API
 API_KEY: Optional[str] = os.getenv("API_KEY")  # Cheie API pentru autentificare
-API_RATE_LIMIT = "100/minute"  # Limită de request-uri per minut
+# Token separat pentru GET /metrics (Prometheus: "Authorization: Bearer <token>"); X-API-Key este acceptat și el
+METRICS_TOKEN: Optional[str] = os.getenv("METRICS_TOKEN")
+API_RATE_LIMIT = "100/minute"  # Limită de request-uri per client (IP sau terminal POS)
+# Limite individuale per client: "pos-1=300/minute,10.0.0.7=20/minute" (terminal din X-Terminal-Id
+# - doar pentru request-uri cu X-API-Key valid - sau IP)
+API_RATE_LIMIT_QUOTAS = {
+    client.strip(): limit.strip()
+    for client, _, limit in (item.partition("=") for item in os.getenv("API_RATE_LIMIT_QUOTAS", "").split(","))
+    if client.strip() and limit.strip()
+}
+API_RATE_LIMIT_FILE = DATA_DIR / "rate_limits.mmap"  # Tabelul token bucket partajat de worker-ii Gunicorn
+API_RATE_LIMIT_SLOTS = 4096  # Clienți urmăriți simultan (cei inactivi sunt înlocuiți)
+
+# Distribuirea comenzilor către terminale (GET /api/comenzi):
+# "shared" - toate terminalele primesc cea mai veche comandă nouă (un singur POS)
+# "lease"  - fiecare GET rezervă comanda pentru terminalul din X-Terminal-Id (sau IP);
+#            celelalte terminale primesc următoarea comandă, iar rezervările neconfirmate
+#            în DISPATCH_LEASE_SECONDS revin în coadă
+DISPATCH_MODE = os.getenv("DISPATCH_MODE", "shared").lower()
+DISPATCH_LEASE_SECONDS = int(os.getenv("DISPATCH_LEASE_SECONDS", "120"))
+DISPATCH_FILE = DATA_DIR / "dispatch.sqlite3"  # Rezervările active, partajate de worker-ii Gunicorn
+
+# Idempotency-Key pentru POST /api/comenzi: primul răspuns este păstrat și retrimis la reîncercări
+IDEMPOTENCY_FILE = DATA_DIR / "idempotency.sqlite3"  # Răspunsurile păstrate, partajate de worker-ii Gunicorn
+IDEMPOTENCY_TTL = 24 * 60 * 60  # Cât timp este păstrat un răspuns (secunde)
+IDEMPOTENCY_MAX_ENTRIES = 10000  # Răspunsuri păstrate (cele mai vechi sunt eliminate peste limită)
+IDEMPOTENCY_WAIT = 5  # Cât așteaptă un duplicat rezultatul request-ului original aflat în curs (secunde)
+
+# Metrici Prometheus (GET /metrics): fiecare proces (ingestie și worker-i) își publică
+# periodic contoarele în METRICS_DIR/<pid>.json, agregate la fiecare scrape
+METRICS_DIR = DATA_DIR / "metrics"
+METRICS_PUBLISH_INTERVAL = 5  # Secunde între publicările unui proces
+
+# Timpii comenzilor pe etape (data emailului, sosire IMAP, parsare, salvare, prima preluare
+# de POS, confirmare/anulare), păstrați într-o bază SQLite partajată; GET /api/timpi
+ORDER_TIMELINE_FILE = DATA_DIR / "order_timeline.sqlite3"
+ORDER_TIMELINE_WINDOW = 60 * 60  # Fereastra implicită a percentilelor (secunde)
+ORDER_TIMELINE_RETENTION = 14 * 24 * 60 * 60  # Cât timp sunt păstrați timpii unei comenzi (secunde)
+
+# Jurnalul schimbărilor comenzilor (creată, confirmată, anulată) cu numere de secvență, pentru
+# sincronizarea incrementală a sistemelor din aval: GET /api/changes?since=<seq>&limit=N
+CHANGE_LOG_FILE = DATA_DIR / "changes.sqlite3"
+CHANGE_LOG_RETENTION = int(os.getenv("CHANGE_LOG_RETENTION_DAYS", "30")) * 24 * 60 * 60  # Compactare (secunde)
+CHANGE_LOG_PAGE_SIZE = 100  # Schimbări per răspuns (implicit)
+CHANGE_LOG_PAGE_MAX = 1000  # Valoarea maximă a parametrului limit
+
+# Trasarea fiecărei comenzi (email -> parsare -> salvare -> API): span-uri cu durate, scrise
+# ca linii JSON în TRACE_FILE; `python trace_waterfall.py <id_comanda>` le afișează
+TRACING = os.getenv("TRACING", "true").lower() == "true"
+TRACE_FILE = DATA_DIR / "traces.jsonl"
+TRACE_MAX_BYTES = 20 * 1024 * 1024  # Peste această dimensiune fișierul devine traces.jsonl.1 (o singură copie)
+
+# Profilare CPU la cerere (dezactivată implicit - fără niciun cost când este oprită):
+# - profil prin eșantionare pe toate thread-urile procesului, pentru PROFILE_SECONDS, pornit prin
+#   POST /api/admin/profil sau semnalul PROFILE_SIGNAL (ex. `kill -PROF <pid>` - ingestie sau worker)
+# - cProfile pentru un singur request cu header-ul "X-Profile: 1" (și X-API-Key valid)
+# Rezultatele sunt scrise în PROFILE_DIR: stive "collapsed" (.folded, pentru flamegraph.pl /
+# speedscope) și fișiere pstats (.prof, pentru `python -m pstats` / snakeviz)
+PROFILING = os.getenv("PROFILING", "false").lower() == "true"
+PROFILE_DIR = LOGS_DIR / "profiles"
+PROFILE_SIGNAL = "SIGPROF"  # Nefolosit de Gunicorn (master și worker-i)
+PROFILE_SECONDS = 30  # Durata implicită a unui profil prin eșantionare
+PROFILE_MAX_SECONDS = 300
+PROFILE_INTERVAL = 0.005  # Secunde între eșantioane
+PROFILE_KEEP = 50  # Fișiere de profil păstrate (cele mai vechi sunt șterse)
+
+# Watchdog de memorie pentru procesul de ingestie (Email Listener, Cleanup): snapshot-uri tracemalloc
+# periodice, RSS și numărul de obiecte; alertă prin email când RSS-ul crește cu încă
+# MEMORY_ALERT_GROWTH_MB față de pornire. Ultimul raport: GET /api/memorie
+MEMORY_WATCHDOG = os.getenv("MEMORY_WATCHDOG", "true").lower() == "true"
+MEMORY_WATCHDOG_INTERVAL = int(os.getenv("MEMORY_WATCHDOG_INTERVAL", "300"))  # Secunde între snapshot-uri
+# Cadre tracemalloc păstrate per alocare; 0 = fără tracemalloc (doar RSS și obiecte). Urmărirea
+# alocărilor încetinește construirea arborelui unui email de ~5 ori (3 ms -> 16 ms)
+MEMORY_TRACEMALLOC_FRAMES = int(os.getenv("MEMORY_TRACEMALLOC_FRAMES", "1"))
+MEMORY_ALERT_GROWTH_MB = int(os.getenv("MEMORY_ALERT_GROWTH_MB", "200"))
+MEMORY_TOP_ALLOCATIONS = 15  # Locații de alocare (și tipuri de obiecte) incluse în raport
+MEMORY_HISTORY = 288  # Valori RSS păstrate în raport (24 de ore la intervalul implicit)
+MEMORY_REPORT_FILE = DATA_DIR / "memory_watchdog.json"
 
 # Gunicorn (pentru producție)
-GUNICORN_WORKERS = 2  # Număr de worker-i (pentru trafic redus)
+GUNICORN_WORKERS = int(os.getenv("GUNICORN_WORKERS", "2"))  # Număr de worker-i (pentru trafic redus)
 GUNICORN_THREADS = 2  # Thread-uri per worker
 GUNICORN_TIMEOUT = 120  # Timeout în secunde
+GUNICORN_BIND = os.getenv("GUNICORN_BIND", f"0.0.0.0:{API_PORT}")
+# Modul worker-ilor API (vezi gunicorn_config.py și benchmarks/load_test.py):
+# "sync"     - GUNICORN_THREADS thread-uri per worker; un client lent ocupă un thread
+# "threaded" - gthread cu GUNICORN_THREADED_THREADS thread-uri; conexiunile keep-alive
+#              inactive așteaptă în poller-ul worker-ului, nu într-un thread
+# "gevent"   - un greenlet per conexiune (necesită pachetul gevent, altfel "threaded");
+#              citirile de fișiere sunt mutate în threadpool (app/services/io_offload.py)
+GUNICORN_MODE = os.getenv("GUNICORN_MODE", "sync").lower()
+GUNICORN_THREADED_THREADS = 32  # Thread-uri per worker în modul "threaded"
+GUNICORN_WORKER_CONNECTIONS = 1000  # Conexiuni simultane per worker în modul "gevent"
+GUNICORN_KEEPALIVE = 30  # Secunde în care o conexiune keep-alive a POS-ului rămâne deschisă ("threaded"/"gevent")
+# Aplicația este importată o singură dată, în master, iar worker-ii (re)porniți o moștenesc prin
+# fork (copy-on-write) în loc să o importe din nou; false pentru reîncărcarea codului cu SIGHUP
+GUNICORN_PRELOAD = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+# Serviciile de background (Email Listener, Cleanup, webhook-uri, watchdog memorie) în procesul
+# de ingestie, pornit și supravegheat de master; false pentru o instanță doar cu API (teste de
+# încărcare, instanțe suplimentare, ingestie rulată separat cu `python ingest.py`)
+BACKGROUND_SERVICES = os.getenv("BACKGROUND_SERVICES", "true").lower() == "true"
+
+# Procesul de ingestie (app/services/ingest.py): repornit de supervizor când se oprește, cu o
+# pauză dublată la fiecare oprire survenită la mai puțin de INGEST_STABLE_SECONDS după pornire
+INGEST_PID_FILE = DATA_DIR / "ingest.pid"
+INGEST_RESTART_DELAY = 1  # Pauza înaintea primei reporniri (secunde)
+INGEST_RESTART_MAX_DELAY = 60  # Pauza maximă între reporniri (secunde)
+INGEST_STABLE_SECONDS = 60  # După atâtea secunde de funcționare pauza revine la INGEST_RESTART_DELAY
+INGEST_STOP_TIMEOUT = 10  # Cât așteaptă oprirea (SIGTERM) înainte de SIGKILL (secunde)
+INGEST_CHECK_INTERVAL = 5  # Verificarea serviciilor din procesul de ingestie (secunde)
+# Email Listener fără activitate (ex. un socket IMAP blocat) - procesul este repornit (secunde)
+INGEST_HEARTBEAT_TIMEOUT = int(os.getenv("INGEST_HEARTBEAT_TIMEOUT", "300"))
+
+# Evenimentele "comenzi salvate" trimise worker-ilor API prin socket-uri Unix (un socket
+# datagram per worker în ORDER_EVENTS_DIR): trezesc long-poll-urile GET /api/comenzi?asteapta=N
+# și invalidează cache-urile per comandă
+ORDER_EVENTS = os.getenv("ORDER_EVENTS", "true").lower() == "true"
+ORDER_EVENTS_DIR = DATA_DIR / "events"
+ORDER_LONG_POLL_MAX = 30  # Așteptarea maximă a unui long-poll (secunde, sub GUNICORN_TIMEOUT)
+ORDER_LONG_POLL_RECHECK = 5  # Re-verificarea folderului în timpul unui long-poll, și fără eveniment (secunde)
 
 # Timezone
 TIMEZONE = "Europe/Bucharest"
 
 
+def require_email_credentials():
+    """
+    Verifică credențialele email, necesare procesului de ingestie (IMAP și notificări).
+    
+    Raises:
+        ValueError: Dacă EMAIL_USER sau EMAIL_PASS lipsesc
+    """
+    if not EMAIL_USER or not EMAIL_PASS:
+        raise ValueError("EMAIL_USER și EMAIL_PASS trebuie definite în fișierul .env")
+
+
 def create_directories():
     """Creează toate directoarele necesare dacă nu există."""
     directories = [
         COMENZI_NOI,
         COMENZI_PROCESATE,
         COMENZI_ANULATE,
-        LOGS_DIR
+        COMENZI_DEAD_LETTER,
+        COMENZI_ARHIVA,
+        LOGS_DIR,
+        DATA_DIR
     ]
     
     for directory in directories:
         directory.mkdir(parents=True, exist_ok=True)
-
-
-# Creează directoarele la import
-create_directories()
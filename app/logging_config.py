@@ -1,54 +1,345 @@
 """
 Configurare logging centralizată pentru aplicația Eeatingh.
+
+În modul "queue" (LOG_MODE, implicit) thread-ul care loghează (un request API, Email
+Listener-ul) doar pune înregistrarea într-o coadă; formatarea mesajului și scrierea în
+fișier / stdout au loc într-un thread de background (QueueListener). Argumentele `%s` ale
+mesajului sunt formatate tot acolo, deci payload-urile mari se loghează prin LazyJSON.
+
+Fișierul de log este rotit după dimensiune (LOG_MAX_BYTES) și/sau la miezul nopții
+(LOG_ROTATE_WHEN). Procesele Gunicorn (master + worker-i) scriu în același fișier: rotația
+are loc sub un lock fcntl, iar fiecare proces redeschide fișierul când observă că a fost
+rotit de altul. Fișierele rotite sunt comprimate gzip în background și păstrate maxim
+LOG_BACKUP_COUNT.
 """
 
+import atexit
+import gzip
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import shutil
 import sys
+import threading
+import time
+import weakref
+from contextvars import ContextVar
+from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # pragma: no cover - depinde de mediul de rulare (Windows)
+    FCNTL_AVAILABLE = False
 
 # Format pentru log-uri
-LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(trace)s%(message)s'
 DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
 # Logger global (va fi inițializat prin initialize_logging)
 logger = None
 
+# (trace ID, span ID) al span-ului activ în contextul curent (thread / greenlet), vezi tracing
+trace_context: ContextVar[Optional[Tuple[str, str]]] = ContextVar("eeatingh_trace", default=None)
+
+# Handler-ele cu coadă din procesul curent (repornite lazy după fork)
+_queue_handlers = weakref.WeakSet()
+
+
+class LazyJSON:
+    """
+    Obiect serializat JSON doar când mesajul de log este formatat (în thread-ul de background).
+
+    Utilizare: logger.info("Payload: %s", LazyJSON(data)) - obiectul nu trebuie modificat după.
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self) -> str:
+        return json.dumps(self.obj, ensure_ascii=False, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """Păstrează 1 din `rate` mesaje DEBUG pentru fiecare linie de cod care loghează."""
+
+    def __init__(self, rate: int):
+        super().__init__()
+        self.rate = rate
+        self._seen: Dict[tuple, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != logging.DEBUG or self.rate <= 1:
+            return True
+        site = (record.pathname, record.lineno)
+        count = self._seen.get(site, 0)
+        self._seen[site] = count + 1
+        return count % self.rate == 0
+
+
+class TraceFilter(logging.Filter):
+    """Prefixează mesajele cu ID-ul trace-ului activ în thread-ul care loghează (vezi tracing)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        current = trace_context.get()
+        if current is not None:
+            record.trace = f"[{current[0]}] "
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler care nu blochează niciodată apelantul.
+
+    Înregistrările nu sunt pre-formatate (mesajul este compus de QueueListener). Dacă
+    coada este plină, înregistrarea este renunțată și numărată. Thread-ul QueueListener
+    nu supraviețuiește unui fork: procesul copil primește o coadă nouă și își pornește
+    propriul listener la primul mesaj; la ieșire (atexit) coada este golită în fișier.
+    """
+
+    def __init__(self, handlers, maxsize: int):
+        super().__init__(queue.Queue(maxsize))
+        self.handlers = handlers
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._reported = 0
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._pid = None
+        _queue_handlers.add(self)
+        self._start()
+
+    def _start(self) -> None:
+        self._listener = logging.handlers.QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+        self._listener.start()
+        self._pid = os.getpid()
+        atexit.register(self.stop)
+
+    def _after_fork(self) -> None:
+        """În procesul copil: înregistrările părintelui rămân ale lui; listener-ul pornește lazy."""
+        self.queue = queue.Queue(self.maxsize)
+        self._listener = None
+        self._pid = None
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped != self._reported:
+            lost, self._reported = self.dropped - self._reported, self.dropped
+            try:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    "name": "eeatingh.logging", "levelno": logging.WARNING, "levelname": "WARNING",
+                    "msg": f"⚠️  {lost} mesaje de log pierdute (coada de log plină)",
+                }))
+            except queue.Full:
+                pass
+
+    def stop(self) -> None:
+        """Scrie înregistrările rămase în coadă și oprește listener-ul procesului curent."""
+        listener = self._listener
+        if listener is not None and self._pid == os.getpid() and listener._thread is not None:
+            self.queue.put(listener._sentinel)  # Blocant: așteaptă loc dacă coada este plină
+            listener._thread.join()
+            listener._thread = None
+
+    def close(self) -> None:
+        self.stop()
+        for handler in self.handlers:
+            handler.close()
+        super().close()
+
+
+class SharedRotatingFileHandler(logging.FileHandler):
+    """
+    FileHandler rotit după dimensiune și/sau timp, sigur când mai multe procese scriu în același fișier.
+
+    Args:
+        filename: Fișierul de log
+        max_bytes: Rotație când fișierul depășește dimensiunea (0 = fără)
+        when: "midnight", "hourly" sau "" (fără rotație după timp)
+        backup_count: Fișiere rotite păstrate
+        compress: Comprimă fișierele rotite (gzip, în background)
+    """
+
+    # Un fișier rotit este comprimat doar după ce celelalte procese au trecut la fișierul nou
+    compress_grace = 2.0
+
+    def __init__(self, filename: Path, max_bytes: int = 0, when: str = "", backup_count: int = 7,
+                 compress: bool = True):
+        super().__init__(filename, encoding='utf-8')
+        self.max_bytes = max_bytes
+        self.when = when
+        self.backup_count = backup_count
+        self.compress = compress
+        self._lock_path = f"{self.baseFilename}.lock"
+        self._identity = self._stat_identity()
+        self._rollover_at = self._next_rollover()
+
+    def _stat_identity(self):
+        try:
+            stat = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def _next_rollover(self) -> Optional[float]:
+        now = datetime.now()
+        if self.when == "midnight":
+            return (now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)).timestamp()
+        if self.when == "hourly":
+            return (now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)).timestamp()
+        return None
+
+    def _reopen(self) -> None:
+        if self.stream is not None:
+            self.stream.close()
+        self.stream = self._open()
+        self._identity = self._stat_identity()
+        self._rollover_at = self._next_rollover()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.stream is not None and self._stat_identity() != self._identity:
+                self._reopen()  # Rotit (sau șters) de alt proces
+            if self.stream is not None and self._should_rollover():
+                self._rollover()
+        except OSError:
+            self.handleError(record)
+        super().emit(record)
+
+    def _should_rollover(self) -> bool:
+        if self._rollover_at is not None and time.time() >= self._rollover_at:
+            return True
+        return bool(self.max_bytes) and self.stream.tell() >= self.max_bytes
+
+    def _exclusive(self, lock) -> None:
+        if FCNTL_AVAILABLE:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+    def _rollover(self) -> None:
+        with open(self._lock_path, 'a') as lock:
+            self._exclusive(lock)
+            # Alt proces poate fi rotit fișierul cât am așteptat lock-ul
+            if self._stat_identity() == self._identity:
+                if self._rollover_at is not None and time.time() >= self._rollover_at:
+                    suffix = datetime.fromtimestamp(self._rollover_at).strftime("%Y%m%d-%H%M%S")
+                else:
+                    suffix = datetime.now().strftime("%Y%m%d-%H%M%S")
+                target = f"{self.baseFilename}.{suffix}"
+                index = 1
+                while os.path.exists(target) or os.path.exists(f"{target}.gz"):
+                    target = f"{self.baseFilename}.{suffix}.{index}"
+                    index += 1
+                os.rename(self.baseFilename, target)
+            self._reopen()
+        threading.Thread(target=self._housekeeping, args=(self.compress_grace,), daemon=True,
+                         name="LogCompression").start()
+
+    def _housekeeping(self, delay: float = 0.0) -> None:
+        """Comprimă fișierele rotite și le șterge pe cele peste backup_count."""
+        time.sleep(delay)
+        try:
+            with open(self._lock_path, 'a') as lock:
+                self._exclusive(lock)
+                directory = Path(self.baseFilename).parent
+                prefix = f"{Path(self.baseFilename).name}."
+                rotated = [path for path in directory.iterdir()
+                           if path.name.startswith(prefix) and path.name[len(prefix):][:1].isdigit()]
+                if self.compress:
+                    for path in rotated:
+                        stat = path.stat()
+                        if path.suffix in (".gz", ".tmp") or stat.st_mtime > time.time() - self.compress_grace:
+                            continue  # Alte procese pot scrie încă în fișierul abia rotit
+                        partial = path.with_name(f"{path.name}.gz.tmp")
+                        with open(path, 'rb') as src, gzip.open(partial, 'wb') as dst:
+                            shutil.copyfileobj(src, dst)
+                        os.utime(partial, (stat.st_atime, stat.st_mtime))
+                        os.replace(partial, path.with_name(f"{path.name}.gz"))
+                        path.unlink()
+                    rotated = [path for path in directory.iterdir()
+                               if path.name.startswith(prefix) and path.name[len(prefix):][:1].isdigit()
+                               and path.suffix != ".tmp"]
+                for path in sorted(rotated, key=lambda p: p.stat().st_mtime)[:-self.backup_count or None]:
+                    path.unlink()
+        except OSError as e:
+            sys.stderr.write(f"Eroare la comprimarea log-urilor rotite: {e}\n")
+
+
+def logging_stats() -> Dict:
+    """Starea cozii de log din procesul curent (modul "queue")."""
+    for handler in list(_queue_handlers):
+        return {"mode": "queue", "queued": handler.queue.qsize(), "dropped": handler.dropped}
+    return {"mode": "sync"}
+
+
+def _reset_after_fork() -> None:
+    for handler in list(_queue_handlers):
+        handler._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
 
 def initialize_logging(log_file_path: Path) -> logging.Logger:
     """
     Inițializează configurarea logging pentru întreaga aplicație.
     Această funcție trebuie apelată explicit la pornirea aplicației.
-    
+
     Args:
         log_file_path: Calea către fișierul de log
-        
+
     Returns:
         Logger-ul principal al aplicației
     """
     global logger
-    
+    from app.config import (
+        LOG_MODE, LOG_LEVEL, LOG_QUEUE_SIZE, LOG_MAX_BYTES, LOG_ROTATE_WHEN, LOG_BACKUP_COUNT, LOG_COMPRESS,
+        LOG_DEBUG_SAMPLE_RATE
+    )
+
     # Asigură-te că directorul pentru logs există
     log_file_path.parent.mkdir(parents=True, exist_ok=True)
-    
+
+    formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT, defaults={"trace": ""})
+    handlers = [
+        SharedRotatingFileHandler(log_file_path, max_bytes=LOG_MAX_BYTES, when=LOG_ROTATE_WHEN,
+                                  backup_count=LOG_BACKUP_COUNT, compress=LOG_COMPRESS),
+        logging.StreamHandler(sys.stdout)
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    if LOG_MODE == "queue":
+        handlers = [NonBlockingQueueHandler(handlers, LOG_QUEUE_SIZE)]
+    for handler in handlers:
+        if LOG_DEBUG_SAMPLE_RATE > 1:
+            handler.addFilter(DebugSampler(LOG_DEBUG_SAMPLE_RATE))
+        # Filtrele rulează în thread-ul care loghează, unde trace-ul activ este cunoscut
+        handler.addFilter(TraceFilter())
+
     # Configurare logging de bază (force=True resetează automat handler-ele existente)
-    logging.basicConfig(
-        level=logging.INFO,
-        format=LOG_FORMAT,
-        datefmt=DATE_FORMAT,
-        handlers=[
-            logging.FileHandler(log_file_path, encoding='utf-8'),
-            logging.StreamHandler(sys.stdout)
-        ],
-        force=True
-    )
-    
+    logging.basicConfig(level=LOG_LEVEL, handlers=handlers, force=True)
+
     # Creează și returnează logger-ul principal
     logger = logging.getLogger("eeatingh")
-    logger.setLevel(logging.INFO)
-    
+    logger.setLevel(LOG_LEVEL)
+
     # Log mesaj de confirmare
-    logger.info(f"📋 Logging inițializat: {log_file_path}")
-    
+    logger.info(f"📋 Logging inițializat: {log_file_path} (mod {LOG_MODE})")
+
     return logger
 
 
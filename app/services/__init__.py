@@ -1,15 +1,32 @@
 """
 Serviciile aplicației Eeatingh.
+
+Exporturile de mai jos sunt importate la prima utilizare: `import app.services.<modul>` nu
+încarcă parserul (bs4) sau clientul IMAP (imapclient) în procesele care nu le folosesc
+(worker-ii API).
 """
 
-from .order_service import parse_order_html, save_order_json, is_order_processed
-from .notification_service import NotificationService
-from .email_listener import EmailListener
-
-__all__ = [
-    'parse_order_html',
-    'save_order_json', 
-    'is_order_processed',
-    'NotificationService',
-    'EmailListener'
-]
+import importlib
+
+# Numele exportat -> modulul care îl definește
+_EXPORTS = {
+    'parse_order_html': 'order_service',
+    'parse_orders': 'order_service',
+    'save_order_json': 'order_service',
+    'save_orders_batch': 'order_service',
+    'is_order_processed': 'order_service',
+    'NotificationService': 'notification_service',
+    'get_notification_service': 'notification_service',
+    'EmailListener': 'email_listener',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,204 @@
+"""
+Jurnalul schimbărilor de stare ale comenzilor, pentru sincronizarea incrementală a sistemelor
+din aval (baza de raportare, un al doilea POS): GET /api/changes?since=<seq>&limit=N.
+
+Fiecare schimbare primește un număr de secvență crescător (seq), niciodată refolosit:
+    created   - comanda salvată în comenzi/noi (save_order_json, save_orders_batch), cu datele ei
+    confirmed - confirmată prin POST /api/comenzi (cu timp_livrare)
+    cancelled - anulată prin POST /api/comenzi
+
+Jurnalul este o bază SQLite în DATA_DIR în care doar se adaugă rânduri: scrie procesul de
+ingestie (comenzile salvate) și worker-ii API (confirmări/anulări). Scrierile sunt serializate
+de SQLite, iar seq este alocat în tranzacția de scriere, deci un cititor vede întotdeauna un
+prefix al jurnalului: un consumator care reține ultimul seq primit nu pierde schimbări și
+citește doar schimbările noi (căutare după cheia primară, fără scanarea folderelor).
+
+Schimbările mai vechi decât CHANGE_LOG_RETENTION sunt șterse (compactare): un cursor mai vechi
+decât orizontul compactării primește 410 și trebuie să resincronizeze complet.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.config import CHANGE_LOG_FILE, CHANGE_LOG_RETENTION
+from app.logging_config import get_logger
+from app.services.process_local import ProcessLocal
+
+logger = get_logger("change_log")
+
+EVENT_CREATED = "created"
+EVENT_CONFIRMED = "confirmed"
+EVENT_CANCELLED = "cancelled"
+
+PRUNE_INTERVAL = 60 * 60  # Secunde între compactări
+
+# AUTOINCREMENT: seq nu este refolosit nici după ștergerea celor mai noi rânduri
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    at REAL NOT NULL,
+    order_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    data TEXT
+);
+"""
+
+
+class ChangeLog:
+    """
+    Jurnalul schimbărilor comenzilor, partajat între procese.
+
+    Args:
+        path: Fișierul bazei de date
+        retention: Cât timp sunt păstrate schimbările (secunde)
+    """
+
+    def __init__(self, path: Path, retention: float = CHANGE_LOG_RETENTION):
+        self.path = path
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(path), timeout=5, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+
+    def append(self, changes: List[Tuple[str, str, Optional[Dict]]], at: Optional[float] = None) -> List[int]:
+        """
+        Adaugă schimbări, într-o singură tranzacție (numere de secvență consecutive).
+
+        Args:
+            changes: (id comandă, eveniment, date suplimentare sau None)
+            at: Momentul schimbărilor (implicit acum)
+
+        Returns:
+            Numerele de secvență alocate
+        """
+        at = time.time() if at is None else at
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                sequence = [
+                    self._connection.execute(
+                        "INSERT INTO changes (at, order_id, event, data) VALUES (?, ?, ?, ?)",
+                        (at, str(order_id), event,
+                         json.dumps(data, ensure_ascii=False) if data is not None else None)
+                    ).lastrowid
+                    for order_id, event, data in changes
+                ]
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            if at - self._last_prune >= PRUNE_INTERVAL:
+                self._last_prune = at
+                self._compact(at - self.retention)
+        return sequence
+
+    def _compact(self, cutoff: float) -> None:
+        # Se șterge un prefix al jurnalului (până la ultima schimbare mai veche decât retenția),
+        # deci orizontul rămâne MIN(seq) - 1
+        deleted = self._connection.execute(
+            "DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes WHERE at < ?)", (cutoff,)
+        ).rowcount
+        if deleted:
+            logger.debug(f"🧹 Jurnal schimbări: {deleted} schimbări mai vechi decât retenția șterse")
+
+    def horizon(self) -> int:
+        """Ultimul seq șters la compactare (un cursor mai mic a pierdut schimbări)."""
+        with self._lock:
+            return self._horizon()
+
+    def _horizon(self) -> int:
+        oldest = self._connection.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+        if oldest is not None:
+            return oldest - 1
+        # Jurnal gol: toate schimbările alocate până acum au fost șterse
+        return self._latest()
+
+    def _latest(self) -> int:
+        row = self._connection.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+        return row[0] if row else 0
+
+    def since(self, seq: int, limit: int) -> Optional[Tuple[List[Dict], int, bool]]:
+        """
+        Schimbările cu seq > `seq`, în ordine.
+
+        Args:
+            seq: Cursorul consumatorului (ultimul seq primit, 0 la prima sincronizare)
+            limit: Numărul maxim de schimbări returnate
+
+        Returns:
+            (schimbările, cursorul următor, True dacă mai sunt schimbări după cele returnate),
+            sau None dacă schimbări de după cursor au fost deja șterse ori cursorul nu provine din
+            acest jurnal (resincronizare completă)
+        """
+        with self._lock:
+            # Orizontul și schimbările din același snapshot (o compactare concurentă nu trece neobservată)
+            self._connection.execute("BEGIN")
+            try:
+                if seq < self._horizon() or seq > self._latest():
+                    return None
+                rows = self._connection.execute(
+                    "SELECT seq, at, order_id, event, data FROM changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                    (seq, limit + 1)
+                ).fetchall()
+            finally:
+                self._connection.execute("COMMIT")
+        has_more = len(rows) > limit
+        changes = [
+            {
+                "seq": row_seq,
+                "timestamp": datetime.fromtimestamp(at).isoformat(),
+                "id_comanda": order_id,
+                "event": event,
+                **(json.loads(data) if data is not None else {})
+            }
+            for row_seq, at, order_id, event, data in rows[:limit]
+        ]
+        return changes, changes[-1]["seq"] if changes else seq, has_more
+
+    def latest(self) -> int:
+        """Ultimul seq alocat (0 dacă jurnalul nu a primit încă nicio schimbare)."""
+        with self._lock:
+            return self._latest()
+
+
+# Instanța globală (creată la prima utilizare, în fiecare proces)
+_change_log: ProcessLocal[ChangeLog] = ProcessLocal(
+    lambda: ChangeLog(CHANGE_LOG_FILE),
+    lambda e: logger.error(f"❌ Jurnalul schimbărilor nu poate fi deschis ({e})")
+)
+
+
+def get_change_log() -> Optional[ChangeLog]:
+    """Returnează jurnalul global, sau None dacă nu poate fi deschis (schimbările nu sunt înregistrate)."""
+    return _change_log.get()
+
+
+def record_created_orders(orders: List[Dict]) -> None:
+    """Înregistrează comenzile salvate în comenzi/noi, cu datele lor (nu aruncă excepții)."""
+    change_log = get_change_log()
+    if change_log is None or not orders:
+        return
+    try:
+        change_log.append([(order["comanda"]["id_intern_comanda"], EVENT_CREATED, {"comanda": order["comanda"]})
+                           for order in orders])
+    except Exception as e:
+        logger.error(f"❌ Eroare la înregistrarea comenzilor noi în jurnalul schimbărilor: {e}")
+
+
+def record_order_change(order_id: str, event: str, data: Optional[Dict] = None) -> None:
+    """Înregistrează confirmarea/anularea unei comenzi (nu aruncă excepții)."""
+    change_log = get_change_log()
+    if change_log is None:
+        return
+    try:
+        change_log.append([(order_id, event, data)])
+    except Exception as e:
+        logger.error(f"❌ Eroare la înregistrarea schimbării comenzii #{order_id}: {e}")
@@ -1,6 +1,7 @@
 """
 Automatic cleanup service for old order files.
-Deletes JSON files older than X days from processed and cancelled folders.
+Archives (CLEANUP_ARCHIVE, see order_export) or deletes JSON files older than X days from
+processed and cancelled folders.
 """
 
 import os
@@ -9,9 +10,13 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from threading import Thread
 
-from app.config import COMENZI_PROCESATE, COMENZI_ANULATE, CLEANUP_FILES_DAYS_OLD, CLEANUP_FILES_INTERVAL
+from app.config import (
+    COMENZI_PROCESATE, COMENZI_ANULATE, CLEANUP_FILES_DAYS_OLD, CLEANUP_FILES_INTERVAL, CLEANUP_ARCHIVE
+)
 from app.logging_config import get_logger
-from app.services.notification_service import NotificationService
+from app.services.notification_service import get_notification_service
+from app.services.metrics import CLEANUP_SECONDS, CLEANUP_DELETED
+from app.services.order_export import archive_order_files
 
 logger = get_logger("cleanup_service")
 
@@ -33,13 +38,15 @@ class CleanupService:
     
     def cleanup_old_files(self):
         """
-        Delete JSON files older than X days from processed/cancelled order folders.
+        Archive (CLEANUP_ARCHIVE) or delete JSON files older than X days from processed/cancelled
+        order folders.
         """
         try:
             logger.info("=" * 80)
             logger.info(f"START File cleanup (older than {self.days_old} days)")
             logger.info("=" * 80)
             
+            started = time.perf_counter()
             cutoff_date = datetime.now() - timedelta(days=self.days_old)
             total_deleted = 0
             
@@ -55,6 +62,7 @@ class CleanupService:
                     continue
                 
                 deleted_count = 0
+                old_files = []
                 
                 # Process files in folder
                 for filename in os.listdir(folder_path):
@@ -67,7 +75,9 @@ class CleanupService:
                         # Check file modification date
                         file_modified_time = datetime.fromtimestamp(filepath.stat().st_mtime)
                         
-                        if file_modified_time < cutoff_date:
+                        if file_modified_time < cutoff_date and CLEANUP_ARCHIVE:
+                            old_files.append((folder_name, filepath))
+                        elif file_modified_time < cutoff_date:
                             # Delete file
                             os.remove(filepath)
                             deleted_count += 1
@@ -76,26 +86,33 @@ class CleanupService:
                     except Exception as e:
                         logger.error(f"Error deleting file {filename}: {e}")
                 
+                # Arhivare: comenzile rămân disponibile pentru export (GET /api/export)
+                if old_files:
+                    deleted_count += archive_order_files(old_files)
+                
                 if deleted_count > 0:
-                    logger.info(f"Folder '{folder_name}': {deleted_count} files deleted")
+                    logger.info(f"Folder '{folder_name}': {deleted_count} files {'archived' if CLEANUP_ARCHIVE else 'deleted'}")
                 else:
-                    logger.info(f"Folder '{folder_name}': No old files to delete")
+                    logger.info(f"Folder '{folder_name}': No old files to {'archive' if CLEANUP_ARCHIVE else 'delete'}")
                 
                 total_deleted += deleted_count
+                CLEANUP_DELETED.labels(folder_name).inc(deleted_count)
             
+            CLEANUP_SECONDS.observe(time.perf_counter() - started)
             logger.info("=" * 80)
             if total_deleted > 0:
-                logger.info(f"Cleanup completed: {total_deleted} files deleted total")
+                logger.info(f"Cleanup completed: {total_deleted} files {'archived' if CLEANUP_ARCHIVE else 'deleted'} total")
             else:
                 logger.info("Cleanup completed: No old files found")
             
             # --- MODIFICARE ---
             # Trimite raport de sănătate (health check)
             try:
-                NotificationService().send_notification(
+                get_notification_service().send_notification(
                     subject=f"Raport Zilnic Eeatingh (Curățenie OK)",
                     content=f"Serviciul de curățenie a rulat cu succes.\n\n"
-                            f"Total fișiere vechi șterse: {total_deleted}\n"
+                            f"Total fișiere vechi {'arhivate (comenzi/arhiva)' if CLEANUP_ARCHIVE else 'șterse'}: "
+                            f"{total_deleted}\n"
                             f"Aplicația funcționează normal."
                 )
             except Exception as e:
@@ -3,23 +3,40 @@ Email Listener cu IMAP IDLE - Monitoring în timp real pentru emailuri noi.
 Include funcționalitate integrată de curățare automată a emailurilor vechi.
 """
 
-from imapclient import IMAPClient
 import email
 import time
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional
 
 from app.config import (
     EMAIL_USER, EMAIL_PASS, IMAP_SERVER, IDLE_TIMEOUT, EMAIL_SENDER,
     CLEANUP_THRESHOLD, CLEANUP_DAYS_OLD, ORDER_COUNTER_FILE
 )
 from app.logging_config import get_logger
-from app.services.order_service import parse_order_html, save_order_json, is_order_processed
-from app.services.notification_service import NotificationService
+from app.services.order_service import save_orders_batch, filter_new_orders
+from app.services.parse_memo import parse_orders_memoized
+from app.services.quarantine import STATE_DEAD, dead_letter_id, get_quarantine, message_key
+from app.services.notification_service import get_notification_service
+from app.services.metrics import IMAP_COMMAND_SECONDS, IDLE_TO_SAVE_SECONDS
+from app.services.tracing import span, traced
 
 logger = get_logger("email_listener")
 
 
+def extract_html_from_message(msg) -> Optional[str]:
+    """Extrage conținutul HTML dintr-un mesaj email."""
+    try:
+        if msg.is_multipart():
+            for part in msg.walk():
+                if part.get_content_type() == "text/html":
+                    return part.get_payload(decode=True).decode('utf-8', 'ignore')
+        elif msg.get_content_type() == "text/html":
+            return msg.get_payload(decode=True).decode('utf-8', 'ignore')
+    except Exception as e:
+        logger.error(f"Eroare la extragerea HTML: {e}")
+    return None
+
+
 class EmailListener:
     """
     Clasa pentru monitoring continuu emailuri folosind IMAP IDLE.
@@ -31,9 +48,13 @@ class EmailListener:
         self.user = EMAIL_USER
         self.password = EMAIL_PASS
         self.imap_server = IMAP_SERVER
-        self.mail: Optional[IMAPClient] = None
+        self.mail = None  # IMAPClient, după connect()
         self.running = True
         self.idle_timeout = IDLE_TIMEOUT
+        # Momentul notificării IDLE în curs de procesare (pentru latența notificare -> salvare)
+        self._notified_at: Optional[float] = None
+        # Ultima activitate a buclei (time.monotonic), urmărită de procesul de ingestie
+        self.heartbeat = time.monotonic()
         
         logger.info(f"⚙️  EmailListener inițializat pentru {self.user}")
     
@@ -41,9 +62,12 @@ class EmailListener:
         """Conectare la serverul IMAP."""
         try:
             logger.info("🔌 Conectare la serverul IMAP...")
-            self.mail = IMAPClient(self.imap_server, ssl=True, timeout=30)
-            self.mail.login(self.user, self.password)
-            self.mail.select_folder('INBOX')
+            # Import local: doar procesul de ingestie se conectează la IMAP
+            from imapclient import IMAPClient
+            with IMAP_COMMAND_SECONDS.labels("connect").time():
+                self.mail = IMAPClient(self.imap_server, ssl=True, timeout=30)
+            self._imap("login", self.user, self.password)
+            self._imap("select_folder", 'INBOX')
             logger.info("✅ Conectat cu succes la IMAP")
             return True
         except Exception as e:
@@ -51,6 +75,11 @@ class EmailListener:
             self.mail = None
             return False
     
+    def _imap(self, command: str, *args):
+        """Rulează o comandă IMAP și înregistrează durata ei (round-trip) în metrici."""
+        with IMAP_COMMAND_SECONDS.labels(command).time(), span(f"imap.{command}"):
+            return getattr(self.mail, command)(*args)
+    
     def disconnect(self):
         """Deconectare de la serverul IMAP."""
         try:
@@ -62,10 +91,13 @@ class EmailListener:
         finally:
             self.mail = None
     
-    def increment_order_counter(self) -> int:
+    def increment_order_counter(self, amount: int = 1) -> int:
         """
         Incrementează contorul de comenzi procesate și returnează valoarea.
         
+        Args:
+            amount: Numărul de comenzi procesate (un email JSON poate conține mai multe)
+        
         Returns:
             Numărul curent de comenzi procesate
         """
@@ -76,7 +108,7 @@ class EmailListener:
             else:
                 count = 0
             
-            count += 1
+            count += amount
             
             with open(ORDER_COUNTER_FILE, 'w') as f:
                 f.write(str(count))
@@ -115,7 +147,7 @@ class EmailListener:
             
             # Caută emailuri de la eeatingh mai vechi de cutoff_date
             search_criteria = f'(FROM "{EMAIL_SENDER}" BEFORE {cutoff_date_str})'
-            messages = self.mail.search(['FROM', EMAIL_SENDER, 'BEFORE', cutoff_date_str])
+            messages = self._imap("search", ['FROM', EMAIL_SENDER, 'BEFORE', cutoff_date_str])
             
             if not messages:
                 logger.info("📭 Nu există emailuri vechi de șters")
@@ -127,39 +159,55 @@ class EmailListener:
             for email_id in messages:
                 try:
                     # Copiază în Trash înainte de ștergere
-                    self.mail.copy([email_id], "[Gmail]/Trash")
+                    self._imap("copy", [email_id], "[Gmail]/Trash")
                     # Marchează pentru ștergere
-                    self.mail.set_flags([email_id], [b'\\Deleted'])
+                    self._imap("set_flags", [email_id], [b'\\Deleted'])
                     deleted_count += 1
                 except Exception as e:
                     logger.error(f"⚠️  Eroare la ștergerea emailului {email_id}: {e}")
             
             # Execută ștergerea efectivă
-            self.mail.expunge()
+            self._imap("expunge")
             logger.info(f"✅ {deleted_count} emailuri șterse cu succes!")
             
         except Exception as e:
             logger.error(f"❌ Eroare la curățarea emailurilor: {e}", exc_info=True)
     
+    @traced("email", lambda self, email_id: {"email_id": email_id}, root=True)
     def process_new_email(self, email_id: int) -> bool:
         """
         Procesează un email nou.
         
+        Emailurile eșuate intră în carantină: sunt sărite (fără fetch și parsare) până la
+        următoarea reîncercare programată, iar după QUARANTINE_MAX_ATTEMPTS sunt mutate
+        în dead-letter și marcate ca citite. Fiecare email începe un trace nou (vezi tracing),
+        continuat de request-urile API pentru comenzile lui.
+        
         Args:
             email_id: ID-ul emailului de procesat
             
         Returns:
             True dacă procesarea a reușit, False altfel
         """
+        self.heartbeat = time.monotonic()
+        quarantine = get_quarantine()
+        if quarantine is not None and quarantine.is_blocked(uid=email_id):
+            logger.debug(f"Email {email_id} în carantină - sărit până la următoarea reîncercare")
+            return False
+        
+        key = None
+        raw_email = None
+        subject = ""
         try:
-            # Fetch emailul
-            msg_data = self.mail.fetch([email_id], ['RFC822'])
+            # Fetch emailul (și momentul sosirii lui în căsuță, pentru timpii comenzii)
+            msg_data = self._imap("fetch", [email_id], ['RFC822', 'INTERNALDATE'])
             
             if not msg_data or email_id not in msg_data:
                 logger.warning(f"Nu s-a putut fetch emailul {email_id}")
                 return False
             
             raw_email = msg_data[email_id][b'RFC822']
+            internal_date = msg_data[email_id].get(b'INTERNALDATE')
             msg = email.message_from_bytes(raw_email)
             
             # Verifică expeditorul
@@ -168,35 +216,50 @@ class EmailListener:
                 logger.debug(f"Email ignorat (expeditor: {from_addr})")
                 return True
             
+            key = message_key(msg, raw_email)
+            subject = str(msg.get('Subject', ''))
+            if quarantine is not None and quarantine.is_blocked(key=key):
+                logger.debug(f"Email {email_id} în carantină - sărit până la următoarea reîncercare")
+                return False
+            
             # Extrage conținutul HTML
-            html_content = self._extract_html_from_message(msg)
+            html_content = extract_html_from_message(msg)
             if not html_content:
                 logger.warning(f"Niciun conținut HTML găsit în email {email_id}")
-                return False
+                return self._quarantine_failure(email_id, key, raw_email, subject, "Niciun conținut HTML")
             
             logger.info(f"📧 Procesare email #{email_id}...")
             
-            # Parsează HTML și extrage datele comenzii
-            order_data = parse_order_html(html_content)
+            # Parsează emailul și extrage toate comenzile (wrapper-ul JSON poate conține mai multe);
+            # un email re-livrat cu același conținut ia rezultatul din memo
+            orders, memoized = parse_orders_memoized(html_content)
+            parsed_at = time.time()
+            if memoized:
+                logger.info(f"♻️  Email #{email_id} deja parsat - rezultat din memo")
             
-            if not order_data:
+            if not orders:
                 logger.error(f"❌ Parsare eșuată pentru email {email_id}")
-                return False
+                return self._quarantine_failure(email_id, key, raw_email, subject, "Parsare eșuată - nicio comandă extrasă")
             
-            # Extract order ID from wrapped structure
-            order_id = order_data["comanda"]["id_intern_comanda"]
+            # Verifică duplicate (deja salvate sau repetate în același email)
+            new_orders = filter_new_orders(orders)
             
-            # Verifică duplicate
-            if is_order_processed(order_id):
-                self.mail.set_flags([email_id], [b'\\Seen'])
+            if not new_orders:
+                self._resolve(key)
+                self._imap("set_flags", [email_id], [b'\\Seen'])
                 return True
             
-            # Salvează JSON-ul
-            if save_order_json(order_data):
-                logger.info(f"✅ Comandă #{order_id} procesată cu succes!")
+            # Salvează toate comenzile emailului într-un singur batch
+            order_list = ', '.join(f"#{order['comanda']['id_intern_comanda']}" for order in new_orders)
+            stages = {"arrived": internal_date.timestamp() if internal_date else None, "parsed": parsed_at}
+            if save_orders_batch(new_orders, stages=stages):
+                logger.info(f"✅ Comenzi procesate cu succes: {order_list}")
+                if self._notified_at is not None:
+                    IDLE_TO_SAVE_SECONDS.observe(time.perf_counter() - self._notified_at)
+                self._resolve(key)
                 
                 # Incrementează contorul și verifică dacă trebuie să ruleze cleanup
-                count = self.increment_order_counter()
+                count = self.increment_order_counter(len(new_orders))
                 logger.info(f"📊 Comenzi procesate: {count}/{CLEANUP_THRESHOLD}")
                 
                 if count >= CLEANUP_THRESHOLD:
@@ -204,35 +267,73 @@ class EmailListener:
                     self.reset_order_counter()
                 
                 # Marchează emailul ca citit
-                self.mail.set_flags([email_id], [b'\\Seen'])
+                self._imap("set_flags", [email_id], [b'\\Seen'])
                 return True
             else:
-                logger.error(f"❌ Eroare la salvarea comenzii #{order_id}")
-                return False
+                logger.error(f"❌ Eroare la salvarea comenzilor {order_list}")
+                return self._quarantine_failure(email_id, key, raw_email, subject, f"Salvare eșuată pentru {order_list}")
                 
         except Exception as e:
             logger.error(f"❌ Eroare la procesarea emailului {email_id}: {e}", exc_info=True)
+            if key is not None:
+                return self._quarantine_failure(email_id, key, raw_email, subject, f"Excepție: {e}")
             return False
     
-    def _extract_html_from_message(self, msg) -> Optional[str]:
-        """Extrage conținutul HTML dintr-un mesaj email."""
+    def _quarantine_failure(self, email_id: int, key: str, raw_email: bytes, subject: str, reason: str) -> bool:
+        """
+        Înregistrează eșecul în carantină. Notificarea de eroare este trimisă doar la primul
+        eșec și la mutarea în dead-letter, nu la fiecare reîncercare.
+        
+        Returns:
+            False (emailul nu a fost procesat)
+        """
+        quarantine = get_quarantine()
+        if quarantine is None:
+            return False
+        
+        record = quarantine.record_failure(key, email_id, reason, raw_email, subject)
+        if record["state"] == STATE_DEAD:
+            # Emailul nu mai apare în căutările UNSEEN; rămâne disponibil în dead-letter
+            try:
+                self._imap("set_flags", [email_id], [b'\\Seen'])
+            except Exception as e:
+                logger.error(f"Eroare la marcarea emailului {email_id} ca citit: {e}")
+            context = (f"Email mutat în dead-letter după {record['attempts']} încercări "
+                       f"(subiect: {subject}). Reprocesare: POST /api/carantina/{dead_letter_id(key)}/reproceseaza")
+        elif record["attempts"] == 1:
+            context = f"Email pus în carantină (subiect: {subject}), reîncercare la {record['next_retry']}"
+        else:
+            return False
+        
         try:
-            if msg.is_multipart():
-                for part in msg.walk():
-                    if part.get_content_type() == "text/html":
-                        return part.get_payload(decode=True).decode('utf-8', 'ignore')
-            elif msg.get_content_type() == "text/html":
-                return msg.get_payload(decode=True).decode('utf-8', 'ignore')
-        except Exception as e:
-            logger.error(f"Eroare la extragerea HTML: {e}")
-        return None
+            get_notification_service().send_error_notification(error_message=reason, context=context)
+        except Exception:
+            pass
+        return False
+    
+    def _resolve(self, key: str) -> None:
+        """Scoate din carantină un email procesat cu succes."""
+        quarantine = get_quarantine()
+        if quarantine is not None:
+            quarantine.resolve(key)
+    
+    def quarantined_due(self) -> List[int]:
+        """UID-urile din carantină a căror pauză de backoff a expirat."""
+        quarantine = get_quarantine()
+        return quarantine.due_uids() if quarantine is not None else []
+    
+    def retry_quarantined(self, due: List[int]) -> None:
+        """Reîncearcă emailurile din carantină a căror pauză de backoff a expirat."""
+        logger.info(f"🔁 Reîncercare {len(due)} email(uri) din carantină")
+        for email_id in due:
+            self.process_new_email(email_id)
     
     def process_existing_unread(self):
         """Procesează emailurile necitite existente la pornire."""
         try:
             logger.info("📬 Verificare emailuri necitite existente...")
             
-            messages = self.mail.search(['UNSEEN', 'FROM', EMAIL_SENDER])
+            messages = self._imap("search", ['UNSEEN', 'FROM', EMAIL_SENDER])
             
             if not messages:
                 logger.info("📭 Niciun email necitit existent")
@@ -256,6 +357,7 @@ class EmailListener:
         logger.info("=" * 80)
         
         while self.running:
+            self.heartbeat = time.monotonic()
             try:
                 # Conectare dacă nu suntem conectați
                 if not self.mail:
@@ -270,31 +372,41 @@ class EmailListener:
                 # Start IDLE mode
                 logger.info("👂 Ascult pentru emailuri noi (IDLE mode)...")
                 
-                self.mail.idle()
+                self._imap("idle")
                 logger.info("✅ IDLE mode activat")
                 
                 # Așteaptă notificări
                 start_time = time.time()
                 
                 while self.running and (time.time() - start_time) < self.idle_timeout:
+                    self.heartbeat = time.monotonic()
                     try:
                         responses = self.mail.idle_check(timeout=30)
                         
+                        if not responses:
+                            # Reîncercările programate din carantină (verificate la fiecare 30s)
+                            due = self.quarantined_due()
+                            if due:
+                                self._imap("idle_done")
+                                self.retry_quarantined(due)
+                                self._imap("idle")
+                        
                         if responses:
-                            logger.info(f"📥 IDLE notificare primită: {responses}")
+                            logger.info("📥 IDLE notificare primită: %s", responses)
                             
                             # Verifică dacă sunt emailuri noi
                             has_new_emails = False
                             for response in responses:
                                 if len(response) >= 2:
                                     if b'EXISTS' in response or b'RECENT' in response or b'FETCH' in response:
-                                        logger.info(f"🔔 Email nou detectat! {response}")
+                                        logger.info("🔔 Email nou detectat! %s", response)
                                         has_new_emails = True
                                         break
                             
                             # Procesează emailurile noi
                             if has_new_emails:
-                                self.mail.idle_done()
+                                self._notified_at = time.perf_counter()
+                                self._imap("idle_done")
                                 logger.info("⏸️  Ieșit din IDLE mode pentru procesare")
                                 
                                 #Modificare pentru a evita race condition
@@ -307,7 +419,7 @@ class EmailListener:
                                     time.sleep(wait_time)
 
                                     logger.info(f"🔎 Caut emailuri UNSEEN de la {EMAIL_SENDER}...")
-                                    messages = self.mail.search(['UNSEEN', 'FROM', EMAIL_SENDER])
+                                    messages = self._imap("search", ['UNSEEN', 'FROM', EMAIL_SENDER])
 
                                     if messages:
                                         logger.info(f"✅ Găsit {len(messages)} email(uri) la încercarea {attempt}")
@@ -321,9 +433,10 @@ class EmailListener:
                                         self.process_new_email(email_id)
                                 else:
                                     logger.error(f"❌ EROARE CRITICĂ: Notificare primită, dar emailul nu a fost găsit după 3 încercări.")
+                                self._notified_at = None
                                 
                                 # Reintrare în IDLE
-                                self.mail.idle()
+                                self._imap("idle")
                                 logger.info("▶️  Reintrare în IDLE mode")
                                 start_time = time.time()
                         
@@ -349,9 +462,10 @@ class EmailListener:
                 # --- MODIFICARE ---
                 # Trimite notificare de eroare CRITICĂ
                 try:
-                    NotificationService().send_error_notification(
+                    get_notification_service().send_error_notification(
                         error_message=str(e),
-                        context="EmailListener - idle_loop (CRITICĂ)"
+                        context="EmailListener - idle_loop (CRITICĂ)",
+                        exception=e
                     )
                 except:
                     pass  # Nu vrem să crăpăm dacă nici notificarea nu merge
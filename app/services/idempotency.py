@@ -0,0 +1,194 @@
+"""
+Cache de răspunsuri pentru request-urile cu header Idempotency-Key.
+
+Terminalele POS reîncearcă POST-urile pe Wi-Fi instabil. Primul request cu o cheie dată
+este executat, iar răspunsul lui (status + corp) este păstrat IDEMPOTENCY_TTL secunde;
+reîncercările cu aceeași cheie primesc exact același răspuns, fără a atinge fișierele.
+
+Cheia este rezervată atomic înainte de execuție (un rând "pending", inserat printr-un
+UPSERT condiționat): un duplicat care sosește în timp ce originalul rulează în alt worker
+așteaptă rezultatul (maxim IDEMPOTENCY_WAIT secunde) în loc să execute din nou operația.
+O cheie refolosită cu alt corp de request este respinsă.
+
+Răspunsurile sunt păstrate într-o bază SQLite în DATA_DIR, partajată de worker-ii Gunicorn,
+limitată la IDEMPOTENCY_MAX_ENTRIES rânduri (cele mai vechi sunt eliminate).
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from app.config import (
+    IDEMPOTENCY_FILE, IDEMPOTENCY_TTL, IDEMPOTENCY_MAX_ENTRIES, IDEMPOTENCY_WAIT, GUNICORN_TIMEOUT
+)
+from app.logging_config import get_logger
+from app.services.process_local import ProcessLocal
+
+logger = get_logger("idempotency")
+
+STATE_PENDING = "pending"
+STATE_DONE = "done"
+
+# Rezultatele lui begin()
+NEW = "new"  # Cheia este rezervată pentru request-ul curent: execută și apelează complete()/abandon()
+REPLAY = "replay"  # Răspunsul păstrat trebuie retrimis
+MISMATCH = "mismatch"  # Cheie refolosită pentru un alt request
+IN_PROGRESS = "in_progress"  # Originalul rulează încă
+
+PRUNE_INTERVAL = 60  # Secunde între eliminările răspunsurilor expirate / peste limită
+POLL_INTERVAL = 0.02  # Secunde între verificările unui request original aflat în curs
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    state TEXT NOT NULL,
+    status INTEGER,
+    body BLOB,
+    mimetype TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_created ON responses (created_at);
+"""
+
+# Rezervă cheia dacă este liberă, dacă răspunsul păstrat a expirat, sau dacă request-ul
+# original a rămas "pending" mai mult decât poate rula un request (worker oprit forțat)
+RESERVE = """
+INSERT INTO responses (key, fingerprint, state, created_at) VALUES (?, ?, 'pending', ?)
+ON CONFLICT (key) DO UPDATE SET
+    fingerprint = excluded.fingerprint, state = 'pending', status = NULL, body = NULL, mimetype = NULL,
+    created_at = excluded.created_at
+WHERE (responses.state = 'done' AND responses.created_at <= ?)
+   OR (responses.state = 'pending' AND responses.created_at <= ?)
+"""
+
+
+def request_fingerprint(method: str, path: str, body: bytes) -> str:
+    """Amprenta request-ului (aceeași cheie trebuie folosită doar pentru același request)."""
+    digest = hashlib.sha256(f"{method} {path}\n".encode('utf-8'))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class IdempotencyCache:
+    """
+    Răspunsurile request-urilor idempotente, partajate între procese.
+
+    Args:
+        path: Fișierul bazei de date
+        ttl: Cât timp este păstrat un răspuns (secunde)
+        max_entries: Numărul maxim de răspunsuri păstrate
+        pending_timeout: După cât timp un request original "pending" este considerat abandonat
+    """
+
+    def __init__(self, path: Path, ttl: float = IDEMPOTENCY_TTL, max_entries: int = IDEMPOTENCY_MAX_ENTRIES,
+                 pending_timeout: float = GUNICORN_TIMEOUT):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.pending_timeout = pending_timeout
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self.executed = 0
+        self.replayed = 0
+        self.rejected = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(path), timeout=5, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+
+    def begin(self, key: str, fingerprint: str) -> Tuple[str, Optional[Tuple[int, bytes, str]]]:
+        """
+        Rezervă cheia pentru request-ul curent sau returnează răspunsul păstrat.
+
+        Returns:
+            (NEW, None), (REPLAY, (status, corp, mimetype)), (MISMATCH, None) sau (IN_PROGRESS, None)
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._connection.execute(
+                RESERVE, (key, fingerprint, now, now - self.ttl, now - self.pending_timeout)
+            )
+            if cursor.rowcount == 1:
+                self.executed += 1
+                return NEW, None
+            row = self._connection.execute(
+                "SELECT fingerprint, state, status, body, mimetype FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+        if row is None:  # Eliminat între timp - rar, se reîncearcă rezervarea
+            return self.begin(key, fingerprint)
+        stored_fingerprint, state, status, body, mimetype = row
+        if stored_fingerprint != fingerprint:
+            self.rejected += 1
+            return MISMATCH, None
+        if state == STATE_PENDING:
+            return IN_PROGRESS, None
+        self.replayed += 1
+        return REPLAY, (status, body, mimetype)
+
+    def wait(self, key: str, fingerprint: str,
+             timeout: float = IDEMPOTENCY_WAIT) -> Tuple[str, Optional[Tuple[int, bytes, str]]]:
+        """begin(), repetat cât timp request-ul original rulează încă (maxim `timeout` secunde)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            outcome, response = self.begin(key, fingerprint)
+            if outcome != IN_PROGRESS or time.monotonic() >= deadline:
+                return outcome, response
+            time.sleep(POLL_INTERVAL)
+
+    def complete(self, key: str, status: int, body: bytes, mimetype: str) -> None:
+        """Păstrează răspunsul request-ului original."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "UPDATE responses SET state = ?, status = ?, body = ?, mimetype = ?, created_at = ? WHERE key = ?",
+                (STATE_DONE, status, body, mimetype, now, key)
+            )
+            if now - self._last_prune >= PRUNE_INTERVAL:
+                self._last_prune = now
+                self._prune(now)
+
+    def abandon(self, key: str) -> None:
+        """Eliberează cheia unui request care nu a produs un răspuns definitiv (poate fi reîncercat)."""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses WHERE key = ? AND state = ?", (key, STATE_PENDING))
+
+    def _prune(self, now: float) -> None:
+        """Elimină răspunsurile expirate și pe cele mai vechi peste max_entries (sub self._lock)."""
+        expired = self._connection.execute(
+            "DELETE FROM responses WHERE state = ? AND created_at <= ?", (STATE_DONE, now - self.ttl)
+        ).rowcount
+        evicted = self._connection.execute(
+            "DELETE FROM responses WHERE key IN "
+            "(SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+        ).rowcount
+        if expired or evicted:
+            logger.debug(f"🧹 Idempotency: {expired} răspunsuri expirate, {evicted} eliminate peste limită")
+
+    def stats(self) -> Dict:
+        """Numărul de răspunsuri păstrate și contoarele procesului curent."""
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "rejected": self.rejected,
+        }
+
+
+# Instanța globală (creată la prima utilizare, în fiecare proces)
+_idempotency_cache: ProcessLocal[IdempotencyCache] = ProcessLocal(
+    lambda: IdempotencyCache(IDEMPOTENCY_FILE),
+    lambda e: logger.error(f"❌ Cache-ul Idempotency-Key nu poate fi deschis ({e}) - cheile sunt ignorate")
+)
+
+
+def get_idempotency_cache() -> Optional[IdempotencyCache]:
+    """Returnează cache-ul global, sau None dacă baza de date nu poate fi deschisă (cheile sunt ignorate)."""
+    return _idempotency_cache.get()
@@ -0,0 +1,298 @@
+"""
+Procesul de ingestie: Email Listener, Cleanup Service, livrarea webhook-urilor și watchdog-ul de
+memorie, într-un proces separat de master-ul Gunicorn și de worker-ii API.
+
+O parsare lungă sau un socket IMAP blocat nu mai împart procesul cu supravegherea worker-ilor,
+iar master-ul nu mai rulează cod al aplicației după fork-area worker-ilor.
+
+- start_background_services() - punctul unic de pornire, apelat din gunicorn_config.when_ready
+  și din run_dev.py - pornește IngestSupervisor.
+- IngestSupervisor rulează `python ingest.py` ca proces copil și îl repornește când se oprește,
+  după INGEST_RESTART_DELAY secunde, dublate la fiecare oprire survenită la mai puțin de
+  INGEST_STABLE_SECONDS după pornire (maxim INGEST_RESTART_MAX_DELAY). Fiecare oprire
+  neașteptată trimite o notificare de eroare (deduplicată de notification_throttle).
+- run_ingest() rulează serviciile în thread-uri și oprește procesul (cod 1, deci repornire)
+  când un serviciu s-a oprit neașteptat sau Email Listener nu a mai raportat activitate de
+  INGEST_HEARTBEAT_TIMEOUT secunde.
+
+Comenzile salvate sunt anunțate worker-ilor API prin socket-uri Unix (vezi order_events).
+"""
+
+import atexit
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import List, Optional
+
+from app.config import (
+    BASE_DIR, BACKGROUND_SERVICES, require_email_credentials, INGEST_PID_FILE, INGEST_RESTART_DELAY, INGEST_RESTART_MAX_DELAY,
+    INGEST_STABLE_SECONDS, INGEST_STOP_TIMEOUT, INGEST_CHECK_INTERVAL, INGEST_HEARTBEAT_TIMEOUT
+)
+from app.logging_config import get_logger
+
+logger = get_logger("ingest")
+
+INGEST_SCRIPT = BASE_DIR / "ingest.py"
+# PID-ul supervizorului, transmis procesului de ingestie (care se oprește dacă supervizorul dispare)
+SUPERVISOR_PID_ENV = "EEATINGH_INGEST_SUPERVISOR"
+
+
+def run_ingest(check_interval: float = INGEST_CHECK_INTERVAL,
+               heartbeat_timeout: float = INGEST_HEARTBEAT_TIMEOUT) -> int:
+    """
+    Rulează serviciile de background în procesul curent, până la SIGTERM/SIGINT sau până când
+    unul dintre ele nu mai funcționează. Trebuie apelată din thread-ul principal.
+
+    Returns:
+        Codul de ieșire al procesului: 0 la oprire cerută, 1 dacă un serviciu s-a oprit
+
+    Raises:
+        ValueError: Dacă EMAIL_USER sau EMAIL_PASS lipsesc
+    """
+    require_email_credentials()
+
+    # Import local: parserul și clientul IMAP sunt încărcate doar în procesul de ingestie
+    from app.services.email_listener import EmailListener
+    from app.services.cleanup_service import CleanupService
+    from app.services.webhook_outbox import get_webhook_outbox
+    from app.services.memory_watchdog import get_memory_watchdog
+    from app.services.profiler import install_signal_handler
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.set())
+    install_signal_handler()  # Profilare la cerere (PROFILING=true)
+    _write_pid_file()
+
+    logger.info("=" * 80)
+    logger.info(f"🚀 Pornire servicii background (proces de ingestie {os.getpid()})")
+    logger.info("=" * 80)
+
+    logger.info("📧 Pornire Email Listener...")
+    email_listener = EmailListener()
+    logger.info("🧹 Pornire Cleanup Service...")
+    cleanup_service = CleanupService()
+    threads = [
+        threading.Thread(target=email_listener.start, daemon=True, name="EmailListener"),
+        threading.Thread(target=cleanup_service.start, daemon=True, name="CleanupService"),
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Livrarea webhook-urilor (dacă sunt configurați abonați)
+    webhook_outbox = get_webhook_outbox()
+    if webhook_outbox is not None:
+        logger.info("🔗 Pornire livrare webhook-uri...")
+        webhook_outbox.start()
+
+    # Watchdog-ul de memorie (MEMORY_WATCHDOG)
+    memory_watchdog = get_memory_watchdog()
+    if memory_watchdog is not None:
+        logger.info("🧠 Pornire watchdog memorie...")
+        memory_watchdog.start()
+
+    logger.info("=" * 80)
+    logger.info("✅ Servicii background pornite cu succes!")
+    logger.info("=" * 80)
+
+    supervisor = os.environ.get(SUPERVISOR_PID_ENV)
+    exit_code = 0
+    while not stopping.wait(check_interval):
+        if supervisor is not None and str(os.getppid()) != supervisor:
+            logger.error("❌ Supervizorul procesului de ingestie s-a oprit - oprire")
+            break
+        stopped = [thread.name for thread in threads if not thread.is_alive()]
+        if stopped:
+            logger.error(f"❌ Serviciul {', '.join(stopped)} s-a oprit - procesul de ingestie repornește")
+            exit_code = 1
+            break
+        silent = time.monotonic() - email_listener.heartbeat
+        if silent > heartbeat_timeout:
+            logger.error(f"❌ Email Listener nu mai răspunde de {silent:.0f}s (IMAP blocat?) - "
+                         f"procesul de ingestie repornește")
+            exit_code = 1
+            break
+
+    logger.info("🛑 Oprire servicii background...")
+    email_listener.stop()
+    cleanup_service.stop()
+    if webhook_outbox is not None:
+        webhook_outbox.stop()
+    if memory_watchdog is not None:
+        memory_watchdog.stop()
+    if exit_code == 0:
+        # Salvarea în curs a unui email se termină; un thread blocat nu întârzie oprirea
+        deadline = time.monotonic() + INGEST_STOP_TIMEOUT / 2
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+    _remove_pid_file()
+    logger.info(f"🛑 Proces de ingestie oprit (cod {exit_code})")
+    return exit_code
+
+
+def _write_pid_file() -> None:
+    try:
+        INGEST_PID_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = INGEST_PID_FILE.with_name(INGEST_PID_FILE.name + '.tmp')
+        tmp_file.write_text(str(os.getpid()), encoding='utf-8')
+        os.replace(tmp_file, INGEST_PID_FILE)
+    except OSError as e:
+        logger.warning(f"⚠️ Fișierul PID al procesului de ingestie nu a putut fi scris: {e}")
+
+
+def _remove_pid_file() -> None:
+    try:
+        if INGEST_PID_FILE.read_text(encoding='utf-8').strip() == str(os.getpid()):
+            INGEST_PID_FILE.unlink()
+    except OSError:
+        pass
+
+
+def ingest_pid() -> Optional[int]:
+    """PID-ul procesului de ingestie în funcțiune, sau None."""
+    try:
+        value = INGEST_PID_FILE.read_text(encoding='utf-8').strip()
+    except OSError:
+        return None
+    if not value.isdigit():
+        return None
+    try:
+        os.kill(int(value), 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass
+    return int(value)
+
+
+class IngestSupervisor:
+    """
+    Pornește procesul de ingestie și îl repornește când se oprește.
+
+    Args:
+        command: Comanda procesului (implicit `python ingest.py`)
+    """
+
+    def __init__(self, command: Optional[List[str]] = None):
+        self.command = command or [sys.executable, str(INGEST_SCRIPT)]
+        self.process: Optional[subprocess.Popen] = None
+        self.restarts = 0
+        self._pid = os.getpid()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="IngestSupervisor")
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self) -> None:
+        failures = 0
+        while not self._stopping.is_set():
+            started = time.monotonic()
+            try:
+                # Sesiune proprie: Ctrl+C în terminal oprește master-ul, care oprește apoi ingestia
+                self.process = subprocess.Popen(self.command, cwd=str(BASE_DIR), start_new_session=True,
+                                                env={**os.environ, SUPERVISOR_PID_ENV: str(os.getpid())})
+            except OSError as e:
+                logger.error(f"❌ Procesul de ingestie nu a putut fi pornit: {e}")
+                code = None
+            else:
+                logger.info(f"🚀 Proces de ingestie pornit (PID {self.process.pid})")
+                # Sub Gunicorn, master-ul poate culege el procesul copil (os.waitpid(-1));
+                # Popen.wait() returnează atunci 0 în loc de codul real, deci 0 nu este raportat
+                code = self.process.wait()
+            if self._stopping.is_set():
+                break
+
+            uptime = time.monotonic() - started
+            failures = 0 if uptime >= INGEST_STABLE_SECONDS else failures + 1
+            delay = min(INGEST_RESTART_DELAY * 2 ** max(failures - 1, 0), INGEST_RESTART_MAX_DELAY)
+            self.restarts += 1
+            status = f" (cod {code})" if code else ""
+            message = f"Procesul de ingestie s-a oprit{status} după {uptime:.0f}s"
+            logger.error(f"❌ {message} - repornire în {delay:g}s")
+            try:
+                from app.services.notification_service import get_notification_service
+                get_notification_service().send_error_notification(
+                    error_message=message,
+                    context="IngestSupervisor - repornire proces de ingestie"
+                )
+            except Exception as e:
+                logger.error(f"Eroare la trimiterea notificării: {e}")
+            self._stopping.wait(delay)
+
+    def stop(self, timeout: float = INGEST_STOP_TIMEOUT) -> None:
+        """Oprește procesul de ingestie (SIGTERM, apoi SIGKILL după `timeout` secunde)."""
+        if os.getpid() != self._pid:
+            return  # Handler atexit moștenit prin fork (worker Gunicorn): ingestia aparține părintelui
+        self._stopping.set()
+        process = self.process
+        if process is not None and process.poll() is None:
+            logger.info(f"🛑 Oprire proces de ingestie (PID {process.pid})...")
+            process.terminate()
+            try:
+                process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                logger.warning(f"⚠️ Procesul de ingestie nu s-a oprit în {timeout:g}s - SIGKILL")
+                process.kill()
+                process.wait()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+# Supervizorul procesului curent (master Gunicorn sau run_dev.py)
+_supervisor: Optional[IngestSupervisor] = None
+_supervisor_lock = threading.Lock()
+
+
+def start_background_services() -> Optional[IngestSupervisor]:
+    """
+    Punctul unic de pornire a serviciilor de background (gunicorn_config.py, run_dev.py):
+    procesul de ingestie, supravegheat. Fără efect cu BACKGROUND_SERVICES=false.
+
+    Returns:
+        Supervizorul pornit, sau None
+
+    Raises:
+        ValueError: Dacă EMAIL_USER sau EMAIL_PASS lipsesc (procesul de ingestie nu ar putea porni)
+    """
+    global _supervisor
+
+    if not BACKGROUND_SERVICES:
+        logger.info("⏭️  BACKGROUND_SERVICES=false - pornesc doar API-ul")
+        return None
+    require_email_credentials()
+    with _supervisor_lock:
+        if _supervisor is None:
+            _supervisor = IngestSupervisor()
+            _supervisor.start()
+    return _supervisor
+
+
+def stop_background_services() -> None:
+    """Oprește procesul de ingestie pornit de start_background_services()."""
+    global _supervisor
+
+    with _supervisor_lock:
+        if _supervisor is not None:
+            _supervisor.stop()
+            _supervisor = None
+
+
+def _reset_after_fork() -> None:
+    """Procesul de ingestie aparține părintelui (worker-ii Gunicorn nu îl supraveghează)."""
+    global _supervisor, _supervisor_lock
+    _supervisor = None
+    _supervisor_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,37 @@
+"""
+Mutarea operațiilor blocante pe fișiere în afara event loop-ului (modul "gevent").
+
+Sub gevent, socket-urile sunt cooperative, dar citirile de pe disc (os.listdir, open/read,
+shutil.move) blochează tot worker-ul - toate conexiunile POS servite de el așteaptă după
+un director mare sau un disc lent. offload() rulează astfel de funcții în threadpool-ul
+hub-ului gevent, iar greenlet-ul curent cedează controlul până la rezultat.
+
+În modurile "sync" și "threaded" fiecare request are deja thread-ul lui, deci funcția este
+apelată direct (fără cost suplimentar). gevent nu este importat dacă nu este deja activ.
+"""
+
+import sys
+from typing import Any, Callable
+
+
+def gevent_active() -> bool:
+    """True dacă procesul rulează sub gevent (modulul socket a fost patch-uit de worker)."""
+    monkey = sys.modules.get("gevent.monkey")
+    return monkey is not None and monkey.is_module_patched("socket")
+
+
+def offload(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Rulează o funcție cu I/O blocant pe disc fără a bloca event loop-ul.
+
+    Args:
+        func: Funcția de rulat (citiri/scanări de fișiere)
+        *args, **kwargs: Argumentele funcției
+
+    Returns:
+        Rezultatul funcției (excepțiile sunt propagate)
+    """
+    if gevent_active():
+        import gevent
+        return gevent.get_hub().threadpool.apply(func, args, kwargs)
+    return func(*args, **kwargs)
@@ -0,0 +1,99 @@
+"""
+Motor rapid de parsare a comenzilor, bazat pe lxml.
+
+Arborele lxml este tradus, într-o singură traversare, în același DocumentIndex pe care
+îl construiește și motorul de referință (BeautifulSoup), respectând semantica acestuia
+(Tag.string, get_text fără comentarii/script/style). Extracția este comună
+(order_service.extract_order), deci dicționarul {"comanda": {...}} rezultat este identic,
+inclusiv ordinea cheilor. Orice excepție sau rezultat incomplet este tratat de apelant
+prin fallback la BeautifulSoup.
+"""
+
+from typing import Optional, Dict
+
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:  # pragma: no cover - depinde de mediul de rulare
+    etree = None
+    LXML_AVAILABLE = False
+
+from app.services.order_index import DocumentIndex, IndexBuilder
+from app.services.order_service import TRACKING_HOST, extract_order
+
+# Tag-uri al căror conținut text nu apare în get_text() la BeautifulSoup
+HIDDEN_TEXT_TAGS = frozenset(('script', 'style', 'template', 'rt', 'rp'))
+
+if LXML_AVAILABLE:
+    # huge_tree: fără el libxml2 oprește imbricarea la 256 de niveluri (emailurile redirecționate
+    # de multe ori o depășesc); peste 2048 rezultatul este incomplet și se folosește BeautifulSoup
+    HTML_PARSER = etree.HTMLParser(encoding='utf-8', remove_comments=False, remove_pis=False, huge_tree=True)
+
+
+def build_index_lxml(root, marker: str) -> DocumentIndex:
+    """Construiește indexul dintr-un arbore lxml, într-o singură traversare."""
+    builder = IndexBuilder(marker)
+
+    def add_special(node):
+        # Comentariile și instrucțiunile de procesare sunt string-uri invizibile în BeautifulSoup
+        builder.add_string(node.text or '', False)
+
+    def open_element(element, hidden, stack):
+        builder.start_element(element.tag, element.attrib)
+        hidden = hidden or element.tag in HIDDEN_TEXT_TAGS
+        if element.text:
+            builder.add_string(element.text, not hidden)
+        stack.append((element, iter(element), hidden))
+
+    # Comentariile din afara elementului <html> aparțin documentului
+    for sibling in reversed(list(root.itersiblings(preceding=True))):
+        add_special(sibling)
+
+    # Stivă explicită, nu recursivitate: emailurile redirecționate pot avea mii de niveluri
+    stack = []
+    open_element(root, False, stack)
+    while stack:
+        element, children, hidden = stack[-1]
+        child = next(children, None)
+        if child is None:
+            builder.end_element()
+            stack.pop()
+            # Textul de după element aparține părintelui (nu și după <html>)
+            if stack and element.tail:
+                builder.add_string(element.tail, not stack[-1][2])
+        elif isinstance(child.tag, str):
+            open_element(child, hidden, stack)
+        else:
+            add_special(child)
+            if child.tail:
+                builder.add_string(child.tail, not hidden)
+
+    for sibling in root.itersiblings():
+        add_special(sibling)
+
+    return builder.finish()
+
+
+def build_index_from_html(html_doc: str) -> Optional[DocumentIndex]:
+    """Parsează HTML-ul cu lxml și îl indexează; None dacă documentul nu are niciun element."""
+    root = etree.fromstring(html_doc.encode('utf-8'), HTML_PARSER)
+    if root is None:
+        return None
+    return build_index_lxml(root, TRACKING_HOST)
+
+
+def parse_order_lxml(html_doc: str) -> Optional[Dict]:
+    """
+    Parse the legacy HTML format with lxml.
+
+    Args:
+        html_doc: String with email HTML content
+
+    Returns:
+        Dict with order data in format {"comanda": {...}} or None if the order ID is missing.
+        Raises on structures the reference engine would also reject; the caller falls back.
+    """
+    index = build_index_from_html(html_doc)
+    if index is None:
+        return None
+    return extract_order(index)
@@ -0,0 +1,314 @@
+"""
+Watchdog de memorie pentru procesul de ingestie (app/services/ingest.py).
+
+Procesul de ingestie găzduiește săptămâni la rând Email Listener (un email.message și un arbore
+BeautifulSoup per email) și Cleanup Service. La fiecare MEMORY_WATCHDOG_INTERVAL secunde,
+watchdog-ul înregistrează:
+    - RSS-ul procesului și memoria urmărită de tracemalloc (curent și vârf)
+    - locațiile de alocare (fișier:linie) care au crescut cel mai mult față de snapshot-ul
+      anterior și față de pornire
+    - numărul de obiecte urmărite de GC, pe tipuri (ex. Tag-uri BeautifulSoup reținute)
+
+Raportul este scris atomic în MEMORY_REPORT_FILE (worker-ii API îl servesc prin
+GET /api/memorie). Când RSS-ul depășește valoarea de la pornire cu încă MEMORY_ALERT_GROWTH_MB,
+este trimisă o alertă prin email (o singură dată per prag depășit).
+
+tracemalloc este pornit doar în procesul de ingestie: un proces creat prin fork îl oprește
+imediat, ca alocările request-urilor să nu plătească costul urmăririi.
+"""
+
+import gc
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.config import (
+    MEMORY_WATCHDOG, MEMORY_WATCHDOG_INTERVAL, MEMORY_TRACEMALLOC_FRAMES, MEMORY_ALERT_GROWTH_MB,
+    MEMORY_TOP_ALLOCATIONS, MEMORY_HISTORY, MEMORY_REPORT_FILE
+)
+from app.logging_config import get_logger
+from app.services.metrics import MEMORY_RSS_BYTES
+
+logger = get_logger("memory_watchdog")
+
+MB = 1024 * 1024
+
+# Alocările interne ale importurilor și ale tracemalloc nu sunt relevante pentru scurgeri
+IGNORED_FILES = {
+    "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", tracemalloc.__file__, "<unknown>"
+}
+
+
+def rss_bytes() -> int:
+    """RSS-ul curent al procesului (Linux: /proc/self/statm; altfel vârful, din getrusage)."""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def object_counts() -> Counter:
+    """Numărul de obiecte urmărite de GC, pe numele tipului."""
+    return Counter(type(obj).__name__ for obj in gc.get_objects())
+
+
+def allocation_sites() -> Dict[str, Tuple[int, int]]:
+    """
+    Memoria alocată (octeți, blocuri) per locație "fișier:linie", din snapshot-ul tracemalloc curent.
+
+    Snapshot-ul este eliberat imediat: între verificări sunt păstrate doar aceste totaluri
+    (zeci de intrări), nu toate urmele de alocare.
+    """
+    sites = {}
+    for stat in tracemalloc.take_snapshot().statistics("lineno"):
+        frame = stat.traceback[0]
+        if frame.filename not in IGNORED_FILES:
+            sites[f"{frame.filename}:{frame.lineno}"] = (stat.size, stat.count)
+    return sites
+
+
+def _allocation_diff(current: Dict[str, Tuple[int, int]], previous: Dict[str, Tuple[int, int]],
+                     limit: int) -> List[Dict]:
+    growth = sorted(((size - previous.get(site, (0, 0))[0], site) for site, (size, _) in current.items()),
+                    reverse=True)
+    return [
+        {
+            "locatie": site,
+            "dimensiune_kb": round(current[site][0] / 1024, 1),
+            "diferenta_kb": round(diff / 1024, 1),
+            "numar": current[site][1],
+            "diferenta_numar": current[site][1] - previous.get(site, (0, 0))[1],
+        }
+        for diff, site in growth[:limit] if diff > 0
+    ]
+
+
+def _type_diff(current: Counter, previous: Counter, limit: int) -> List[Dict]:
+    growth = Counter({name: count - previous.get(name, 0) for name, count in current.items()})
+    return [{"tip": name, "numar": current[name], "diferenta": diff}
+            for name, diff in growth.most_common(limit) if diff > 0]
+
+
+class MemoryWatchdog:
+    """
+    Snapshot-uri periodice ale memoriei procesului curent.
+
+    Args:
+        interval: Secunde între snapshot-uri
+        report_file: Fișierul JSON cu ultimul raport
+        alert_growth_mb: Creșterea RSS (MB, față de pornire) care declanșează o alertă
+        top: Numărul de locații de alocare și tipuri de obiecte din raport
+        frames: Cadrele păstrate de tracemalloc per alocare (0 = fără tracemalloc)
+    """
+
+    def __init__(self, interval: float = MEMORY_WATCHDOG_INTERVAL, report_file: Path = MEMORY_REPORT_FILE,
+                 alert_growth_mb: float = MEMORY_ALERT_GROWTH_MB, top: int = MEMORY_TOP_ALLOCATIONS,
+                 frames: int = MEMORY_TRACEMALLOC_FRAMES):
+        self.interval = interval
+        self.report_file = report_file
+        self.alert_growth_mb = alert_growth_mb
+        self.top = top
+        self.frames = frames
+        self.alerts = 0
+        self._alert_level = 0  # Pragurile de creștere deja raportate
+        self._baseline_sites: Optional[Dict[str, Tuple[int, int]]] = None
+        self._previous_sites: Optional[Dict[str, Tuple[int, int]]] = None
+        self._baseline_rss = 0
+        self._baseline_types: Counter = Counter()
+        self._previous_types: Counter = Counter()
+        self._history = deque(maxlen=MEMORY_HISTORY)
+        self._started = time.time()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Pornește tracemalloc, înregistrează starea de la pornire și thread-ul de snapshot-uri."""
+        if self._thread is not None:
+            return
+        if self.frames > 0:
+            _start_tracing(self.frames)
+        self.check()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="MemoryWatchdog")
+        self._thread.start()
+        logger.info(f"🧠 Watchdog de memorie pornit (interval {self.interval:g} s, "
+                    f"alertă la +{self.alert_growth_mb:g} MB RSS)")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"❌ Eroare în watchdog-ul de memorie: {e}", exc_info=True)
+
+    def check(self, now: Optional[float] = None) -> Dict:
+        """
+        Un snapshot: compară cu snapshot-ul anterior și cu cel de la pornire, scrie raportul
+        și trimite o alertă dacă RSS-ul a depășit un prag nou.
+
+        Returns:
+            Raportul
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            gc.collect()  # Doar obiectele încă accesibile contează pentru o scurgere
+            rss = rss_bytes()
+            types = object_counts()
+            tracing = tracemalloc.is_tracing()
+            sites = allocation_sites() if tracing else {}
+            traced, peak = tracemalloc.get_traced_memory()
+            if not self._baseline_rss:
+                self._baseline_sites, self._baseline_rss, self._baseline_types = sites, rss, types
+            previous_sites, self._previous_sites = self._previous_sites or sites, sites
+            previous_types, self._previous_types = self._previous_types or types, types
+            self._history.append([round(now), round(rss / MB, 1), round(traced / MB, 1)])
+
+            growth_mb = (rss - self._baseline_rss) / MB
+            report = {
+                "pid": os.getpid(),
+                "timestamp": datetime.fromtimestamp(now).isoformat(),
+                "activ_de_secunde": round(now - self._started),
+                "interval_secunde": self.interval,
+                "rss_mb": round(rss / MB, 1),
+                "rss_pornire_mb": round(self._baseline_rss / MB, 1),
+                "rss_crestere_mb": round(growth_mb, 1),
+                "tracemalloc": {
+                    "activ": tracing,
+                    "curent_mb": round(traced / MB, 1),
+                    "varf_mb": round(peak / MB, 1),
+                },
+                "obiecte": {
+                    "total": sum(types.values()),
+                    "crestere_fata_de_snapshot_anterior": _type_diff(types, previous_types, self.top),
+                    "crestere_de_la_pornire": _type_diff(types, self._baseline_types, self.top),
+                },
+                "alocari": {
+                    "crestere_fata_de_snapshot_anterior": _allocation_diff(sites, previous_sites, self.top),
+                    "crestere_de_la_pornire": _allocation_diff(sites, self._baseline_sites, self.top),
+                },
+                "alerte_trimise": self.alerts,
+                "istoric": list(self._history),  # [moment, RSS MB, tracemalloc MB]
+            }
+            level = int(growth_mb // self.alert_growth_mb) if self.alert_growth_mb > 0 else 0
+            alert = level > self._alert_level
+            if alert:
+                self._alert_level = level
+                self.alerts += 1
+                report["alerte_trimise"] = self.alerts
+
+        MEMORY_RSS_BYTES.set(rss)
+        self._write(report)
+        if alert:
+            self._alert(report)
+        logger.debug(f"🧠 Memorie: RSS {report['rss_mb']} MB ({growth_mb:+.1f} MB de la pornire), "
+                     f"tracemalloc {report['tracemalloc']['curent_mb']} MB, {report['obiecte']['total']} obiecte")
+        return report
+
+    def _write(self, report: Dict) -> None:
+        try:
+            self.report_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.report_file.with_suffix(".tmp")
+            temp_path.write_text(json.dumps(report, ensure_ascii=False), encoding='utf-8')
+            os.replace(temp_path, self.report_file)
+        except OSError as e:
+            logger.warning(f"⚠️  Raportul de memorie nu poate fi scris: {e}")
+
+    def _alert(self, report: Dict) -> None:
+        logger.warning(f"🧠 RSS-ul procesului {report['pid']} a crescut cu {report['rss_crestere_mb']} MB "
+                       f"de la pornire ({report['rss_mb']} MB)")
+        allocations = "\n".join(
+            f"  {entry['diferenta_kb']:+.0f} KB ({entry['diferenta_numar']:+d} blocuri)  {entry['locatie']}"
+            for entry in report["alocari"]["crestere_de_la_pornire"]
+        ) or "  (tracemalloc inactiv)"
+        objects = "\n".join(f"  {entry['diferenta']:+d}  {entry['tip']}"
+                            for entry in report["obiecte"]["crestere_de_la_pornire"])
+        content = (f"Memoria procesului de ingestie Eeatingh (PID {report['pid']}) crește.\n\n"
+                   f"RSS: {report['rss_mb']} MB (la pornire {report['rss_pornire_mb']} MB, "
+                   f"+{report['rss_crestere_mb']} MB în {report['activ_de_secunde'] // 3600} ore)\n"
+                   f"tracemalloc: {report['tracemalloc']['curent_mb']} MB\n\n"
+                   f"Locațiile de alocare cu cea mai mare creștere:\n{allocations}\n\n"
+                   f"Tipurile de obiecte cu cea mai mare creștere:\n{objects}\n\n"
+                   f"Raportul complet: GET /api/memorie")
+        try:
+            # Import local: worker-ii API importă modulul doar pentru load_memory_report
+            from app.services.notification_service import get_notification_service
+            get_notification_service().send_notification(
+                subject=f"Alertă memorie: +{report['rss_crestere_mb']:.0f} MB RSS", content=content
+            )
+        except Exception as e:
+            logger.error(f"❌ Eroare la trimiterea alertei de memorie: {e}")
+
+
+def load_memory_report(report_file: Optional[Path] = None) -> Optional[Dict]:
+    """
+    Ultimul raport publicat (implicit MEMORY_REPORT_FILE), cu "activ" = procesul care l-a
+    scris încă rulează; None dacă lipsește.
+    """
+    try:
+        report = json.loads((report_file or MEMORY_REPORT_FILE).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    try:
+        os.kill(report["pid"], 0)
+        report["activ"] = True
+    except ProcessLookupError:
+        report["activ"] = False
+    except (PermissionError, KeyError, TypeError):
+        report["activ"] = True
+    return report
+
+
+# Instanța globală (creată la prima utilizare)
+_memory_watchdog: Optional[MemoryWatchdog] = None
+_memory_watchdog_lock = threading.Lock()
+# tracemalloc pornit de watchdog (nu de altcineva, ex. PYTHONTRACEMALLOC)
+_tracing_started = False
+
+
+def _start_tracing(frames: int) -> None:
+    global _tracing_started
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        _tracing_started = True
+
+
+def get_memory_watchdog() -> Optional[MemoryWatchdog]:
+    """Returnează watchdog-ul global, sau None dacă este dezactivat (MEMORY_WATCHDOG)."""
+    global _memory_watchdog
+
+    if not MEMORY_WATCHDOG:
+        return None
+    if _memory_watchdog is None:
+        with _memory_watchdog_lock:
+            if _memory_watchdog is None:
+                _memory_watchdog = MemoryWatchdog()
+    return _memory_watchdog
+
+
+def _reset_after_fork() -> None:
+    """Worker-ii nu moștenesc watchdog-ul (thread-ul lui nu există în copil) și nici tracemalloc."""
+    global _memory_watchdog, _memory_watchdog_lock, _tracing_started
+    _memory_watchdog = None
+    _memory_watchdog_lock = threading.Lock()
+    if _tracing_started:
+        tracemalloc.stop()
+        _tracing_started = False
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,380 @@
+"""
+Metrici în format Prometheus (GET /metrics), agregate peste toate procesele.
+
+Contoarele și histogramele sunt înregistrate în memoria procesului: o observație este o
+căutare în dicționar (eticheta) și o actualizare sub lock-ul etichetei - un lock
+necontestat în practică, de ordinul sutelor de nanosecunde. Histogramele au bucket-uri
+fixe, deci nu păstrează valorile individuale.
+
+Serviciile din procesul de ingestie (Email Listener, Cleanup Service) și worker-ii
+API sunt procese diferite. Fiecare proces își publică periodic valorile în
+METRICS_DIR/<pid>.json (METRICS_PUBLISH_INTERVAL), iar worker-ul care servește /metrics
+le adună pe toate (fișierele proceselor oprite sunt ignorate și șterse). Un proces copil
+(worker creat prin fork) pornește cu valori goale, ca să nu numere de două ori ce a
+moștenit de la master.
+
+Toate metricile aplicației sunt definite la sfârșitul acestui modul.
+"""
+
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.config import METRICS_DIR, METRICS_PUBLISH_INTERVAL
+from app.logging_config import get_logger
+
+logger = get_logger("metrics")
+
+# Bucket-uri pentru operații din procesul curent (secunde): de la 0.5 ms la 10 s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bucket-uri pentru operații de rețea și latențe end-to-end (secunde): de la 10 ms la 2 minute
+SLOW_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+_registry: Dict[str, "_Metric"] = {}
+
+
+class _Metric:
+    """Baza metricilor: o valoare per combinație de etichete."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), local: bool = False):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.local = local  # Calculată la scrape de procesul care îl servește - nu este publicată
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._by_values: Dict[tuple, object] = {}  # Etichetele exact cum sunt primite (ex. status int)
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    def labels(self, *values) -> object:
+        """Valoarea pentru combinația de etichete dată (creată la prima utilizare)."""
+        child = self._by_values.get(values)
+        if child is None:
+            key = tuple(str(value) for value in values)
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: etichetele așteptate sunt {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+                self._by_values[values] = child
+            _ensure_publisher()
+        return child
+
+    def _new_child(self) -> object:
+        raise NotImplementedError
+
+    def _reset(self) -> None:
+        self._children = {}
+        self._by_values = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Dict:
+        """Valorile curente, serializabile JSON."""
+        return {
+            "type": self.kind,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": [[list(key), child.value()] for key, child in list(self._children.items())],
+        }
+
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = value
+
+    def value(self) -> float:
+        return self._value
+
+
+class Counter(_Metric):
+    """Contor monoton (suma peste procese)."""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(Counter):
+    """Valoare curentă (suma peste procese, ex. elemente în cozile proceselor)."""
+
+    kind = "gauge"
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)  # Ultimul bucket: peste toate limitele (+Inf)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self) -> "_Timer":
+        """Observă durata blocului `with` (secunde)."""
+        return _Timer(self)
+
+    def value(self) -> List:
+        with self._lock:
+            return [list(self._counts), self._sum]
+
+
+class _Timer:
+    """Context manager pentru Histogram.time() (mai ieftin decât un generator @contextmanager)."""
+
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class Histogram(_Metric):
+    """Histogramă cu bucket-uri fixe (secunde)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def snapshot(self) -> Dict:
+        return {**super().snapshot(), "buckets": list(self.buckets)}
+
+
+def snapshot(include_local: bool = False) -> Dict[str, Dict]:
+    """Valorile metricilor din procesul curent (fără cele locale, dacă nu sunt cerute)."""
+    return {name: metric.snapshot() for name, metric in list(_registry.items())
+            if include_local or not metric.local}
+
+
+# --- Publicarea și agregarea între procese ---
+
+_publisher: Optional[threading.Thread] = None
+_publisher_lock = threading.Lock()
+
+
+def _ensure_publisher() -> None:
+    """Pornește thread-ul de publicare al procesului (la prima metrică înregistrată)."""
+    global _publisher
+    if _publisher is not None:
+        return
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = threading.Thread(target=_publish_loop, daemon=True, name="MetricsPublisher")
+            _publisher.start()
+            atexit.register(unpublish)
+
+
+def _publish_loop() -> None:
+    while True:
+        time.sleep(METRICS_PUBLISH_INTERVAL)
+        publish()
+
+
+def publish(metrics_dir: Optional[Path] = None) -> None:
+    """Scrie valorile procesului în metrics_dir/<pid>.json (implicit METRICS_DIR)."""
+    metrics_dir = metrics_dir or METRICS_DIR
+    try:
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        path = metrics_dir / f"{os.getpid()}.json"
+        temp_path = path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(snapshot()), encoding='utf-8')
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.warning(f"⚠️  Metricile nu pot fi publicate: {e}")
+
+
+def unpublish(metrics_dir: Optional[Path] = None) -> None:
+    """Șterge fișierul procesului (la ieșire)."""
+    (metrics_dir or METRICS_DIR / f"{os.getpid()}.json").unlink(missing_ok=True)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(total: Dict[str, Dict], metrics: Dict[str, Dict]) -> None:
+    """Adună valorile unui proces la total (contoare, gauge-uri și bucket-uri sunt însumate)."""
+    for name, metric in metrics.items():
+        target = total.setdefault(name, {**metric, "samples": {}})
+        samples = target["samples"]
+        for labels, value in metric["samples"]:
+            key = tuple(labels)
+            if metric["type"] == "histogram":
+                counts, total_sum = samples.get(key, [[0] * len(value[0]), 0.0])
+                samples[key] = [[a + b for a, b in zip(counts, value[0])], total_sum + value[1]]
+            else:
+                samples[key] = samples.get(key, 0.0) + value
+
+
+def collect_metrics(metrics_dir: Optional[Path] = None) -> Dict[str, Dict]:
+    """
+    Valorile agregate ale tuturor proceselor în viață. Procesul curent contribuie cu
+    valorile live, celelalte cu ultima publicare.
+    """
+    metrics_dir = metrics_dir or METRICS_DIR
+    total: Dict[str, Dict] = {}
+    _merge(total, snapshot(include_local=True))
+    own = f"{os.getpid()}.json"
+    if metrics_dir.exists():
+        for path in metrics_dir.glob("*.json"):
+            if path.name == own:
+                continue
+            try:
+                pid = int(path.stem)
+                if not _process_alive(pid):
+                    path.unlink(missing_ok=True)
+                    continue
+                _merge(total, json.loads(path.read_text(encoding='utf-8')))
+            except (ValueError, OSError):
+                continue
+    return total
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_metrics(metrics: Dict[str, Dict]) -> str:
+    """Metricile agregate în formatul text Prometheus (text/plain; version=0.0.4)."""
+    lines = []
+    for name in sorted(metrics):
+        metric = metrics[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        names = metric["labelnames"]
+        for key in sorted(metric["samples"]):
+            value = metric["samples"][key]
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_labels(names, key)} {_number(value)}")
+                continue
+            counts, total_sum = value
+            cumulative = 0
+            for bound, count in zip(metric["buckets"] + ["+Inf"], counts):
+                cumulative += count
+                le = 'le="{}"'.format(bound if bound == "+Inf" else _number(bound))
+                lines.append(f"{name}_bucket{_labels(names, key, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, key)} {_number(total_sum)}")
+            lines.append(f"{name}_count{_labels(names, key)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def _reset_after_fork() -> None:
+    """Procesul copil pornește cu valori goale și își pornește propriul thread de publicare."""
+    global _publisher, _publisher_lock
+    _publisher = None
+    _publisher_lock = threading.Lock()
+    for metric in _registry.values():
+        metric._reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+# --- Metricile aplicației ---
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "eeatingh_http_request_duration_seconds", "Durata request-urilor API, per endpoint și status",
+    ("method", "endpoint", "status")
+)
+ORDER_LOOKUP_SECONDS = Histogram(
+    "eeatingh_order_lookup_duration_seconds",
+    "Durata căutărilor în folderele comenzilor și în bazele partajate, per operație", ("operation",)
+)
+ORDERS_PENDING = Gauge(
+    "eeatingh_orders_pending", "Comenzi care așteaptă în comenzi/noi (calculat la fiecare scrape)", local=True
+)
+IMAP_COMMAND_SECONDS = Histogram(
+    "eeatingh_imap_command_duration_seconds", "Durata comenzilor IMAP (round-trip), per comandă",
+    ("command",), buckets=SLOW_BUCKETS
+)
+IDLE_TO_SAVE_SECONDS = Histogram(
+    "eeatingh_idle_to_save_seconds", "Latența de la notificarea IMAP IDLE la salvarea comenzilor",
+    buckets=SLOW_BUCKETS
+)
+PARSE_SECONDS = Histogram(
+    "eeatingh_parse_duration_seconds", "Durata parsării unui email, per motor (json, lxml, bs4)", ("engine",)
+)
+ORDERS_SAVED = Counter("eeatingh_orders_saved_total", "Comenzi noi salvate în comenzi/noi")
+NOTIFICATION_SEND_SECONDS = Histogram(
+    "eeatingh_notification_send_duration_seconds", "Durata trimiterii unui email de notificare (SMTP)",
+    ("result",), buckets=SLOW_BUCKETS
+)
+NOTIFICATIONS = Counter(
+    "eeatingh_notifications_total",
+    "Notificări pe email, per rezultat (queued, sent, failed, dropped, retries...)", ("result",)
+)
+CLEANUP_SECONDS = Histogram(
+    "eeatingh_cleanup_duration_seconds", "Durata unei rulări a Cleanup Service", buckets=SLOW_BUCKETS
+)
+CLEANUP_DELETED = Counter(
+    "eeatingh_cleanup_deleted_files_total", "Fișiere vechi șterse (sau arhivate) de Cleanup Service, per folder",
+    ("folder",)
+)
+MEMORY_RSS_BYTES = Gauge(
+    "eeatingh_ingest_rss_bytes",
+    "RSS-ul procesului de ingestie (Email Listener, Cleanup), la ultimul snapshot al watchdog-ului de memorie"
+)
@@ -0,0 +1,313 @@
+"""
+Dispecer asincron pentru notificările pe email.
+
+Apelanții (parsarea, Email Listener, Cleanup Service) doar pun mesajul într-o coadă
+limitată și continuă imediat; un singur thread de background le trimite pe o sesiune
+SMTP persistentă (STARTTLS și login o singură dată), cu reconectare și reîncercări cu
+backoff exponențial. Dacă SMTP-ul este lent sau căzut, coada se umple și notificările noi
+sunt renunțate (cu avertisment în log) - procesarea comenzilor nu este niciodată blocată.
+
+În modul digest (NOTIFICATION_DIGEST_WINDOW > 0), notificările sosite în aceeași
+fereastră pentru același destinatar sunt trimise într-un singur email.
+"""
+
+import atexit
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+from typing import Dict, List, Optional
+
+from app.config import (
+    EMAIL_USER, EMAIL_PASS, SMTP_SERVER, SMTP_PORT, SMTP_STARTTLS, SMTP_TIMEOUT,
+    NOTIFICATION_QUEUE_SIZE, NOTIFICATION_MAX_RETRIES, NOTIFICATION_RETRY_DELAY,
+    NOTIFICATION_SMTP_IDLE, NOTIFICATION_DIGEST_WINDOW
+)
+from app.logging_config import get_logger
+from app.services.metrics import NOTIFICATIONS, NOTIFICATION_SEND_SECONDS
+
+logger = get_logger("notification_dispatcher")
+
+# Marcaj în coadă pentru oprirea thread-ului
+_STOP = object()
+
+
+class NotificationDispatcher:
+    """
+    Coadă de notificări cu un thread de trimitere și o sesiune SMTP persistentă.
+
+    Args:
+        host: Serverul SMTP
+        port: Portul SMTP
+        user: Utilizatorul pentru login (None = fără login)
+        password: Parola pentru login
+        starttls: Activează STARTTLS după conectare
+        queue_size: Capacitatea cozii
+        max_retries: Reîncercări după o trimitere eșuată
+        retry_delay: Pauza înainte de prima reîncercare (secunde), dublată la fiecare eșec
+        digest_window: Fereastra de grupare a notificărilor (secunde, 0 = fără digest)
+        idle_timeout: Sesiunea SMTP este închisă după atâtea secunde fără trimiteri
+    """
+
+    def __init__(self, host: str = SMTP_SERVER, port: int = SMTP_PORT,
+                 user: Optional[str] = EMAIL_USER, password: Optional[str] = EMAIL_PASS,
+                 starttls: bool = SMTP_STARTTLS, queue_size: int = NOTIFICATION_QUEUE_SIZE,
+                 max_retries: int = NOTIFICATION_MAX_RETRIES, retry_delay: float = NOTIFICATION_RETRY_DELAY,
+                 digest_window: float = NOTIFICATION_DIGEST_WINDOW, idle_timeout: float = NOTIFICATION_SMTP_IDLE):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.digest_window = digest_window
+        self.idle_timeout = idle_timeout
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._counters = {
+            "queued": 0, "sent": 0, "emails": 0, "digests": 0, "dropped": 0,
+            "failed": 0, "retries": 0, "connections": 0
+        }
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+        NOTIFICATIONS.labels(name).inc(amount)
+
+    def start(self) -> None:
+        """Pornește thread-ul de trimitere (dacă nu rulează deja)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="NotificationDispatcher")
+            self._thread.start()
+
+    def submit(self, msg: EmailMessage) -> bool:
+        """
+        Pune o notificare în coadă, fără să aștepte.
+
+        Returns:
+            True dacă notificarea a fost acceptată, False dacă coada este plină sau dispecerul oprit
+        """
+        if self._stopping.is_set():
+            logger.warning(f"⚠️  Dispecer oprit - notificare renunțată: {msg['Subject']}")
+            self._count("dropped")
+            return False
+        self.start()
+        try:
+            self._queue.put_nowait(msg)
+        except queue.Full:
+            logger.warning(f"⚠️  Coada de notificări este plină - notificare renunțată: {msg['Subject']}")
+            self._count("dropped")
+            return False
+        self._count("queued")
+        return True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        Așteaptă trimiterea notificărilor din coadă.
+
+        Returns:
+            True dacă coada s-a golit înainte de timeout
+        """
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Trimite notificările rămase în coadă (cel mult `timeout` secunde) și oprește thread-ul."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("⚠️  Coada de notificări nu s-a golit la oprire")
+        thread.join(timeout)
+        self._stopping.set()
+        if thread.is_alive():
+            logger.warning(f"⚠️  Notificări netrimise la oprire: {self._queue.qsize()}")
+
+    def stats(self) -> Dict:
+        """Contoarele dispecerului și dimensiunea cozii."""
+        with self._lock:
+            return {**self._counters, "pending": self._queue.qsize(), "connected": self._smtp is not None}
+
+    def _run(self) -> None:
+        """Loop-ul thread-ului de trimitere."""
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._close()  # Sesiune inactivă - serverul ar închide-o oricum
+                continue
+
+            if item is _STOP:
+                self._queue.task_done()
+                break
+            batch = [item]
+            stop = self.digest_window > 0 and self._collect(batch)
+
+            try:
+                self._send_batch(batch)
+            except Exception as e:
+                logger.error(f"❌ Eroare neașteptată în dispecerul de notificări: {e}", exc_info=True)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                self._queue.task_done()
+                break
+        self._close()
+
+    def _collect(self, batch: List[EmailMessage]) -> bool:
+        """
+        Adaugă în batch notificările sosite în fereastra de digest.
+
+        Returns:
+            True dacă în fereastră a sosit și cererea de oprire
+        """
+        deadline = time.monotonic() + self.digest_window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                return False
+            if item is _STOP:
+                return True
+            batch.append(item)
+
+    def _send_batch(self, batch: List[EmailMessage]) -> None:
+        """Trimite batch-ul: un email per notificare sau un digest per destinatar."""
+        if len(batch) == 1:
+            self._deliver(batch[0], 1)
+            return
+
+        by_recipient: Dict[str, List[EmailMessage]] = {}
+        for msg in batch:
+            by_recipient.setdefault(msg['To'], []).append(msg)
+        for messages in by_recipient.values():
+            if len(messages) == 1:
+                self._deliver(messages[0], 1)
+            elif self._deliver(_digest(messages), len(messages)):
+                self._count("digests")
+
+    def _connection(self) -> smtplib.SMTP:
+        """Sesiunea SMTP curentă, deschisă (conectare, STARTTLS, login) la nevoie."""
+        if self._smtp is None:
+            smtp = smtplib.SMTP(host=self.host, port=self.port, timeout=SMTP_TIMEOUT)
+            try:
+                if self.starttls:
+                    smtp.starttls()
+                if self.user:
+                    smtp.login(self.user, self.password)
+            except Exception:
+                smtp.close()
+                raise
+            self._smtp = smtp
+            self._count("connections")
+            logger.debug(f"Sesiune SMTP deschisă către {self.host}:{self.port}")
+        return self._smtp
+
+    def _close(self) -> None:
+        """Închide sesiunea SMTP (QUIT dacă serverul mai răspunde)."""
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def _deliver(self, msg: EmailMessage, count: int) -> bool:
+        """
+        Trimite un email, cu reconectare și reîncercări cu backoff.
+
+        Args:
+            msg: Emailul de trimis
+            count: Numărul de notificări conținute (1, sau mai multe pentru un digest)
+        """
+        attempt = 0
+        while True:
+            reused = self._smtp is not None
+            start = time.perf_counter()
+            try:
+                self._connection().send_message(msg)
+                NOTIFICATION_SEND_SECONDS.labels("sent").observe(time.perf_counter() - start)
+                self._count("sent", count)
+                self._count("emails")
+                logger.info(f"✅ Email trimis cu succes către {msg['To']}: {msg['Subject']}")
+                return True
+            except (smtplib.SMTPException, OSError) as e:
+                NOTIFICATION_SEND_SECONDS.labels("error").observe(time.perf_counter() - start)
+                self._close()
+                if reused and isinstance(e, (smtplib.SMTPServerDisconnected, ConnectionError)):
+                    # Sesiunea persistentă a fost închisă de server - reconectare imediată
+                    logger.debug(f"Sesiune SMTP expirată ({e}) - reconectare")
+                    continue
+                if attempt >= self.max_retries:
+                    logger.error(f"❌ Eroare la trimiterea emailului după {attempt + 1} încercări: {e}")
+                    self._count("failed", count)
+                    return False
+                delay = self.retry_delay * 2 ** attempt
+                attempt += 1
+                self._count("retries")
+                logger.warning(f"⚠️  Trimitere eșuată ({e}) - reîncerc în {delay:.0f}s "
+                               f"(încercarea {attempt}/{self.max_retries})")
+                time.sleep(delay)
+
+
+def _digest(messages: List[EmailMessage]) -> EmailMessage:
+    """Un singur email care conține toate notificările, în ordinea sosirii."""
+    digest = EmailMessage()
+    digest['From'] = messages[0]['From']
+    digest['To'] = messages[0]['To']
+    digest['Subject'] = f"🔔 {len(messages)} notificări Eeatingh"
+    sections = []
+    for index, msg in enumerate(messages, 1):
+        body = msg.get_content() if not msg.is_multipart() else ""
+        sections.append(f"--- {index}/{len(messages)}: {msg['Subject']} ---\n{body.strip()}\n")
+    digest.set_content("\n".join(sections))
+    return digest
+
+
+# Instanța globală (creată la prima utilizare)
+_dispatcher: Optional[NotificationDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_notification_dispatcher() -> NotificationDispatcher:
+    """Returnează dispecerul global; notificările rămase sunt trimise la ieșirea din proces."""
+    global _dispatcher
+
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = NotificationDispatcher()
+                atexit.register(_dispatcher.stop)
+    return _dispatcher
+
+
+def _reset_after_fork() -> None:
+    """Procesul copil (worker Gunicorn) nu moștenește thread-ul și sesiunea SMTP ale părintelui."""
+    global _dispatcher, _dispatcher_lock
+    _dispatcher = None
+    _dispatcher_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,13 +1,19 @@
 """
 Serviciu de notificări - Trimitere emailuri și alerte.
+
+Emailurile sunt trimise asincron de NotificationDispatcher (vezi notification_dispatcher.py):
+metodele send_* doar pun notificarea în coadă și nu blochează apelantul. Notificările de
+eroare trec în plus prin ErrorThrottle (deduplicare, buget orar, rezumate).
 """
 
-import smtplib
+import threading
 from email.message import EmailMessage
 from typing import Optional
 
-from app.config import EMAIL_USER, EMAIL_PASS, SMTP_SERVER, SMTP_PORT, NOTIFICATION_RECIPIENT
+from app.config import EMAIL_USER, NOTIFICATION_RECIPIENT
 from app.logging_config import get_logger
+from app.services.notification_dispatcher import get_notification_dispatcher
+from app.services.notification_throttle import get_error_throttle
 
 logger = get_logger("notification_service")
 
@@ -18,16 +24,13 @@ class NotificationService:
     def __init__(self):
         """Inițializează serviciul de notificări."""
         self.user = EMAIL_USER
-        self.password = EMAIL_PASS
-        self.smtp_server = SMTP_SERVER
-        self.smtp_port = SMTP_PORT
         self.default_recipient = NOTIFICATION_RECIPIENT
         
         logger.info(f"⚙️  NotificationService inițializat pentru {self.user}")
     
     def send_notification(self, subject: str, content: str, recipient: Optional[str] = None) -> bool:
         """
-        Trimite un email de notificare.
+        Pune în coadă un email de notificare (trimis în background, fără a bloca apelantul).
         
         Args:
             subject: Subiectul emailului
@@ -35,7 +38,7 @@ class NotificationService:
             recipient: Destinatarul (opțional, folosește default din config)
             
         Returns:
-            True dacă emailul a fost trimis cu succes, False altfel
+            True dacă notificarea a fost pusă în coadă, False altfel
         """
         target_recipient = recipient or self.default_recipient
         
@@ -43,7 +46,7 @@ class NotificationService:
             logger.error("Niciun destinatar specificat pentru notificare")
             return False
         
-        logger.info(f"📤 Trimitere notificare către {target_recipient}...")
+        logger.info(f"📤 Notificare în coadă pentru {target_recipient}: {subject}")
         
         try:
             msg = EmailMessage()
@@ -52,29 +55,29 @@ class NotificationService:
             msg['Subject'] = f'🔔 {subject}'
             msg.set_content(content)
             
-            with smtplib.SMTP(host=self.smtp_server, port=self.smtp_port) as smtp:
-                smtp.starttls()
-                smtp.login(self.user, self.password)
-                smtp.send_message(msg)
-            
-            logger.info(f"✅ Email trimis cu succes către {target_recipient}")
-            return True
+            return get_notification_dispatcher().submit(msg)
             
         except Exception as e:
-            logger.error(f"❌ Eroare la trimiterea emailului: {e}", exc_info=True)
+            logger.error(f"❌ Eroare la pregătirea notificării: {e}", exc_info=True)
             return False
     
-    def send_error_notification(self, error_message: str, context: str = "") -> bool:
+    def send_error_notification(self, error_message: str, context: str = "",
+                                exception: Optional[BaseException] = None) -> bool:
         """
-        Trimite o notificare de eroare.
+        Trimite o notificare de eroare (dacă nu este suprimată ca duplicat sau peste bugetul orar).
         
         Args:
             error_message: Mesajul de eroare
             context: Context suplimentar (opțional)
+            exception: Excepția care a produs eroarea (opțional, folosită pentru deduplicare)
             
         Returns:
-            True dacă notificarea a fost trimisă cu succes
+            True dacă notificarea a fost pusă în coadă, False dacă a fost suprimată
         """
+        exception_type = type(exception).__name__ if exception is not None else ""
+        if not get_error_throttle().admit(context, error_message, exception_type):
+            return False
+        
         subject = "Eroare în aplicația Eeatingh"
         context_text = f"Context: {context}\n" if context else ""
         content = f"""
@@ -96,7 +99,7 @@ Vă rugăm verificați log-urile pentru mai multe detalii.
             order_details: Detalii despre comandă (opțional)
             
         Returns:
-            True dacă notificarea a fost trimisă cu succes
+            True dacă notificarea a fost pusă în coadă
         """
         subject = f"Comandă nouă #{order_id}"
         details_text = f"\n\nDetalii:\n{order_details}" if order_details else ""
@@ -108,3 +111,19 @@ ID Comandă: #{order_id}{details_text}
 Comandă disponibilă pentru preluare în sistem.
 """
         return self.send_notification(subject, content)
+
+
+# Instanța globală (creată la prima utilizare)
+_notification_service: Optional[NotificationService] = None
+_notification_service_lock = threading.Lock()
+
+
+def get_notification_service() -> NotificationService:
+    """Returnează serviciul de notificări global."""
+    global _notification_service
+    
+    if _notification_service is None:
+        with _notification_service_lock:
+            if _notification_service is None:
+                _notification_service = NotificationService()
+    return _notification_service
@@ -0,0 +1,291 @@
+"""
+Control al avalanșelor de notificări de eroare.
+
+O conexiune IMAP instabilă sau un parser defect poate genera sute de notificări pe oră,
+iar Gmail limitează apoi contul (inclusiv IMAP-ul). Înainte de a fi puse în coadă,
+notificările de eroare trec prin ErrorThrottle:
+
+- amprenta erorii (contextul și tipul excepției, cu numerele normalizate) deduplică
+  erorile repetate: aceeași amprentă este trimisă cel mult o dată pe fereastră;
+- un token bucket în memorie limitează numărul total de notificări de eroare pe oră;
+- erorile suprimate sunt numărate și trimise periodic într-un singur email de rezumat.
+
+Fiecare proces își publică statisticile în NOTIFICATION_STATS_DIR/<pid>.json, iar
+/api/health le agregă pentru procesele în viață.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from app.config import (
+    NOTIFICATION_ERROR_DEDUP_WINDOW, NOTIFICATION_ERROR_BUDGET, NOTIFICATION_SUMMARY_INTERVAL,
+    NOTIFICATION_STATS_DIR
+)
+from app.logging_config import get_logger
+
+logger = get_logger("notification_throttle")
+
+# Părțile variabile ale mesajelor (ID-uri, UID-uri, ore, hash-uri) nu schimbă amprenta
+VARIABLE_PATTERN = re.compile(r'\b[0-9a-f]{8,}\b|\d+', re.IGNORECASE)
+
+# Erorile distincte listate în rezumat (cele mai frecvente)
+SUMMARY_MAX_ENTRIES = 20
+
+COUNTERS = ("sent", "suppressed_duplicate", "suppressed_budget", "summaries")
+
+
+def error_fingerprint(context: str, error_message: str, exception_type: str = "") -> str:
+    """
+    Amprenta unei erori: contextul și tipul excepției (sau mesajul, dacă tipul lipsește).
+
+    Args:
+        context: Locul în care a apărut eroarea
+        error_message: Mesajul erorii
+        exception_type: Numele clasei excepției (opțional)
+    """
+    detail = exception_type or error_message
+    normalized = VARIABLE_PATTERN.sub('#', f"{context}|{detail}")
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+class TokenBucket:
+    """
+    Token bucket: `capacity` jetoane, reumplute uniform în `period` secunde.
+
+    Args:
+        capacity: Numărul maxim de jetoane (rafala permisă)
+        period: Intervalul în care se reumple complet (secunde)
+    """
+
+    def __init__(self, capacity: int, period: float = 3600.0):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self) -> bool:
+        """Consumă un jeton; False dacă bugetul este epuizat."""
+        self._refill()
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def available(self) -> int:
+        self._refill()
+        return int(self._tokens)
+
+
+class ErrorThrottle:
+    """
+    Deduplicare, buget orar și rezumate pentru notificările de eroare.
+
+    Args:
+        send_summary: Funcția care trimite rezumatul (subiect, conținut)
+        dedup_window: Fereastra în care aceeași amprentă este trimisă o singură dată (secunde)
+        budget: Notificări de eroare permise pe oră
+        summary_interval: Întârzierea rezumatului după prima suprimare (secunde)
+        stats_dir: Folderul în care procesul își publică statisticile (None = nu publică)
+    """
+
+    def __init__(self, send_summary: Callable[[str, str], bool],
+                 dedup_window: float = NOTIFICATION_ERROR_DEDUP_WINDOW, budget: int = NOTIFICATION_ERROR_BUDGET,
+                 summary_interval: float = NOTIFICATION_SUMMARY_INTERVAL, stats_dir: Optional[Path] = NOTIFICATION_STATS_DIR):
+        self.send_summary = send_summary
+        self.dedup_window = dedup_window
+        self.summary_interval = summary_interval
+        self.stats_dir = stats_dir
+        self._bucket = TokenBucket(budget)
+        self._lock = threading.Lock()
+        self._last_sent: Dict[str, float] = {}
+        self._suppressed: Dict[str, Dict] = {}
+        self._timer: Optional[threading.Timer] = None
+        self._counters = {name: 0 for name in COUNTERS}
+
+    def admit(self, context: str, error_message: str, exception_type: str = "") -> bool:
+        """
+        Decide dacă notificarea de eroare poate fi trimisă acum.
+
+        Returns:
+            True dacă trebuie trimisă; False dacă a fost suprimată (și numărată pentru rezumat)
+        """
+        fingerprint = error_fingerprint(context, error_message, exception_type)
+        now = time.time()
+        with self._lock:
+            # Amprentele ieșite din fereastră nu mai sunt păstrate
+            for key in [key for key, sent in self._last_sent.items() if now - sent >= self.dedup_window]:
+                del self._last_sent[key]
+
+            if fingerprint in self._last_sent:
+                reason = "suppressed_duplicate"
+            elif not self._bucket.take():
+                reason = "suppressed_budget"
+            else:
+                self._last_sent[fingerprint] = now
+                self._counters["sent"] += 1
+                reason = None
+
+            if reason is not None:
+                self._counters[reason] += 1
+                entry = self._suppressed.setdefault(fingerprint, {
+                    "context": context, "error": error_message, "exception": exception_type,
+                    "count": 0, "first": now
+                })
+                entry["count"] += 1
+                entry["last"] = now
+                self._schedule_summary()
+        self.publish()
+
+        if reason is not None:
+            logger.info(f"🔕 Notificare de eroare suprimată ({reason}): {context}")
+        return reason is None
+
+    def _schedule_summary(self) -> None:
+        """Programează rezumatul (apelat cu lock-ul deținut)."""
+        if self._timer is None:
+            self._timer = threading.Timer(self.summary_interval, self.flush_summary)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush_summary(self) -> bool:
+        """
+        Trimite rezumatul erorilor suprimate. Rezumatul nu consumă din buget (altfel s-ar pierde
+        tocmai în timpul unei avalanșe); este limitat la unul per summary_interval.
+
+        Returns:
+            True dacă rezumatul a fost trimis
+        """
+        with self._lock:
+            self._timer = None
+            if not self._suppressed:
+                return False
+            suppressed, self._suppressed = self._suppressed, {}
+            self._counters["summaries"] += 1
+
+        total = sum(entry["count"] for entry in suppressed.values())
+        lines = [f"{total} notificări de eroare au fost suprimate (duplicate sau peste bugetul orar):", ""]
+        entries = sorted(suppressed.values(), key=lambda entry: -entry["count"])
+        for entry in entries[:SUMMARY_MAX_ENTRIES]:
+            exception = f" [{entry['exception']}]" if entry["exception"] else ""
+            lines.append(f"- {entry['count']}× {entry['context']}{exception}: {entry['error']}")
+            lines.append(f"  prima: {_format_time(entry['first'])}, ultima: {_format_time(entry['last'])}")
+        if len(entries) > SUMMARY_MAX_ENTRIES:
+            lines.append(f"- ... și alte {len(entries) - SUMMARY_MAX_ENTRIES} erori distincte")
+        lines += ["", "Vă rugăm verificați log-urile pentru mai multe detalii."]
+
+        self.publish()
+        return self.send_summary(f"Rezumat erori Eeatingh ({total} suprimate)", "\n".join(lines))
+
+    def stats(self) -> Dict:
+        """Contoarele, bugetul rămas și erorile în așteptarea rezumatului."""
+        with self._lock:
+            return {
+                **self._counters,
+                "pending_summary": sum(entry["count"] for entry in self._suppressed.values()),
+                "budget_left": self._bucket.available(),
+                "budget_per_hour": self._bucket.capacity
+            }
+
+    def publish(self) -> None:
+        """Scrie statisticile procesului în stats_dir/<pid>.json (citite de /api/health)."""
+        if self.stats_dir is None:
+            return
+        try:
+            self.stats_dir.mkdir(parents=True, exist_ok=True)
+            path = self.stats_dir / f"{os.getpid()}.json"
+            temp_path = path.with_suffix(".tmp")
+            temp_path.write_text(json.dumps({**self.stats(), "updated": time.time()}), encoding='utf-8')
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"⚠️  Statisticile notificărilor nu pot fi publicate: {e}")
+
+    def unpublish(self) -> None:
+        """Șterge fișierul de statistici al procesului (la ieșire)."""
+        if self.stats_dir is not None:
+            (self.stats_dir / f"{os.getpid()}.json").unlink(missing_ok=True)
+
+
+def _format_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect_throttle_stats(stats_dir: Path = NOTIFICATION_STATS_DIR) -> Dict:
+    """
+    Statisticile agregate ale tuturor proceselor în viață (Email Listener și worker-ii API).
+
+    Fișierele proceselor oprite sunt ignorate și șterse.
+    """
+    totals = {name: 0 for name in COUNTERS}
+    totals["pending_summary"] = 0
+    processes = 0
+    if stats_dir.exists():
+        for path in stats_dir.glob("*.json"):
+            try:
+                pid = int(path.stem)
+                if not _process_alive(pid):
+                    path.unlink(missing_ok=True)
+                    continue
+                data = json.loads(path.read_text(encoding='utf-8'))
+            except (ValueError, OSError):
+                continue
+            processes += 1
+            for name in totals:
+                totals[name] += data.get(name, 0)
+    return {**totals, "processes": processes}
+
+
+def _send_summary(subject: str, content: str) -> bool:
+    # Import local: notification_service importă acest modul
+    from app.services.notification_service import get_notification_service
+    return get_notification_service().send_notification(subject, content)
+
+
+# Instanța globală (creată la prima utilizare)
+_error_throttle: Optional[ErrorThrottle] = None
+_error_throttle_lock = threading.Lock()
+
+
+def get_error_throttle() -> ErrorThrottle:
+    """Returnează controlul notificărilor de eroare al procesului curent."""
+    global _error_throttle
+
+    if _error_throttle is None:
+        with _error_throttle_lock:
+            if _error_throttle is None:
+                _error_throttle = ErrorThrottle(_send_summary)
+                atexit.register(_error_throttle.unpublish)
+    return _error_throttle
+
+
+def _reset_after_fork() -> None:
+    """Fiecare proces copil are propriul buget și propriul fișier de statistici."""
+    global _error_throttle, _error_throttle_lock
+    _error_throttle = None
+    _error_throttle_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,150 @@
+"""
+Rezervarea comenzilor noi pentru terminale (DISPATCH_MODE="lease").
+
+Cu mai multe terminale POS (sau tablete în bucătărie) care interoghează GET /api/comenzi,
+fiecare GET rezervă comanda pentru terminalul care a cerut-o, pentru DISPATCH_LEASE_SECONDS.
+Celelalte terminale sar peste comenzile rezervate și primesc următoarea comandă. O
+rezervare neconfirmată expiră și comanda revine în coadă, pentru primul terminal care
+interoghează după expirare.
+
+Rezervările sunt rânduri într-o bază SQLite în DATA_DIR, partajată de worker-ii Gunicorn.
+O rezervare este un singur UPSERT condiționat (atomic în SQLite): dintre două terminale
+care încearcă aceeași comandă în același timp, exact unul o primește, iar celălalt trece
+la următoarea - fără lock-uri între procese în afara tranzacției de scriere.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.config import DISPATCH_FILE, DISPATCH_LEASE_SECONDS
+from app.logging_config import get_logger
+from app.services.process_local import ProcessLocal
+
+logger = get_logger("order_dispatch")
+
+PRUNE_INTERVAL = 60  # Secunde între ștergerile rezervărilor expirate de mult
+PRUNE_AGE = 60 * 60  # Rezervările expirate de peste o oră sunt șterse
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    order_id TEXT PRIMARY KEY,
+    terminal TEXT NOT NULL,
+    claimed_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    deliveries INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS leases_terminal ON leases (terminal, expires_at);
+"""
+
+# Reușește doar dacă nu există o rezervare activă a altui terminal; reînnoiește rezervarea proprie
+CLAIM = """
+INSERT INTO leases (order_id, terminal, claimed_at, expires_at, deliveries) VALUES (?, ?, ?, ?, 1)
+ON CONFLICT (order_id) DO UPDATE SET
+    deliveries = CASE WHEN leases.terminal = excluded.terminal AND leases.expires_at > excluded.claimed_at
+                      THEN leases.deliveries ELSE leases.deliveries + 1 END,
+    terminal = excluded.terminal,
+    claimed_at = excluded.claimed_at,
+    expires_at = excluded.expires_at
+WHERE leases.terminal = excluded.terminal OR leases.expires_at <= excluded.claimed_at
+"""
+
+
+class OrderLeases:
+    """
+    Rezervările comenzilor noi, per terminal, partajate între procese.
+
+    Args:
+        path: Fișierul bazei de date
+        lease_seconds: Durata unei rezervări (secunde)
+    """
+
+    def __init__(self, path: Path, lease_seconds: float = DISPATCH_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self.claimed = 0
+        self.conflicts = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(path), timeout=5, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # Rezervările pot fi pierdute la o cădere de curent (expiră oricum) - fără fsync la fiecare GET
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    def active(self) -> Dict[str, str]:
+        """Rezervările active: {id comandă: terminal}."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT order_id, terminal FROM leases WHERE expires_at > ?", (time.time(),)
+            ).fetchall()
+        return dict(rows)
+
+    def claim(self, order_id: str, terminal: str) -> Optional[float]:
+        """
+        Rezervă comanda pentru terminal (sau reînnoiește rezervarea lui).
+
+        Returns:
+            Momentul expirării rezervării (time.time), sau None dacă altă rezervare activă există
+        """
+        now = time.time()
+        expires_at = now + self.lease_seconds
+        with self._lock:
+            cursor = self._connection.execute(CLAIM, (order_id, terminal, now, expires_at))
+            if cursor.rowcount != 1:
+                self.conflicts += 1
+                return None
+            self.claimed += 1
+            deliveries = self._connection.execute(
+                "SELECT deliveries FROM leases WHERE order_id = ?", (order_id,)
+            ).fetchone()[0]
+            if now - self._last_prune >= PRUNE_INTERVAL:
+                self._last_prune = now
+                self._connection.execute("DELETE FROM leases WHERE expires_at < ?", (now - PRUNE_AGE,))
+
+        if deliveries > 1:
+            logger.warning(f"⏰ Comanda #{order_id} redistribuită către {terminal} "
+                           f"(rezervarea anterioară a expirat, livrarea {deliveries})")
+        return expires_at
+
+    def holder(self, order_id: str) -> Optional[str]:
+        """Terminalul care are rezervarea activă a comenzii (None dacă nu este rezervată)."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT terminal FROM leases WHERE order_id = ? AND expires_at > ?", (order_id, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def release(self, order_id: str) -> None:
+        """Șterge rezervarea unei comenzi confirmate sau anulate."""
+        with self._lock:
+            self._connection.execute("DELETE FROM leases WHERE order_id = ?", (order_id,))
+
+    def stats(self) -> Dict:
+        """Rezervările active per terminal și contoarele procesului curent."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT terminal, COUNT(*) FROM leases WHERE expires_at > ? GROUP BY terminal", (time.time(),)
+            ).fetchall()
+        return {
+            "lease_seconds": self.lease_seconds,
+            "active": sum(count for _, count in rows),
+            "terminals": dict(rows),
+            "claimed": self.claimed,
+            "conflicts": self.conflicts,
+        }
+
+
+# Instanța globală (creată la prima utilizare, în fiecare proces)
+_order_leases: ProcessLocal[OrderLeases] = ProcessLocal(
+    lambda: OrderLeases(DISPATCH_FILE),
+    lambda e: logger.error(f"❌ Rezervările nu pot fi deschise ({e}) - toate terminalele primesc aceeași comandă")
+)
+
+
+def get_order_leases() -> Optional[OrderLeases]:
+    """Returnează rezervările globale, sau None dacă baza de date nu poate fi deschisă."""
+    return _order_leases.get()
@@ -0,0 +1,183 @@
+"""
+Evenimente "comenzi salvate", trimise de procesul de ingestie worker-ilor API prin socket-uri Unix.
+
+Fiecare worker API deschide, la primul request, un socket Unix datagram ORDER_EVENTS_DIR/<pid>.sock
+și un thread care primește evenimentele. După ce comenzile noi sunt salvate în comenzi/noi
+(save_orders_batch, save_order_json), procesul care le-a salvat - de regulă procesul de
+ingestie - trimite un datagram fiecărui socket din director:
+
+    {"event": "saved", "orders": ["123", "124"], "pid": 4242}
+
+Trimiterea nu blochează niciodată salvarea: socket-ul unui worker oprit este șters din
+director, iar un worker cu bufferul plin pierde evenimentul (long-poll-urile re-verifică oricum
+folderul la fiecare ORDER_LONG_POLL_RECHECK secunde).
+
+La primirea unui eveniment, worker-ul trezește request-urile GET /api/comenzi?asteapta=<secunde>
+în așteptare și apelează funcțiile înregistrate cu on_orders_saved (ex. invalidarea cache-urilor
+per comandă).
+"""
+
+import atexit
+import json
+import os
+import socket
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from app.config import ORDER_EVENTS, ORDER_EVENTS_DIR
+from app.logging_config import get_logger
+
+logger = get_logger("order_events")
+
+MAX_DATAGRAM = 64 * 1024
+
+# Funcțiile apelate la fiecare eveniment, în thread-ul receptorului (moștenite de worker-i)
+_listeners: List[Callable[[List[str]], None]] = []
+
+
+def on_orders_saved(listener: Callable[[List[str]], None]) -> None:
+    """Înregistrează o funcție apelată cu ID-urile comenzilor salvate de orice proces."""
+    _listeners.append(listener)
+
+
+def publish_saved_orders(orders: List[dict], directory: Optional[Path] = None) -> int:
+    """
+    Anunță worker-ii API că au fost salvate comenzi noi (fără excepții, fără blocare).
+
+    Args:
+        orders: Comenzile salvate, în formatul {"comanda": {...}}
+        directory: Directorul socket-urilor (implicit ORDER_EVENTS_DIR)
+
+    Returns:
+        Numărul de worker-i anunțați
+    """
+    directory = directory or ORDER_EVENTS_DIR
+    if not ORDER_EVENTS or not hasattr(socket, "AF_UNIX") or not directory.exists():
+        return 0
+    ids = [str(order.get("comanda", {}).get("id_intern_comanda")) for order in orders]
+    message = json.dumps({"event": "saved", "orders": ids, "pid": os.getpid()}).encode('utf-8')
+
+    sent = 0
+    try:
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    except OSError as e:
+        logger.warning(f"⚠️ Evenimentul comenzilor {', '.join(ids)} nu a putut fi trimis: {e}")
+        return 0
+    with sender:
+        sender.setblocking(False)
+        for path in directory.glob("*.sock"):
+            try:
+                sender.sendto(message, str(path))
+                sent += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Niciun proces nu mai citește socket-ul (worker oprit fără curățenie)
+                path.unlink(missing_ok=True)
+            except BlockingIOError:
+                logger.debug(f"Bufferul {path.name} este plin - eveniment pierdut")
+            except OSError as e:
+                logger.warning(f"⚠️ Evenimentul nu a putut fi trimis către {path.name}: {e}")
+    return sent
+
+
+class OrderEvents:
+    """
+    Receptorul evenimentelor din procesul curent (un worker API).
+
+    `version` crește la fiecare eveniment primit; wait() așteaptă o versiune nouă.
+
+    Args:
+        directory: Directorul socket-urilor
+    """
+
+    def __init__(self, directory: Path):
+        self.pid = os.getpid()
+        self.path = directory / f"{self.pid}.sock"
+        self.version = 0
+        self._condition = threading.Condition()
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path.unlink(missing_ok=True)  # Un socket rămas de la un proces vechi cu același PID
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            self._socket.bind(str(self.path))
+        except OSError:
+            self._socket.close()
+            raise
+        self._thread = threading.Thread(target=self._run, daemon=True, name="OrderEvents")
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                data = self._socket.recv(MAX_DATAGRAM)
+            except OSError:
+                return  # Socket închis
+            try:
+                ids = [str(order_id) for order_id in json.loads(data)["orders"]]
+            except (ValueError, KeyError, TypeError):
+                logger.warning(f"⚠️ Eveniment invalid ignorat: {data[:200]!r}")
+                continue
+            with self._condition:
+                self.version += 1
+                self._condition.notify_all()
+            for listener in _listeners:
+                try:
+                    listener(ids)
+                except Exception as e:
+                    logger.error(f"❌ Eroare la tratarea evenimentului comenzilor {', '.join(ids)}: {e}",
+                                 exc_info=True)
+
+    def wait(self, version: int, timeout: float) -> bool:
+        """
+        Așteaptă un eveniment primit după `version` (valoarea citită înainte de verificarea folderului).
+
+        Returns:
+            True dacă a sosit un eveniment, False la timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self.version != version, timeout)
+
+    def close(self) -> None:
+        if os.getpid() != self.pid:
+            return  # Handler atexit moștenit prin fork: socket-ul aparține părintelui
+        self.path.unlink(missing_ok=True)
+        self._socket.close()
+
+
+# Instanța globală (creată la prima utilizare, în fiecare worker)
+_order_events: Optional[OrderEvents] = None
+_order_events_failed = False
+_order_events_lock = threading.Lock()
+
+
+def get_order_events() -> Optional[OrderEvents]:
+    """Returnează receptorul procesului curent, sau None dacă evenimentele nu sunt disponibile."""
+    global _order_events, _order_events_failed
+
+    if _order_events is None and not _order_events_failed:
+        with _order_events_lock:
+            if _order_events is None and not _order_events_failed:
+                if not ORDER_EVENTS or not hasattr(socket, "AF_UNIX"):
+                    _order_events_failed = True
+                    return None
+                try:
+                    _order_events = OrderEvents(ORDER_EVENTS_DIR)
+                except OSError as e:
+                    _order_events_failed = True
+                    logger.error(f"❌ Socket-ul evenimentelor nu poate fi creat ({e}) - "
+                                 f"long-poll-urile re-verifică doar periodic")
+                    return None
+                atexit.register(_order_events.close)
+    return _order_events
+
+
+def _reset_after_fork() -> None:
+    """Procesul copil își deschide propriul socket (cel moștenit aparține părintelui)."""
+    global _order_events, _order_events_failed, _order_events_lock
+    _order_events = None
+    _order_events_failed = False
+    _order_events_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
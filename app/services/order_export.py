@@ -0,0 +1,332 @@
+"""
+Arhiva comenzilor vechi și exportul comenzilor (GET /api/export, `python export_orders.py`).
+
+Arhiva: Cleanup Service mută comenzile procesate/anulate mai vechi de CLEANUP_FILES_DAYS_OLD
+(CLEANUP_ARCHIVE=true) din folderele comenzi/procesate și comenzi/anulate în fișiere NDJSON
+comprimate gzip, câte unul per rulare și lună:
+
+    comenzi/arhiva/2026-10/20261001_083012-20261008_221540.ndjson.gz
+
+Fiecare linie este {"fisier": ..., "folder": "procesate"|"anulate", "comanda": {...}}, în ordinea
+momentului salvării (prefixul numelui fișierului comenzii), iar numele arhivei conține primul
+și ultimul moment din ea.
+
+Exportul citește folderele curente (noi, procesate, anulate) și arhivele ca surse deja
+sortate și le interclasează, deschizând o sursă doar când intervalul ei începe (de regulă
+una sau două surse deschise simultan): comenzile sunt citite una câte una, în ordine
+cronologică, cu memorie constantă indiferent de numărul lor. export_chunks() le formatează
+ca NDJSON (o comandă per linie) sau CSV (un rând per produs) în bucăți de EXPORT_CHUNK_BYTES.
+"""
+
+import csv
+import gzip
+import heapq
+import io
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.config import (
+    COMENZI_NOI, COMENZI_PROCESATE, COMENZI_ANULATE, COMENZI_ARHIVA, EXPORT_CHUNK_BYTES
+)
+from app.logging_config import get_logger
+
+logger = get_logger("order_export")
+
+# <YYYYmmdd_HHMMSS>_comanda_<id>.json (order_service._order_filename)
+ORDER_FILENAME = re.compile(r'^(\d{8}_\d{6})_comanda_.+\.json$')
+ARCHIVE_FILENAME = re.compile(r'^(\d{8}_\d{6})-(\d{8}_\d{6})(?:-\d+)?\.ndjson\.gz$')
+KEY_FORMAT = "%Y%m%d_%H%M%S"
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+# Coloanele CSV: câmpurile comenzii, repetate pe fiecare rând, urmate de câmpurile produsului
+CSV_ORDER_FIELDS = (
+    "id_intern_comanda", "data_comanda", "status_comanda", "tip_comanda", "mod_plata", "nume_client",
+    "numar_telefon_client", "email_client", "adresa_livrare_client", "cartier", "valoare_comanda",
+    "simbol_monetar", "observatii_comanda"
+)
+CSV_PRODUCT_FIELDS = ("id_produs", "denumire_produs", "cantitate_produs", "pret_produs", "observatii_produs")
+CSV_HEADER = ("salvata", "folder", *CSV_ORDER_FIELDS, "discounturi", *CSV_PRODUCT_FIELDS, "extra")
+
+
+def order_key(path: Path) -> str:
+    """Momentul salvării comenzii (YYYYmmdd_HHMMSS), din numele fișierului sau, altfel, din mtime."""
+    match = ORDER_FILENAME.match(path.name)
+    if match:
+        return match.group(1)
+    return datetime.fromtimestamp(path.stat().st_mtime).strftime(KEY_FORMAT)
+
+
+def key_from_datetime(moment: datetime) -> str:
+    return moment.strftime(KEY_FORMAT)
+
+
+def _folders() -> Tuple[Tuple[str, Path], ...]:
+    return (("noi", COMENZI_NOI), ("procesate", COMENZI_PROCESATE), ("anulate", COMENZI_ANULATE))
+
+
+# --- Arhivare (Cleanup Service) ---
+
+def archive_order_files(files: List[Tuple[str, Path]], archive_dir: Optional[Path] = None) -> int:
+    """
+    Mută fișierele comenzilor în arhivă (câte un fișier NDJSON gzip per lună), apoi le șterge.
+
+    Arhiva este scrisă într-un fișier .tmp și redenumită: o rulare întreruptă nu lasă arhive
+    parțiale, iar fișierele rămân în folder pentru rularea următoare.
+
+    Args:
+        files: (numele folderului, calea fișierului comenzii)
+        archive_dir: Directorul arhivei (implicit COMENZI_ARHIVA)
+
+    Returns:
+        Numărul de comenzi arhivate
+    """
+    archive_dir = archive_dir or COMENZI_ARHIVA
+    by_month: Dict[str, List[Tuple[str, str, Path]]] = {}
+    for folder, path in files:
+        key = order_key(path)
+        by_month.setdefault(f"{key[:4]}-{key[4:6]}", []).append((key, folder, path))
+
+    archived = 0
+    for month, entries in sorted(by_month.items()):
+        entries.sort(key=lambda entry: (entry[0], entry[2].name))
+        month_dir = archive_dir / month
+        month_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"{entries[0][0]}-{entries[-1][0]}"
+        target = month_dir / f"{stem}.ndjson.gz"
+        suffix = 1
+        while target.exists():
+            target = month_dir / f"{stem}-{suffix}.ndjson.gz"
+            suffix += 1
+        tmp_target = target.with_name(target.name + '.tmp')
+
+        written = []
+        try:
+            with gzip.open(tmp_target, 'wt', encoding='utf-8') as archive:
+                for key, folder, path in entries:
+                    try:
+                        with open(path, 'r', encoding='utf-8') as f:
+                            order_data = json.load(f)
+                    except (OSError, ValueError) as e:
+                        logger.error(f"❌ Comanda {path.name} nu poate fi arhivată ({e}) - rămâne în {folder}")
+                        continue
+                    record = {"fisier": path.name, "folder": folder, **order_data}
+                    archive.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    written.append(path)
+            if not written:
+                tmp_target.unlink(missing_ok=True)
+                continue
+            os.replace(tmp_target, target)
+        except OSError as e:
+            logger.error(f"❌ Eroare la scrierea arhivei {target.name}: {e}")
+            tmp_target.unlink(missing_ok=True)
+            continue
+
+        for path in written:
+            try:
+                path.unlink()
+            except OSError as e:
+                # Comanda rămâne și în folder; exportul nu o dublează (aceeași cheie și fișier)
+                logger.error(f"❌ Comanda arhivată {path.name} nu a putut fi ștearsă: {e}")
+        archived += len(written)
+        logger.info(f"🗄️ {len(written)} comenzi arhivate în {month}/{target.name}")
+    return archived
+
+
+# --- Citire cronologică (folderele curente + arhiva) ---
+
+class _Source:
+    """O sursă de comenzi sortate după cheie: un folder curent sau un fișier de arhivă."""
+
+    def __init__(self, first: str, opener):
+        self.first = first
+        self._opener = opener
+
+    def open(self) -> Iterator[Tuple[str, str, Dict]]:
+        """(cheie, nume fișier, înregistrare), în ordinea cheilor."""
+        return self._opener()
+
+
+def _folder_source(folder: str, path: Path, start: Optional[str], end: Optional[str],
+                   moved_to: Tuple[Tuple[str, Path], ...] = ()) -> Optional[_Source]:
+    if not path.exists():
+        return None
+    # Doar numele fișierelor sunt ținute în memorie (folderele curente păstrează câteva zile)
+    entries = []
+    for filename in os.listdir(path):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            key = order_key(path / filename)
+        except OSError:
+            continue  # Mutată între listare și stat (confirmare/anulare concurentă)
+        if (start is None or key >= start) and (end is None or key < end):
+            entries.append((key, filename))
+    if not entries:
+        return None
+    entries.sort()
+
+    def read() -> Iterator[Tuple[str, str, Dict]]:
+        for key, filename in entries:
+            # O comandă confirmată/anulată după listare este citită din folderul destinație
+            # (dacă apare și în listarea aceluia, exportul elimină duplicatul)
+            for current, current_path in ((folder, path), *moved_to):
+                try:
+                    with open(current_path / filename, 'r', encoding='utf-8') as f:
+                        order_data = json.load(f)
+                except FileNotFoundError:
+                    continue
+                except ValueError as e:
+                    logger.warning(f"⚠️ Comanda {filename} ignorată la export (JSON invalid: {e})")
+                    break
+                yield key, filename, {"folder": current, **order_data}
+                break
+
+    return _Source(entries[0][0], read)
+
+
+def _archive_sources(archive_dir: Path, start: Optional[str], end: Optional[str]) -> Iterator[_Source]:
+    """Arhivele din interval, în ordinea primei chei, listate lună cu lună (pe măsură ce sunt citite)."""
+    if not archive_dir.exists():
+        return
+    for month_dir in sorted(archive_dir.iterdir()):
+        if not month_dir.is_dir():
+            continue
+        for path in sorted(month_dir.iterdir()):
+            match = ARCHIVE_FILENAME.match(path.name)
+            if not match:
+                continue
+            first, last = match.groups()
+            if (end is not None and first >= end) or (start is not None and last < start):
+                continue
+
+            def read(path=path) -> Iterator[Tuple[str, str, Dict]]:
+                with gzip.open(path, 'rt', encoding='utf-8') as archive:
+                    for line in archive:
+                        record = json.loads(line)
+                        filename = record.pop("fisier")
+                        key = ORDER_FILENAME.match(filename)
+                        yield key.group(1) if key else first, filename, record
+
+            yield _Source(first, read)
+
+
+def _merge(sources: Iterator[_Source]) -> Iterator[Tuple[str, str, Dict]]:
+    """
+    Interclasează sursele sortate (primite în ordinea primei chei), deschizând fiecare sursă
+    doar când poate conține următoarea comandă (prima ei cheie <= cea mai mică cheie din heap).
+    """
+    upcoming = next(sources, None)
+    heap = []
+    index = 0
+    try:
+        while heap or upcoming is not None:
+            while upcoming is not None and (not heap or upcoming.first <= heap[0][0]):
+                iterator = upcoming.open()
+                item = next(iterator, None)
+                if item is not None:
+                    heapq.heappush(heap, (item[0], item[1], index, item[2], iterator))
+                index += 1
+                upcoming = next(sources, None)
+            if not heap:
+                continue
+            key, filename, source, record, iterator = heapq.heappop(heap)
+            yield key, filename, record
+            item = next(iterator, None)
+            if item is not None:
+                heapq.heappush(heap, (item[0], item[1], source, item[2], iterator))
+    finally:
+        for *_, iterator in heap:
+            iterator.close()  # Închide fișierele de arhivă deschise (client deconectat)
+
+
+def iter_orders(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                folders: Optional[Tuple[Tuple[str, Path], ...]] = None,
+                archive_dir: Optional[Path] = None) -> Iterator[Dict]:
+    """
+    Comenzile salvate în intervalul [start, end), în ordinea momentului salvării.
+
+    Args:
+        start: Începutul intervalului (inclusiv), None pentru toate
+        end: Sfârșitul intervalului (exclusiv), None pentru toate
+        folders: Folderele curente (implicit noi, procesate, anulate)
+        archive_dir: Directorul arhivei (implicit COMENZI_ARHIVA)
+
+    Yields:
+        {"salvata": ISO, "folder": ..., "fisier": ..., "comanda": {...}}
+    """
+    start_key = key_from_datetime(start) if start is not None else None
+    end_key = key_from_datetime(end) if end is not None else None
+    folders = folders or _folders()
+    hot_sources = []
+    for index, (folder, path) in enumerate(folders):
+        source = _folder_source(folder, path, start_key, end_key, folders[index + 1:])
+        if source is not None:
+            hot_sources.append(source)
+    sources = heapq.merge(_archive_sources(archive_dir or COMENZI_ARHIVA, start_key, end_key),
+                          sorted(hot_sources, key=lambda source: source.first),
+                          key=lambda source: source.first)
+
+    previous = None
+    for key, filename, record in _merge(sources):
+        if (start_key is not None and key < start_key) or (end_key is not None and key >= end_key):
+            continue
+        if (key, filename) == previous:
+            continue  # Arhivată, dar încă neștearsă din folder
+        previous = (key, filename)
+        yield {
+            "salvata": datetime.strptime(key, KEY_FORMAT).isoformat(),
+            "folder": record.pop("folder", None),
+            "fisier": filename,
+            **record
+        }
+
+
+# --- Formate ---
+
+def _csv_value(value) -> str:
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False) if value else ""
+    return "" if value is None else value
+
+
+def _csv_rows(record: Dict) -> Iterator[list]:
+    """Un rând per produs (un rând cu coloanele produsului goale pentru o comandă fără produse)."""
+    order = record.get("comanda", {})
+    prefix = [record["salvata"], record["folder"], *(_csv_value(order.get(field)) for field in CSV_ORDER_FIELDS),
+              _csv_value(order.get("discounturi"))]
+    products = order.get("produse_comanda") or [{}]
+    for product in products:
+        yield prefix + [_csv_value(product.get(field)) for field in CSV_PRODUCT_FIELDS] + \
+            [_csv_value(product.get("extra"))]
+
+
+def export_chunks(records: Iterator[Dict], fmt: str, chunk_bytes: int = EXPORT_CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    Formatează comenzile ca NDJSON sau CSV, în bucăți de aproximativ `chunk_bytes` octeți.
+
+    Args:
+        records: Comenzile, ca în iter_orders()
+        fmt: "ndjson" sau "csv"
+        chunk_bytes: Dimensiunea unei bucăți (un răspuns HTTP chunked sau o scriere în fișier)
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n") if fmt == "csv" else None
+    if writer is not None:
+        writer.writerow(CSV_HEADER)
+    for record in records:
+        if writer is not None:
+            writer.writerows(_csv_rows(record))
+        else:
+            buffer.write(json.dumps(record, ensure_ascii=False))
+            buffer.write("\n")
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
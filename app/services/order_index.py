@@ -0,0 +1,315 @@
+"""
+Index al documentului HTML al unui email de comandă, construit într-o singură traversare.
+
+Ambele motoare de parsare (BeautifulSoup și lxml) populează același index prin
+IndexBuilder, iar pașii de extracție din order_service citesc doar din index.
+Elementele sunt numerotate în pre-ordine, deci descendenții elementului `i` sunt
+exact elementele din intervalul (i, ends[i]); listele pe tipuri (td, tr, table, a)
+sunt sortate, astfel încât căutările într-un subarbore se fac prin bisecție.
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, List, Optional, Tuple
+
+NO_NODE = -1
+
+
+class DocumentIndex:
+    """
+    Indexul unui document: structura elementelor, textul vizibil și string-urile brute.
+
+    Semantica urmează BeautifulSoup: `strings_of[i]` este echivalentul Tag.string,
+    `text(i)` al Tag.text, iar `strings` conține toate string-urile (inclusiv comentarii
+    și conținutul <script>/<style>), ca find(string=...).
+    """
+
+    def __init__(self):
+        # Per element (indexat în pre-ordine)
+        self.tags: List[str] = []
+        self.parents: List[int] = []
+        self.ends: List[int] = []
+        self.next_siblings: List[int] = []
+        self.styles: List[Optional[str]] = []
+        self.strings_of: List[Optional[str]] = []
+        self.text_spans: List[Tuple[int, int]] = []
+        self.string_spans: List[Tuple[int, int]] = []
+
+        # Elemente pe tipuri, în ordinea documentului
+        self.tds: List[int] = []
+        self.trs: List[int] = []
+        self.tables: List[int] = []
+        self.styled_tds: List[int] = []
+        self.anchors: List[int] = []
+        self.anchor_hrefs: List[Optional[str]] = []
+        # Elementele care conțin marcajul căutat (ex. host-ul de tracking) într-un atribut sau string
+        self.marker_nodes: List[int] = []
+        self.td_by_string: Dict[str, List[int]] = {}
+
+        # String-uri brute (inclusiv comentarii) și proprietarul lor (NO_NODE = documentul)
+        self.strings: List[str] = []
+        self.string_owners: List[int] = []
+
+        # Textul vizibil al întregului document (echivalentul soup.get_text())
+        self.doc_text: str = ""
+
+    def text(self, node: int) -> str:
+        """Textul vizibil al unui element."""
+        start, end = self.text_spans[node]
+        return self.doc_text[start:end]
+
+    def _within(self, nodes: List[int], node: int) -> List[int]:
+        """Elementele din `nodes` care sunt descendenți ai lui `node`."""
+        return nodes[bisect_right(nodes, node):bisect_left(nodes, self.ends[node])]
+
+    def descendant_tds(self, node: int) -> List[int]:
+        return self._within(self.tds, node)
+
+    def descendant_trs(self, node: int) -> List[int]:
+        return self._within(self.trs, node)
+
+    def descendant_styled_tds(self, node: int) -> List[int]:
+        return self._within(self.styled_tds, node)
+
+    def first_descendant_table(self, node: int) -> int:
+        tables = self._within(self.tables, node)
+        return tables[0] if tables else NO_NODE
+
+    def has_anchor(self, node: int) -> bool:
+        return bool(self._within(self.anchors, node))
+
+    def anchor_hrefs_within(self, node: int) -> List[Optional[str]]:
+        """Valorile href ale tag-urilor <a> din subarborele unui element."""
+        start = bisect_right(self.anchors, node)
+        end = bisect_left(self.anchors, self.ends[node])
+        return self.anchor_hrefs[start:end]
+
+    def mentions_marker(self, node: int) -> bool:
+        """Echivalentul `marker in str(tag)`: marcajul apare într-un atribut sau string din subarbore."""
+        position = bisect_left(self.marker_nodes, node)
+        return position < len(self.marker_nodes) and self.marker_nodes[position] < self.ends[node]
+
+    def parent_named(self, node: int, tag: str) -> int:
+        """Cel mai apropiat strămoș cu numele dat (find_parent)."""
+        parent = self.parents[node]
+        while parent != NO_NODE and self.tags[parent] != tag:
+            parent = self.parents[parent]
+        return parent
+
+    def next_sibling_named(self, node: int, tag: str) -> int:
+        """Următorul frate cu numele dat (find_next_sibling)."""
+        sibling = self.next_siblings[node]
+        while sibling != NO_NODE and self.tags[sibling] != tag:
+            sibling = self.next_siblings[sibling]
+        return sibling
+
+    def find_td(self, predicate: Callable[[str], bool]) -> int:
+        """Primul <td> al cărui .string satisface predicatul (find('td', string=...))."""
+        strings_of = self.strings_of
+        for node in self.tds:
+            string = strings_of[node]
+            if string is not None and predicate(string):
+                return node
+        return NO_NODE
+
+    def td_with_string(self, value: str, within: int = NO_NODE) -> int:
+        """Primul <td> cu .string identic cu `value`, opțional doar în subarborele `within`."""
+        for node in self.td_by_string.get(value, ()):
+            if within == NO_NODE or within < node < self.ends[within]:
+                return node
+        return NO_NODE
+
+    def first_td_with_text_containing_upper(self, needle: str) -> int:
+        """
+        Primul <td> (în ordinea documentului) cu `needle in td.text.upper()`.
+        Caută aparițiile o singură dată în tot textul și verifică intervalul fiecărui <td>.
+        """
+        upper_text = self.doc_text.upper()
+        if len(upper_text) != len(self.doc_text):
+            # Majusculele schimbă lungimea textului (ex. "ß") - intervalele nu mai corespund
+            for node in self.tds:
+                if needle in self.text(node).upper():
+                    return node
+            return NO_NODE
+
+        positions = []
+        position = upper_text.find(needle)
+        while position != -1:
+            positions.append(position)
+            position = upper_text.find(needle, position + 1)
+        if not positions:
+            return NO_NODE
+
+        for node in self.tds:
+            start, end = self.text_spans[node]
+            k = bisect_left(positions, start)
+            if k < len(positions) and positions[k] + len(needle) <= end:
+                return node
+        return NO_NODE
+
+    def path_of(self, node: int) -> List[int]:
+        """Calea elementului: indicii copiilor-element de la rădăcină până la `node`."""
+        path = []
+        while node != NO_NODE:
+            parent = self.parents[node]
+            sibling = parent + 1 if parent != NO_NODE else 0
+            ordinal = 0
+            while sibling != node:
+                sibling = self.next_siblings[sibling]
+                ordinal += 1
+            path.append(ordinal)
+            node = parent
+        path.reverse()
+        return path
+
+    def node_at(self, path: List[int]) -> int:
+        """Elementul aflat la calea dată (inversul path_of), sau NO_NODE dacă nu există."""
+        node = NO_NODE
+        for ordinal in path:
+            # Primul copil al unui element este elementul următor în pre-ordine, dacă e în subarbore
+            if node == NO_NODE:
+                child = 0 if self.tags else NO_NODE
+            else:
+                child = node + 1 if node + 1 < self.ends[node] else NO_NODE
+            while ordinal and child != NO_NODE:
+                child = self.next_siblings[child]
+                ordinal -= 1
+            if child == NO_NODE:
+                return NO_NODE
+            node = child
+        return node
+
+
+class IndexBuilder:
+    """
+    Construiește un DocumentIndex din evenimente de traversare în ordinea documentului:
+    start_element / add_string / end_element. Tag.string este calculat aici, la fel
+    pentru ambele motoare.
+    
+    Args:
+        marker: Subșir urmărit în atribute și string-uri (vezi DocumentIndex.mentions_marker)
+    """
+
+    def __init__(self, marker: str):
+        self.index = DocumentIndex()
+        self._marker = marker
+        self._text_parts: List[str] = []
+        self._text_length = 0
+        # Cadre pentru elementele deschise: [index, număr conținut, .string candidat, ultimul copil]
+        self._stack: List[list] = []
+        self._root_last_child = NO_NODE
+
+    def start_element(self, tag: str, attrs) -> None:
+        """Deschide un element; `attrs` este dicționarul de atribute al nodului."""
+        index = self.index
+        node = len(index.tags)
+        parent = self._stack[-1] if self._stack else None
+
+        if parent is not None:
+            parent[1] += 1
+            previous = parent[3]
+            parent[3] = node
+        else:
+            previous = self._root_last_child
+            self._root_last_child = node
+        if previous != NO_NODE:
+            index.next_siblings[previous] = node
+
+        style = attrs.get('style')
+        index.tags.append(tag)
+        index.parents.append(parent[0] if parent is not None else NO_NODE)
+        index.ends.append(NO_NODE)
+        index.next_siblings.append(NO_NODE)
+        index.styles.append(style)
+        index.strings_of.append(None)
+        index.text_spans.append((self._text_length, self._text_length))
+        index.string_spans.append((len(index.strings), len(index.strings)))
+
+        if tag == 'td':
+            index.tds.append(node)
+            if style is not None:
+                index.styled_tds.append(node)
+        elif tag == 'tr':
+            index.trs.append(node)
+        elif tag == 'table':
+            index.tables.append(node)
+        elif tag == 'a':
+            index.anchors.append(node)
+            index.anchor_hrefs.append(attrs.get('href'))
+
+        for value in attrs.values():
+            if isinstance(value, list):
+                value = ' '.join(value)
+            if self._marker in value:
+                index.marker_nodes.append(node)
+                break
+
+        self._stack.append([node, 0, None, NO_NODE])
+
+    def add_string(self, value: str, visible: bool) -> None:
+        """Adaugă un string; `visible` = apare în get_text() (nu e comentariu, script, style)."""
+        index = self.index
+        owner = self._stack[-1] if self._stack else None
+        owner_node = owner[0] if owner is not None else NO_NODE
+
+        index.strings.append(value)
+        index.string_owners.append(owner_node)
+        if visible:
+            self._text_parts.append(value)
+            self._text_length += len(value)
+        if owner is not None:
+            owner[1] += 1
+            owner[2] = value
+            if self._marker in value:
+                index.marker_nodes.append(owner_node)
+
+    def end_element(self) -> None:
+        """Închide ultimul element deschis."""
+        index = self.index
+        node, contents, single_string, last_child = self._stack.pop()
+
+        index.ends[node] = len(index.tags)
+        index.text_spans[node] = (index.text_spans[node][0], self._text_length)
+        index.string_spans[node] = (index.string_spans[node][0], len(index.strings))
+
+        if contents == 1:
+            # Un singur copil: string direct sau .string-ul copilului (recursiv)
+            string = single_string if last_child == NO_NODE else index.strings_of[last_child]
+            index.strings_of[node] = string
+            if string is not None and index.tags[node] == 'td':
+                index.td_by_string.setdefault(string, []).append(node)
+
+    def finish(self) -> DocumentIndex:
+        """Finalizează indexul (textul complet și ordonarea listelor auxiliare)."""
+        while self._stack:
+            self.end_element()
+
+        index = self.index
+        index.doc_text = ''.join(self._text_parts)
+        index.marker_nodes = sorted(set(index.marker_nodes))
+        for nodes in index.td_by_string.values():
+            nodes.sort()
+        return index
+
+
+def build_index_bs4(soup, marker: str) -> DocumentIndex:
+    """Construiește indexul dintr-un arbore BeautifulSoup, într-o singură traversare."""
+    from bs4.element import NavigableString
+
+    builder = IndexBuilder(marker)
+
+    # Stivă explicită, nu recursivitate: emailurile redirecționate pot avea mii de niveluri
+    stack = [iter(soup.contents)]
+    while stack:
+        child = next(stack[-1], None)
+        if child is None:
+            stack.pop()
+            if stack:
+                builder.end_element()
+        elif isinstance(child, NavigableString):
+            # Doar NavigableString "simplu" apare în get_text() (nu Comment, Script, Stylesheet...)
+            builder.add_string(child, type(child) is NavigableString)
+        else:
+            builder.start_element(child.name, child.attrs)
+            stack.append(iter(child.contents))
+
+    return builder.finish()
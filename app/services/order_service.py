@@ -7,14 +7,33 @@ import os
 import re
 import unicodedata
 from datetime import datetime
-from typing import Optional, Dict
-from bs4 import BeautifulSoup
-from app.config import COMENZI_NOI, COMENZI_PROCESATE, COMENZI_ANULATE
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:  # pragma: no cover - depinde de mediul de rulare
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+from app.config import COMENZI_NOI, COMENZI_PROCESATE, COMENZI_ANULATE, PARSER_ENGINE, PARSER_PRETRIM
 from app.logging_config import get_logger
-from app.services.notification_service import NotificationService
+from app.services.order_index import DocumentIndex, NO_NODE, build_index_bs4
+from app.services.template_cache import get_template_cache, template_fingerprint
+from app.services.notification_service import get_notification_service
+from app.services.webhook_outbox import enqueue_new_orders
+from app.services.order_events import publish_saved_orders
+from app.services.metrics import PARSE_SECONDS, ORDERS_SAVED
+from app.services.order_timeline import record_saved_orders
+from app.services.change_log import record_created_orders
+from app.services.tracing import traced
 
 logger = get_logger("order_service")
 
+# Primul caracter semnificativ al documentului (spații și BOM ignorate)
+LEADING_WHITESPACE_PATTERN = re.compile(r'[\s\ufeff]*')
+
 
 def remove_diacritics(text: str) -> str:
     """
@@ -84,269 +103,782 @@ def parse_romanian_date(date_str: str) -> str:
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 
-def parse_order_html(html_doc: str) -> Optional[Dict]:
+# Expresii regulate precompilate, folosite de ambele motoare de parsare (BeautifulSoup și lxml)
+ORDER_ID_PATTERN = re.compile(r'Comanda #|Comandă #')
+FORWARDED_PATTERN = re.compile(r'Forwarded message|Date:', re.IGNORECASE)
+DATE_LINE_PATTERN = re.compile(r'Date:\s*(.+)', re.IGNORECASE)
+DATE_TEXT_PATTERN = re.compile(r'Date:\s*(.+?)(?:\n|$)', re.IGNORECASE)
+ROBOTO_STYLE_PATTERN = re.compile(r"font-family.*Roboto Condensed", re.IGNORECASE)
+BOLD_STYLE_PATTERN = re.compile(r'font-weight:700')
+MAPS_LINK_PATTERN = re.compile(r'google.com/maps|maps.google')
+PHONE_PATTERN = re.compile(r'^(\+?4?0?7\d{8}|\d{10}|\+?\d{11,12})$')
+# Address keywords - use word boundaries to avoid false positives (e.g., "ap" in "Pap")
+ADDRESS_KEYWORDS_PATTERN = re.compile(
+    r'\b(str\.?|strada|bloc|etaj|ap\.?|nr\.?|judet|oras|municipiu|sat|comuna|sector|'
+    r'mures|maros|cluj|bucuresti|timis|brasov|sibiu|alba|principala|calea|bulevardul|'
+    r'aleea|piata)\b',
+    re.IGNORECASE
+)
+PRICE_PATTERN = re.compile(r'(\d+\.\d{2})')
+QUANTITY_PATTERN = re.compile(r'(\d+)')
+TRACKING_HOST = 'track.smbcl.com'
+
+# Câmpurile ale căror noduri sunt localizate de euristici (și memorate în cache-ul de șabloane)
+TEMPLATE_FIELDS = (
+    "order_id", "delivery_header", "phone", "address", "name", "message_header",
+    "payment_header", "payment", "total", "products_table"
+)
+DELIVERY_ROLES = ("phone", "address", "name")
+
+
+def new_order_data() -> Dict:
     """
-    Extract order data from HTML document or JSON and return as a dictionary.
+    Return an empty order dictionary in EXACT key order from model_comanda_json.txt.
+    This order MUST be preserved to match the target JSON structure.
+    """
+    return {
+        "id_intern_comanda": None,
+        "simbol_monetar": "RON",
+        "email_client": "",
+        "numar_telefon_client": None,
+        "nume_client": None,
+        "cartier": "",
+        "tip_comanda": "livrare",
+        "adresa_livrare_client": None,
+        "valoare_comanda": None,
+        "discounturi": [],
+        "status_comanda": "processing",
+        "mod_plata": None,
+        "observatii_comanda": "",
+        "data_comanda": None,
+        "produse_comanda": []
+    }
+
+
+def is_skipped_delivery_text(text: str) -> bool:
+    """Empty cells, headers, spacers and "thank you" / "view order" messages."""
+    return (not text or
+            text.startswith('Adresa') or
+            text == 'Vă mulțumim!' or
+            text == 'Va multumim!' or
+            'Click aici' in text or
+            'vizualiza comanda' in text.lower())
+
+
+def is_phone_text(text: str) -> bool:
+    """Phone number (starts with 07, +407, 07xx, or is all digits 10-12 chars)."""
+    clean_text = re.sub(r'[\s\-\.]', '', text)
+    return bool(PHONE_PATTERN.match(clean_text)) or (clean_text.isdigit() and 10 <= len(clean_text) <= 12)
+
+
+def is_definite_address(text: str, has_maps_link: bool) -> bool:
+    """Address: has Google Maps link OR contains address keywords OR has comma with numbers."""
+    has_address_keywords = bool(ADDRESS_KEYWORDS_PATTERN.search(text))
+    has_address_pattern = bool(re.search(r'\d+.*,|,.*\d+', text))  # numbers with comma = likely address
+    return bool(has_maps_link or has_address_keywords or has_address_pattern)
+
+
+def is_name_candidate(text: str) -> bool:
+    """Short text with few digits - may be a name (or an address without keywords)."""
+    return len(text) < 80 and len(re.findall(r'\d', text)) <= 2
+
+
+def looks_like_name(candidate: str) -> bool:
+    """Name: typically no numbers, no commas, looks like a person name (2-4 words)."""
+    return len(candidate.split()) <= 5 and not re.search(r'\d', candidate) and ',' not in candidate
+
+
+def looks_like_address(candidate: str) -> bool:
+    """Address without Google Maps link or keywords: has comma, numbers or many words."""
+    return ',' in candidate or bool(re.search(r'\d', candidate)) or len(candidate.split()) > 3
+
+
+def classify_delivery_cells(cells: List[Tuple[str, bool, bool]]) -> Tuple[int, int, int]:
+    """
+    Detect phone, address and name among the cells of the delivery table.
     
     Args:
-        html_doc: String with email HTML content or JSON data
+        cells: (stripped text, is tracking link, has Google Maps link) for every
+               "Roboto Condensed" cell of the delivery table, in document order
         
     Returns:
-        Dict with order data in format {"comanda": {...}} or None if parsing fails
+        Positions in `cells` of (phone, address, name); -1 for missing values
     """
-    try:
-        # First, try to parse as JSON (new format)
-        # New format: {"comenzi": [{"comanda": {...}}], "message": "...", "total": 1}
+    phone_position = -1
+    address_position = -1
+    name_position = -1
+    candidates = []  # Store candidates for later analysis
+
+    for position, (text, is_tracking_link, has_maps_link) in enumerate(cells):
+        # Skip empty, headers, spacers, and "thank you" messages
+        if is_skipped_delivery_text(text):
+            continue
+
+        # Skip if it's a link to view order
+        if is_tracking_link:
+            continue
+
+        if is_phone_text(text):
+            if phone_position == -1:
+                phone_position = position
+            continue
+
+        if is_definite_address(text, has_maps_link) and address_position == -1:
+            address_position = position
+            continue
+
+        # Collect remaining candidates (potential names)
+        if is_name_candidate(text):
+            candidates.append(position)
+
+    # Process candidates: first non-address-like candidate is likely the name
+    for position in candidates:
+        candidate = cells[position][0]
+        if name_position == -1 and looks_like_name(candidate):
+            name_position = position
+        elif address_position == -1 and looks_like_address(candidate):
+            # Could be address without Google Maps link
+            address_position = position
+
+    return phone_position, address_position, name_position
+
+
+def payment_method_from_text(tag_text: str) -> str:
+    """
+    Map the payment cell text to the POSnet payment method (ONLINE, CASH or CARD).
+    
+    Args:
+        tag_text: Stripped text of the payment cell
+        
+    Returns:
+        Payment method code
+    """
+    payment_text = tag_text.lower()
+
+    #schimbam prioritatea, punem "card online" primul
+    if 'online' in payment_text:
+        return "ONLINE"
+    elif 'numerar' in payment_text or 'cash' in payment_text:
+        return "CASH"
+    elif 'pos' in payment_text or 'card' in payment_text or 'ramburs' in payment_text:
+        return "CARD"
+    return "CASH"
+
+
+def total_from_text(text: str) -> Optional[str]:
+    """Return the last price (e.g. "118.50") found in the TOTAL cell text, or None."""
+    all_numbers = PRICE_PATTERN.findall(text)
+    if all_numbers:
+        return all_numbers[-1]
+    return None
+
+
+def product_from_columns(name_text: str, quantity_text: str, price_text: str, order_id: str) -> Dict:
+    """
+    Build a product dictionary from the three cells of a product row.
+    
+    Args:
+        name_text: Stripped text of the product name cell
+        quantity_text: Stripped text of the quantity cell
+        price_text: Stripped text of the price cell (total price for the row)
+        order_id: Order ID the product belongs to
+        
+    Returns:
+        Product dictionary in EXACT order from model_comanda_json.txt
+    """
+    name = remove_diacritics(name_text)
+    quantity_match = QUANTITY_PATTERN.search(quantity_text)
+    quantity = int(quantity_match.group(1)) if quantity_match else 1
+    price_match = PRICE_PATTERN.search(price_text)
+    total_price = float(price_match.group(1)) if price_match else 0.00
+
+    # Calculate unit price (HTML contains total price, POSnet multiplies by quantity)
+    unit_price = total_price / quantity if quantity > 0 else total_price
+    price = f"{unit_price:.2f}"
+
+    return {
+        "id_produs": name,
+        "denumire_produs": name,
+        "cantitate_produs": quantity,
+        "pret_produs": price,
+        "id_intern_comanda": order_id,
+        "observatii_produs": "",
+        "extra": []
+    }
+
+
+def _json_start(document: str) -> int:
+    """
+    Cheap format sniff: the JSON wrapper is an object and HTML never starts with '{'.
+    
+    Returns:
+        Position of the opening '{' (after whitespace and BOM), or -1 if the input is not JSON
+    """
+    position = LEADING_WHITESPACE_PATTERN.match(document).end()
+    return position if document[position:position + 1] == '{' else -1
+
+
+def _json_loads(document: str):
+    """
+    Decode JSON with orjson when installed, stdlib json otherwise.
+    orjson is stricter (e.g. NaN, huge integers), so its errors are retried with the stdlib decoder.
+    """
+    if ORJSON_AVAILABLE:
         try:
-            json_data = json.loads(html_doc)
-            
-            # Check if it has the expected structure
-            if isinstance(json_data, dict) and 'comenzi' in json_data:
-                comenzi_list = json_data['comenzi']
-                
-                if isinstance(comenzi_list, list) and len(comenzi_list) > 0:
-                    # Extract the first order from the array
-                    first_order = comenzi_list[0]
-                    
-                    # Verify it has the "comanda" key
-                    if isinstance(first_order, dict) and 'comanda' in first_order:
-                        logger.info(f"✅ JSON parsare reușită - comandă extractă din wrapper")
-                        # Return the order in the expected format {"comanda": {...}}
-                        return first_order
-        except (json.JSONDecodeError, ValueError, KeyError, TypeError):
-            # Not JSON or invalid structure, continue with HTML parsing
-            logger.debug("Input nu este JSON valid sau nu are structura așteptată, încerc parsare HTML...")
+            return orjson.loads(document)
+        except orjson.JSONDecodeError:
             pass
+    return json.loads(document)
+
+
+def _parse_orders_json(html_doc: str) -> Optional[List[Dict]]:
+    """
+    Try to parse the input as the JSON wrapper format.
+    New format: {"comenzi": [{"comanda": {...}}, ...], "message": "...", "total": N}
+    
+    Returns:
+        All orders in format {"comanda": {...}}, or None if input is not in JSON format
+    """
+    start = _json_start(html_doc)
+    if start == -1:
+        return None
+    
+    try:
+        json_data = _json_loads(html_doc[start:] if start else html_doc)
+    except (ValueError, TypeError):
+        # Not JSON, continue with HTML parsing
+        logger.debug("Input nu este JSON valid, încerc parsare HTML...")
+        return None
+    
+    # Check if it has the expected structure
+    if not isinstance(json_data, dict) or not isinstance(json_data.get('comenzi'), list):
+        logger.debug("JSON fără structura așteptată (cheia 'comenzi'), încerc parsare HTML...")
+        return None
+    
+    orders = []
+    for position, order in enumerate(json_data['comenzi']):
+        # Verify it has the "comanda" key
+        if isinstance(order, dict) and isinstance(order.get('comanda'), dict):
+            orders.append(order)
+        else:
+            logger.warning(f"⚠️  Element #{position} din wrapper-ul JSON ignorat (lipsește cheia 'comanda')")
+    
+    logger.info(f"✅ JSON parsare reușită - {len(orders)} comenzi extrase din wrapper")
+    return orders
+
+
+def _require_node(node: int, description: str) -> int:
+    """Return node or raise if the template structure is broken (same as the old AttributeError path)."""
+    if node == NO_NODE:
+        raise ValueError(f"Structura emailului nu este cea așteptată: {description} lipsește")
+    return node
+
+
+def _has_maps_link(index: DocumentIndex, node: int) -> bool:
+    """True if a link inside the cell points to Google Maps."""
+    return any(href is not None and MAPS_LINK_PATTERN.search(href) for href in index.anchor_hrefs_within(node))
+
+
+def _classify_delivery_tags(index: DocumentIndex, cell_tags: List[int]) -> Dict[str, int]:
+    """Return the phone, address and name nodes among the delivery cells (NO_NODE if missing)."""
+    cells = [
+        (
+            index.text(tag).strip(),
+            index.has_anchor(tag) and index.mentions_marker(tag),
+            _has_maps_link(index, tag)
+        )
+        for tag in cell_tags
+    ]
+    return {
+        role: cell_tags[position] if position != -1 else NO_NODE
+        for role, position in zip(DELIVERY_ROLES, classify_delivery_cells(cells))
+    }
+
+
+def _extract_date(index: DocumentIndex) -> str:
+    """
+    Extract order date from the "Forwarded message" section, falling back to
+    a "Date:" line anywhere in the document and finally to the current timestamp.
+    """
+    strings = index.strings
+    for position, value in enumerate(strings):
+        if FORWARDED_PATTERN.search(value):
+            # Search in the parent of the header string for the Date: line
+            owner = index.string_owners[position]
+            if owner == NO_NODE:
+                candidates = strings
+            else:
+                start, end = index.string_spans[owner]
+                candidates = strings[start:end]
+            
+            for elem in candidates:
+                if 'Date:' in elem:
+                    date_match = DATE_LINE_PATTERN.search(elem)
+                    if date_match:
+                        return parse_romanian_date(date_match.group(1).strip())
+            break
+    
+    # Fallback: search for Date: anywhere in the HTML
+    date_match = DATE_TEXT_PATTERN.search(index.doc_text)
+    if date_match:
+        return parse_romanian_date(date_match.group(1).strip())
+    
+    # Last resort: use current timestamp
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _locate_nodes(index: DocumentIndex) -> Optional[Dict]:
+    """
+    Locate the nodes of every order field with the template heuristics.
+    
+    Args:
+        index: Single-pass index of the email HTML
         
-        # If JSON parsing failed or was not applicable, proceed with HTML parsing (legacy format)
-        soup = BeautifulSoup(html_doc, 'html.parser')
-        
-        # Initialize order data dictionary in EXACT order from model_comanda_json.txt
-        # This order MUST be preserved to match the target JSON structure
-        order_data = {
-            "id_intern_comanda": None,
-            "simbol_monetar": "RON",
-            "email_client": "",
-            "numar_telefon_client": None,
-            "nume_client": None,
-            "cartier": "",
-            "tip_comanda": "livrare",
-            "adresa_livrare_client": None,
-            "valoare_comanda": None,
-            "discounturi": [],
-            "status_comanda": "processing",
-            "mod_plata": None,
-            "observatii_comanda": "",
-            "data_comanda": None,
-            "produse_comanda": []
-        }
+    Returns:
+        Dict field -> node (NO_NODE for missing fields) plus "delivery_cells" (the
+        "Roboto Condensed" cells of the delivery table), or None if the order ID is missing
+    """
+    nodes = dict.fromkeys(TEMPLATE_FIELDS, NO_NODE)
+    nodes["delivery_cells"] = []
+    
+    # 1. Order ID
+    order_id_tag = index.find_td(ORDER_ID_PATTERN.search)
+    if order_id_tag == NO_NODE:
+        logger.error("Order ID not found in HTML")
+        return None
+    nodes["order_id"] = order_id_tag
+
+    # 2. Client data, delivery address and notes
+    delivery_header = index.td_with_string('Adresa de livrare:')
+    if delivery_header != NO_NODE:
+        nodes["delivery_header"] = delivery_header
+        delivery_table = _require_node(index.parent_named(delivery_header, 'table'), "tabelul de livrare")
+
+        cell_tags = [
+            tag for tag in index.descendant_styled_tds(delivery_table)
+            if ROBOTO_STYLE_PATTERN.search(index.styles[tag])
+        ]
+        nodes["delivery_cells"] = cell_tags
+        nodes.update(_classify_delivery_tags(index, cell_tags))
+
+        nodes["message_header"] = index.td_with_string('Mesaj:', within=delivery_table)
+
+    # 3. Payment method: first bold td of the payment table, skipping the header itself
+    payment_header = index.td_with_string('Plata:')
+    if payment_header != NO_NODE:
+        nodes["payment_header"] = payment_header
+        payment_table = _require_node(index.parent_named(payment_header, 'table'), "tabelul de plată")
+        for tag in index.descendant_styled_tds(payment_table):
+            if not BOLD_STYLE_PATTERN.search(index.styles[tag]):
+                continue
+            if index.text(tag).strip() == 'Plata:':
+                continue
+            nodes["payment"] = tag
+            break  # Found payment method, stop searching
+
+    # 4. Total value
+    total_tag = index.find_td(lambda text: 'TOTAL:' in text.upper())
+    if total_tag == NO_NODE:
+        total_tag = index.first_td_with_text_containing_upper('TOTAL:')
+    nodes["total"] = total_tag
+
+    # 5. Products (first table inside the order table)
+    order_table = _require_node(index.parent_named(order_id_tag, 'table'), "tabelul comenzii")
+    nodes["products_table"] = index.first_descendant_table(order_table)
+    
+    return nodes
+
+
+def _fill_order(index: DocumentIndex, nodes: Dict, order_date: Optional[str] = None) -> Optional[Dict]:
+    """
+    Build the order dictionary from the located nodes.
+    
+    Args:
+        index: Single-pass index of the email HTML
+        nodes: Field nodes from _locate_nodes or from the template cache
+        order_date: Date already extracted by the pre-scanner (see order_region), if any
         
-        # 1. Extract order ID
-        order_id_tag = soup.find('td', string=re.compile(r'Comanda #|Comandă #'))
-        if order_id_tag:
-            order_data["id_intern_comanda"] = order_id_tag.text.split('#')[1].strip()
+    Returns:
+        Dict with order data in format {"comanda": {...}} or None if the order ID is missing
+    """
+    order_data = new_order_data()
+    
+    # 1. Extract order ID
+    order_data["id_intern_comanda"] = index.text(nodes["order_id"]).split('#')[1].strip()
+
+    # 2. Extract order date
+    order_data["data_comanda"] = order_date if order_date is not None else _extract_date(index)
+
+    # 3. Extract client data, delivery address and notes
+    if nodes["delivery_header"] != NO_NODE:
+        # Assign detected values
+        if nodes["phone"] != NO_NODE:
+            order_data["numar_telefon_client"] = index.text(nodes["phone"]).strip()
+        if nodes["address"] != NO_NODE:
+            order_data["adresa_livrare_client"] = remove_diacritics(re.sub(r'\s+', ' ', index.text(nodes["address"]).strip()))
+        # Use detected name or default to "client_eeatingh" if missing
+        if nodes["name"] != NO_NODE:
+            order_data["nume_client"] = remove_diacritics(index.text(nodes["name"]).strip())
         else:
-            logger.error("Order ID not found in HTML")
-            return None
+            order_data["nume_client"] = "client_eeatingh"
+
+        # Extract order notes (Mesaj section)
+        message_header_tag = nodes["message_header"]
+        if message_header_tag != NO_NODE:
+            message_header_row = _require_node(index.parent_named(message_header_tag, 'tr'), "rândul 'Mesaj:'")
+            message_row = index.next_sibling_named(message_header_row, 'tr')
+            if message_row != NO_NODE:
+                message_tags = index.descendant_tds(message_row)
+                if message_tags:
+                    order_data["observatii_comanda"] = remove_diacritics(index.text(message_tags[0]).strip())
+
+    # 4. Extract payment method
+    if nodes["payment"] != NO_NODE:
+        order_data["mod_plata"] = payment_method_from_text(index.text(nodes["payment"]).strip())
+
+    # 5. Extract total value
+    if nodes["total"] != NO_NODE:
+        total_value = total_from_text(index.text(nodes["total"]))
+        if total_value:
+            order_data["valoare_comanda"] = total_value
+
+    # 6. Extract products
+    products_table = nodes["products_table"]
+    if products_table != NO_NODE:
+        for row in index.descendant_trs(products_table):
+            cols = index.descendant_tds(row)
+            if len(cols) == 3:
+                order_data["produse_comanda"].append(product_from_columns(
+                    index.text(cols[0]).strip(),
+                    index.text(cols[1]).strip(),
+                    index.text(cols[2]).strip(),
+                    order_data["id_intern_comanda"]
+                ))
+    
+    # Validate required data
+    if not order_data["id_intern_comanda"]:
+        logger.error("Order ID missing")
+        return None
+    
+    # Wrap order data under "comanda" key as per JSON model requirement
+    return {"comanda": order_data}
 
-        # 2. Extract order date from "Forwarded message" section
-        # Look for "Date:" line in the forwarded message header
-        forwarded_section = soup.find(string=re.compile(r'Forwarded message|Date:', re.IGNORECASE))
-        date_found = False
-        
-        if forwarded_section:
-            # Search in the parent and siblings for Date: line
-            parent = forwarded_section.parent
-            if parent:
-                # Look through all text in the parent and nearby elements
-                for elem in parent.find_all(string=True):
-                    if 'Date:' in elem:
-                        # Extract the date part after "Date:"
-                        date_match = re.search(r'Date:\s*(.+)', elem, re.IGNORECASE)
-                        if date_match:
-                            date_str = date_match.group(1).strip()
-                            order_data["data_comanda"] = parse_romanian_date(date_str)
-                            date_found = True
-                            break
-        
-        # Fallback: search for Date: anywhere in the HTML
-        if not date_found:
-            all_text = soup.get_text()
-            date_match = re.search(r'Date:\s*(.+?)(?:\n|$)', all_text, re.IGNORECASE)
-            if date_match:
-                date_str = date_match.group(1).strip()
-                order_data["data_comanda"] = parse_romanian_date(date_str)
-            else:
-                # Last resort: use current timestamp
-                order_data["data_comanda"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # 3. Extract client data, delivery address and notes
-        delivery_header = soup.find('td', string='Adresa de livrare:')
-        if delivery_header:
-            delivery_table = delivery_header.find_parent('table')
-            info_tags = delivery_table.find_all('td', style=re.compile(r"font-family.*Roboto Condensed", re.IGNORECASE))
-
-            # Filter out header, spacers, and irrelevant tags
-            text_tags = []
-            for tag in info_tags:
-                text = tag.text.strip()
-                # Skip empty, headers, spacers, and "thank you" messages
-                if (text and
-                    not text.startswith('Adresa') and
-                    text != 'Vă mulțumim!' and
-                    text != 'Va multumim!' and
-                    'Click aici' not in text and
-                    'vizualiza comanda' not in text.lower()):
-                    text_tags.append(tag)
-
-            # Smart detection based on content patterns
-            phone_pattern = re.compile(r'^(\+?4?0?7\d{8}|\d{10}|\+?\d{11,12})$')
-            # Address keywords - use word boundaries to avoid false positives (e.g., "ap" in "Pap")
-            address_keywords_pattern = re.compile(
-                r'\b(str\.?|strada|bloc|etaj|ap\.?|nr\.?|judet|oras|municipiu|sat|comuna|sector|'
-                r'mures|maros|cluj|bucuresti|timis|brasov|sibiu|alba|principala|calea|bulevardul|'
-                r'aleea|piata)\b',
-                re.IGNORECASE
-            )
 
-            detected_phone = None
-            detected_address = None
-            detected_name = None
-            candidates = []  # Store candidates for later analysis
-
-            for tag in text_tags:
-                text = tag.text.strip()
-
-                # Skip if it's a link to view order
-                if tag.find('a') and 'track.smbcl.com' in str(tag):
-                    continue
-
-                # Detect phone number (starts with 07, +407, 07xx, or is all digits 10-12 chars)
-                clean_text = re.sub(r'[\s\-\.]', '', text)
-                if phone_pattern.match(clean_text) or (clean_text.isdigit() and 10 <= len(clean_text) <= 12):
-                    if not detected_phone:
-                        detected_phone = text
-                    continue
-
-                # Detect address: has Google Maps link OR contains address keywords OR has comma with numbers
-                has_maps_link = tag.find('a', href=re.compile(r'google.com/maps|maps.google'))
-                has_address_keywords = bool(address_keywords_pattern.search(text))
-                has_address_pattern = bool(re.search(r'\d+.*,|,.*\d+', text))  # numbers with comma = likely address
-
-                is_definite_address = has_maps_link or has_address_keywords or has_address_pattern
-
-                if is_definite_address and not detected_address:
-                    detected_address = remove_diacritics(re.sub(r'\s+', ' ', text))
-                    continue
-
-                # Collect remaining candidates (potential names)
-                if len(text) < 80 and len(re.findall(r'\d', text)) <= 2:
-                    candidates.append(text)
-
-            # Process candidates: first non-address-like candidate is likely the name
-            for candidate in candidates:
-                # Name: typically no numbers, no commas, looks like a person name (2-4 words)
-                word_count = len(candidate.split())
-                has_numbers = bool(re.search(r'\d', candidate))
-                has_comma = ',' in candidate
-
-                if not detected_name and word_count <= 5 and not has_numbers and not has_comma:
-                    detected_name = remove_diacritics(candidate)
-                elif not detected_address and (has_comma or has_numbers or word_count > 3):
-                    # Could be address without Google Maps link
-                    detected_address = remove_diacritics(re.sub(r'\s+', ' ', candidate))
-
-            # Assign detected values
-            if detected_phone:
-                order_data["numar_telefon_client"] = detected_phone
-            if detected_address:
-                order_data["adresa_livrare_client"] = detected_address
-            # Use detected name or default to "client_eeatingh" if missing
-            order_data["nume_client"] = detected_name if detected_name else "client_eeatingh"
-
-            # Extract order notes (Mesaj section)
-            message_header_tag = delivery_table.find('td', string='Mesaj:')
-            if message_header_tag:
-                message_row = message_header_tag.find_parent('tr').find_next_sibling('tr')
-                if message_row:
-                    message_tag = message_row.find('td')
-                    if message_tag:
-                        order_data["observatii_comanda"] = remove_diacritics(message_tag.text.strip())
-
-        # 4. Extract payment method
-        payment_header = soup.find('td', string='Plata:')
-        if payment_header:
-            payment_table = payment_header.find_parent('table')
-            # Find all bold td elements and skip the header itself
-            bold_tags = payment_table.find_all('td', style=re.compile(r'font-weight:700'))
-            for tag in bold_tags:
-                tag_text = tag.text.strip()
-                # Skip if it's the header
-                if tag_text == 'Plata:':
-                    continue
-                payment_text = tag_text.lower()
-
-                #schimbam prioritatea, punem "card online" primul
-                if 'online' in payment_text:
-                    order_data["mod_plata"] = "ONLINE"
-                elif 'numerar' in payment_text or 'cash' in payment_text:
-                    order_data["mod_plata"] = "CASH"
-                elif 'pos' in payment_text or 'card' in payment_text or 'ramburs' in payment_text:
-                    order_data["mod_plata"] = "CARD"
-                else:
-                    order_data["mod_plata"] = "CASH"
-                break  # Found payment method, stop searching
-
-        # 5. Extract total value
-        total_tag = soup.find('td', string=lambda text: text and 'TOTAL:' in text.upper() if text else False)
-        if not total_tag:
-            for td in soup.find_all('td'):
-                if td.text and 'TOTAL:' in td.text.upper():
-                    total_tag = td
-                    break
-        
-        if total_tag:
-            all_numbers = re.findall(r'(\d+\.\d{2})', total_tag.text)
-            if all_numbers:
-                order_data["valoare_comanda"] = all_numbers[-1]
-
-        # 6. Extract products
-        if order_id_tag:
-            products_table = order_id_tag.find_parent('table').find('table')
-            if products_table:
-                product_rows = products_table.find_all('tr')
-                for row in product_rows:
-                    cols = row.find_all('td')
-                    if len(cols) == 3:
-                        name = remove_diacritics(cols[0].text.strip())
-                        quantity_match = re.search(r'(\d+)', cols[1].text.strip())
-                        quantity = int(quantity_match.group(1)) if quantity_match else 1
-                        price_match = re.search(r'(\d+\.\d{2})', cols[2].text.strip())
-                        total_price = float(price_match.group(1)) if price_match else 0.00
-
-                        # Calculate unit price (HTML contains total price, POSnet multiplies by quantity)
-                        unit_price = total_price / quantity if quantity > 0 else total_price
-                        price = f"{unit_price:.2f}"
-
-                        # Product dictionary in EXACT order from model_comanda_json.txt
-                        product_item = {
-                            "id_produs": name,
-                            "denumire_produs": name,
-                            "cantitate_produs": quantity,
-                            "pret_produs": price,
-                            "id_intern_comanda": order_data["id_intern_comanda"],
-                            "observatii_produs": "",
-                            "extra": []
-                        }
-                        order_data["produse_comanda"].append(product_item)
-        
-        # Validate required data
-        if not order_data["id_intern_comanda"]:
-            logger.error("Order ID missing")
+def extract_order(index: DocumentIndex, order_date: Optional[str] = None) -> Optional[Dict]:
+    """
+    Extract order data from a document index (shared by all HTML engines).
+    
+    Args:
+        index: Single-pass index of the email HTML
+        order_date: Date already extracted by the pre-scanner (see order_region), if any
+        
+    Returns:
+        Dict with order data in format {"comanda": {...}} or None if the order ID is missing
+    """
+    nodes = _locate_nodes(index)
+    if nodes is None:
+        return None
+    return _fill_order(index, nodes, order_date)
+
+
+def _delivery_roles_unchanged(index: DocumentIndex, nodes: Dict) -> bool:
+    """
+    Cheap check that classify_delivery_cells would still pick the cached phone, address and name.
+    Holds when the role cells cannot compete with each other and every other cell is either
+    skipped or comes after all three roles were assigned (e.g. the "Mesaj:" rows); otherwise
+    the caller re-classifies the cached cells.
+    """
+    phone, address, name = (nodes[role] for role in DELIVERY_ROLES)
+    if phone == NO_NODE or address == NO_NODE:
+        return False
+    
+    role_nodes = {phone, address, name}
+    last_role = max(role_nodes) if name != NO_NODE else None
+    for tag in nodes["delivery_cells"]:
+        if tag in role_nodes or (last_role is not None and tag > last_role):
+            continue
+        text = index.text(tag).strip()
+        if not (is_skipped_delivery_text(text) or (index.has_anchor(tag) and index.mentions_marker(tag))):
+            return False
+
+    phone_text = index.text(phone).strip()
+    address_text = index.text(address).strip()
+    if not is_phone_text(phone_text) or is_phone_text(address_text):
+        return False
+    if not is_definite_address(address_text, _has_maps_link(index, address)):
+        return False
+    if name != NO_NODE:
+        name_text = index.text(name).strip()
+        if (is_skipped_delivery_text(name_text) or is_phone_text(name_text) or
+                is_definite_address(name_text, _has_maps_link(index, name)) or
+                not (is_name_candidate(name_text) and looks_like_name(name_text))):
+            return False
+    return True
+
+
+def _template_nodes_valid(index: DocumentIndex, nodes: Dict) -> bool:
+    """
+    Check that the nodes resolved from a cached template still hold the expected fields.
+    
+    Args:
+        index: Single-pass index of the email HTML
+        nodes: Field nodes resolved from the cached paths
+        
+    Returns:
+        True if every landmark and value passes the same checks the heuristics use
+    """
+    tags = index.tags
+
+    def td_string(field):
+        node = nodes[field]
+        return index.strings_of[node] if node != NO_NODE and tags[node] == 'td' else None
+
+    order_id = td_string("order_id")
+    if order_id is None or not ORDER_ID_PATTERN.search(order_id):
+        return False
+    if td_string("delivery_header") != 'Adresa de livrare:' or td_string("payment_header") != 'Plata:':
+        return False
+
+    delivery_table = index.parent_named(nodes["delivery_header"], 'table')
+    if delivery_table == NO_NODE:
+        return False
+    if index.td_with_string('Mesaj:', within=delivery_table) != nodes["message_header"]:
+        return False
+
+    # Phone, address and name
+    cell_tags = nodes["delivery_cells"]
+    if any(tag == NO_NODE or tags[tag] != 'td' for tag in cell_tags):
+        return False
+    if not _delivery_roles_unchanged(index, nodes):
+        # Re-classify only the cached cells (no scan of the whole table)
+        roles = _classify_delivery_tags(index, cell_tags)
+        if any(roles[role] != nodes[role] for role in DELIVERY_ROLES):
+            return False
+
+    payment = nodes["payment"]
+    if (payment == NO_NODE or tags[payment] != 'td' or
+            not BOLD_STYLE_PATTERN.search(index.styles[payment] or '') or
+            index.text(payment).strip() == 'Plata:'):
+        return False
+    total = nodes["total"]
+    if total == NO_NODE or tags[total] != 'td' or 'TOTAL:' not in index.text(total).upper():
+        return False
+
+    products_table = nodes["products_table"]
+    return products_table != NO_NODE and tags[products_table] == 'table'
+
+
+def _nodes_to_paths(index: DocumentIndex, nodes: Dict) -> Dict:
+    """Convert located nodes to element paths (stable across emails with the same template)."""
+    paths = {field: index.path_of(node) if node != NO_NODE else None for field, node in nodes.items()
+             if field != "delivery_cells"}
+    paths["delivery_cells"] = [index.path_of(node) for node in nodes["delivery_cells"]]
+    return paths
+
+
+def _paths_to_nodes(index: DocumentIndex, paths: Dict) -> Optional[Dict]:
+    """Resolve cached element paths in a new document; None if the entry is malformed."""
+    if set(paths) != set(TEMPLATE_FIELDS) | {"delivery_cells"}:
+        return None
+    nodes = {field: index.node_at(path) if path is not None else NO_NODE for field, path in paths.items()
+             if field != "delivery_cells"}
+    nodes["delivery_cells"] = [index.node_at(path) for path in paths["delivery_cells"]]
+    return nodes
+
+
+def _extract_order_cached(index: DocumentIndex, engine: str, order_date: Optional[str] = None) -> Optional[Dict]:
+    """
+    Extract order data, using the node paths learned for this email template when available.
+    The full heuristics run only on a cache miss or when the cached nodes fail validation.
+    
+    Args:
+        index: Single-pass index of the email HTML
+        engine: Name of the engine that built the index (node paths differ between engines)
+        order_date: Date already extracted by the pre-scanner (see order_region), if any
+        
+    Returns:
+        Dict with order data in format {"comanda": {...}} or None if the order ID is missing
+    """
+    cache = get_template_cache()
+    if cache is None:
+        return extract_order(index, order_date)
+    
+    key = f"{engine}:{template_fingerprint(index)}"
+    paths = cache.get(key)
+    if paths is not None:
+        nodes = _paths_to_nodes(index, paths)
+        if nodes is not None and _template_nodes_valid(index, nodes):
+            order = _fill_order(index, nodes, order_date)
+            if is_order_complete(order):
+                return order
+        logger.debug("Nodurile din cache-ul de șabloane nu mai corespund, rulez euristicile complete")
+        cache.record_validation_failure(key)
+    
+    nodes = _locate_nodes(index)
+    if nodes is None:
+        return None
+    order = _fill_order(index, nodes, order_date)
+    # Only complete parses teach the cache (a hit must always yield a complete order)
+    if is_order_complete(order) and _template_nodes_valid(index, nodes):
+        cache.learn(key, _nodes_to_paths(index, nodes))
+    return order
+
+
+def _build_index_bs4(html_doc: str) -> DocumentIndex:
+    """Parse the HTML with BeautifulSoup (reference engine) and index it."""
+    # Import local: bs4 este încărcat doar în procesele care parsează (ingestie, reprocesare)
+    from bs4 import BeautifulSoup
+    return build_index_bs4(BeautifulSoup(html_doc, 'html.parser'), TRACKING_HOST)
+
+
+def _parse_order_bs4(html_doc: str) -> Optional[Dict]:
+    """
+    Parse the legacy HTML format with BeautifulSoup (reference engine).
+    
+    Args:
+        html_doc: String with email HTML content
+        
+    Returns:
+        Dict with order data in format {"comanda": {...}} or None if parsing fails
+    """
+    return extract_order(_build_index_bs4(html_doc))
+
+
+def is_order_complete(order: Optional[Dict]) -> bool:
+    """
+    Check that an HTML parse extracted every field the templates always carry.
+    Incomplete fast (lxml) results are re-parsed with BeautifulSoup, which stays
+    the reference, and only complete results teach the template cache.
+    
+    Args:
+        order: Parsed order in format {"comanda": {...}}
+        
+    Returns:
+        True if every field the templates always carry was extracted
+    """
+    if not order:
+        return False
+    
+    comanda = order["comanda"]
+    return bool(
+        comanda["id_intern_comanda"] and
+        comanda["numar_telefon_client"] and
+        comanda["adresa_livrare_client"] and
+        comanda["valoare_comanda"] and
+        comanda["mod_plata"] and
+        comanda["produse_comanda"]
+    )
+
+
+def _parse_order_fast(html_doc: str, order_date: Optional[str] = None) -> Optional[Dict]:
+    """
+    Parse with the lxml engine if it is enabled and installed.
+    
+    Returns:
+        Validated order dict, or None if the reference engine must be used
+    """
+    if PARSER_ENGINE == "bs4":
+        return None
+    
+    from app.services import lxml_parser
+    if not lxml_parser.LXML_AVAILABLE:
+        if PARSER_ENGINE == "lxml":
+            logger.warning("⚠️  PARSER_ENGINE=lxml dar lxml nu este instalat - folosesc BeautifulSoup")
+        return None
+    
+    try:
+        with PARSE_SECONDS.labels("lxml").time():
+            index = lxml_parser.build_index_from_html(html_doc)
+            order = _extract_order_cached(index, "lxml", order_date) if index is not None else None
+    except Exception as e:
+        logger.debug(f"Motorul lxml a eșuat ({e}), folosesc BeautifulSoup")
+        return None
+    
+    if not is_order_complete(order):
+        logger.debug("Rezultat lxml incomplet, folosesc BeautifulSoup")
+        return None
+    
+    return order
+
+
+def _parse_html(html_doc: str, order_date: Optional[str] = None) -> Optional[Dict]:
+    """
+    Parse the legacy HTML format: lxml engine first, BeautifulSoup as reference fallback.
+    
+    Args:
+        html_doc: Email HTML content (whole document or pre-trimmed order region)
+        order_date: Date already extracted by the pre-scanner, if any
+        
+    Returns:
+        Dict with order data in format {"comanda": {...}} or None if the order ID is missing
+    """
+    order = _parse_order_fast(html_doc, order_date)
+    if order is not None:
+        return order
+    
+    with PARSE_SECONDS.labels("bs4").time():
+        return _extract_order_cached(_build_index_bs4(html_doc), "bs4", order_date)
+
+
+def _parse_order_trimmed(html_doc: str) -> Optional[Dict]:
+    """
+    Parse only the order region of a forwarded email (see order_region).
+    
+    Returns:
+        Complete order dict, or None if the whole document must be parsed
+    """
+    if not PARSER_PRETRIM:
+        return None
+    
+    from app.services import lxml_parser
+    if PARSER_ENGINE != "bs4" and lxml_parser.LXML_AVAILABLE:
+        return None  # lxml parsează documentul întreg cel puțin la fel de repede
+    
+    from app.services.order_region import MIN_TRIMMED_FRACTION, trim_order_region
+    try:
+        region = trim_order_region(html_doc, MIN_TRIMMED_FRACTION)
+        if region is None:
             return None
+        fragment, order_date = region
+        order = _parse_html(fragment, order_date)
+    except Exception as e:
+        logger.debug(f"Parsarea zonei comenzii a eșuat ({e}), parsez documentul întreg")
+        return None
+    
+    return order if is_order_complete(order) else None
+
+
+@traced("parse", lambda html_doc: {"bytes": len(html_doc)})
+def parse_orders(html_doc: str) -> List[Dict]:
+    """
+    Extract all orders from an email: every order of the JSON wrapper, or the single
+    order of an HTML email.
+    
+    The format is detected from the first non-whitespace character, so HTML emails never
+    pay for a JSON decode attempt. HTML is parsed with the lxml engine when available
+    (see PARSER_ENGINE) and falls back to BeautifulSoup when lxml is missing or its result
+    fails validation. Forwarded emails are first trimmed to the order region (see
+    PARSER_PRETRIM) and emails matching an already learned template reuse its node paths
+    (see template_cache).
+    
+    Args:
+        html_doc: String with email HTML content or JSON data
         
-        # Wrap order data under "comanda" key as per JSON model requirement
-        return {"comanda": order_data}
+    Returns:
+        List of orders in format {"comanda": {...}} (empty if parsing fails)
+    """
+    try:
+        # First, try to parse as JSON (new format)
+        with PARSE_SECONDS.labels("json").time():
+            orders = _parse_orders_json(html_doc)
+        if orders is not None:
+            return orders
+        
+        # If JSON parsing failed or was not applicable, proceed with HTML parsing (legacy format)
+        order = _parse_order_trimmed(html_doc)
+        if order is None:
+            order = _parse_html(html_doc)
+        return [order] if order is not None else []
         
     except Exception as e:
         logger.error(f"Error parsing HTML: {e}", exc_info=True)
@@ -354,17 +886,45 @@ def parse_order_html(html_doc: str) -> Optional[Dict]:
         # --- MODIFICARE ---
         # Trimite notificare de eroare la parsare
         try:
-            NotificationService().send_error_notification(
+            get_notification_service().send_error_notification(
                 error_message=str(e),
-                context=f"parse_order_html - Emailul nu a putut fi parsat."
+                context=f"parse_order_html - Emailul nu a putut fi parsat.",
+                exception=e
             )
         except:
             pass
         # --- SFÂRȘIT MODIFICARE ---
         
-        return None
+        return []
+
+
+def parse_order_html(html_doc: str) -> Optional[Dict]:
+    """
+    Extract order data from HTML document or JSON and return as a dictionary.
+    For JSON wrappers with several orders only the first one is returned - use parse_orders.
+    
+    Args:
+        html_doc: String with email HTML content or JSON data
+        
+    Returns:
+        Dict with order data in format {"comanda": {...}} or None if parsing fails
+    """
+    orders = parse_orders(html_doc)
+    return orders[0] if orders else None
 
+def _order_ids(orders: List[Dict]) -> List[str]:
+    """Order IDs of a batch (span attributes, see tracing)."""
+    return [order["comanda"]["id_intern_comanda"] for order in orders]
 
+
+def _order_filename(order_data: Dict, output_folder) -> Path:
+    """File name for an order: <timestamp>_comanda_<id>.json (order ID from the wrapped structure)."""
+    order_id = order_data["comanda"]["id_intern_comanda"]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return output_folder / f"{timestamp}_comanda_{order_id}.json"
+
+
+@traced("store", lambda order_data, *args, **kwargs: {"orders": _order_ids([order_data])})
 def save_order_json(order_data: Dict, output_folder = COMENZI_NOI) -> bool:
     """
     Save order data to a JSON file.
@@ -379,15 +939,17 @@ def save_order_json(order_data: Dict, output_folder = COMENZI_NOI) -> bool:
     try:
         output_folder.mkdir(parents=True, exist_ok=True)
         
-        # Extract order ID from wrapped structure
-        order_id = order_data["comanda"]["id_intern_comanda"]
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = output_folder / f"{timestamp}_comanda_{order_id}.json"
-        
+        filename = _order_filename(order_data, output_folder)
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(order_data, f, indent=4, ensure_ascii=False, sort_keys=False)
         
-        logger.info(f"Order #{order_id} saved: {filename.name}")
+        logger.info(f"Order #{order_data['comanda']['id_intern_comanda']} saved: {filename.name}")
+        if output_folder == COMENZI_NOI:
+            ORDERS_SAVED.inc()
+            record_saved_orders([order_data])
+            record_created_orders([order_data])
+            publish_saved_orders([order_data])
+            enqueue_new_orders([order_data])
         return True
         
     except Exception as e:
@@ -395,6 +957,86 @@ def save_order_json(order_data: Dict, output_folder = COMENZI_NOI) -> bool:
         return False
 
 
+@traced("store", lambda orders, *args, **kwargs: {"orders": _order_ids(orders)})
+def save_orders_batch(orders: List[Dict], output_folder = COMENZI_NOI,
+                      stages: Optional[Dict[str, float]] = None) -> bool:
+    """
+    Save several orders (e.g. all orders of a JSON wrapper).
+    
+    Every order is written to a temporary file first, so a failed write leaves no
+    half-written JSON behind. The files are then renamed one by one and each order is
+    recorded/published as soon as its file is in place. The batch is not atomic: if a
+    rename fails, the orders already renamed stay saved (and announced) and False is
+    returned; when the email is processed again, filter_new_orders skips them and only
+    the rest are saved.
+    
+    Args:
+        orders: Orders in format {"comanda": {...}}
+        output_folder: Folder where JSON files are saved (default: comenzi/noi)
+        stages: Timestamps of the earlier lifecycle stages ("arrived", "parsed"), see order_timeline
+        
+    Returns:
+        True if all orders were saved, False otherwise
+    """
+    pending = []
+    try:
+        output_folder.mkdir(parents=True, exist_ok=True)
+        
+        for order_data in orders:
+            filename = _order_filename(order_data, output_folder)
+            tmp_filename = filename.with_name(filename.name + '.tmp')
+            pending.append((tmp_filename, filename, order_data))
+            with open(tmp_filename, 'w', encoding='utf-8') as f:
+                json.dump(order_data, f, indent=4, ensure_ascii=False, sort_keys=False)
+        
+        saved = []
+        while pending:
+            tmp_filename, filename, order_data = pending[0]
+            os.replace(tmp_filename, filename)
+            pending.pop(0)
+            saved.append(filename.name)
+            if output_folder == COMENZI_NOI:
+                ORDERS_SAVED.inc()
+                record_saved_orders([order_data], stages)
+                record_created_orders([order_data])
+                publish_saved_orders([order_data])
+                enqueue_new_orders([order_data])
+        
+        logger.info(f"{len(saved)} orders saved: {', '.join(saved)}")
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error saving order batch: {e}", exc_info=True)
+        for tmp_filename, _, _ in pending:
+            try:
+                tmp_filename.unlink(missing_ok=True)
+            except OSError:
+                pass
+        return False
+
+
+
+def filter_new_orders(orders: List[Dict]) -> List[Dict]:
+    """
+    Keep only orders that were not saved before and are not repeated in the same batch.
+    
+    Args:
+        orders: Orders in format {"comanda": {...}}
+        
+    Returns:
+        The new orders, in their original order
+    """
+    new_orders = []
+    order_ids = set()
+    for order_data in orders:
+        order_id = order_data["comanda"]["id_intern_comanda"]
+        if order_id in order_ids or is_order_processed(order_id):
+            continue
+        order_ids.add(order_id)
+        new_orders.append(order_data)
+    return new_orders
+
+
 def is_order_processed(order_id: str) -> bool:
     """
     Check if an order has already been processed.
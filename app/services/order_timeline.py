@@ -0,0 +1,260 @@
+"""
+Timpii fiecărei comenzi pe etapele ciclului ei de viață, pentru a vedea unde așteaptă comenzile.
+
+Etapele (momente UNIX, secunde):
+    email_date - data comenzii din emailul redirecționat (parse_romanian_date, rezoluție de un minut)
+    arrived    - sosirea emailului în căsuța IMAP (INTERNALDATE)
+    parsed     - sfârșitul parsării emailului
+    saved      - salvarea în comenzi/noi
+    served     - prima livrare către un POS prin GET /api/comenzi
+    finished   - confirmarea sau anularea prin POST /api/comenzi (outcome)
+
+Fișierele comenzilor rămân exact în formatul așteptat de POSnet, deci timpii sunt păstrați
+separat, un rând per comandă într-o bază SQLite în DATA_DIR: etapele de ingestie sunt scrise
+de Email Listener (procesul de ingestie), iar preluarea și confirmarea de worker-ii API.
+summary() calculează p50/p95/p99 pentru intervalul dintre etape, peste comenzile salvate în
+ultima fereastră (ORDER_TIMELINE_WINDOW).
+"""
+
+import math
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.config import ORDER_TIMELINE_FILE, ORDER_TIMELINE_WINDOW, ORDER_TIMELINE_RETENTION
+from app.logging_config import get_logger
+from app.services.process_local import ProcessLocal
+from app.services.tracing import current_trace_id
+
+logger = get_logger("order_timeline")
+
+STAGES = ("email_date", "arrived", "parsed", "saved", "served", "finished")
+
+OUTCOME_CONFIRMED = "confirmed"
+OUTCOME_CANCELLED = "cancelled"
+
+# Intervalele raportate: (nume, etapa de început, etapa de sfârșit, rezultatul cerut)
+INTERVALS = (
+    ("email_imap", "email_date", "arrived", None),  # Redirecționare + livrare email
+    ("imap_parsare", "arrived", "parsed", None),  # Notificare IDLE, indexare Gmail, fetch, parsare
+    ("parsare_salvare", "parsed", "saved", None),
+    ("asteptare_pos", "saved", "served", None),  # Comanda în comenzi/noi până o preia un POS
+    ("preluare_confirmare", "served", "finished", OUTCOME_CONFIRMED),  # Operatorul POS
+    ("preluare_anulare", "served", "finished", OUTCOME_CANCELLED),
+    ("total_confirmare", "arrived", "finished", OUTCOME_CONFIRMED),
+)
+PERCENTILES = (50, 95, 99)
+
+PRUNE_INTERVAL = 60 * 60  # Secunde între ștergerile rândurilor mai vechi decât retenția
+SERVED_CACHE_SIZE = 10000  # Comenzi marcate ca preluate, ținute minte per proces
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS timeline (
+    order_id TEXT PRIMARY KEY,
+    email_date REAL,
+    arrived REAL,
+    parsed REAL,
+    saved REAL NOT NULL,
+    served REAL,
+    finished REAL,
+    outcome TEXT,
+    trace_id TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS timeline_saved ON timeline (saved);
+"""
+
+
+def order_date_timestamp(order_data: Dict) -> Optional[float]:
+    """Momentul UNIX al câmpului data_comanda ("YYYY-MM-DD HH:MM:SS"), sau None."""
+    try:
+        return datetime.strptime(order_data["comanda"]["data_comanda"], "%Y-%m-%d %H:%M:%S").timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Percentila `p` (nearest-rank) a unei liste sortate."""
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+class OrderTimeline:
+    """
+    Timpii comenzilor pe etape, partajați între procese.
+
+    Args:
+        path: Fișierul bazei de date
+        retention: Cât timp sunt păstrați timpii unei comenzi (secunde)
+    """
+
+    def __init__(self, path: Path, retention: float = ORDER_TIMELINE_RETENTION):
+        self.path = path
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._served = set()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(path), timeout=5, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(timeline)")}
+        if "trace_id" not in columns:  # Bază creată înainte de trasarea comenzilor
+            self._connection.execute("ALTER TABLE timeline ADD COLUMN trace_id TEXT")
+
+    def record_saved(self, orders: List[Dict], stages: Optional[Dict[str, float]] = None,
+                     saved: Optional[float] = None, trace_id: Optional[str] = None) -> None:
+        """
+        Înregistrează comenzile unui email salvate în comenzi/noi.
+
+        Args:
+            orders: Comenzile în format {"comanda": {...}}
+            stages: Momentele etapelor anterioare salvării ("arrived", "parsed"), dacă sunt cunoscute
+            saved: Momentul salvării (implicit acum)
+            trace_id: Trace-ul ingestiei emailului (continuat de request-urile API pentru comenzi)
+        """
+        stages = stages or {}
+        saved = time.time() if saved is None else saved
+        rows = [(str(order["comanda"]["id_intern_comanda"]), order_date_timestamp(order),
+                 stages.get("arrived"), stages.get("parsed"), saved, trace_id) for order in orders]
+        with self._lock:
+            # O comandă salvată din nou (de ex. ștearsă și re-trimisă) începe un ciclu nou
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO timeline (order_id, email_date, arrived, parsed, saved, trace_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            for row in rows:
+                self._served.discard(row[0])
+            if saved - self._last_prune >= PRUNE_INTERVAL:
+                self._last_prune = saved
+                deleted = self._connection.execute(
+                    "DELETE FROM timeline WHERE saved < ?", (saved - self.retention,)
+                ).rowcount
+                if deleted:
+                    logger.debug(f"🧹 Timpi comenzi: {deleted} comenzi mai vechi decât retenția șterse")
+
+    def mark_served(self, order_id: str, at: Optional[float] = None) -> None:
+        """Prima livrare a comenzii către un POS (livrările repetate sunt ignorate fără scriere)."""
+        order_id = str(order_id)
+        if order_id in self._served:
+            return
+        with self._lock:
+            self._connection.execute(
+                "UPDATE timeline SET served = ? WHERE order_id = ? AND served IS NULL",
+                (time.time() if at is None else at, order_id)
+            )
+            if len(self._served) >= SERVED_CACHE_SIZE:
+                self._served.clear()
+            self._served.add(order_id)
+
+    def mark_finished(self, order_id: str, outcome: str, at: Optional[float] = None) -> None:
+        """Confirmarea (OUTCOME_CONFIRMED) sau anularea (OUTCOME_CANCELLED) comenzii; contează prima."""
+        with self._lock:
+            self._connection.execute(
+                "UPDATE timeline SET finished = ?, outcome = ? WHERE order_id = ? AND finished IS NULL",
+                (time.time() if at is None else at, outcome, str(order_id))
+            )
+
+    def timeline(self, order_id: str) -> Optional[Dict]:
+        """Momentele etapelor unei comenzi, rezultatul și trace ID-ul, sau None dacă nu există."""
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT {', '.join(STAGES)}, outcome, trace_id FROM timeline WHERE order_id = ?", (str(order_id),)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(STAGES + ("outcome", "trace_id"), row))
+
+    def trace_of(self, order_id: str) -> Optional[str]:
+        """Trace ID-ul ingestiei comenzii, sau None."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT trace_id FROM timeline WHERE order_id = ?", (str(order_id),)
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def summary(self, window: float = ORDER_TIMELINE_WINDOW, now: Optional[float] = None) -> Dict:
+        """
+        Percentilele duratelor dintre etape pentru comenzile salvate în ultimele `window` secunde.
+
+        Returns:
+            Numărul de comenzi, comenzile încă în așteptare și, per interval, numărul de
+            comenzi, p50/p95/p99 și maximul (secunde)
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {', '.join(STAGES)}, outcome FROM timeline WHERE saved >= ?", (now - window,)
+            ).fetchall()
+
+        positions = {stage: index for index, stage in enumerate(STAGES)}
+        intervals = {}
+        for name, start, end, outcome in INTERVALS:
+            first, last = positions[start], positions[end]
+            durations = sorted(
+                max(0.0, row[last] - row[first]) for row in rows
+                if row[first] is not None and row[last] is not None and (outcome is None or row[-1] == outcome)
+            )
+            stats = {"numar": len(durations)}
+            if durations:
+                for p in PERCENTILES:
+                    stats[f"p{p}"] = round(percentile(durations, p), 3)
+                stats["max"] = round(durations[-1], 3)
+            intervals[name] = stats
+
+        served, finished = positions["served"], positions["finished"]
+        return {
+            "fereastra_secunde": window,
+            "comenzi": len(rows),
+            "in_asteptare": {
+                "nepreluate": sum(1 for row in rows if row[served] is None and row[finished] is None),
+                "preluate_nefinalizate": sum(1 for row in rows if row[served] is not None and row[finished] is None),
+            },
+            "etape": intervals,
+        }
+
+
+# Instanța globală (creată la prima utilizare, în fiecare proces)
+_order_timeline: ProcessLocal[OrderTimeline] = ProcessLocal(
+    lambda: OrderTimeline(ORDER_TIMELINE_FILE),
+    lambda e: logger.error(f"❌ Baza de timpi a comenzilor nu poate fi deschisă ({e})")
+)
+
+
+def get_order_timeline() -> Optional[OrderTimeline]:
+    """Returnează baza de timpi globală, sau None dacă nu poate fi deschisă (timpii nu sunt înregistrați)."""
+    return _order_timeline.get()
+
+
+def record_saved_orders(orders: List[Dict], stages: Optional[Dict[str, float]] = None) -> None:
+    """Înregistrează comenzile salvate în comenzi/noi (nu aruncă excepții)."""
+    timeline = get_order_timeline()
+    if timeline is None or not orders:
+        return
+    try:
+        timeline.record_saved(orders, stages, trace_id=current_trace_id())
+    except Exception as e:
+        logger.error(f"❌ Eroare la înregistrarea timpilor comenzilor: {e}")
+
+
+def mark_order_served(order_id: str) -> None:
+    """Înregistrează prima livrare a comenzii către un POS (nu aruncă excepții)."""
+    timeline = get_order_timeline()
+    if timeline is None:
+        return
+    try:
+        timeline.mark_served(order_id)
+    except Exception as e:
+        logger.error(f"❌ Eroare la înregistrarea preluării comenzii #{order_id}: {e}")
+
+
+def mark_order_finished(order_id: str, outcome: str) -> None:
+    """Înregistrează confirmarea/anularea comenzii (nu aruncă excepții)."""
+    timeline = get_order_timeline()
+    if timeline is None:
+        return
+    try:
+        timeline.mark_finished(order_id, outcome)
+    except Exception as e:
+        logger.error(f"❌ Eroare la înregistrarea finalizării comenzii #{order_id}: {e}")
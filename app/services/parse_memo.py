@@ -0,0 +1,201 @@
+"""
+Memo persistent al rezultatelor parsării pentru emailurile re-livrate.
+
+Același email de comandă ajunge de mai multe ori la procesare: după reconectări cât timp
+este încă UNSEEN, după o salvare eșuată sau când restaurantul îl forwardează din nou.
+Comenzile extrase sunt memorate după hash-ul SHA-256 al HTML-ului, astfel încât un duplicat
+costă doar un hash și o căutare. Eșecurile nu sunt memorate: reîncercările carantinei (care le
+rărește deja) și o corectură a parserului reparsează emailul.
+
+Memo-ul este o bază SQLite în DATA_DIR (scrisă de Email Listener, citită și de worker-ii
+API pentru statistici), limitat ca dimensiune totală (LRU) și ca vârstă a intrărilor.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.config import PARSE_MEMO_ENABLED, PARSE_MEMO_FILE, PARSE_MEMO_MAX_AGE, PARSE_MEMO_MAX_BYTES
+from app.logging_config import get_logger
+from app.services.process_local import ProcessLocal
+
+logger = get_logger("parse_memo")
+
+# Schimbă versiunea când formatul rezultatelor parsării se schimbă (invalidează memo-ul);
+# v2: eșecurile memorate de v1 nu mai sunt returnate
+MEMO_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memo (
+    key TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL,
+    outcome TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS memo_last_used ON memo (last_used);
+CREATE INDEX IF NOT EXISTS memo_created ON memo (created);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+COUNTERS = ("hits", "misses", "evictions_age", "evictions_size")
+
+
+def content_key(html_doc: str) -> str:
+    """Cheia memo-ului: hash-ul conținutului emailului (prefixat cu versiunea formatului)."""
+    digest = hashlib.sha256(html_doc.encode('utf-8', 'surrogatepass')).hexdigest()
+    return f"v{MEMO_VERSION}:{digest}"
+
+
+class ParseMemo:
+    """
+    Memo hash conținut -> rezultat al parsării, persistent în SQLite.
+
+    Args:
+        path: Fișierul bazei de date
+        max_bytes: Dimensiunea maximă a rezultatelor păstrate; peste ea sunt eliminate
+            intrările folosite cel mai demult
+        max_age: Vârsta maximă (secunde) a unei intrări
+    """
+
+    def __init__(self, path: Path, max_bytes: int = PARSE_MEMO_MAX_BYTES, max_age: float = PARSE_MEMO_MAX_AGE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._connection = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(str(self.path), timeout=5, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        connection.executemany("INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)",
+                               [(name,) for name in COUNTERS])
+        return connection
+
+    def _increment(self, name: str, amount: int = 1) -> None:
+        self._connection.execute("UPDATE counters SET value = value + ? WHERE name = ?", (amount, name))
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Returnează rezultatul memorat pentru o cheie și actualizează contoarele.
+
+        Returns:
+            {"orders": [...]}, sau None la miss (sau intrare expirată)
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT created, outcome FROM memo WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[0] > self.max_age:
+                self._increment("misses")
+                return None
+            self._connection.execute("UPDATE memo SET last_used = ? WHERE key = ?", (now, key))
+            self._increment("hits")
+        return json.loads(row[1])
+
+    def put(self, key: str, outcome: Dict) -> None:
+        """Memorează rezultatul parsării și aplică limitele de vârstă și dimensiune."""
+        now = time.time()
+        data = json.dumps(outcome, ensure_ascii=False)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO memo (key, created, last_used, size, outcome) VALUES (?, ?, ?, ?, ?)",
+                (key, now, now, len(data), data)
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """Elimină intrările expirate, apoi pe cele folosite cel mai demult peste max_bytes. Apelat cu lock-ul deținut."""
+        expired = self._connection.execute("DELETE FROM memo WHERE created < ?", (now - self.max_age,)).rowcount
+        if expired:
+            self._increment("evictions_age", expired)
+
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM memo").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in self._connection.execute("SELECT key, size FROM memo ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        self._connection.executemany("DELETE FROM memo WHERE key = ?", victims)
+        self._increment("evictions_size", len(victims))
+
+    def stats(self) -> Dict:
+        """Statistici: hits, misses, hit_rate, evicări (vârstă/dimensiune), entries, size_bytes."""
+        with self._lock:
+            counters = dict(self._connection.execute("SELECT name, value FROM counters"))
+            entries, size = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM memo"
+            ).fetchone()
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes
+        }
+
+
+# Instanța globală (creată la prima utilizare, în fiecare proces)
+_parse_memo: ProcessLocal[ParseMemo] = ProcessLocal(
+    lambda: ParseMemo(PARSE_MEMO_FILE),
+    lambda e: logger.warning(f"⚠️  Memo-ul parsării nu poate fi deschis ({e}) - parsez fără memo")
+)
+
+
+def get_parse_memo() -> Optional[ParseMemo]:
+    """Returnează memo-ul global, sau None dacă este dezactivat (PARSE_MEMO_ENABLED) ori indisponibil."""
+    if not PARSE_MEMO_ENABLED:
+        return None
+    return _parse_memo.get()
+
+
+def parse_orders_memoized(html_doc: str) -> Tuple[List[Dict], bool]:
+    """
+    parse_orders cu memo după conținut: un email deja văzut nu mai este parsat.
+
+    Args:
+        html_doc: Conținutul HTML (sau JSON) al emailului
+
+    Returns:
+        (comenzile extrase - listă goală la eșec, True dacă rezultatul vine din memo);
+        un eșec nu este memorat, deci emailul este parsat din nou la următoarea încercare
+    """
+    # Import local: worker-ii API citesc doar statisticile și nu au nevoie de parser
+    from app.services.order_service import parse_orders
+
+    memo = get_parse_memo()
+    if memo is None:
+        return parse_orders(html_doc), False
+
+    key = content_key(html_doc)
+    try:
+        outcome = memo.get(key)
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️  Citire memo eșuată ({e}) - parsez emailul")
+        outcome = None
+    if outcome is not None:
+        return outcome["orders"], True
+
+    orders = parse_orders(html_doc)
+    if not orders:
+        return orders, False
+    try:
+        memo.put(key, {"orders": orders})
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️  Salvare în memo eșuată: {e}")
+    return orders, False
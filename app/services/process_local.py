@@ -0,0 +1,70 @@
+"""
+Instanța globală a unui store SQLite (jurnalul schimbărilor, carantina, rezervările...), câte
+una în fiecare proces.
+
+O conexiune SQLite nu poate fi folosită în procesul copil după fork (worker-ii Gunicorn,
+procesul de ingestie): ProcessLocal creează instanța la prima utilizare și o uită în procesul
+copil, care își deschide propria conexiune.
+"""
+
+import os
+import sqlite3
+import threading
+import weakref
+from typing import Callable, Generic, Optional, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+# Instanțele uitate după fork (WeakSet: nu țin în viață instanțele create de benchmark-uri)
+_process_locals: "weakref.WeakSet[ProcessLocal]" = weakref.WeakSet()
+
+
+class ProcessLocal(Generic[T]):
+    """
+    Instanță creată la prima utilizare, per proces.
+
+    Args:
+        factory: Creează instanța; citește configurația la apel (benchmark-urile o pot schimba)
+        on_error: Apelată cu excepția dacă instanța nu poate fi creată (mesajul din log)
+        errors: Excepțiile care înseamnă "store indisponibil" (get() returnează atunci None);
+            OSError - DATA_DIR nu poate fi creat (volum read-only, permisiuni)
+    """
+
+    def __init__(self, factory: Callable[[], T], on_error: Callable[[Exception], None],
+                 errors: Tuple[Type[Exception], ...] = (sqlite3.Error, OSError)):
+        self._factory = factory
+        self._on_error = on_error
+        self._errors = errors
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+        _process_locals.add(self)
+
+    def get(self) -> Optional[T]:
+        """Instanța procesului, creată la primul apel; None dacă nu poate fi creată."""
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    try:
+                        self._instance = self._factory()
+                    except self._errors as e:
+                        self._on_error(e)
+                        return None
+        return self._instance
+
+    def set(self, instance: Optional[T]) -> None:
+        """Înlocuiește instanța (None: recreată la următorul get())."""
+        self._instance = instance
+
+    def reset(self) -> None:
+        self._instance = None
+        self._lock = threading.Lock()  # Poate fi fost ținut de alt thread la fork
+
+
+def _reset_after_fork() -> None:
+    """Procesul copil nu poate folosi conexiunile părintelui; le redeschide la prima utilizare."""
+    for process_local in list(_process_locals):
+        process_local.reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,293 @@
+"""
+Profilare CPU la cerere, pentru procesul de ingestie (Email Listener, Cleanup, webhook-uri),
+worker-ii API și procesul master Gunicorn.
+
+Cu PROFILING=false (implicit) nu este instalat nimic: niciun handler de semnal, niciun
+middleware, deci niciun cost per request. Cu PROFILING=true:
+
+- Profil prin eșantionare (SamplingProfiler): un thread citește stivele tuturor thread-urilor
+  procesului (sys._current_frames) la fiecare PROFILE_INTERVAL, pentru un timp limitat.
+  Pornit prin POST /api/admin/profil (worker-ul care servește request-ul, ingestia sau master-ul)
+  ori prin semnalul PROFILE_SIGNAL trimis oricărui proces (`kill -PROF <pid>`). Rezultatul
+  este un fișier de stive "collapsed" - o linie "thread;funcție (fișier:linie);... număr" per
+  stivă distinctă - citit direct de flamegraph.pl, speedscope și inferno.
+- cProfile pentru un singur request (ProfilingMiddleware), cu header-ul "X-Profile: 1" și un
+  X-API-Key valid. Rezultatul este un fișier pstats (`python -m pstats`, snakeviz).
+
+Sub gevent, thread-ul de eșantionare este un thread real al sistemului, nu un greenlet: vede
+greenlet-ul care rulează în acel moment în thread-ul principal (cel care consumă CPU).
+"""
+
+import cProfile
+import os
+import re
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.config import (
+    PROFILING, PROFILE_DIR, PROFILE_SIGNAL, PROFILE_SECONDS, PROFILE_MAX_SECONDS, PROFILE_INTERVAL, PROFILE_KEEP
+)
+from app.logging_config import get_logger
+from app.services.io_offload import gevent_active
+
+logger = get_logger("profiler")
+
+# PID-ul procesului master Gunicorn, moștenit de worker-i (vezi register_master)
+MASTER_PID_ENV = "EEATINGH_MASTER_PID"
+
+
+def _original(module: str, name: str):
+    """Funcția originală, nepatch-uită de gevent (thread real, sleep real)."""
+    if gevent_active():
+        from gevent import monkey
+        return monkey.get_original(module, name)
+    return getattr(__import__(module), name)
+
+
+def _timestamp() -> str:
+    return datetime.now().strftime("%Y%m%d-%H%M%S-%f")[:-3]
+
+
+def prune_profiles(directory: Path = PROFILE_DIR, keep: int = PROFILE_KEEP) -> None:
+    """Păstrează doar cele mai noi `keep` fișiere de profil."""
+    try:
+        files = sorted((path for path in directory.iterdir() if path.suffix in (".folded", ".prof")),
+                       key=lambda path: path.stat().st_mtime)
+        for path in files[:-keep] if keep > 0 else files:
+            path.unlink()
+    except OSError as e:
+        logger.warning(f"⚠️ Fișierele de profil vechi nu au putut fi șterse: {e}")
+
+
+class SamplingProfiler:
+    """
+    Profil prin eșantionare al tuturor thread-urilor procesului curent.
+
+    Args:
+        seconds: Durata profilului
+        interval: Secunde între eșantioane
+        output_dir: Directorul fișierului .folded
+    """
+
+    def __init__(self, seconds: float, interval: float = PROFILE_INTERVAL, output_dir: Path = PROFILE_DIR):
+        self.seconds = seconds
+        self.interval = interval
+        self.path = output_dir / f"sample-{os.getpid()}-{_timestamp()}.folded"
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._labels: Dict[object, str] = {}
+        self._stopped = False
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})".replace(";", ",")
+            self._labels[code] = label
+        return label
+
+    def sample(self, own_thread: Optional[int] = None) -> None:
+        """Un eșantion: stiva curentă a fiecărui thread (în afară de `own_thread`)."""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_thread:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}").replace(";", ",").replace(" ", "_"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def run(self) -> None:
+        """Eșantionează până la expirarea duratei (sau stop()), apoi scrie fișierul."""
+        sleep = _original("time", "sleep")
+        own_thread = _original("_thread", "get_ident")()
+        logger.info(f"🔬 Profil prin eșantionare pornit: {self.seconds:g} s, proces {os.getpid()}")
+        deadline = time.monotonic() + self.seconds
+        try:
+            while not self._stopped and time.monotonic() < deadline:
+                self.sample(own_thread)
+                sleep(self.interval)
+            self.write()
+        except Exception as e:
+            logger.error(f"❌ Eroare la profilarea procesului {os.getpid()}: {e}", exc_info=True)
+        finally:
+            _finished(self)
+
+    def stop(self) -> None:
+        self._stopped = True
+
+    def write(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        prune_profiles(self.path.parent)
+        logger.info(f"🔬 Profil scris: {self.path} ({self.samples} eșantioane)")
+        top = Counter()
+        for stack, count in self.stacks.items():
+            top[stack.rsplit(";", 1)[-1]] += count
+        total = sum(top.values()) or 1
+        for label, count in top.most_common(5):
+            logger.info(f"🔬   {count / total:6.1%} {label}")
+
+
+# Profilul prin eșantionare activ în procesul curent (unul singur)
+_active: Optional[SamplingProfiler] = None
+# Lock real (nu gevent): este folosit și din thread-ul profilului
+_active_lock = _original("_thread", "allocate_lock")()
+
+
+def start_sampling(seconds: Optional[float] = None, output_dir: Optional[Path] = None) -> Optional[SamplingProfiler]:
+    """
+    Pornește un profil prin eșantionare al procesului curent.
+
+    Args:
+        seconds: Durata (implicit PROFILE_SECONDS, limitată la PROFILE_MAX_SECONDS)
+        output_dir: Directorul fișierului .folded (implicit PROFILE_DIR)
+
+    Returns:
+        Profilul pornit, sau None dacă unul rulează deja
+    """
+    global _active
+
+    seconds = min(max(seconds or PROFILE_SECONDS, PROFILE_INTERVAL), PROFILE_MAX_SECONDS)
+    # Fără blocare: poate fi apelată dintr-un handler de semnal care a întrerupt chiar această funcție
+    if not _active_lock.acquire(blocking=False):
+        return None
+    try:
+        if _active is not None:
+            return None
+        _active = profiler = SamplingProfiler(seconds, output_dir=output_dir or PROFILE_DIR)
+    finally:
+        _active_lock.release()
+    _original("_thread", "start_new_thread")(profiler.run, ())
+    return profiler
+
+
+def _finished(profiler: SamplingProfiler) -> None:
+    global _active
+    with _active_lock:
+        if _active is profiler:
+            _active = None
+
+
+def active_profile() -> Optional[SamplingProfiler]:
+    """Profilul prin eșantionare în curs în procesul curent, sau None."""
+    return _active
+
+
+def _on_signal(signum, frame) -> None:
+    # Nu loghează aici: thread-ul principal poate fi fost întrerupt în timp ce ținea un lock
+    # de logging; mesajele sunt scrise de thread-ul profilului
+    start_sampling()
+
+
+def install_signal_handler() -> bool:
+    """
+    PROFILE_SIGNAL pornește un profil prin eșantionare în procesul care îl primește.
+    Trebuie apelată din thread-ul principal; fără efect dacă PROFILING este dezactivat.
+    """
+    signum = getattr(signal, PROFILE_SIGNAL, None)
+    if not PROFILING or signum is None:
+        return False
+    try:
+        signal.signal(signum, _on_signal)
+    except ValueError:  # Nu din thread-ul principal
+        return False
+    return True
+
+
+def register_master() -> None:
+    """
+    Apelată în procesul master Gunicorn, înainte de crearea worker-ilor: instalează handler-ul
+    de semnal și publică PID-ul master-ului către worker-i (POST /api/admin/profil?proces=master).
+    """
+    if install_signal_handler():
+        os.environ[MASTER_PID_ENV] = str(os.getpid())
+        logger.info(f"🔬 Profilare la cerere activă: kill -{PROFILE_SIGNAL[3:]} {os.getpid()} (master) "
+                    f"sau POST /api/admin/profil")
+
+
+def master_pid() -> Optional[int]:
+    """PID-ul procesului master Gunicorn, sau None în afara Gunicorn."""
+    value = os.environ.get(MASTER_PID_ENV, "")
+    return int(value) if value.isdigit() and int(value) != os.getpid() else None
+
+
+def signal_process(pid: int) -> None:
+    """Pornește un profil (PROFILE_SECONDS) în alt proces al aplicației."""
+    os.kill(pid, getattr(signal, PROFILE_SIGNAL))
+
+
+class ProfilingMiddleware:
+    """
+    Middleware WSGI: request-urile cu "X-Profile: 1" și X-API-Key valid rulează sub cProfile,
+    iar răspunsul primește header-ul X-Profile-File cu numele fișierului .prof.
+
+    Fără API_KEY configurat, header-ul este ignorat (profilarea nu este disponibilă anonim).
+
+    Args:
+        app: Aplicația WSGI
+        api_key: Cheia API cerută
+        output_dir: Directorul fișierelor .prof
+    """
+
+    def __init__(self, app, api_key: Optional[str], output_dir: Path = PROFILE_DIR):
+        self.app = app
+        self.api_key = api_key
+        self.output_dir = output_dir
+
+    def __call__(self, environ, start_response):
+        if environ.get("HTTP_X_PROFILE") != "1" or not self.api_key or environ.get("HTTP_X_API_KEY") != self.api_key:
+            return self.app(environ, start_response)
+
+        route = re.sub(r"[^A-Za-z0-9]+", "_", environ.get("PATH_INFO", "")).strip("_") or "root"
+        path = self.output_dir / f"request-{os.getpid()}-{_timestamp()}-{environ.get('REQUEST_METHOD', '')}-{route}.prof"
+
+        def profiled_start_response(status, headers, exc_info=None):
+            headers.append(("X-Profile-File", path.name))
+            return start_response(status, headers, exc_info)
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:  # Alt profiler activ (ex. un request profilat în paralel, Python 3.12+)
+            logger.warning(f"⚠️ Request-ul nu poate fi profilat: {e}")
+            return self.app(environ, start_response)
+        try:
+            response = self.app(environ, profiled_start_response)
+            try:
+                body = list(response)  # Corpul răspunsului este generat tot sub profil
+            finally:
+                if hasattr(response, "close"):
+                    response.close()
+        finally:
+            profile.disable()
+
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            profile.dump_stats(str(path))
+            prune_profiles(self.output_dir)
+            logger.info(f"🔬 Request profilat: {environ.get('REQUEST_METHOD')} {environ.get('PATH_INFO')} -> {path}")
+        except OSError as e:
+            logger.error(f"❌ Profilul request-ului nu a putut fi scris: {e}")
+        return body
+
+
+def _reset_after_fork() -> None:
+    """Thread-ul profilului nu există în procesul copil."""
+    global _active, _active_lock
+    _active = None
+    _active_lock = _original("_thread", "allocate_lock")()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,243 @@
+"""
+Carantină pentru emailurile care nu pot fi procesate (poison messages).
+
+Un email eșuat (fără HTML, parsare sau salvare eșuată) este înregistrat cu motivul
+eșecului și reîncercat cu backoff exponențial (QUARANTINE_BASE_DELAY, dublat la fiecare
+încercare, maxim QUARANTINE_MAX_DELAY). Până la următoarea reîncercare, emailul este
+sărit fără fetch și fără parsare, chiar dacă rămâne UNSEEN în inbox. După
+QUARANTINE_MAX_ATTEMPTS încercări, emailul brut (.eml) și detaliile eșecului (.json) sunt
+mutate în COMENZI_DEAD_LETTER, de unde pot fi listate și reprocesate prin API.
+
+Starea reîncercărilor este o bază SQLite în DATA_DIR, partajată de Email Listener și
+worker-ii API.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.config import (
+    COMENZI_DEAD_LETTER, QUARANTINE_FILE, QUARANTINE_MAX_ATTEMPTS,
+    QUARANTINE_BASE_DELAY, QUARANTINE_MAX_DELAY
+)
+from app.logging_config import get_logger
+from app.services.process_local import ProcessLocal
+
+logger = get_logger("quarantine")
+
+STATE_RETRY = "retry"
+STATE_DEAD = "dead"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    key TEXT PRIMARY KEY,
+    uid INTEGER,
+    subject TEXT,
+    reason TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    first_failed REAL NOT NULL,
+    last_failed REAL NOT NULL,
+    next_retry REAL NOT NULL,
+    state TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_uid ON messages (uid);
+CREATE INDEX IF NOT EXISTS messages_next_retry ON messages (state, next_retry);
+"""
+
+
+def message_key(msg, raw_email: bytes) -> str:
+    """Identitatea unui email: Message-ID, sau hash-ul conținutului brut dacă lipsește."""
+    message_id = (msg.get('Message-ID') or '').strip() if msg is not None else ''
+    if message_id:
+        return message_id
+    return "sha256:" + hashlib.sha256(raw_email).hexdigest()
+
+
+def dead_letter_id(key: str) -> str:
+    """Numele fișierelor din dead-letter (sigur pentru sistemul de fișiere)."""
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def _format_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Quarantine:
+    """
+    Evidența emailurilor eșuate: backoff exponențial, apoi dead-letter.
+
+    Args:
+        path: Fișierul bazei de date
+        dead_letter_dir: Folderul în care sunt parcate emailurile abandonate
+        max_attempts: Încercări înainte de dead-letter
+        base_delay: Pauza după primul eșec (secunde), dublată la fiecare eșec
+        max_delay: Pauza maximă între reîncercări (secunde)
+    """
+
+    def __init__(self, path: Path, dead_letter_dir: Path = COMENZI_DEAD_LETTER,
+                 max_attempts: int = QUARANTINE_MAX_ATTEMPTS, base_delay: float = QUARANTINE_BASE_DELAY,
+                 max_delay: float = QUARANTINE_MAX_DELAY):
+        self.path = path
+        self.dead_letter_dir = dead_letter_dir
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(path), timeout=5, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+
+    def retry_delay(self, attempts: int) -> float:
+        """Pauza până la următoarea încercare după `attempts` eșecuri."""
+        return min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+
+    def is_blocked(self, uid: Optional[int] = None, key: Optional[str] = None) -> bool:
+        """
+        True dacă emailul nu trebuie procesat acum: este în pauză de backoff sau în dead-letter.
+
+        Args:
+            uid: UID-ul IMAP (verificare înainte de fetch)
+            key: Identitatea emailului (message_key), după fetch
+        """
+        now = time.time()
+        with self._lock:
+            if key is not None:
+                row = self._connection.execute(
+                    "SELECT state, next_retry FROM messages WHERE key = ?", (key,)
+                ).fetchone()
+            else:
+                row = self._connection.execute(
+                    "SELECT state, next_retry FROM messages WHERE uid = ? ORDER BY last_failed DESC LIMIT 1", (uid,)
+                ).fetchone()
+        if row is None:
+            return False
+        state, next_retry = row
+        return state == STATE_DEAD or next_retry > now
+
+    def record_failure(self, key: str, uid: Optional[int], reason: str,
+                       raw_email: Optional[bytes] = None, subject: str = "") -> Dict:
+        """
+        Înregistrează un eșec și programează reîncercarea (sau mută emailul în dead-letter).
+
+        Returns:
+            Înregistrarea actualizată: attempts, state, next_retry, reason
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT attempts, first_failed FROM messages WHERE key = ?", (key,)
+            ).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            first_failed = row[1] if row else now
+
+            state = STATE_DEAD if attempts >= self.max_attempts else STATE_RETRY
+            next_retry = now + self.retry_delay(attempts)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO messages "
+                "(key, uid, subject, reason, attempts, first_failed, last_failed, next_retry, state) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, uid, subject, reason, attempts, first_failed, now, next_retry, state)
+            )
+
+        record = {
+            "key": key, "uid": uid, "subject": subject, "reason": reason, "attempts": attempts,
+            "first_failed": _format_time(first_failed), "last_failed": _format_time(now),
+            "next_retry": _format_time(next_retry) if state == STATE_RETRY else None, "state": state
+        }
+        if state == STATE_DEAD:
+            self._write_dead_letter(record, raw_email)
+            logger.error(f"☠️  Email {key} mutat în dead-letter după {attempts} încercări: {reason}")
+        else:
+            logger.warning(f"🔒 Email {key} în carantină (încercarea {attempts}/{self.max_attempts}): "
+                           f"{reason} - reîncerc după {self.retry_delay(attempts):.0f}s")
+        return record
+
+    def _write_dead_letter(self, record: Dict, raw_email: Optional[bytes]) -> None:
+        """Scrie emailul brut (.eml) și detaliile eșecului (.json) în folderul dead-letter."""
+        try:
+            self.dead_letter_dir.mkdir(parents=True, exist_ok=True)
+            name = dead_letter_id(record["key"])
+            if raw_email is not None:
+                (self.dead_letter_dir / f"{name}.eml").write_bytes(raw_email)
+            with open(self.dead_letter_dir / f"{name}.json", 'w', encoding='utf-8') as f:
+                json.dump({"id": name, **record}, f, indent=4, ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"❌ Eroare la scrierea în dead-letter: {e}", exc_info=True)
+
+    def resolve(self, key: str) -> None:
+        """Șterge evidența unui email procesat cu succes (după reîncercare sau reprocesare)."""
+        with self._lock:
+            self._connection.execute("DELETE FROM messages WHERE key = ?", (key,))
+
+    def due_uids(self) -> List[int]:
+        """UID-urile emailurilor în carantină a căror pauză de backoff a expirat."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT uid FROM messages WHERE state = ? AND next_retry <= ? AND uid IS NOT NULL ORDER BY next_retry",
+                (STATE_RETRY, time.time())
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def pending(self) -> List[Dict]:
+        """Emailurile aflate încă în reîncercare."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT key, uid, subject, reason, attempts, first_failed, last_failed, next_retry "
+                "FROM messages WHERE state = ? ORDER BY first_failed", (STATE_RETRY,)
+            ).fetchall()
+        return [{
+            "key": key, "uid": uid, "subject": subject, "reason": reason, "attempts": attempts,
+            "first_failed": _format_time(first_failed), "last_failed": _format_time(last_failed),
+            "next_retry": _format_time(next_retry)
+        } for key, uid, subject, reason, attempts, first_failed, last_failed, next_retry in rows]
+
+    def dead_letters(self) -> List[Dict]:
+        """Emailurile din dead-letter (detaliile din fișierele .json), cele mai vechi primele."""
+        letters = []
+        if not self.dead_letter_dir.exists():
+            return letters
+        for path in sorted(self.dead_letter_dir.glob("*.json")):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    letters.append(json.load(f))
+            except Exception as e:
+                logger.error(f"Eroare la citirea {path.name}: {e}")
+        letters.sort(key=lambda letter: letter.get("first_failed", ""))
+        return letters
+
+    def load_dead_letter(self, letter_id: str) -> Optional[Dict]:
+        """Detaliile și emailul brut al unei intrări din dead-letter (None dacă nu există)."""
+        if not letter_id.isalnum():
+            return None
+        meta_path = self.dead_letter_dir / f"{letter_id}.json"
+        eml_path = self.dead_letter_dir / f"{letter_id}.eml"
+        if not meta_path.exists() or not eml_path.exists():
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            letter = json.load(f)
+        letter["raw_email"] = eml_path.read_bytes()
+        return letter
+
+    def remove_dead_letter(self, letter_id: str, key: str) -> None:
+        """Șterge o intrare reprocesată cu succes din dead-letter și din evidență."""
+        for suffix in (".eml", ".json"):
+            (self.dead_letter_dir / f"{letter_id}{suffix}").unlink(missing_ok=True)
+        self.resolve(key)
+
+
+# Instanța globală (creată la prima utilizare, în fiecare proces)
+_quarantine: ProcessLocal[Quarantine] = ProcessLocal(
+    lambda: Quarantine(QUARANTINE_FILE),
+    lambda e: logger.warning(f"⚠️  Carantina nu poate fi deschisă ({e}) - emailurile eșuate vor fi reîncercate imediat")
+)
+
+
+def get_quarantine() -> Optional[Quarantine]:
+    """Returnează carantina globală, sau None dacă baza de date nu poate fi deschisă."""
+    return _quarantine.get()
@@ -0,0 +1,211 @@
+"""
+Rate limiter partajat de worker-ii Gunicorn (token bucket într-un fișier mmap).
+
+Flask-Limiter cu storage "memory://" ținea contoarele în fiecare worker, deci limita
+efectivă era API_RATE_LIMIT × numărul de worker-i. Aici bucket-urile sunt sloturi de
+dimensiune fixă într-un fișier mapat în memorie (MAP_SHARED) de toate procesele:
+
+    header (64 B) | slot 0 | slot 1 | ...      slot = (hash client, jetoane, ultima actualizare)
+
+Un client este căutat prin open addressing (PROBE_LIMIT sloturi de la hash % slots).
+Fiecare actualizare blochează doar slotul ei: un lock fcntl pe intervalul de octeți al
+slotului (între procese) plus un lock dintr-un set de lock-uri de thread (în proces, unde
+lock-urile fcntl nu se exclud). Costul per request este de ordinul microsecundelor și nu
+implică alte procese, iar limita este exactă indiferent de numărul de worker-i.
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # pragma: no cover - depinde de mediul de rulare (Windows)
+    FCNTL_AVAILABLE = False
+
+from app.config import API_RATE_LIMIT, API_RATE_LIMIT_QUOTAS, API_RATE_LIMIT_FILE, API_RATE_LIMIT_SLOTS
+from app.logging_config import get_logger
+
+logger = get_logger("rate_limiter")
+
+MAGIC = b"EERATE01"
+HEADER = struct.Struct("<8sI")  # magic, număr de sloturi
+HEADER_SIZE = 64
+SLOT = struct.Struct("<Qdd")  # hash client (0 = liber), jetoane, ultima actualizare (time.time)
+SLOT_SIZE = 32
+PROBE_LIMIT = 8
+LOCK_STRIPES = 64
+
+LIMIT_PATTERN = re.compile(r'^\s*(\d+)\s*(?:/|per)\s*(\d+)?\s*(second|minute|hour|day)s?\s*$', re.IGNORECASE)
+UNIT_SECONDS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_limit(limit: str) -> Tuple[int, float]:
+    """
+    Parsează o limită în formatul Flask-Limiter ("100/minute", "100 per minute", "5/10 seconds").
+
+    Returns:
+        (capacitatea bucket-ului, perioada în care se reumple complet, în secunde)
+
+    Raises:
+        ValueError: Format invalid
+    """
+    match = LIMIT_PATTERN.match(limit)
+    if match is None:
+        raise ValueError(f"Limită invalidă: {limit!r}")
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * UNIT_SECONDS[unit.lower()]
+
+
+def _client_hash(client: str) -> int:
+    """Hash-ul de 64 de biți al clientului (0 este rezervat pentru sloturile libere)."""
+    return int.from_bytes(hashlib.blake2b(client.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+
+class SharedRateLimiter:
+    """
+    Token bucket per client, partajat între procese printr-un fișier mmap.
+
+    Args:
+        path: Fișierul tabelului
+        slots: Numărul de sloturi (clienți urmăriți simultan)
+        default_limit: Limita implicită ("100/minute")
+        quotas: Limite individuale per client (terminal sau IP)
+    """
+
+    def __init__(self, path: Path, slots: int = API_RATE_LIMIT_SLOTS, default_limit: str = API_RATE_LIMIT,
+                 quotas: Optional[Dict[str, str]] = None):
+        self.path = path
+        self.slots = slots
+        self.default_limit = parse_limit(default_limit)
+        self.quotas = {client: parse_limit(limit) for client, limit in (quotas or {}).items()}
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        size = HEADER_SIZE + slots * SLOT_SIZE
+        self._fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self._initialize(size)
+            self._mmap = mmap.mmap(self._fd, size)
+        except Exception:
+            os.close(self._fd)
+            raise
+
+    def _initialize(self, size: int) -> None:
+        """Creează (sau recreează, dacă formatul diferă) tabelul, sub lock exclusiv pe tot fișierul."""
+        if FCNTL_AVAILABLE:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(self._fd, HEADER.size, 0)
+            if os.fstat(self._fd).st_size != size or header != HEADER.pack(MAGIC, self.slots):
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, HEADER.pack(MAGIC, self.slots), 0)
+        finally:
+            if FCNTL_AVAILABLE:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def limit_for(self, client: str) -> Tuple[int, float]:
+        """(capacitate, perioadă) pentru client: cota individuală sau limita implicită."""
+        identity = client.split(":", 1)[-1]
+        return self.quotas.get(identity, self.default_limit)
+
+    def acquire(self, client: str, cost: int = 1) -> Tuple[bool, float]:
+        """
+        Consumă `cost` jetoane din bucket-ul clientului.
+
+        Args:
+            client: Identitatea clientului ("terminal:pos-1", "ip:10.0.0.7")
+            cost: Jetoane consumate de request
+
+        Returns:
+            (True dacă request-ul este permis, secunde până la următorul jeton dacă nu)
+        """
+        capacity, period = self.limit_for(client)
+        key = _client_hash(client)
+        start = key % self.slots
+        victim = None
+        victim_updated = float('inf')
+
+        for probe in range(PROBE_LIMIT):
+            index = (start + probe) % self.slots
+            slot_key, _, updated = SLOT.unpack_from(self._mmap, HEADER_SIZE + index * SLOT_SIZE)
+            if slot_key not in (key, 0):
+                if updated < victim_updated:
+                    victim, victim_updated = index, updated
+                continue
+            result = self._take(index, key, capacity, period, cost, replace=False)
+            if result is not None:
+                return result
+
+        # Toate sloturile încercate sunt ocupate de alți clienți: îl înlocuim pe cel mai vechi
+        return self._take(start if victim is None else victim, key, capacity, period, cost, replace=True)
+
+    def _take(self, index: int, key: int, capacity: int, period: float, cost: int,
+              replace: bool) -> Optional[Tuple[bool, float]]:
+        """Actualizează bucket-ul din slot sub lock; None dacă slotul a fost ocupat între timp de alt client."""
+        offset = HEADER_SIZE + index * SLOT_SIZE
+        stripe = self._stripes[index % LOCK_STRIPES]
+        with stripe:
+            if FCNTL_AVAILABLE:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, SLOT_SIZE, offset)
+            try:
+                slot_key, tokens, updated = SLOT.unpack_from(self._mmap, offset)
+                now = time.time()
+                if slot_key == key:
+                    tokens = min(capacity, tokens + max(0.0, now - updated) * capacity / period)
+                elif slot_key == 0 or replace:
+                    tokens = float(capacity)
+                else:
+                    return None
+
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                SLOT.pack_into(self._mmap, offset, key, tokens, now)
+            finally:
+                if FCNTL_AVAILABLE:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, SLOT_SIZE, offset)
+        return allowed, 0.0 if allowed else (cost - tokens) * period / capacity
+
+    def close(self) -> None:
+        self._mmap.close()
+        os.close(self._fd)
+
+
+# Instanța globală (creată la prima utilizare, în fiecare proces)
+_rate_limiter: Optional[SharedRateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> Optional[SharedRateLimiter]:
+    """Returnează rate limiter-ul procesului, sau None dacă tabelul nu poate fi deschis (fără limitare)."""
+    global _rate_limiter
+
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                try:
+                    _rate_limiter = SharedRateLimiter(API_RATE_LIMIT_FILE, quotas=API_RATE_LIMIT_QUOTAS)
+                except (OSError, ValueError) as e:
+                    logger.error(f"❌ Rate limiter-ul nu poate fi inițializat ({e}) - request-urile nu sunt limitate")
+                    return None
+    return _rate_limiter
+
+
+def _reset_after_fork() -> None:
+    """Lock-urile de thread nu sunt moștenite în siguranță; mapping-ul este redeschis în procesul copil."""
+    global _rate_limiter, _rate_limiter_lock
+    _rate_limiter = None
+    _rate_limiter_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,183 @@
+"""
+Cache de șabloane pentru emailurile de comandă.
+
+Emailurile Eeatingh provin din câteva șabloane. Pentru fiecare email se calculează o
+amprentă structurală din index (secvența de tag-uri, cu rândurile de produse comprimate),
+iar după o parsare completă se memorează căile nodurilor găsite de euristici. Un email
+cu aceeași amprentă sare direct la acele noduri; euristicile complete rulează doar la cache miss sau dacă validarea nodurilor eșuează.
+
+Cache-ul este limitat (LRU) și persistat ca JSON în DATA_DIR.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.config import (
+    TEMPLATE_CACHE_ENABLED, TEMPLATE_CACHE_FILE,
+    TEMPLATE_CACHE_MAX_ENTRIES, TEMPLATE_CACHE_SAVE_INTERVAL
+)
+from app.logging_config import get_logger
+from app.services.order_index import DocumentIndex
+
+logger = get_logger("template_cache")
+
+# Rândurile de produse (3 celule) sunt înlocuite cu un marcaj, iar rândurile consecutive
+# sunt comprimate - numărul de produse nu schimbă șablonul
+PRODUCT_ROW = 'tr td td td '
+PRODUCT_ROWS_PATTERN = re.compile(r'\|+')
+
+CACHE_VERSION = 1
+
+
+def template_fingerprint(index: DocumentIndex) -> str:
+    """
+    Calculează amprenta structurală a unui email din indexul documentului.
+
+    Args:
+        index: Indexul documentului (căile nodurilor depind de motorul care l-a construit)
+
+    Returns:
+        Hash-ul SHA-1 al secvenței de tag-uri
+    """
+    skeleton = (' '.join(index.tags) + ' ').replace(PRODUCT_ROW, '|')
+    skeleton = PRODUCT_ROWS_PATTERN.sub('products ', skeleton)
+    return hashlib.sha1(skeleton.encode('utf-8')).hexdigest()
+
+
+class TemplateCache:
+    """
+    Cache LRU persistent: amprentă șablon -> căile nodurilor pentru fiecare câmp.
+
+    Args:
+        path: Fișierul JSON în care este salvat cache-ul
+        max_entries: Numărul maxim de șabloane păstrate
+        save_interval: Salvează ordinea LRU și statisticile la fiecare N căutări
+    """
+
+    def __init__(self, path: Path, max_entries: int = TEMPLATE_CACHE_MAX_ENTRIES,
+                 save_interval: int = TEMPLATE_CACHE_SAVE_INTERVAL):
+        self.path = path
+        self.max_entries = max_entries
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "validation_failures": 0, "evictions": 0}
+        self._lookups_since_save = 0
+        self._load()
+
+    def _load(self) -> None:
+        """Încarcă cache-ul de pe disc (un fișier lipsă sau corupt înseamnă cache gol)."""
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION:
+                logger.info("Cache de șabloane cu versiune veche - pornesc cu cache gol")
+                return
+            for key, paths in data.get("entries", []):
+                self._entries[key] = paths
+            self._stats.update(data.get("stats", {}))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            logger.info(f"📐 Cache de șabloane încărcat: {len(self._entries)} șabloane")
+        except Exception as e:
+            logger.warning(f"⚠️  Nu am putut încărca cache-ul de șabloane ({e}) - pornesc cu cache gol")
+            self._entries.clear()
+
+    def _save(self) -> None:
+        """Scrie cache-ul atomic (fișier temporar + rename). Apelat cu lock-ul deținut."""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            data = {
+                "version": CACHE_VERSION,
+                "entries": list(self._entries.items()),
+                "stats": self._stats
+            }
+            tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                # json.dumps folosește encoderul C (json.dump scrie incremental, mult mai lent)
+                f.write(json.dumps(data))
+            os.replace(tmp_path, self.path)
+            self._lookups_since_save = 0
+        except Exception as e:
+            logger.warning(f"⚠️  Nu am putut salva cache-ul de șabloane: {e}")
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Returnează căile învățate pentru un șablon și actualizează statisticile.
+
+        Args:
+            key: Amprenta șablonului (prefixată cu motorul de parsare)
+
+        Returns:
+            Dicționarul câmp -> cale, sau None la cache miss
+        """
+        with self._lock:
+            paths = self._entries.get(key)
+            if paths is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+            else:
+                self._stats["misses"] += 1
+
+            self._lookups_since_save += 1
+            if self._lookups_since_save >= self.save_interval:
+                self._save()
+                stats = self._stats_locked()
+                logger.info(f"📐 Cache șabloane: rată hit {stats['hit_rate']:.1%} "
+                            f"({stats['hits']} hit / {stats['misses']} miss, "
+                            f"{stats['validation_failures']} validări eșuate, {stats['entries']} șabloane)")
+            return paths
+
+    def learn(self, key: str, paths: Dict) -> None:
+        """Memorează căile nodurilor pentru un șablon, după o parsare completă."""
+        with self._lock:
+            self._entries[key] = paths
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+            self._save()
+
+    def record_validation_failure(self, key: str) -> None:
+        """Înregistrează un hit ale cărui noduri nu au trecut validarea (șablonul este reînvățat)."""
+        with self._lock:
+            self._stats["validation_failures"] += 1
+
+    def _stats_locked(self) -> Dict:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+            "entries": len(self._entries)
+        }
+
+    def stats(self) -> Dict:
+        """Statistici: hits, misses, hit_rate, validation_failures, evictions, entries."""
+        with self._lock:
+            return self._stats_locked()
+
+
+# Instanța globală (creată la prima utilizare)
+_template_cache: Optional[TemplateCache] = None
+_template_cache_lock = threading.Lock()
+
+
+def get_template_cache() -> Optional[TemplateCache]:
+    """Returnează cache-ul global de șabloane, sau None dacă este dezactivat (TEMPLATE_CACHE_ENABLED)."""
+    global _template_cache
+
+    if not TEMPLATE_CACHE_ENABLED:
+        return None
+    if _template_cache is None:
+        with _template_cache_lock:
+            if _template_cache is None:
+                _template_cache = TemplateCache(TEMPLATE_CACHE_FILE)
+    return _template_cache
@@ -0,0 +1,292 @@
+"""
+Trasare per comandă: span-uri cu durate, corelate printr-un trace ID.
+
+Un trace începe în EmailListener.process_new_email și conține fetch-ul IMAP, parsarea și
+salvarea comenzilor. Trace ID-ul este păstrat în order_timeline alături de comandă, iar
+request-urile API ulterioare pentru acea comandă (GET /api/comenzi, POST confirmare) își
+scriu span-urile în același trace și primesc header-ul X-Trace-Id. Cât timp un trace este
+activ, liniile de log ale thread-ului curent sunt prefixate cu ID-ul lui.
+
+Trace-ul curent este ținut într-un ContextVar (separat per thread și per greenlet). Fiecare
+span terminat devine o linie JSON compactă în TRACE_FILE, scrisă printr-un singur os.write
+în modul append, deci procesul de ingestie și worker-ii API pot scrie în același fișier:
+
+    {"t": trace, "s": span, "p": părinte, "n": nume, "ts": început, "ms": durată, "pid": proces, "a": {...}}
+
+`python trace_waterfall.py <id_comanda>` afișează span-urile unei comenzi ca waterfall.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # pragma: no cover - depinde de mediul de rulare (Windows)
+    FCNTL_AVAILABLE = False
+
+from app.config import TRACING, TRACE_FILE, TRACE_MAX_BYTES
+from app.logging_config import get_logger, trace_context as _current
+
+
+def new_id() -> str:
+    """Un ID aleator de 16 caractere hex."""
+    return os.urandom(8).hex()
+
+
+def current_trace_id() -> Optional[str]:
+    """ID-ul trace-ului activ în contextul curent, sau None."""
+    current = _current.get()
+    return current[0] if current is not None else None
+
+
+def _warn(message: str) -> None:
+    # Logger obținut la nevoie: logging_config este importat înainte de initialize_logging()
+    get_logger("tracing").warning(message)
+
+
+class TraceWriter:
+    """
+    Fișierul de trace-uri, partajat între procese.
+
+    Args:
+        path: Fișierul JSON lines
+        max_bytes: Dimensiunea peste care fișierul este mutat în <path>.1
+    """
+
+    def __init__(self, path: Path, max_bytes: int = TRACE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._inode = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _open(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(str(self.path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._inode = os.fstat(self._fd).st_ino
+
+    def write(self, record: Dict) -> None:
+        line = (json.dumps(record, separators=(",", ":"), ensure_ascii=False, default=str) + "\n").encode('utf-8')
+        with self._lock:
+            try:
+                inode = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                inode = None
+            if self._fd is None or inode != self._inode:
+                self._open()  # Prima scriere, sau fișierul a fost mutat de alt proces
+            os.write(self._fd, line)
+            if os.fstat(self._fd).st_size >= self.max_bytes:
+                self._rotate()
+
+    def _rotate(self) -> None:
+        """Mută fișierul în <path>.1 (sub un lock între procese) și deschide unul nou."""
+        with open(f"{self.path}.lock", 'a') as lock:
+            if FCNTL_AVAILABLE:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            # Alt proces poate fi rotit fișierul cât am așteptat lock-ul
+            if os.stat(self.path).st_ino == self._inode:
+                os.replace(self.path, f"{self.path}.1")
+            self._open()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+class Span:
+    """
+    Un span: `with` îl activează în contextul curent și îl scrie la ieșire.
+
+    Un span fără trace ID explicit este copilul span-ului activ; dacă niciun trace nu este
+    activ (sau TRACING este dezactivat), nu înregistrează nimic.
+    """
+
+    __slots__ = ("name", "attrs", "trace_id", "span_id", "parent_id", "_token", "_started", "_perf")
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, attrs: Optional[Dict] = None):
+        self.name = name
+        self.attrs = attrs
+        self.trace_id = trace_id
+        self.span_id = None
+        self.parent_id = None
+
+    def __enter__(self) -> "Span":
+        current = _current.get()
+        if self.trace_id is None:
+            if current is None:
+                return self
+            self.trace_id, self.parent_id = current
+        elif current is not None and current[0] == self.trace_id:
+            self.parent_id = current[1]
+        self.span_id = new_id()
+        self._token = _current.set((self.trace_id, self.span_id))
+        self._started = time.time()
+        self._perf = time.perf_counter()
+        return self
+
+    def set(self, **attrs) -> None:
+        """Adaugă atribute span-ului (ex. ID-urile comenzilor, aflate pe parcurs)."""
+        if self.span_id is not None:
+            self.attrs = dict(self.attrs or {}, **attrs)
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if self.span_id is None:
+            return False
+        duration = time.perf_counter() - self._perf
+        _current.reset(self._token)
+        self.span_id, span_id = None, self.span_id
+        if exc_type is not None:
+            self.set(error=exc_type.__name__)
+        record = {"t": self.trace_id, "s": span_id, "p": self.parent_id, "n": self.name,
+                  "ts": round(self._started, 6), "ms": round(duration * 1000, 3), "pid": os.getpid()}
+        if self.attrs:
+            record["a"] = self.attrs
+        writer = get_trace_writer()
+        if writer is not None:
+            try:
+                writer.write(record)
+            except OSError as e:
+                _warn(f"⚠️ Span-ul {self.name} nu a putut fi scris: {e}")
+        return False
+
+
+def span(name: str, **attrs) -> Span:
+    """Un span copil al span-ului activ (fără efect în afara unui trace)."""
+    return Span(name, None, attrs)
+
+
+def traced(name: str, attrs: Optional[Callable[..., Dict]] = None, root: bool = False):
+    """
+    Decorator: apelul funcției devine un span copil al span-ului activ.
+
+    Args:
+        name: Numele span-ului
+        attrs: Funcție care primește argumentele apelului și returnează atributele span-ului
+        root: În afara unui trace, apelul începe un trace nou (altfel nu este înregistrat)
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None and not (root and TRACING):
+                return func(*args, **kwargs)
+            trace_id = new_id() if _current.get() is None else None
+            with Span(name, trace_id, attrs(*args, **kwargs) if attrs is not None else None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_trace(name: str, trace_id: Optional[str] = None, **attrs) -> Span:
+    """
+    Span-ul rădăcină al unui trace nou, sau al unui trace existent (ex. un request API pentru
+    o comandă, cu trace ID-ul păstrat la ingestie).
+    """
+    if not TRACING:
+        return Span(name, None, attrs)  # Niciun trace activ: span fără efect
+    return Span(name, trace_id or new_id(), attrs)
+
+
+# Instanța globală (creată la prima utilizare, în fiecare proces)
+_trace_writer: Optional[TraceWriter] = None
+_trace_writer_lock = threading.Lock()
+
+
+def get_trace_writer() -> Optional[TraceWriter]:
+    """Returnează fișierul de trace-uri global, sau None dacă nu poate fi creat."""
+    global _trace_writer
+
+    if _trace_writer is None:
+        with _trace_writer_lock:
+            if _trace_writer is None:
+                try:
+                    _trace_writer = TraceWriter(TRACE_FILE)
+                except OSError as e:
+                    _warn(f"❌ Fișierul de trace-uri nu poate fi creat ({e})")
+                    return None
+    return _trace_writer
+
+
+def _reset_after_fork() -> None:
+    """Procesul copil își deschide propriul descriptor (lock-ul poate fi fost ținut la fork)."""
+    global _trace_writer, _trace_writer_lock
+    _trace_writer = None
+    _trace_writer_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def read_spans(path: Path = TRACE_FILE) -> Iterator[Dict]:
+    """Span-urile din <path>.1 și <path>, în ordinea scrierii (liniile incomplete sunt ignorate)."""
+    for candidate in (Path(f"{path}.1"), path):
+        if not candidate.exists():
+            continue
+        with open(candidate, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def order_traces(order_id: str, path: Path = TRACE_FILE) -> Dict[str, List[Dict]]:
+    """Span-urile trace-urilor care au atins comanda, grupate pe trace ID."""
+    order_id = str(order_id)
+    spans = list(read_spans(path))
+    trace_ids = {record["t"] for record in spans
+                 if str(record.get("a", {}).get("order")) == order_id
+                 or order_id in map(str, record.get("a", {}).get("orders", ()))}
+    traces: Dict[str, List[Dict]] = {}
+    for record in spans:
+        if record["t"] in trace_ids:
+            traces.setdefault(record["t"], []).append(record)
+    return traces
+
+
+def _format_duration(ms: float) -> str:
+    if ms < 1000:
+        return f"{ms:.1f} ms"
+    if ms < 60000:
+        return f"{ms / 1000:.2f} s"
+    return f"{int(ms // 60000)}m{ms % 60000 / 1000:04.1f}s"
+
+
+def render_waterfall(spans: List[Dict], width: int = 50) -> str:
+    """Span-urile unui trace ca waterfall text: offset, nume indentat după adâncime, durată, bară."""
+    spans = sorted(spans, key=lambda record: record["ts"])
+    start = spans[0]["ts"]
+    end = max(record["ts"] + record["ms"] / 1000 for record in spans)
+    total = max(end - start, 1e-6)
+    by_id = {record["s"]: record for record in spans}
+
+    def depth(record: Dict) -> int:
+        level = 0
+        while record.get("p") in by_id and level < 20:
+            record = by_id[record["p"]]
+            level += 1
+        return level
+
+    lines = [f"Trace {spans[0]['t']} - {datetime.fromtimestamp(start).strftime('%Y-%m-%d %H:%M:%S')}, "
+             f"total {_format_duration(total * 1000)}"]
+    labels = ["  " * depth(record) + record["n"] for record in spans]
+    label_width = max(len(label) for label in labels)
+    for record, label in zip(spans, labels):
+        offset = int((record["ts"] - start) / total * width)
+        length = max(1, int(record["ms"] / 1000 / total * width))
+        bar = " " * min(offset, width - 1) + "█" * min(length, width - min(offset, width - 1))
+        attrs = " ".join(f"{key}={value}" for key, value in record.get("a", {}).items())
+        lines.append(f"  +{_format_duration((record['ts'] - start) * 1000):>10} {label:<{label_width}} "
+                     f"{_format_duration(record['ms']):>10} |{bar:<{width}}| pid {record['pid']} {attrs}".rstrip())
+    return "\n".join(lines)
@@ -0,0 +1,365 @@
+"""
+Livrarea comenzilor noi către POS prin webhook-uri (push, fără polling).
+
+Când o comandă este salvată în comenzi/noi, payload-ul ei JSON este scris într-un outbox
+SQLite (câte o livrare per abonat din WEBHOOK_SUBSCRIBERS) și thread-ul abonatului este
+trezit imediat. Fiecare abonat are propriul thread și o conexiune HTTP keep-alive
+persistentă, deci livrările către un abonat pleacă în ordinea salvării, iar un abonat
+lent sau căzut nu îi întârzie pe ceilalți.
+
+Livrarea este semnată HMAC-SHA256 (WEBHOOK_SECRET) peste "<timestamp>.<body>":
+
+    X-Eeatingh-Signature: sha256=<hex>
+    X-Eeatingh-Timestamp: <secunde unix>
+    X-Eeatingh-Delivery: <id livrare, stabil între reîncercări>
+
+Un răspuns 2xx confirmă livrarea. Erorile de rețea, 5xx, 408 și 429 sunt reîncercate cu
+backoff exponențial (livrările următoare către același abonat așteaptă, pentru păstrarea
+ordinii); celelalte 4xx și livrările care depășesc WEBHOOK_MAX_ATTEMPTS sunt marcate
+eșuate și rămân în outbox pentru inspecție. Livrările neconfirmate supraviețuiesc
+repornirilor.
+"""
+
+import hashlib
+import hmac
+import http.client
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from app.config import (
+    WEBHOOK_SUBSCRIBERS, WEBHOOK_SECRET, WEBHOOK_OUTBOX_FILE, WEBHOOK_TIMEOUT, WEBHOOK_MAX_ATTEMPTS,
+    WEBHOOK_RETRY_DELAY, WEBHOOK_MAX_DELAY, WEBHOOK_POLL_INTERVAL
+)
+from app.logging_config import get_logger
+from app.services.process_local import ProcessLocal
+
+logger = get_logger("webhook_outbox")
+
+EVENT_NEW_ORDER = "comanda.noua"
+
+STATE_PENDING = "pending"
+STATE_FAILED = "failed"
+
+# Statusuri HTTP reîncercate (pe lângă 5xx și erorile de rețea)
+RETRYABLE_STATUSES = (408, 429)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    subscriber TEXT NOT NULL,
+    order_id TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    last_error TEXT,
+    state TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deliveries_queue ON deliveries (subscriber, state, id);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def sign_payload(secret: str, timestamp: str, body: bytes) -> str:
+    """Semnătura HMAC-SHA256 a unei livrări: "sha256=" + hex peste "<timestamp>.<body>"."""
+    digest = hmac.new(secret.encode('utf-8'), timestamp.encode('ascii') + b"." + body, hashlib.sha256)
+    return "sha256=" + digest.hexdigest()
+
+
+class HTTPSession:
+    """
+    Conexiune HTTP/1.1 keep-alive către un abonat, redeschisă la nevoie.
+
+    Args:
+        url: URL-ul abonatului (http:// sau https://)
+        timeout: Timeout per request (secunde)
+    """
+
+    def __init__(self, url: str, timeout: float = WEBHOOK_TIMEOUT):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"URL webhook invalid: {url}")
+        self.url = url
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.timeout = timeout
+        self.connections = 0
+        self._connection: Optional[http.client.HTTPConnection] = None
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self._connection is None:
+            connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._connection = connection_class(self.host, self.port, timeout=self.timeout)
+            self.connections += 1
+        return self._connection
+
+    def post(self, body: bytes, headers: Dict[str, str]) -> int:
+        """
+        Trimite un POST pe conexiunea persistentă.
+
+        Returns:
+            Statusul HTTP al răspunsului
+
+        Raises:
+            OSError, http.client.HTTPException: erori de rețea (conexiunea este închisă)
+        """
+        for reused in (self._connection is not None, False):
+            try:
+                connection = self._connect()
+                connection.request("POST", self.path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()  # Răspunsul trebuie citit complet pentru reutilizarea conexiunii
+                if response.will_close:
+                    self.close()
+                return response.status
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.close()
+                if not reused:
+                    raise
+                # Serverul a închis conexiunea keep-alive inactivă - reîncercare pe o conexiune nouă
+            except (OSError, http.client.HTTPException):
+                self.close()
+                raise
+        raise http.client.HTTPException("conexiune închisă")  # pragma: no cover - bucla returnează sau aruncă
+
+    def close(self) -> None:
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            connection.close()
+
+
+class WebhookOutbox:
+    """
+    Outbox persistent și thread-urile de livrare (câte unul per abonat).
+
+    Args:
+        path: Fișierul bazei de date
+        subscribers: URL-urile abonaților
+        secret: Cheia HMAC (None = livrări nesemnate)
+        timeout: Timeout per livrare (secunde)
+        max_attempts: Încercări înainte ca livrarea să fie marcată eșuată
+        retry_delay: Pauza după primul eșec (secunde), dublată la fiecare eșec
+        max_delay: Pauza maximă între reîncercări (secunde)
+        poll_interval: Cât așteaptă un thread inactiv înainte de a reverifica outbox-ul
+            (pentru livrările adăugate de alte procese)
+    """
+
+    def __init__(self, path: Path, subscribers: List[str], secret: Optional[str] = WEBHOOK_SECRET,
+                 timeout: float = WEBHOOK_TIMEOUT, max_attempts: int = WEBHOOK_MAX_ATTEMPTS,
+                 retry_delay: float = WEBHOOK_RETRY_DELAY, max_delay: float = WEBHOOK_MAX_DELAY,
+                 poll_interval: float = WEBHOOK_POLL_INTERVAL):
+        self.path = path
+        self.subscribers = list(dict.fromkeys(subscribers))
+        self.secret = secret
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._wake = {subscriber: threading.Event() for subscriber in self.subscribers}
+        self._sessions = {subscriber: HTTPSession(subscriber, timeout) for subscriber in self.subscribers}
+        self._threads: List[threading.Thread] = []
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(path), timeout=5, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        self._connection.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('delivered', 0)")
+
+        if not secret:
+            logger.warning("⚠️  WEBHOOK_SECRET nu este setat - livrările webhook nu sunt semnate!")
+
+    def enqueue(self, orders: List[Dict]) -> int:
+        """
+        Adaugă comenzile în outbox (câte o livrare per abonat) și trezește thread-urile.
+
+        Args:
+            orders: Comenzile salvate, în format {"comanda": {...}}
+
+        Returns:
+            Numărul de livrări adăugate
+        """
+        now = time.time()
+        rows = []
+        for order_data in orders:
+            payload = json.dumps(order_data, ensure_ascii=False).encode('utf-8')
+            order_id = str(order_data["comanda"]["id_intern_comanda"])
+            rows.extend((subscriber, order_id, payload, now, now, STATE_PENDING) for subscriber in self.subscribers)
+
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.executemany(
+                    "INSERT INTO deliveries (subscriber, order_id, payload, created, next_attempt, state) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", rows
+                )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+        for event in self._wake.values():
+            event.set()
+        return len(rows)
+
+    def start(self) -> None:
+        """Pornește thread-urile de livrare (livrările rămase din rulările anterioare sunt reluate)."""
+        if self._threads:
+            return
+        self._stopping.clear()
+        for index, subscriber in enumerate(self.subscribers, 1):
+            thread = threading.Thread(target=self._run, args=(subscriber,), daemon=True, name=f"Webhook-{index}")
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"🔗 Webhook-uri active pentru {len(self.subscribers)} abonat(i)")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Oprește thread-urile de livrare (livrările neconfirmate rămân în outbox)."""
+        self._stopping.set()
+        for event in self._wake.values():
+            event.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        for session in self._sessions.values():
+            session.close()
+
+    def _next(self, subscriber: str) -> Optional[tuple]:
+        """Cea mai veche livrare în așteptare a abonatului (păstrează ordinea)."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT id, order_id, payload, attempts, next_attempt FROM deliveries "
+                "WHERE subscriber = ? AND state = ? ORDER BY id LIMIT 1", (subscriber, STATE_PENDING)
+            ).fetchone()
+
+    def _run(self, subscriber: str) -> None:
+        """Loop-ul de livrare al unui abonat."""
+        wake = self._wake[subscriber]
+        while not self._stopping.is_set():
+            wake.clear()
+            try:
+                delivery = self._next(subscriber)
+            except sqlite3.Error as e:
+                logger.error(f"❌ Eroare la citirea outbox-ului webhook: {e}")
+                delivery = None
+
+            if delivery is None:
+                wake.wait(self.poll_interval)
+                continue
+            delay = delivery[4] - time.time()
+            if delay > 0:
+                # Backoff: și livrările următoare către acest abonat așteaptă (ordinea se păstrează)
+                self._stopping.wait(min(delay, self.poll_interval))
+                continue
+
+            try:
+                self._deliver(subscriber, *delivery[:4])
+            except Exception as e:
+                logger.error(f"❌ Eroare neașteptată la livrarea webhook: {e}", exc_info=True)
+                self._stopping.wait(self.retry_delay)
+
+    def _deliver(self, subscriber: str, delivery_id: int, order_id: str, payload: bytes, attempts: int) -> None:
+        """O încercare de livrare; actualizează outbox-ul cu rezultatul."""
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json; charset=utf-8",
+            "X-Eeatingh-Event": EVENT_NEW_ORDER,
+            "X-Eeatingh-Delivery": str(delivery_id),
+            "X-Eeatingh-Timestamp": timestamp,
+        }
+        if self.secret:
+            headers["X-Eeatingh-Signature"] = sign_payload(self.secret, timestamp, payload)
+
+        try:
+            status = self._sessions[subscriber].post(payload, headers)
+            error = None if 200 <= status < 300 else f"HTTP {status}"
+            retryable = status >= 500 or status in RETRYABLE_STATUSES
+        except (OSError, http.client.HTTPException) as e:
+            error = f"{type(e).__name__}: {e}"
+            retryable = True
+
+        attempts += 1
+        if error is None:
+            with self._lock:
+                self._connection.execute("DELETE FROM deliveries WHERE id = ?", (delivery_id,))
+                self._connection.execute("UPDATE counters SET value = value + 1 WHERE name = 'delivered'")
+            logger.info(f"🔗 Comanda #{order_id} livrată către {subscriber}")
+            return
+
+        if retryable and attempts < self.max_attempts:
+            delay = min(self.retry_delay * 2 ** (attempts - 1), self.max_delay)
+            with self._lock:
+                self._connection.execute(
+                    "UPDATE deliveries SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                    (attempts, time.time() + delay, error, delivery_id)
+                )
+            logger.warning(f"⚠️  Livrare webhook #{order_id} către {subscriber} eșuată ({error}) - "
+                           f"reîncerc în {delay:.0f}s (încercarea {attempts}/{self.max_attempts})")
+            return
+
+        with self._lock:
+            self._connection.execute(
+                "UPDATE deliveries SET attempts = ?, last_error = ?, state = ? WHERE id = ?",
+                (attempts, error, STATE_FAILED, delivery_id)
+            )
+        logger.error(f"❌ Livrare webhook #{order_id} către {subscriber} abandonată după {attempts} încercări: {error}")
+        try:
+            from app.services.notification_service import get_notification_service
+            get_notification_service().send_error_notification(
+                error_message=error,
+                context=f"Webhook - comanda #{order_id} nu a putut fi livrată către {subscriber}"
+            )
+        except Exception:
+            pass
+
+    def stats(self) -> Dict:
+        """Livrări confirmate, în așteptare și eșuate (per abonat)."""
+        with self._lock:
+            delivered = self._connection.execute(
+                "SELECT value FROM counters WHERE name = 'delivered'"
+            ).fetchone()[0]
+            rows = self._connection.execute(
+                "SELECT subscriber, state, COUNT(*) FROM deliveries GROUP BY subscriber, state"
+            ).fetchall()
+        subscribers = {subscriber: {STATE_PENDING: 0, STATE_FAILED: 0} for subscriber in self.subscribers}
+        for subscriber, state, count in rows:
+            subscribers.setdefault(subscriber, {STATE_PENDING: 0, STATE_FAILED: 0})[state] = count
+        return {"delivered": delivered, "subscribers": subscribers}
+
+
+# Instanța globală (creată la prima utilizare, în fiecare proces)
+_webhook_outbox: ProcessLocal[WebhookOutbox] = ProcessLocal(
+    lambda: WebhookOutbox(WEBHOOK_OUTBOX_FILE, WEBHOOK_SUBSCRIBERS),
+    lambda e: logger.error(f"❌ Outbox-ul webhook nu poate fi deschis: {e}"),
+    errors=(sqlite3.Error, OSError, ValueError)
+)
+
+
+def get_webhook_outbox() -> Optional[WebhookOutbox]:
+    """Returnează outbox-ul global, sau None dacă nu există abonați (WEBHOOK_SUBSCRIBERS) ori este indisponibil."""
+    if not WEBHOOK_SUBSCRIBERS:
+        return None
+    return _webhook_outbox.get()
+
+
+def enqueue_new_orders(orders: List[Dict]) -> None:
+    """Programează livrarea comenzilor noi către abonați (nu aruncă excepții)."""
+    outbox = get_webhook_outbox()
+    if outbox is None or not orders:
+        return
+    try:
+        outbox.enqueue(orders)
+    except Exception as e:
+        logger.error(f"❌ Eroare la adăugarea comenzilor în outbox-ul webhook: {e}", exc_info=True)
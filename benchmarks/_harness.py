@@ -0,0 +1,62 @@
+"""
+Pregătirea comună a benchmark-urilor, importată înaintea modulelor aplicației:
+
+- directorul proiectului în sys.path;
+- credențiale email fictive (benchmark-urile rulează offline);
+- starea persistentă (DATA_DIR) și log-urile (LOGS_DIR) într-un director temporar, nu în
+  data/ și logs/ ale proiectului (moștenite și de procesele pornite de benchmark-uri);
+- logging inițializat în LOG_FILE și dezactivat (ieșirea este raportul benchmark-ului).
+
+Utilizare (după eventualele variabile de mediu care trebuie citite de app.config):
+    from _harness import check, setup_api
+"""
+
+import logging
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+CORPUS_DIR = BENCHMARKS_DIR / "corpus"
+LOG_FILE = Path(tempfile.gettempdir()) / "eeatingh_benchmark.log"
+
+sys.path.insert(0, str(BASE_DIR))
+
+# Benchmark-urile rulează offline - nu au nevoie de credențiale reale
+os.environ.setdefault("EMAIL_USER", "benchmark@example.com")
+os.environ.setdefault("EMAIL_PASS", "benchmark")
+
+TEMP_DIR = Path(tempfile.mkdtemp(prefix="eeatingh_benchmark_"))
+os.environ.setdefault("DATA_DIR", str(TEMP_DIR / "data"))
+os.environ.setdefault("LOGS_DIR", str(TEMP_DIR / "logs"))
+
+from app.logging_config import initialize_logging
+
+initialize_logging(LOG_FILE)
+logging.disable(logging.CRITICAL)
+
+
+def check(name: str, condition: bool, failures: list) -> None:
+    print(f"  {'✅' if condition else '❌'} {name}")
+    if not condition:
+        failures.append(name)
+
+
+def setup_api(root: Path) -> None:
+    """
+    Pregătește API-ul (în procesul curent) pentru request-uri prin app.test_client(): folderele
+    comenzilor în `root` (noi, procesate, anulate - necreate), fără API key (terminalele simulate
+    nu trimit X-API-Key) și un rate limiter fără limită practică, în `root`.
+    """
+    # Import local: benchmark-urile parserului nu încarcă API-ul
+    from app import api_server
+    import app.services.rate_limiter as rate_limiter_module
+    from app.services.rate_limiter import SharedRateLimiter
+
+    api_server.COMENZI_NOI = root / "noi"
+    api_server.COMENZI_PROCESATE = root / "procesate"
+    api_server.COMENZI_ANULATE = root / "anulate"
+    api_server.API_KEY = None
+    rate_limiter_module._rate_limiter = SharedRateLimiter(root / "rate_limits.mmap", default_limit="1000000/second")
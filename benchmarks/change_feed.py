@@ -0,0 +1,194 @@
+"""
+Verificare și cost pentru jurnalul schimbărilor comenzilor (app/services/change_log.py,
+GET /api/changes).
+
+1. Scrieri concurente din mai multe procese (ca procesul de ingestie și worker-ii API), cu un
+   consumator care sincronizează în paralel după cursor: fiecare schimbare este primită o
+   singură dată, în ordinea seq, fără goluri.
+2. Costul unei pagini nu depinde de mărimea jurnalului (căutare după cheia primară).
+3. Compactarea: schimbările mai vechi decât retenția sunt șterse; un cursor mai vechi decât
+   orizontul (sau necunoscut) este refuzat.
+4. API: save_orders_batch și POST /api/comenzi (confirmare/anulare) alimentează jurnalul;
+   GET /api/changes validează parametrii, paginează și răspunde 410 pentru un cursor compactat.
+
+Utilizare:
+    python benchmarks/change_feed.py [--writers 4] [--changes 500] [--size 100000]
+"""
+
+import argparse
+import json
+import multiprocessing
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from _harness import check, setup_api
+
+from app import api_server
+import app.services.change_log as change_log_module
+import app.services.order_events as order_events
+import app.services.order_service as order_service
+import app.services.order_timeline as order_timeline
+from app.services.change_log import ChangeLog, EVENT_CONFIRMED
+
+
+def _order(order_id: str) -> dict:
+    return {"comanda": {"id_intern_comanda": order_id, "status_comanda": "processing", "total": "42.00"}}
+
+
+def _write_changes(path: Path, writer: int, count: int) -> None:
+    """Un proces care adaugă schimbări, câte una sau în loturi (ca save_orders_batch)."""
+    log = ChangeLog(path)
+    index = 0
+    while index < count:
+        batch = 1 + index % 3
+        log.append([(f"W{writer}-{index + offset}", EVENT_CONFIRMED, None)
+                    for offset in range(min(batch, count - index))])
+        index += batch
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4, help="Procese care scriu în paralel")
+    parser.add_argument("--changes", type=int, default=500, help="Schimbări scrise de fiecare proces")
+    parser.add_argument("--size", type=int, default=100000, help="Mărimea jurnalului pentru costul unei pagini")
+    args = parser.parse_args()
+
+    failures = []
+    root = Path(tempfile.mkdtemp())
+    context = multiprocessing.get_context("fork")
+
+    print("Scrieri concurente:")
+    path = root / "concurrent.sqlite3"
+    log = ChangeLog(path)
+    writers = [context.Process(target=_write_changes, args=(path, writer, args.changes))
+               for writer in range(args.writers)]
+    started = time.perf_counter()
+    for writer in writers:
+        writer.start()
+    received, cursor, pages = [], 0, 0
+    while any(writer.is_alive() for writer in writers) or log.latest() > cursor:
+        changes, cursor, _ = log.since(cursor, 50)
+        received.extend(changes)
+        pages += 1
+    for writer in writers:
+        writer.join()
+    elapsed = time.perf_counter() - started
+    total = args.writers * args.changes
+    sequence = [change["seq"] for change in received]
+    print(f"  {total} schimbări din {args.writers} procese în {elapsed:.2f}s, citite în {pages} cereri")
+    check("fiecare schimbare primită o singură dată", len({change["id_comanda"] for change in received}) == total
+          and len(received) == total, failures)
+    check("seq crescător, fără goluri", sequence == list(range(1, total + 1)), failures)
+    for writer in range(args.writers):
+        own = [int(change["id_comanda"].split("-")[1]) for change in received
+               if change["id_comanda"].startswith(f"W{writer}-")]
+        if own != sorted(own):
+            break
+    else:
+        writer = None
+    check("ordinea schimbărilor fiecărui proces este păstrată", writer is None, failures)
+
+    print("Costul unei pagini:")
+    timings = {}
+    for size in (1000, args.size):
+        log = ChangeLog(root / f"size_{size}.sqlite3")
+        for start in range(0, size, 1000):
+            log.append([(str(index), EVENT_CONFIRMED, {"timp_livrare": 30})
+                        for index in range(start, min(start + 1000, size))])
+        cursor = size - 500
+        samples = []
+        for _ in range(200):
+            begin = time.perf_counter()
+            log.since(cursor, 100)
+            samples.append((time.perf_counter() - begin) * 1000)
+        timings[size] = statistics.median(samples)
+        print(f"  jurnal de {size} schimbări: pagina de 100 în {timings[size]:.3f} ms (mediana)")
+    check(f"costul unei pagini nu crește cu jurnalul (< 3x pentru {args.size // 1000}x mai multe schimbări)",
+          timings[args.size] < 3 * timings[1000], failures)
+
+    print("Compactare:")
+    log = ChangeLog(root / "compact.sqlite3", retention=60)
+    now = time.time()
+    log.append([(str(index), EVENT_CONFIRMED, None) for index in range(10)], at=now - 3600)
+    log._last_prune = 0.0
+    log.append([("nou", EVENT_CONFIRMED, None)], at=now)
+    check("schimbările mai vechi decât retenția sunt șterse", log.horizon() == 10, failures)
+    check("cursor mai vechi decât orizontul: refuzat", log.since(5, 100) is None, failures)
+    check("cursor necunoscut (mai mare decât ultimul seq): refuzat", log.since(99, 100) is None, failures)
+    changes, cursor, has_more = log.since(10, 100)
+    check("de la orizont: schimbările rămase", [change["id_comanda"] for change in changes] == ["nou"]
+          and cursor == 11 and not has_more, failures)
+    log._compact(now + 1)
+    check("jurnal gol după compactare: orizontul este ultimul seq",
+          log.horizon() == 11 and log.since(11, 100) == ([], 11, False), failures)
+
+    print("API:")
+    noi = root / "noi"
+    change_log_module.CHANGE_LOG_FILE = root / "changes.sqlite3"
+    change_log_module._change_log.set(None)
+    order_timeline.ORDER_TIMELINE_FILE = root / "order_timeline.sqlite3"
+    order_events.ORDER_EVENTS_DIR = root / "events"
+    order_service.COMENZI_NOI = noi
+    setup_api(root)
+    client = api_server.app.test_client()
+
+    order_service.save_orders_batch([_order("A1"), _order("A2"), _order("A3")], noi)
+    for order_id, operation in (("A1", "CONFIRMA"), ("A2", "ANULEAZA")):
+        client.post('/api/comenzi', json={"id_comanda": order_id, "operatiune": operation, "timp_livrare": 40})
+    first = client.get('/api/changes?limit=2').get_json()
+    second = client.get(f'/api/changes?since={first["next"]}&limit=2').get_json()
+    check("paginare: next și has_more", first["has_more"] and first["next"] == 2 and second["has_more"], failures)
+    created = first["changes"][0]
+    check("schimbarea 'created' conține comanda, 'confirmed' timpul de livrare",
+          created["comanda"] == _order("A1")["comanda"] and second["changes"][1]["timp_livrare"] == 40, failures)
+    replay = client.post('/api/comenzi', json={"id_comanda": "A1", "operatiune": "CONFIRMA"})
+    last = client.get(f'/api/changes?since={second["next"]}').get_json()
+    events = [(change["id_comanda"], change["event"])
+              for change in first["changes"] + second["changes"] + last["changes"]]
+    check("salvarea și confirmarea/anularea alimentează jurnalul",
+          events == [("A1", "created"), ("A2", "created"), ("A3", "created"), ("A1", "confirmed"),
+                     ("A2", "cancelled")], failures)
+    check("actualizarea unei comenzi deja procesate nu adaugă o schimbare", replay.status_code == 200, failures)
+    caught_up = client.get(f'/api/changes?since={last["next"]}').get_json()
+    check("consumatorul la zi: listă goală, același cursor",
+          caught_up == {"changes": [], "next": last["next"], "has_more": False}, failures)
+    check("parametri invalizi: 400", all(client.get(url).status_code == 400 for url in (
+        '/api/changes?since=-1', '/api/changes?since=abc', '/api/changes?limit=0', '/api/changes?limit=1001')),
+        failures)
+    change_log_module.get_change_log()._compact(time.time() + 1)
+    gone = client.get('/api/changes?since=0')
+    body = gone.get_json()
+    check("cursor compactat: 410 cu orizontul", gone.status_code == 410 and body["horizon"] == body["latest"] == 5,
+          failures)
+
+    replace = order_service.os.replace
+    renamed = []
+    def failing_replace(src, dst):
+        if renamed:
+            raise OSError("disc plin")
+        replace(src, dst)
+        renamed.append(dst)
+    order_service.os.replace = failing_replace
+    try:
+        saved = order_service.save_orders_batch([_order("B1"), _order("B2")], noi)
+    finally:
+        order_service.os.replace = replace
+    partial = client.get(f'/api/changes?since={body["latest"]}').get_json()
+    check("lot întrerupt: comanda deja redenumită este înregistrată, restul nu lasă fișiere .tmp",
+          not saved and [change["id_comanda"] for change in partial["changes"]] == ["B1"]
+          and not list(noi.glob("*.tmp")), failures)
+    payload = json.dumps(first).encode('utf-8')
+    print(f"  răspuns pentru 2 schimbări: {len(payload)} octeți")
+
+    if failures:
+        print(f"❌ {len(failures)} verificări eșuate")
+        return 1
+    print("✅ Toate verificările au trecut")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Benchmark și verificare pentru Idempotency-Key la POST /api/comenzi.
+
+Pornește mai multe procese (ca worker-ii Gunicorn) care trimit simultan aceeași confirmare
+cu aceeași cheie (un POS care reîncearcă pe Wi-Fi instabil) și verifică faptul că operația
+rulează o singură dată, iar toate răspunsurile sunt identice. Măsoară costul unei
+reîncercări servite din cache și verifică: duplicatele concurente fără cheie (fără 500),
+cheie refolosită pentru alt request (422), limita de răspunsuri păstrate și expirarea.
+
+Utilizare:
+    python benchmarks/idempotency.py [--processes 4] [--threads 8] [--replays 2000]
+"""
+
+import argparse
+import json
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from _harness import check, setup_api
+
+from app import api_server
+import app.services.idempotency as idempotency_module
+from app.services.idempotency import IdempotencyCache
+
+HEADERS = {"X-Terminal-Id": "pos-1"}
+CONFIRM = {"id_comanda": "7", "operatiune": "CONFIRMA", "timp_livrare": 30}
+
+
+def _setup(root: Path, **cache_options) -> None:
+    """Redirecționează API-ul către folderele de test (în procesul curent)."""
+    setup_api(root)
+    idempotency_module._idempotency_cache.set(IdempotencyCache(root / "idempotency.sqlite3", **cache_options))
+
+
+def _seed(root: Path, order_ids) -> None:
+    (root / "noi").mkdir(parents=True, exist_ok=True)
+    for order_id in order_ids:
+        order = {"comanda": {"id_intern_comanda": str(order_id), "status_comanda": "processing"}}
+        with open(root / "noi" / f"20240101_120000_comanda_{order_id}.json", 'w', encoding='utf-8') as f:
+            json.dump(order, f)
+
+
+def _worker(root: str, threads: int, key, start, queue) -> None:
+    _setup(Path(root))
+    client = api_server.app.test_client()
+    results = []
+    headers = dict(HEADERS, **({"Idempotency-Key": key} if key else {}))
+
+    def send() -> None:
+        response = client.post('/api/comenzi', headers=headers, json=CONFIRM)
+        results.append((response.status_code, response.get_data(), response.headers.get('Idempotent-Replayed')))
+
+    workers = [threading.Thread(target=send) for _ in range(threads)]
+    start.wait()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    queue.put(results)
+
+
+def concurrent_duplicates(processes: int, threads: int, key) -> list:
+    """processes × threads request-uri identice, trimise simultan; returnează răspunsurile."""
+    root = Path(tempfile.mkdtemp())
+    _seed(root, ["7"])
+    context = multiprocessing.get_context("fork")
+    start = context.Event()
+    queue = context.Queue()
+    workers = [context.Process(target=_worker, args=(str(root), threads, key, start, queue))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    start.set()
+    results = [item for _ in workers for item in queue.get(timeout=60)]
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4, help="Procese (worker-i Gunicorn)")
+    parser.add_argument("--threads", type=int, default=8, help="Request-uri simultane per proces")
+    parser.add_argument("--replays", type=int, default=2000, help="Reîncercări pentru măsurarea costului")
+    args = parser.parse_args()
+
+    failures = []
+    total = args.processes * args.threads
+    results = concurrent_duplicates(args.processes, args.threads, key="retry-7")
+    originals = [result for result in results if result[2] is None]
+    print(f"{total} duplicate simultane cu Idempotency-Key: {len(originals)} executate, "
+          f"{len(results) - len(originals)} din cache")
+    check("operația rulează o singură dată", len(originals) == 1, failures)
+    check("toate răspunsurile sunt identice (status și corp)",
+          len({(status, body) for status, body, _ in results}) == 1 and results[0][0] == 200, failures)
+
+    results = concurrent_duplicates(args.processes, args.threads, key=None)
+    statuses = sorted({status for status, _, _ in results})
+    print(f"{total} duplicate simultane fără cheie: status-uri {statuses}")
+    check("fără cheie: niciun 500 la mutarea concurentă", all(status == 200 for status in statuses), failures)
+
+    print("Reîncercări din cache:")
+    root = Path(tempfile.mkdtemp())
+    _seed(root, ["7"])
+    _setup(root)
+    client = api_server.app.test_client()
+    headers = dict(HEADERS, **{"Idempotency-Key": "k-7"})
+    start = time.perf_counter()
+    first = client.post('/api/comenzi', headers=headers, json=CONFIRM)
+    first_ms = (time.perf_counter() - start) * 1000
+
+    missing = dict(HEADERS, **{"Idempotency-Key": "k-8"})
+    before = client.post('/api/comenzi', headers=missing, json=dict(CONFIRM, id_comanda="8"))
+    _seed(root, ["8"])  # Comanda salvată între reîncercări
+    after = client.post('/api/comenzi', headers=missing, json=dict(CONFIRM, id_comanda="8"))
+    check("404 nu este păstrat: reîncercarea după salvarea comenzii reușește",
+          before.status_code == 404 and after.status_code == 200
+          and after.headers.get('Idempotent-Replayed') is None, failures)
+
+    shutil.rmtree(root / "procesate")  # Reîncercările nu trebuie să atingă fișierele
+    start = time.perf_counter()
+    for _ in range(args.replays):
+        replay = client.post('/api/comenzi', headers=headers, json=CONFIRM)
+    replay_ms = (time.perf_counter() - start) * 1000 / args.replays
+    print(f"  request original {first_ms:.2f} ms, reîncercare {replay_ms:.3f} ms")
+    check("reîncercarea este servită fără fișiere, cu același răspuns",
+          replay.status_code == first.status_code and replay.get_data() == first.get_data()
+          and replay.headers.get('Idempotent-Replayed') == 'true', failures)
+
+    other = client.post('/api/comenzi', headers=headers, json=dict(CONFIRM, operatiune="ANULEAZA"))
+    check("cheie refolosită pentru alt request: 422", other.status_code == 422, failures)
+    elsewhere = client.post('/api/comenzi', headers={"X-Terminal-Id": "pos-2", "Idempotency-Key": "k-7"},
+                            json={"id_comanda": "404", "operatiune": "CONFIRMA"})
+    check("cheile sunt separate per terminal", elsewhere.status_code == 404, failures)
+
+    root = Path(tempfile.mkdtemp())
+    _seed(root, range(50))
+    _setup(root, max_entries=10, ttl=0.2)
+    cache = idempotency_module._idempotency_cache.get()
+    for order_id in range(50):
+        client.post('/api/comenzi', headers=dict(HEADERS, **{"Idempotency-Key": f"k-{order_id}"}),
+                    json={"id_comanda": str(order_id), "operatiune": "CONFIRMA"})
+    cache._last_prune = 0
+    cache.complete("unused", 200, b"", "application/json")  # Forțează eliminarea
+    check("cache-ul este limitat la max_entries", cache.stats()["entries"] <= 10, failures)
+    time.sleep(0.3)
+    expired = client.post('/api/comenzi', headers=dict(HEADERS, **{"Idempotency-Key": "k-49"}),
+                          json={"id_comanda": "49", "operatiune": "CONFIRMA"})
+    check("după expirare, cheia este executată din nou",
+          expired.status_code == 200 and expired.get_json().get("status") == "updated", failures)
+
+    if failures:
+        print(f"❌ {len(failures)} verificări eșuate")
+        return 1
+    print("✅ Toate verificările au trecut")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
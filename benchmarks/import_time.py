@@ -0,0 +1,169 @@
+"""
+Timpul de import al worker-ilor API și al procesului de ingestie (`python -X importtime`),
+cu un buget pentru worker-i.
+
+1. Worker API (`import wsgi`, ce importă Gunicorn în fiecare worker fără preload_app): durata
+   cumulată (cea mai bună din --runs procese noi, fără zgomotul mașinii) trebuie să rămână sub
+   --budget-ms; bs4, imapclient și smtplib nu sunt importate, iar dotenv doar dacă există un
+   fișier .env.
+2. Importul nu necesită credențiale email (se verifică la pornirea ingestiei) și nu creează
+   directoare.
+3. Procesul de ingestie (`import ingest` + Email Listener și parserul): raportat informativ;
+   bs4 și imapclient sunt încărcate abia la prima parsare, respectiv conectare.
+4. preload_app: memoria privată (Private_Dirty) scrisă de un proces creat prin fork după
+   gc.collect(), cu și fără gc.freeze() în master (Linux).
+
+Utilizare:
+    python benchmarks/import_time.py [--runs 5] [--budget-ms 250]
+"""
+
+import argparse
+import gc
+import os
+import statistics
+import subprocess
+import sys
+
+from _harness import BASE_DIR, LOG_FILE, check
+
+import app.config as config
+
+# Module pe care worker-ii API nu trebuie să le importe
+API_FORBIDDEN = ("bs4", "imapclient", "smtplib")
+
+API_IMPORT = "import wsgi"
+INGEST_IMPORT = "import ingest, app.services.email_listener, app.services.order_service"
+
+
+def import_times(code: str, env: dict) -> dict:
+    """
+    Rulează `code` într-un proces nou cu -X importtime.
+
+    Returns:
+        Modulul importat -> durata cumulată (ms); "total" - suma importurilor de nivel superior
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=str(BASE_DIR), env=env,
+                            capture_output=True, text=True, timeout=60)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    times = {"total": 0.0}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative) / 1000
+        if name[1:2] != " ":  # Import de nivel superior (fără indentare)
+            times["total"] += int(cumulative) / 1000
+    return times
+
+
+def measure(code: str, runs: int, env: dict):
+    """Durata totală a importurilor din `code` (minimul și mediana) și modulele importate (ultima rulare)."""
+    durations = []
+    modules = {}
+    for _ in range(runs):
+        modules = import_times(code, env)
+        durations.append(modules["total"])
+    return min(durations), statistics.median(durations), modules
+
+
+def heaviest(modules: dict, prefix: str = "", limit: int = 5) -> str:
+    top = sorted(((ms, name) for name, ms in modules.items() if name.startswith(prefix) and name != "total"),
+                 reverse=True)
+    return ", ".join(f"{name} {ms:.1f} ms" for ms, name in top[:limit])
+
+
+def private_dirty_after_fork(freeze: bool) -> int:
+    """KiB de memorie privată scrise de gc.collect() într-un proces copil (ca un worker Gunicorn)."""
+    if freeze:
+        gc.freeze()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        def private_dirty() -> int:
+            with open("/proc/self/smaps_rollup", encoding="utf-8") as smaps:
+                for line in smaps:
+                    if line.startswith("Private_Dirty:"):
+                        return int(line.split()[1])
+            return 0
+
+        before = private_dirty()
+        gc.collect()
+        os.write(write_fd, str(private_dirty() - before).encode())
+        os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    with os.fdopen(read_fd) as result:
+        value = int(result.read() or 0)
+    if freeze:
+        gc.unfreeze()
+    return value
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Procese noi per măsurare")
+    parser.add_argument("--budget-ms", type=float, default=250, help="Bugetul importului unui worker API (ms)")
+    args = parser.parse_args()
+
+    failures = []
+    # Fără credențiale și fără mesaje în logs/app.log
+    env = {key: value for key, value in os.environ.items() if key not in ("EMAIL_USER", "EMAIL_PASS")}
+    env["LOG_LEVEL"] = "WARNING"
+    has_dotenv = any((directory / ".env").is_file() for directory in (config.APP_DIR, *config.APP_DIR.parents))
+
+    print("Worker API (import wsgi, fără EMAIL_USER/EMAIL_PASS):")
+    api_ms, api_median, api_modules = measure(API_IMPORT, args.runs, env)
+    print(f"  {api_ms:.1f} ms (cel mai bun din {args.runs}, mediana {api_median:.1f} ms, buget {args.budget_ms:g} ms)")
+    print(f"  cele mai lente: {heaviest(api_modules)}")
+    print(f"  module ale aplicației: {heaviest(api_modules, 'app.')}")
+    check(f"importul unui worker API sub {args.budget_ms:g} ms", api_ms <= args.budget_ms, failures)
+    loaded = [name for name in API_FORBIDDEN if name in api_modules]
+    check(f"fără {', '.join(API_FORBIDDEN)}", not loaded, failures)
+    if not has_dotenv:
+        check("fără dotenv când nu există un fișier .env", "dotenv" not in api_modules, failures)
+
+    print("Configurație:")
+    try:
+        import_times("from app.config import require_email_credentials as r; r()", env)
+        raised = False
+    except RuntimeError as e:
+        raised = "EMAIL_USER" in str(e)
+    check("require_email_credentials() oprește ingestia fără credențiale", raised, failures)
+    created = subprocess.run(
+        [sys.executable, "-c", "import pathlib; calls = []; "
+                               "pathlib.Path.mkdir = lambda self, *args, **kwargs: calls.append(self); "
+                               "import app.config; print(len(calls))"],
+        cwd=str(BASE_DIR), env=env, capture_output=True, text=True).stdout.strip()
+    check("importul app.config nu creează directoare", created == "0", failures)
+
+    print("Proces de ingestie (import ingest):")
+    ingest_env = {**env, "EMAIL_USER": "benchmark@example.com", "EMAIL_PASS": "benchmark"}
+    ingest_ms, _, ingest_modules = measure(INGEST_IMPORT, args.runs, ingest_env)
+    print(f"  {ingest_ms:.1f} ms; cele mai lente: {heaviest(ingest_modules)}")
+    check("bs4 și imapclient sunt importate la prima utilizare",
+          "bs4" not in ingest_modules and "imapclient" not in ingest_modules, failures)
+    parsed = import_times(f"from app.logging_config import initialize_logging; "
+                          f"initialize_logging(__import__('pathlib').Path({str(LOG_FILE)!r})); "
+                          f"from app.services import parse_orders; "
+                          f"parse_orders('<html><body><p>fără comenzi</p></body></html>')",
+                          ingest_env)
+    check("parse_orders (export leneș din app.services) încarcă bs4", "bs4" in parsed, failures)
+
+    if os.path.exists("/proc/self/smaps_rollup"):
+        print("preload_app (fork după importul aplicației):")
+        import wsgi  # noqa: F401 - aplicația importată în master, ca la preload_app
+        plain = private_dirty_after_fork(False)
+        frozen = private_dirty_after_fork(True)
+        print(f"  gc.collect() în worker: {plain} KiB copiate fără gc.freeze(), {frozen} KiB cu gc.freeze()")
+        check("gc.freeze() în master păstrează paginile partajate", frozen < plain, failures)
+
+    if failures:
+        print(f"❌ {len(failures)} verificări eșuate")
+        return 1
+    print("✅ Toate verificările au trecut")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Verificare pentru procesul de ingestie supravegheat și evenimentele "comenzi salvate"
+(app/services/ingest.py, app/services/order_events.py).
+
+1. IngestSupervisor: un proces care se oprește imediat este repornit cu pauză dublată; un
+   proces oprit cu SIGKILL este repornit; stop() oprește procesul curent.
+2. run_ingest() (într-un proces copil, ca `python ingest.py`): iese cu cod 1 când un serviciu
+   s-a oprit sau Email Listener nu mai raportează activitate (IMAP blocat) și cu cod 0 la SIGTERM.
+3. Evenimente: latența de la save_orders_batch într-un alt proces până la trezirea worker-ului;
+   socket-ul unui worker oprit este șters; cache-ul de trace-uri al comenzii este invalidat.
+4. Long-poll GET /api/comenzi?asteapta=N: răspunde imediat după salvarea unei comenzi de alt
+   proces, cu și fără evenimente (re-verificare periodică).
+
+Utilizare:
+    python benchmarks/ingest_process.py [--events 200]
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from _harness import check, setup_api
+
+from app import api_server
+import app.services.cleanup_service as cleanup_service_module
+import app.services.email_listener as email_listener_module
+import app.services.ingest as ingest
+import app.services.memory_watchdog as memory_watchdog
+import app.services.notification_service as notification_service
+import app.services.order_events as order_events
+import app.services.order_service as order_service
+from app.services.ingest import IngestSupervisor, run_ingest
+from app.services.order_events import OrderEvents, publish_saved_orders
+
+
+class FakeNotifications:
+    """Notificările trimise (în loc de SMTP)."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_error_notification(self, error_message: str, context: str = "", exception=None) -> bool:
+        self.sent.append(error_message)
+        return True
+
+
+def _order(order_id: str) -> dict:
+    return {"comanda": {"id_intern_comanda": order_id, "status_comanda": "processing", "total": "42.00"}}
+
+
+def _wait_until(condition, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def _ingest_child(scenario: str) -> None:
+    """Proces de ingestie cu serviciile înlocuite (fără IMAP): sys.exit(run_ingest())."""
+    if scenario == "blocat":
+        email_listener_module.EmailListener.start = lambda self: time.sleep(3600)
+    else:
+        email_listener_module.EmailListener.start = lambda self: _heartbeat(self)
+    if scenario == "serviciu_oprit":
+        cleanup_service_module.CleanupService.start = lambda self: None
+    else:
+        cleanup_service_module.CleanupService.start = lambda self: time.sleep(3600)
+    sys.exit(run_ingest(check_interval=0.1, heartbeat_timeout=1))
+
+
+def _heartbeat(listener) -> None:
+    while listener.running:
+        listener.heartbeat = time.monotonic()
+        time.sleep(0.1)
+
+
+def _save_orders(folder: Path, order_ids: list, sent_at) -> None:
+    """Salvează comenzi dintr-un alt proces (ca procesul de ingestie)."""
+    for order_id in order_ids:
+        sent_at.value = time.perf_counter()
+        order_service.save_orders_batch([_order(order_id)], folder)
+        time.sleep(0.005)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200, help="Salvări pentru măsurarea latenței evenimentelor")
+    args = parser.parse_args()
+
+    failures = []
+    root = Path(tempfile.mkdtemp())
+    context = multiprocessing.get_context("fork")
+    notifications = FakeNotifications()
+    notification_service.get_notification_service = lambda: notifications
+    ingest.INGEST_PID_FILE = root / "ingest.pid"
+    ingest.INGEST_RESTART_DELAY = 0.2
+    ingest.INGEST_STABLE_SECONDS = 2
+    memory_watchdog.MEMORY_WATCHDOG = False
+
+    print("Supervizor:")
+    crashing = IngestSupervisor([sys.executable, "-c", "import sys; sys.exit(3)"])
+    started = time.monotonic()
+    crashing.start()
+    _wait_until(lambda: crashing.restarts >= 4, 10)
+    elapsed = time.monotonic() - started
+    crashing.stop()
+    print(f"  4 opriri în {elapsed:.2f}s (pauze 0.2 + 0.4 + 0.8 s între ele)")
+    check("procesul oprit imediat este repornit cu pauză dublată", crashing.restarts >= 4 and elapsed >= 1.3,
+          failures)
+    check("fiecare oprire trimite o notificare de eroare",
+          len(notifications.sent) >= 3 and "cod 3" in notifications.sent[0], failures)
+
+    supervisor = IngestSupervisor([sys.executable, "-c", "import time; time.sleep(60)"])
+    supervisor.start()
+    _wait_until(lambda: supervisor.process is not None, 5)
+    first = supervisor.process.pid
+    os.kill(first, signal.SIGKILL)
+    restarted = _wait_until(lambda: supervisor.process.pid != first and supervisor.process.poll() is None, 5)
+    check("procesul oprit cu SIGKILL este repornit", restarted, failures)
+    process = supervisor.process
+    supervisor.stop()
+    check("stop() oprește procesul de ingestie fără repornire",
+          process.poll() is not None and supervisor.process is process, failures)
+
+    print("run_ingest():")
+    for scenario, expected, name in (("blocat", 1, "Email Listener fără activitate: cod 1"),
+                                     ("serviciu_oprit", 1, "serviciu oprit neașteptat: cod 1")):
+        child = context.Process(target=_ingest_child, args=(scenario,))
+        child.start()
+        child.join(10)
+        check(name, child.exitcode == expected, failures)
+    child = context.Process(target=_ingest_child, args=("normal",))
+    child.start()
+    written = _wait_until(lambda: ingest.INGEST_PID_FILE.exists(), 5)
+    time.sleep(0.5)
+    alive = child.is_alive()
+    os.kill(child.pid, signal.SIGTERM)
+    child.join(10)
+    check("PID-ul este publicat, serviciile sănătoase rulează", written and alive, failures)
+    check("SIGTERM: cod 0, fișierul PID este șters",
+          child.exitcode == 0 and not ingest.INGEST_PID_FILE.exists(), failures)
+
+    print("Evenimente:")
+    events_dir = root / "events"
+    noi = root / "noi"
+    order_events.ORDER_EVENTS_DIR = events_dir
+    order_service.COMENZI_NOI = noi
+    order_service.record_saved_orders = lambda orders, stages=None: None
+    setup_api(root)
+    noi.mkdir()
+    receiver = OrderEvents(events_dir)
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    stale.bind(str(events_dir / "999999.sock"))
+    stale.close()
+    received = []
+    order_events.on_orders_saved(received.extend)
+
+    sent_at = context.Value('d', 0.0)
+    latencies = []
+    ids = [f"E{index}" for index in range(args.events)]
+    saver = context.Process(target=_save_orders, args=(noi, ids, sent_at))
+    version = receiver.version
+    saver.start()
+    while len(latencies) < args.events and receiver.wait(version, 5):
+        latencies.append((time.perf_counter() - sent_at.value) * 1000)
+        version = receiver.version
+    saver.join()
+    print(f"  {len(latencies)} evenimente, latență salvare -> trezire p50 {statistics.median(latencies):.3f} ms, "
+          f"max {max(latencies):.3f} ms" if latencies else "  niciun eveniment")
+    check("fiecare salvare din alt proces trezește worker-ul", _wait_until(lambda: received == ids, 2), failures)
+    check("socket-ul unui worker oprit este șters", not (events_dir / "999999.sock").exists(), failures)
+    api_server._order_traces["E0"] = "trace-vechi"
+    publish_saved_orders([_order("E0")])
+    check("cache-ul de trace-uri al comenzii salvate este invalidat",
+          _wait_until(lambda: "E0" not in api_server._order_traces, 2), failures)
+    for path in noi.iterdir():
+        path.unlink()
+
+    print("Long-poll GET /api/comenzi?asteapta=N:")
+    order_events._order_events = receiver
+    client = api_server.app.test_client()
+    check("asteapta invalid: 400", client.get('/api/comenzi?asteapta=abc').status_code == 400
+          and client.get(f'/api/comenzi?asteapta={api_server.ORDER_LONG_POLL_MAX + 1}').status_code == 400, failures)
+    start = time.perf_counter()
+    empty = client.get('/api/comenzi?asteapta=1').get_json()
+    waited = time.perf_counter() - start
+    check("fără comenzi: răspuns gol după timeout", empty.get("status") == "empty" and 0.9 < waited < 2.5, failures)
+
+    for label, events in (("cu evenimente", receiver), ("fără evenimente (re-verificare la 0.5 s)", None)):
+        api_server.get_order_events = lambda events=events: events
+        api_server.ORDER_LONG_POLL_RECHECK = 0.5 if events is None else 5
+        result = {}
+
+        def long_poll():
+            response = client.get('/api/comenzi?asteapta=10')
+            result["done"] = time.perf_counter()
+            result["body"] = response.get_json()
+
+        poll = threading.Thread(target=long_poll)
+        poll.start()
+        time.sleep(0.3)
+        order_id = "LP1" if events is not None else "LP2"
+        saver = context.Process(target=_save_orders, args=(noi, [order_id], sent_at))
+        saver.start()
+        saver.join()
+        poll.join(15)
+        delay_ms = (result.get("done", float("inf")) - sent_at.value) * 1000
+        print(f"  {label}: comanda primită la {delay_ms:.1f} ms după salvare")
+        served = result.get("body", {}).get("comanda", {}).get("id_intern_comanda") == order_id
+        if events is not None:
+            check("long-poll-ul primește comanda imediat (< 100 ms)", served and delay_ms < 100, failures)
+        else:
+            check("fără evenimente: comanda este găsită la re-verificare (< 700 ms)", served and delay_ms < 700,
+                  failures)
+        for path in noi.iterdir():
+            path.unlink()
+
+    receiver.close()
+    if failures:
+        print(f"❌ {len(failures)} verificări eșuate")
+        return 1
+    print("✅ Toate verificările au trecut")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
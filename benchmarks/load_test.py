@@ -0,0 +1,257 @@
+"""
+Test de încărcare: câte terminale POS simultane suportă fiecare mod de worker (GUNICORN_MODE).
+
+Pentru fiecare mod pornește Gunicorn (gunicorn_config.py, fără serviciile de background)
+într-o copie temporară a aplicației, cu comenzi de test în comenzi/noi. Fiecare terminal
+simulat este un thread cu o conexiune keep-alive care interoghează GET /api/comenzi, apoi
+așteaptă `--think` secunde (și `--slow` secunde între antete și corp la o parte din clienți,
+ca un POS pe o rețea mobilă). Numărul de terminale crește în trepte, iar pentru fiecare mod
+se raportează cea mai mare treaptă la care p99 rămâne sub `--p99` ms fără erori.
+
+Utilizare:
+    python benchmarks/load_test.py [--modes sync,threaded,gevent] [--p99 200] [--levels 8,16,32,64,128]
+    python benchmarks/load_test.py --url http://127.0.0.1:5550   # un server deja pornit
+"""
+
+import argparse
+import http.client
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import urlparse
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+API_KEY = "load-test-key"
+ORDER_FILES = 50
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _sandbox() -> Path:
+    """Copie a aplicației într-un director temporar (comenzi/, data/ și logs/ separate de cele reale)."""
+    root = Path(tempfile.mkdtemp(prefix="eeatingh_load_"))
+    shutil.copytree(BASE_DIR / "app", root / "app", ignore=shutil.ignore_patterns("__pycache__"))
+    for name in ("gunicorn_config.py", "wsgi.py"):
+        shutil.copy(BASE_DIR / name, root / name)
+    noi = root / "comenzi" / "noi"
+    noi.mkdir(parents=True)
+    for index in range(ORDER_FILES):
+        order = {"comanda": {"id_intern_comanda": str(1000 + index), "status_comanda": "processing",
+                             "total": "42.00", "produse": [{"denumire": "Pizza", "cantitate": 1}] * 5}}
+        (noi / f"20240101_1200{index:02d}_comanda_{1000 + index}.json").write_text(json.dumps(order), encoding="utf-8")
+    return root
+
+
+def _unlimited_quotas(terminals: int) -> str:
+    """API_RATE_LIMIT_QUOTAS fără limitare pentru terminalele simulate (testul măsoară worker-ii, nu limita)."""
+    return ",".join(f"pos-{index}=1000000/second" for index in range(terminals))
+
+
+class Server:
+    """Gunicorn pornit ca subproces, în modul dat."""
+
+    def __init__(self, mode: str, workers: int, terminals: int):
+        self.root = _sandbox()
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        env = dict(os.environ, GUNICORN_MODE=mode, GUNICORN_BIND=f"127.0.0.1:{self.port}",
+                   GUNICORN_WORKERS=str(workers), BACKGROUND_SERVICES="false", API_KEY=API_KEY,
+                   API_RATE_LIMIT_QUOTAS=_unlimited_quotas(terminals))
+        env.setdefault("EMAIL_USER", "benchmark@example.com")
+        env.setdefault("EMAIL_PASS", "benchmark")
+        self._log = open(self.root / "gunicorn.log", "wb")
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py", "wsgi:application"],
+            cwd=self.root, env=env, stdout=self._log, stderr=subprocess.STDOUT
+        )
+
+    def wait_ready(self, timeout: float = 30.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                return False
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=1)
+                connection.request("GET", "/api/health")
+                ok = connection.getresponse().status == 200
+                connection.close()
+                if ok:
+                    return True
+            except OSError:
+                pass
+            time.sleep(0.2)
+        return False
+
+    def stop(self) -> None:
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+        self._log.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class Terminal(threading.Thread):
+    """Un terminal POS simulat: interogare GET /api/comenzi pe o conexiune keep-alive."""
+
+    def __init__(self, url: str, index: int, think: float, slow: float, stop: threading.Event):
+        super().__init__(daemon=True)
+        parsed = urlparse(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.headers = {"X-API-Key": API_KEY, "X-Terminal-Id": f"pos-{index}", "Connection": "keep-alive"}
+        self.think = think
+        self.slow = slow
+        self.stop_event = stop
+        self.latencies: List[float] = []
+        self.errors = 0
+        self._connection: Optional[http.client.HTTPConnection] = None
+
+    def _request(self) -> None:
+        if self._connection is None:
+            self._connection = http.client.HTTPConnection(self.host, self.port, timeout=10)
+        if self.slow:
+            # Antetele sosesc, corpul request-ului întârzie (rețea lentă): worker-ul așteaptă după client
+            self._connection.putrequest("POST", "/api/comenzi")
+            for name, value in self.headers.items():
+                self._connection.putheader(name, value)
+            body = json.dumps({"id_comanda": "inexistent", "operatiune": "CONFIRMA"}).encode()
+            self._connection.putheader("Content-Type", "application/json")
+            self._connection.putheader("Content-Length", str(len(body)))
+            self._connection.endheaders()
+            time.sleep(self.slow)
+            self._connection.send(body)
+        else:
+            self._connection.request("GET", "/api/comenzi", headers=self.headers)
+        response = self._connection.getresponse()
+        response.read()
+        if response.status not in (200, 404):
+            raise http.client.HTTPException(f"status {response.status}")
+        if response.getheader("Connection", "").lower() == "close":
+            self._connection.close()
+            self._connection = None
+
+    def run(self) -> None:
+        while not self.stop_event.is_set():
+            start = time.perf_counter()
+            try:
+                self._request()
+                if not self.slow:
+                    self.latencies.append((time.perf_counter() - start) * 1000)
+            except (OSError, http.client.HTTPException):
+                self.errors += 1
+                if self._connection is not None:
+                    self._connection.close()
+                self._connection = None
+            self.stop_event.wait(self.think)
+        if self._connection is not None:
+            self._connection.close()
+
+
+def run_level(url: str, clients: int, duration: float, think: float, slow_share: float, slow: float) -> dict:
+    """Rulează `clients` terminale timp de `duration` secunde; latențele sunt măsurate doar la clienții normali."""
+    stop = threading.Event()
+    slow_clients = int(clients * slow_share)
+    terminals = [Terminal(url, index, think, slow if index < slow_clients else 0.0, stop) for index in range(clients)]
+    for terminal in terminals:
+        terminal.start()
+        time.sleep(0.002)  # Conectare eșalonată, ca terminalele pornite pe rând
+    time.sleep(duration)
+    stop.set()
+    for terminal in terminals:
+        terminal.join(timeout=15)
+
+    latencies = sorted(value for terminal in terminals for value in terminal.latencies)
+    if not latencies:
+        return {"clients": clients, "requests": 0, "p50": float("inf"), "p99": float("inf"),
+                "errors": sum(terminal.errors for terminal in terminals)}
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "rps": len(latencies) / duration,
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "errors": sum(terminal.errors for terminal in terminals),
+    }
+
+
+def measure(url: str, args) -> int:
+    """Treptele de încărcare pentru un server; returnează numărul maxim de terminale susținute."""
+    sustained = 0
+    for clients in args.levels:
+        result = run_level(url, clients, args.duration, args.think, args.slow_share, args.slow)
+        ok = result["errors"] == 0 and result["p99"] <= args.p99
+        print(f"  {'✅' if ok else '❌'} {clients:4d} terminale: {result['requests']:6d} request-uri, "
+              f"p50 {result['p50']:7.1f} ms, p99 {result['p99']:7.1f} ms, erori {result['errors']}")
+        if not ok:
+            break
+        sustained = clients
+    return sustained
+
+
+def available_modes(modes: List[str]) -> List[str]:
+    result = []
+    for mode in modes:
+        if mode == "gevent":
+            try:
+                import gevent  # noqa: F401
+            except ImportError:
+                print("⏭️  gevent nu este instalat - modul gevent este omis")
+                continue
+        result.append(mode)
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="sync,threaded,gevent", help="Modurile testate (GUNICORN_MODE)")
+    parser.add_argument("--url", default=None, help="Testează un server deja pornit (API_KEY=load-test-key)")
+    parser.add_argument("--workers", type=int, default=2, help="GUNICORN_WORKERS pentru serverele pornite")
+    parser.add_argument("--levels", default="8,16,32,64,128", help="Trepte de terminale simultane")
+    parser.add_argument("--duration", type=float, default=5.0, help="Secunde per treaptă")
+    parser.add_argument("--think", type=float, default=0.5, help="Pauza unui terminal între interogări (secunde)")
+    parser.add_argument("--slow-share", type=float, default=0.1, help="Fracțiunea de terminale pe o rețea lentă")
+    parser.add_argument("--slow", type=float, default=0.5, help="Întârzierea corpului la terminalele lente (secunde)")
+    parser.add_argument("--p99", type=float, default=200.0, help="Ținta p99 (ms)")
+    args = parser.parse_args()
+    args.levels = [int(level) for level in args.levels.split(",")]
+
+    if args.url:
+        print(f"Server {args.url}:")
+        print(f"Terminale susținute la p99 ≤ {args.p99:.0f} ms: {measure(args.url, args)}")
+        return 0
+
+    summary = {}
+    for mode in available_modes([mode.strip() for mode in args.modes.split(",") if mode.strip()]):
+        server = Server(mode, args.workers, max(args.levels))
+        try:
+            if not server.wait_ready():
+                print(f"❌ Gunicorn nu a pornit în modul {mode} (vezi {server.root / 'gunicorn.log'})")
+                return 1
+            print(f"Mod {mode} ({args.workers} worker-i):")
+            summary[mode] = measure(server.url, args)
+        finally:
+            server.stop()
+
+    print(f"Terminale POS susținute la p99 ≤ {args.p99:.0f} ms "
+          f"({int(args.slow_share * 100)}% pe rețea lentă, {args.slow:.1f} s):")
+    for mode, sustained in summary.items():
+        print(f"  {mode:9s} {sustained}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""
+Benchmark și verificare pentru logging-ul prin coadă (LOG_MODE) și rotația log-urilor.
+
+Măsoară latența request-urilor POST /api/comenzi (care loghează payload-ul POS-ului) și
+GET /api/comenzi cu LOG_MODE="sync" (scriere directă) și LOG_MODE="queue", cu un stdout
+lent (--stdout-delay, ca un pipe către journald / driver-ul de log Docker sub presiune).
+Verifică apoi, cu mai multe procese create prin fork după inițializarea logging-ului (ca
+worker-ii Gunicorn), că nicio linie nu este pierdută sau duplicată la rotație, că fișierele
+rotite sunt comprimate și limitate la LOG_BACKUP_COUNT, rotația la miezul nopții, renunțarea
+la mesaje când coada este plină și eșantionarea mesajelor DEBUG.
+
+Utilizare:
+    python benchmarks/logging_latency.py [--requests 2000] [--stdout-delay 0.2] [--processes 4]
+"""
+
+import argparse
+import gzip
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from _harness import check, setup_api
+
+logging.disable(logging.NOTSET)  # Benchmark-ul măsoară chiar logging-ul
+
+import app.config as config
+import app.logging_config as logging_config
+from app.logging_config import initialize_logging, DebugSampler, NonBlockingQueueHandler, SharedRotatingFileHandler
+
+from app import api_server
+
+
+class SlowStream:
+    """stdout care blochează `delay` secunde la fiecare scriere."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def write(self, text: str) -> int:
+        time.sleep(self.delay)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def _configure(log_file: Path, mode: str, stdout, **options) -> None:
+    """initialize_logging() cu setările date și stdout redirecționat."""
+    config.LOG_MODE = mode
+    for name, value in options.items():
+        setattr(config, name, value)
+    real_stdout, sys.stdout = sys.stdout, stdout
+    try:
+        initialize_logging(log_file)
+    finally:
+        sys.stdout = real_stdout
+
+
+def _flush() -> None:
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, NonBlockingQueueHandler):
+            handler.stop()
+
+
+def measure(mode: str, requests: int, delay: float, root: Path) -> dict:
+    """Latențele (ms) request-urilor POST și GET în modul dat."""
+    _configure(root / f"{mode}.log", mode, SlowStream(delay), LOG_ROTATE_WHEN="")
+    client = api_server.app.test_client()
+    # Confirmare pentru o comandă inexistentă: 404 după logarea payload-ului, fără fișiere mutate
+    payload = {"id_comanda": "404", "operatiune": "CONFIRMA", "timp_livrare": 30,
+               "produse": [{"nume": f"Produs {index}", "cantitate": 2, "pret": "24.50"} for index in range(50)]}
+    latencies = {"POST": [], "GET": []}
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.post('/api/comenzi', json=payload)
+        latencies["POST"].append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        client.get('/api/comenzi')
+        latencies["GET"].append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    _flush()
+    drain_ms = (time.perf_counter() - start) * 1000
+    logged = sum(1 for line in open(root / f"{mode}.log", encoding='utf-8') if "POST RECEIVED" in line)
+    result = {"drain_ms": drain_ms, "logged": logged}
+    for method, values in latencies.items():
+        values.sort()
+        result[method] = (statistics.median(values), values[int(len(values) * 0.99)])
+    return result
+
+
+def _writer(index: int, lines: int, start) -> None:
+    start.wait()
+    logger = logging.getLogger(f"eeatingh.worker{index}")
+    for line in range(lines):
+        logger.info("linia %d-%d %s", index, line, "x" * 80)
+    logging.shutdown()  # Ca atexit la oprirea unui worker Gunicorn (multiprocessing iese prin os._exit)
+
+
+def rotated_files(log_file: Path) -> list:
+    return sorted(path for path in log_file.parent.iterdir() if path.name.startswith(f"{log_file.name}.")
+                  and path.suffix != ".lock")
+
+
+def read_all(log_file: Path) -> list:
+    lines = []
+    for path in rotated_files(log_file) + [log_file]:
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            lines.extend(f.read().splitlines())
+    return lines
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="Request-uri POST + GET per mod")
+    parser.add_argument("--stdout-delay", type=float, default=0.2, help="Blocarea stdout per scriere (ms)")
+    parser.add_argument("--processes", type=int, default=4, help="Procese care scriu în același fișier")
+    parser.add_argument("--lines", type=int, default=5000, help="Linii de log per proces")
+    args = parser.parse_args()
+
+    failures = []
+    root = Path(tempfile.mkdtemp())
+    setup_api(root)
+    api_server.COMENZI_NOI.mkdir()
+
+    results = {}
+    for mode in ("sync", "queue"):
+        results[mode] = result = measure(mode, args.requests, args.stdout_delay / 1000, root)
+        print(f"{mode:5s}: POST p50 {result['POST'][0]:.3f} ms p99 {result['POST'][1]:.3f} ms, "
+              f"GET p50 {result['GET'][0]:.3f} ms p99 {result['GET'][1]:.3f} ms "
+              f"(golirea cozii la final: {result['drain_ms']:.0f} ms)")
+    check("queue: latența POST p50 mai mică decât sync", results["queue"]["POST"][0] < results["sync"]["POST"][0],
+          failures)
+    check("queue: latența GET p50 mai mică decât sync", results["queue"]["GET"][0] < results["sync"]["GET"][0],
+          failures)
+    check("toate payload-urile ajung în fișier în ambele moduri",
+          results["sync"]["logged"] == results["queue"]["logged"] == args.requests, failures)
+
+    print("Rotație cu mai multe procese:")
+    log_file = root / "shared" / "app.log"
+    _configure(log_file, "queue", open(os.devnull, 'w'), LOG_MAX_BYTES=64 * 1024, LOG_BACKUP_COUNT=10000,
+               LOG_COMPRESS=True)
+    context = multiprocessing.get_context("fork")
+    start = context.Event()
+    writers = [context.Process(target=_writer, args=(index, args.lines, start)) for index in range(args.processes)]
+    for writer in writers:
+        writer.start()
+    start.set()
+    for writer in writers:
+        writer.join()
+    _flush()
+    # Procesele s-au oprit înainte ca thread-urile lor de compresie să ruleze
+    leftover = SharedRotatingFileHandler(log_file, backup_count=10000)
+    leftover.compress_grace = 0
+    leftover._housekeeping()
+
+    lines = [line for line in read_all(log_file) if " - INFO - linia " in line]
+    expected = {f"linia {index}-{line}" for index in range(args.processes) for line in range(args.lines)}
+    found = [line.split(" - INFO - ")[1].rsplit(" ", 1)[0] for line in lines]
+    rotated = rotated_files(log_file)
+    sizes = [len(gzip.open(path).read()) for path in rotated if path.suffix == ".gz"]
+    print(f"  {len(found)} linii, {len(rotated)} fișiere rotite, maxim {max(sizes, default=0) // 1024} KB")
+    check("nicio linie pierdută sau duplicată", len(found) == len(expected) and set(found) == expected, failures)
+    check("fișierele rotite sunt comprimate", rotated and all(path.suffix == ".gz" for path in rotated), failures)
+    check("rotația respectă dimensiunea maximă", sizes and max(sizes) <= 2 * 64 * 1024, failures)
+
+    SharedRotatingFileHandler(log_file, backup_count=3)._housekeeping()
+    check("fișierele rotite sunt limitate la LOG_BACKUP_COUNT", len(rotated_files(log_file)) == 3, failures)
+
+    handler = SharedRotatingFileHandler(root / "daily.log", when="midnight", compress=False)
+    handler.emit(logging.makeLogRecord({"msg": "ieri"}))
+    handler._rollover_at = time.time() - 1
+    handler.emit(logging.makeLogRecord({"msg": "azi"}))
+    handler.close()
+    daily = rotated_files(root / "daily.log")
+    check("rotația la miezul nopții",
+          len(daily) == 1 and daily[0].read_text() == "ieri\n" and (root / "daily.log").read_text() == "azi\n",
+          failures)
+
+    print("Coadă plină și eșantionare DEBUG:")
+    stalled = logging.Handler()
+    stalled.emit = lambda record: time.sleep(0.01)
+    handler = NonBlockingQueueHandler([stalled], maxsize=10)
+    stalled_logger = logging.getLogger("benchmark.stalled")
+    stalled_logger.propagate = False
+    stalled_logger.addHandler(handler)
+    start_time = time.perf_counter()
+    for index in range(1000):
+        stalled_logger.warning("mesaj %d", index)
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+    check(f"apelantul nu este blocat de un handler lent ({elapsed_ms:.1f} ms pentru 1000 de mesaje)",
+          elapsed_ms < 500 and handler.dropped > 0, failures)
+    handler.close()
+
+    kept = []
+    sampled = logging.getLogger("benchmark.sampled")
+    sampled.propagate = False
+    sampled.setLevel(logging.DEBUG)
+    collector = logging.Handler()
+    collector.emit = kept.append
+    collector.addFilter(DebugSampler(10))
+    sampled.addHandler(collector)
+    for _ in range(100):
+        sampled.debug("IDLE răspuns")
+    sampled.info("informativ")
+    check("DEBUG: 1 din 10 mesaje per linie, celelalte niveluri nefiltrate",
+          len(kept) == 11 and logging_config.logging_stats()["mode"] == "queue", failures)
+
+    if failures:
+        print(f"❌ {len(failures)} verificări eșuate")
+        return 1
+    print("✅ Toate verificările au trecut")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
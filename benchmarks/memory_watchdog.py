@@ -0,0 +1,142 @@
+"""
+Verificare și cost pentru watchdog-ul de memorie (MEMORY_WATCHDOG, GET /api/memorie).
+
+1. O scurgere simulată în procesul curent (ca Email Listener în procesul de ingestie): arborii
+   BeautifulSoup ai emailurilor parsate sunt reținuți într-o listă. Verifică faptul că
+   raportul indică locația alocărilor din bs4 și creșterea obiectelor Tag, că alerta este
+   trimisă o singură dată per prag depășit și că GET /api/memorie servește raportul.
+2. Un proces creat prin fork (ca un worker Gunicorn) nu moștenește tracemalloc.
+3. Costul: construirea arborelui BeautifulSoup al unui email cu și fără tracemalloc, durata
+   unui snapshot.
+
+Utilizare:
+    python benchmarks/memory_watchdog.py [--emails 300] [--threshold 20]
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from _harness import BASE_DIR, check, setup_api
+
+from bs4 import BeautifulSoup
+
+from app import api_server
+import app.services.memory_watchdog as memory_watchdog
+import app.services.notification_service as notification_service
+from app.services.memory_watchdog import MemoryWatchdog
+
+CORPUS_EMAIL = BASE_DIR / "benchmarks" / "corpus" / "forwarded_cash.html"
+
+# Arborii "uitați" de scurgerea simulată
+_leaked = []
+
+
+class FakeNotifications:
+    """Notificările trimise (în loc de SMTP)."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_notification(self, subject: str, content: str, recipient=None) -> bool:
+        self.sent.append((subject, content))
+        return True
+
+
+def _child_tracing(queue) -> None:
+    queue.put(tracemalloc.is_tracing())
+
+
+def _parse_time(html: str, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        BeautifulSoup(html, "html.parser")
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=300, help="Emailuri ai căror arbori sunt reținuți")
+    parser.add_argument("--threshold", type=float, default=20, help="Pragul de alertă (MB)")
+    args = parser.parse_args()
+
+    failures = []
+    root = Path(tempfile.mkdtemp())
+    html = CORPUS_EMAIL.read_text(encoding='utf-8')
+    notifications = FakeNotifications()
+    notification_service.get_notification_service = lambda: notifications
+    setup_api(root)
+    client = api_server.app.test_client()
+
+    print("Cost:")
+    plain_ms = _parse_time(html, 50)
+    watchdog = MemoryWatchdog(interval=3600, report_file=root / "memory.json", alert_growth_mb=args.threshold)
+    watchdog.start()
+    traced_ms = _parse_time(html, 50)
+    print(f"  arborele unui email: {plain_ms:.2f} ms fără tracemalloc, {traced_ms:.2f} ms cu tracemalloc "
+          f"({traced_ms / plain_ms - 1:+.0%})")
+
+    print("Scurgere simulată:")
+    quiet = watchdog.check()
+    check("fără creștere: nicio alertă", quiet["alerte_trimise"] == 0 and not notifications.sent, failures)
+    for _ in range(args.emails):
+        _leaked.append(BeautifulSoup(html, "html.parser"))
+    start = time.perf_counter()
+    report = watchdog.check()
+    snapshot_ms = (time.perf_counter() - start) * 1000
+    top = report["alocari"]["crestere_de_la_pornire"]
+    types = {entry["tip"]: entry["diferenta"] for entry in report["obiecte"]["crestere_de_la_pornire"]}
+    print(f"  RSS {report['rss_mb']} MB ({report['rss_crestere_mb']:+} MB), tracemalloc "
+          f"{report['tracemalloc']['curent_mb']} MB, snapshot {snapshot_ms:.0f} ms")
+    for entry in top[:3]:
+        print(f"    {entry['diferenta_kb']:+10.0f} KB  {entry['locatie']}")
+    check("locația cu cea mai mare creștere este în bs4", top and "bs4" in top[0]["locatie"], failures)
+    check("creșterea obiectelor Tag este raportată", types.get("Tag", 0) >= args.emails, failures)
+    check("creșterea față de snapshot-ul anterior este aceeași scurgere",
+          report["alocari"]["crestere_fata_de_snapshot_anterior"][:1] and
+          "bs4" in report["alocari"]["crestere_fata_de_snapshot_anterior"][0]["locatie"], failures)
+    check(f"alertă trimisă la +{args.threshold:g} MB RSS",
+          report["rss_crestere_mb"] < args.threshold or (len(notifications.sent) == 1
+                                                         and "bs4" in notifications.sent[0][1]), failures)
+    alerts = len(notifications.sent)
+    again = watchdog.check()
+    new_threshold = again["rss_crestere_mb"] // args.threshold > report["rss_crestere_mb"] // args.threshold
+    check("același prag nu este raportat din nou", len(notifications.sent) == alerts + new_threshold, failures)
+
+    memory_watchdog.MEMORY_REPORT_FILE = root / "memory.json"
+    response = client.get('/api/memorie')
+    served = response.get_json()
+    check("GET /api/memorie servește ultimul raport", response.status_code == 200 and served.get("activ")
+          and served.get("pid") == os.getpid() and len(served.get("istoric", [])) == 4, failures)
+    memory_watchdog.MEMORY_REPORT_FILE = root / "missing.json"
+    check("fără raport: 404", client.get('/api/memorie').status_code == 404, failures)
+
+    print("Fork:")
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    child = context.Process(target=_child_tracing, args=(queue,))
+    child.start()
+    child_tracing = queue.get(timeout=10)
+    child.join()
+    check("procesul creat prin fork nu moștenește tracemalloc", tracemalloc.is_tracing() and not child_tracing,
+          failures)
+
+    watchdog.stop()
+    _leaked.clear()
+    if failures:
+        print(f"❌ {len(failures)} verificări eșuate")
+        return 1
+    print("✅ Toate verificările au trecut")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
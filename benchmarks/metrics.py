@@ -0,0 +1,174 @@
+"""
+Benchmark și verificare pentru metricile Prometheus (GET /metrics).
+
+Măsoară costul unei observații într-o histogramă (un thread și 8 thread-uri în paralel),
+apoi simulează procesul master Gunicorn (Email Listener: IMAP, parsare, notificări) și
+un al doilea worker API ca procese separate, care publică valorile, și verifică faptul că
+/metrics le adună exact cu cele ale worker-ului curent, în format text Prometheus valid.
+
+Utilizare:
+    python benchmarks/metrics.py [--observations 200000]
+"""
+
+import argparse
+import multiprocessing
+import re
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from _harness import check, setup_api
+
+from app import api_server
+import app.services.metrics as metrics
+from app.services.metrics import Histogram, IMAP_COMMAND_SECONDS, PARSE_SECONDS, ORDERS_SAVED
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})? (-?[0-9.e+-]+|\+Inf|NaN)$')
+
+
+def _master(metrics_dir: str, ready) -> None:
+    """Procesul master: Email Listener cu 100 de comenzi IMAP și 40 de parsări."""
+    metrics.METRICS_DIR = Path(metrics_dir)
+    for index in range(100):
+        IMAP_COMMAND_SECONDS.labels("fetch").observe(0.05 + index * 0.001)
+    for _ in range(40):
+        PARSE_SECONDS.labels("lxml").observe(0.004)
+    ORDERS_SAVED.inc(40)
+    metrics.publish()
+    ready.set()
+    time.sleep(60)
+
+
+def _worker(metrics_dir: str, ready) -> None:
+    """Alt worker API: 7 comenzi salvate (ex. reprocesare din carantină)."""
+    metrics.METRICS_DIR = Path(metrics_dir)
+    ORDERS_SAVED.inc(7)
+    metrics.publish()
+    ready.set()
+    time.sleep(60)
+
+
+def parse_exposition(text: str) -> dict:
+    """Parsează formatul text Prometheus; ridică ValueError la o linie invalidă."""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("# HELP ") or line.startswith("# TYPE "):
+            continue
+        match = SAMPLE.match(line)
+        if match is None:
+            raise ValueError(f"Linie invalidă: {line!r}")
+        samples[match.group(1) + (match.group(2) or "")] = float(match.group(3))
+    return samples
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--observations", type=int, default=200000, help="Observații pentru măsurarea costului")
+    args = parser.parse_args()
+
+    failures = []
+    histogram = Histogram("benchmark_seconds", "Benchmark", ("operation",))
+    child = histogram.labels("get")
+    start = time.perf_counter()
+    for _ in range(args.observations):
+        child.observe(0.003)
+    single_ns = (time.perf_counter() - start) * 1e9 / args.observations
+    start = time.perf_counter()
+    for _ in range(args.observations):
+        histogram.labels("get").observe(0.003)
+    labelled_ns = (time.perf_counter() - start) * 1e9 / args.observations
+
+    def hammer() -> None:
+        for _ in range(args.observations // 8):
+            histogram.labels("get").observe(0.003)
+
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    threaded_ns = (time.perf_counter() - start) * 1e9 / (args.observations // 8 * 8)
+    print(f"Cost per observație: {single_ns:.0f} ns, cu etichete {labelled_ns:.0f} ns, "
+          f"8 thread-uri {threaded_ns:.0f} ns")
+    check("observația costă sub 2 µs", labelled_ns < 2000 and threaded_ns < 2000, failures)
+    check("nicio observație pierdută sub concurență",
+          child.value()[0][histogram.buckets.index(0.005)] == args.observations * 2 + args.observations // 8 * 8,
+          failures)
+    del metrics._registry["benchmark_seconds"]
+
+    print("Agregare între procese:")
+    metrics_dir = Path(tempfile.mkdtemp())
+    metrics.METRICS_DIR = metrics_dir
+    setup_api(metrics_dir)
+    api_server.COMENZI_NOI.mkdir()
+    for index in range(3):
+        (api_server.COMENZI_NOI / f"20240101_120000_comanda_{index}.json").write_text("{}", encoding="utf-8")
+    ORDERS_SAVED.inc(1000)  # Înainte de fork: procesele copil nu trebuie să numere aceste valori
+
+    context = multiprocessing.get_context("fork")
+    master_ready, worker_ready = context.Event(), context.Event()
+    processes = [context.Process(target=_master, args=(str(metrics_dir), master_ready), daemon=True),
+                 context.Process(target=_worker, args=(str(metrics_dir), worker_ready), daemon=True)]
+    for process in processes:
+        process.start()
+    master_ready.wait(10)
+    worker_ready.wait(10)
+    (metrics_dir / "999999.json").write_text('{"eeatingh_orders_saved_total": {}}', encoding="utf-8")
+
+    client = api_server.app.test_client()
+    for _ in range(5):
+        client.get('/api/comanda/123')
+    client.get('/api/health')
+    response = client.get('/metrics')
+    text = response.get_data(as_text=True)
+    try:
+        samples = parse_exposition(text)
+        valid = True
+    except ValueError as e:
+        print(f"  {e}")
+        samples, valid = {}, False
+    for process in processes:
+        process.terminate()
+
+    check("format text Prometheus valid", response.status_code == 200 and valid
+          and response.mimetype == "text/plain", failures)
+    check("contoarele sunt adunate exact între procese (1000 + 40 + 7)",
+          samples.get("eeatingh_orders_saved_total") == 1047, failures)
+    check("histogramele procesului master (IMAP) apar în /metrics",
+          samples.get('eeatingh_imap_command_duration_seconds_count{command="fetch"}') == 100
+          and samples.get('eeatingh_parse_duration_seconds_count{engine="lxml"}') == 40, failures)
+    buckets = [value for key, value in samples.items()
+               if key.startswith('eeatingh_imap_command_duration_seconds_bucket{command="fetch"')]
+    check("bucket-uri cumulative, +Inf = _count", buckets == sorted(buckets) and buckets[-1] == 100, failures)
+    check("latența per endpoint folosește regula URL",
+          samples.get('eeatingh_http_request_duration_seconds_count'
+                      '{method="GET",endpoint="/api/comanda/<id_comanda>",status="404"}') == 5, failures)
+    check("coada comenzi/noi calculată la scrape", samples.get("eeatingh_orders_pending") == 3, failures)
+    check("fișierul unui proces oprit este ignorat și șters", not (metrics_dir / "999999.json").exists(), failures)
+
+    print("Autentificare /metrics:")
+    api_server.API_KEY, api_server.METRICS_TOKEN = "cheie", "token"
+    bearer = {'Authorization': 'Bearer token'}
+    check("fără credențiale: 401", client.get('/metrics').status_code == 401, failures)
+    check("token bearer sau X-API-Key: 200", client.get('/metrics', headers=bearer).status_code == 200
+          and client.get('/metrics', headers={'X-API-Key': 'cheie'}).status_code == 200, failures)
+    check("X-API-Key invalid: 403", client.get('/metrics', headers={'X-API-Key': 'alta'}).status_code == 403, failures)
+    api_server.API_KEY = None
+    check("METRICS_TOKEN fără API_KEY: endpoint-ul rămâne protejat",
+          client.get('/metrics').status_code == 401
+          and client.get('/metrics', headers={'Authorization': 'Bearer alt'}).status_code == 401
+          and client.get('/metrics', headers=bearer).status_code == 200, failures)
+    api_server.METRICS_TOKEN = None
+
+    if failures:
+        print(f"❌ {len(failures)} verificări eșuate")
+        return 1
+    print("✅ Toate verificările au trecut")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+Benchmark și verificare pentru dispecerul asincron de notificări.
+
+Rulează pe serverul SMTP local din smtp_stub.py (cu latență simulată) și compară timpul
+petrecut de apelant cu trimiterea sincronă anterioară (conectare, login și trimitere la
+fiecare notificare). Verifică apoi: sesiunea persistentă, reconectarea după închiderea
+sesiunii de către server, reîncercările după erori temporare, renunțarea la notificări
+când coada este plină, gruparea în modul digest și controlul unei avalanșe de erori
+(deduplicare, buget orar, rezumat).
+
+Utilizare:
+    python benchmarks/notification_dispatch.py [--count 20] [--latency 0.05]
+"""
+
+import argparse
+import smtplib
+import sys
+import tempfile
+import time
+from email.message import EmailMessage
+from pathlib import Path
+
+from _harness import check
+
+from app.services.notification_dispatcher import NotificationDispatcher
+from app.services.notification_throttle import ErrorThrottle, collect_throttle_stats
+from benchmarks.smtp_stub import SMTPStub
+
+
+def _message(index: int, recipient: str = "admin@example.com") -> EmailMessage:
+    msg = EmailMessage()
+    msg['From'] = "Automatizare comenzi Eeatingh <benchmark@example.com>"
+    msg['To'] = recipient
+    msg['Subject'] = f"🔔 Notificare {index}"
+    msg.set_content(f"Conținutul notificării {index}")
+    return msg
+
+
+def _dispatcher(stub: SMTPStub, **kwargs) -> NotificationDispatcher:
+    options = {"starttls": False, "retry_delay": 0.01, "digest_window": 0}
+    options.update(kwargs)
+    return NotificationDispatcher(host=stub.host, port=stub.port, user="benchmark", password="benchmark", **options)
+
+
+def measure_sync(stub: SMTPStub, count: int) -> float:
+    """Timpul apelantului (ms/notificare) cu trimiterea sincronă: sesiune nouă la fiecare email."""
+    start = time.perf_counter()
+    for index in range(count):
+        with smtplib.SMTP(host=stub.host, port=stub.port) as smtp:
+            smtp.login("benchmark", "benchmark")
+            smtp.send_message(_message(index))
+    return (time.perf_counter() - start) * 1000 / count
+
+
+def measure_async(stub: SMTPStub, count: int) -> tuple:
+    """(ms/notificare pentru apelant, ms până la livrarea tuturor, conexiuni deschise)."""
+    dispatcher = _dispatcher(stub)
+    connections = stub.connections
+    messages = [_message(index) for index in range(count)]
+    start = time.perf_counter()
+    for msg in messages:
+        dispatcher.submit(msg)
+    caller = (time.perf_counter() - start) * 1000 / count
+    dispatcher.flush(timeout=60)
+    delivered = (time.perf_counter() - start) * 1000
+    dispatcher.stop()
+    return caller, delivered, stub.connections - connections
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20, help="Notificări per scenariu")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latența simulată a serverului SMTP (secunde)")
+    args = parser.parse_args()
+
+    failures = []
+    with SMTPStub(latency=args.latency) as stub:
+        sync_ms = measure_sync(stub, args.count)
+        caller_ms, delivered_ms, connections = measure_async(stub, args.count)
+        print(f"Trimitere sincronă:  {sync_ms:8.2f} ms/notificare în thread-ul apelantului")
+        print(f"Dispecer asincron:   {caller_ms:8.3f} ms/notificare în thread-ul apelantului "
+              f"({delivered_ms:.0f} ms până la livrarea a {args.count}, {connections} conexiune(i) SMTP)")
+        check("apelantul nu așteaptă serverul SMTP", caller_ms < args.latency * 1000 / 10, failures)
+        check("o singură sesiune SMTP pentru toate notificările", connections == 1, failures)
+
+    print("Scenarii:")
+    with SMTPStub() as stub:
+        dispatcher = _dispatcher(stub)
+        dispatcher.submit(_message(1))
+        dispatcher.flush()
+        stub.drop_connections()
+        time.sleep(0.05)
+        dispatcher.submit(_message(2))
+        dispatcher.flush()
+        check("reconectare după închiderea sesiunii de către server",
+              len(stub.messages) == 2 and dispatcher.stats()["connections"] == 2, failures)
+
+        stub.fail_next = 2
+        dispatcher.submit(_message(3))
+        dispatcher.flush()
+        stats = dispatcher.stats()
+        check("reîncercare după erori temporare (451)", len(stub.messages) == 3 and stats["retries"] == 2, failures)
+
+        stub.fail_next = 10
+        dispatcher.submit(_message(4))
+        dispatcher.flush()
+        stub.fail_next = 0
+        check("renunțare după NOTIFICATION_MAX_RETRIES", dispatcher.stats()["failed"] == 1, failures)
+        dispatcher.stop()
+
+    with SMTPStub(latency=0.2) as stub:
+        dispatcher = _dispatcher(stub, queue_size=5)
+        accepted = sum(dispatcher.submit(_message(index)) for index in range(12))
+        dispatcher.flush(timeout=10)
+        dispatcher.stop()
+        check(f"coadă plină: {accepted}/12 acceptate, restul renunțate fără blocare",
+              accepted < 12 and dispatcher.stats()["dropped"] == 12 - accepted, failures)
+
+    with SMTPStub() as stub:
+        dispatcher = _dispatcher(stub, digest_window=0.3)
+        for index in range(args.count):
+            dispatcher.submit(_message(index))
+        dispatcher.submit(_message(99, recipient="altcineva@example.com"))
+        dispatcher.flush()
+        dispatcher.stop()
+        digest = [message for message in stub.messages if message['To'] == "admin@example.com"]
+        check(f"digest: {args.count} notificări într-un singur email",
+              len(digest) == 1 and f"Notificare {args.count - 1}" in digest[0].get_content(), failures)
+        check("digest separat per destinatar", len(stub.messages) == 2, failures)
+
+    with SMTPStub() as stub:
+        dispatcher = _dispatcher(stub)
+
+        def send_summary(subject: str, content: str) -> bool:
+            msg = _message(0)
+            msg.replace_header('Subject', subject)
+            msg.set_content(content)
+            return dispatcher.submit(msg)
+
+        stats_dir = Path(tempfile.mkdtemp())
+        throttle = ErrorThrottle(send_summary, dedup_window=60, budget=5, summary_interval=0.3, stats_dir=stats_dir)
+        admitted = 0
+        for index in range(300):
+            # Conexiune instabilă: aceleași 3 erori repetate, cu UID-uri diferite în mesaj
+            kind = index % 3
+            if throttle.admit(f"EmailListener - idle_loop (eroare {kind})", f"socket closed uid={index}", "OSError"):
+                admitted += 1
+                dispatcher.submit(_message(index))
+        for index in range(10):
+            if throttle.admit(f"parse_order_html - email {index}", f"eroare {index}", f"Error{chr(65 + index)}"):
+                admitted += 1
+                dispatcher.submit(_message(index))
+        time.sleep(0.5)
+        dispatcher.flush()
+        dispatcher.stop()
+        stats = throttle.stats()
+        aggregated = collect_throttle_stats(stats_dir)
+        print(f"  310 erori -> {admitted} notificări, {stats['suppressed_duplicate']} duplicate, "
+              f"{stats['suppressed_budget']} peste buget, {stats['summaries']} rezumat(e)")
+        summary = [message for message in stub.messages if message['Subject'].startswith("Rezumat")]
+        check("avalanșă de erori: 3 amprente deduplicate + buget de 5/oră", admitted == 5, failures)
+        check("rezumat trimis cu numărul erorilor suprimate",
+              len(summary) == 1 and "305 notificări" in summary[0].get_content(), failures)
+        check("statistici agregate pentru /api/health",
+              aggregated["processes"] == 1 and aggregated["suppressed_duplicate"] == stats["suppressed_duplicate"], failures)
+
+    if failures:
+        print(f"❌ {len(failures)} verificări eșuate")
+        return 1
+    print("✅ Toate verificările au trecut")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
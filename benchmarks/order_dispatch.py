@@ -0,0 +1,168 @@
+"""
+Benchmark și verificare pentru distribuirea comenzilor către mai multe terminale POS.
+
+Pornește mai multe procese (ca worker-ii Gunicorn), fiecare cu mai multe terminale
+simulate care repetă GET /api/comenzi -> procesare -> POST CONFIRMA până la golirea
+cozii. Verifică faptul că în modul "lease" fiecare comandă este livrată unui singur
+terminal și confirmată exact o dată, măsoară debitul în funcție de numărul de terminale
+și îl compară cu modul "shared" (toate terminalele primesc aceeași comandă). Verifică
+apoi expirarea rezervărilor și conflictul la confirmarea unei comenzi rezervate de altul.
+
+Utilizare:
+    python benchmarks/order_dispatch.py [--orders 200] [--processes 2] [--work 0.02]
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from _harness import check, setup_api
+
+from app import api_server
+import app.services.order_dispatch as order_dispatch
+from app.services.order_dispatch import OrderLeases
+
+
+def _setup(root: Path, mode: str, lease_seconds: float) -> None:
+    """Redirecționează API-ul către folderele de test (în procesul curent)."""
+    setup_api(root)
+    api_server.DISPATCH_MODE = mode
+    order_dispatch._order_leases.set(OrderLeases(root / "dispatch.sqlite3", lease_seconds=lease_seconds))
+
+
+def _seed(root: Path, count: int) -> None:
+    (root / "noi").mkdir(parents=True)
+    for index in range(count):
+        order = {"comanda": {"id_intern_comanda": str(index), "status_comanda": "processing", "total": "42.00"}}
+        with open(root / "noi" / f"20240101_{index:06d}_comanda_{index}.json", 'w', encoding='utf-8') as f:
+            json.dump(order, f)
+
+
+def _terminal(client, name: str, work: float, results: list) -> None:
+    """Un terminal: preia, procesează și confirmă comenzi până când coada este goală."""
+    headers = {"X-Terminal-Id": name}
+    empty = 0
+    while empty < 3:
+        response = client.get('/api/comenzi', headers=headers)
+        data = response.get_json()
+        if data.get("status") == "empty":
+            empty += 1
+            time.sleep(0.01)
+            continue
+        empty = 0
+        order_id = data["comanda"]["id_intern_comanda"]
+        time.sleep(work)  # Operatorul POS acceptă comanda
+        status = client.post('/api/comenzi', headers=headers,
+                             json={"id_comanda": order_id, "operatiune": "CONFIRMA"}).status_code
+        results.append((name, order_id, status))
+
+
+def _worker(root: str, mode: str, process_index: int, terminals: int, work: float, start, queue) -> None:
+    _setup(Path(root), mode, lease_seconds=30)
+    client = api_server.app.test_client()
+    results = []
+    start.wait()
+    threads = [threading.Thread(target=_terminal, args=(client, f"pos-{process_index}-{index}", work, results))
+               for index in range(terminals)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    queue.put(results)
+
+
+def run(mode: str, orders: int, processes: int, terminals: int, work: float) -> dict:
+    """Golește o coadă de `orders` comenzi cu processes × terminals terminale."""
+    root = Path(tempfile.mkdtemp())
+    _seed(root, orders)
+    context = multiprocessing.get_context("fork")
+    start = context.Event()
+    queue = context.Queue()
+    workers = [context.Process(target=_worker, args=(str(root), mode, index, terminals, work, start, queue))
+               for index in range(processes)]
+    for worker in workers:
+        worker.start()
+    began = time.perf_counter()
+    start.set()
+    results = [item for _ in workers for item in queue.get(timeout=300)]
+    elapsed = time.perf_counter() - began
+    for worker in workers:
+        worker.join()
+
+    confirmed = [order_id for _, order_id, status in results if status == 200]
+    return {
+        "elapsed": elapsed,
+        "per_second": len(set(confirmed)) / elapsed,
+        "deliveries": len(results),
+        "confirmed": len(confirmed),
+        "unique": len(set(confirmed)),
+        "conflicts": sum(1 for *_, status in results if status == 409),
+        "other": sum(1 for *_, status in results if status not in (200, 409)),
+        "processed_files": len(list((root / "procesate").glob("*.json"))),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200, help="Comenzi în coadă")
+    parser.add_argument("--processes", type=int, default=2, help="Procese (worker-i Gunicorn)")
+    parser.add_argument("--work", type=float, default=0.02, help="Timpul de procesare pe terminal (secunde)")
+    args = parser.parse_args()
+
+    failures = []
+    throughput = {}
+    for terminals in (1, 2, 4, 8):
+        result = run("lease", args.orders, args.processes, terminals, args.work)
+        total = args.processes * terminals
+        throughput[total] = result["per_second"]
+        print(f"lease, {total:2d} terminale: {result['per_second']:7.1f} comenzi/s, "
+              f"{result['deliveries']} livrări, {result['conflicts']} conflicte, {result['other']} erori")
+        check(f"{total} terminale: fiecare comandă confirmată exact o dată",
+              result["unique"] == result["confirmed"] == result["processed_files"] == args.orders
+              and result["deliveries"] == args.orders and result["other"] == 0, failures)
+    terminals = sorted(throughput)
+    check(f"debitul crește cu numărul de terminale ({terminals[0]} -> {terminals[-1]}: "
+          f"×{throughput[terminals[-1]] / throughput[terminals[0]]:.1f})",
+          throughput[terminals[-1]] > 3 * throughput[terminals[0]], failures)
+
+    shared = run("shared", args.orders, args.processes, 4, args.work)
+    print(f"shared, {args.processes * 4:2d} terminale: {shared['per_second']:7.1f} comenzi/s, "
+          f"{shared['deliveries']} livrări, {shared['conflicts']} conflicte (aceeași comandă la mai multe terminale)")
+
+    print("Scenarii:")
+    root = Path(tempfile.mkdtemp())
+    _seed(root, 3)
+    _setup(root, "lease", lease_seconds=0.3)
+    client = api_server.app.test_client()
+
+    def take(terminal: str):
+        data = client.get('/api/comenzi', headers={"X-Terminal-Id": terminal}).get_json()
+        return data.get("comanda", {}).get("id_intern_comanda")
+
+    first, second, again = take("pos-a"), take("pos-b"), take("pos-a")
+    check("terminale diferite primesc comenzi diferite", (first, second) == ("0", "1"), failures)
+    check("GET repetat fără confirmare returnează aceeași comandă", again == "0", failures)
+    time.sleep(0.4)
+    check("rezervarea expirată revine în coadă", take("pos-c") == "0", failures)
+    response = client.post('/api/comenzi', headers={"X-Terminal-Id": "pos-a"},
+                           json={"id_comanda": "0", "operatiune": "CONFIRMA"})
+    check("confirmarea unei comenzi rezervate de alt terminal: 409", response.status_code == 409, failures)
+    response = client.post('/api/comenzi', headers={"X-Terminal-Id": "pos-c"},
+                           json={"id_comanda": "0", "operatiune": "CONFIRMA"})
+    check("terminalul care are rezervarea confirmă comanda",
+          response.status_code == 200 and order_dispatch._order_leases.get().holder("0") is None, failures)
+
+    if failures:
+        print(f"❌ {len(failures)} verificări eșuate")
+        return 1
+    print("✅ Toate verificările au trecut")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
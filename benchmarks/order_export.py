@@ -0,0 +1,256 @@
+"""
+Verificare și cost pentru exportul comenzilor (app/services/order_export.py, GET /api/export,
+export_orders.py).
+
+1. Arhivarea: Cleanup Service mută comenzile vechi din procesate/anulate în arhiva NDJSON gzip
+   (per lună) și le șterge din foldere.
+2. Un an de comenzi (arhive suprapuse, din rulări diferite ale curățeniei, plus folderele
+   curente): exportul este cronologic, fără duplicate (nici pentru o comandă arhivată, dar
+   încă neștearsă), filtrat pe interval; CSV are câte un rând per produs.
+3. O comandă confirmată în timpul exportului (mutată din noi în procesate) apare o singură dată.
+4. Memorie constantă: vârful tracemalloc pentru un an față de o lună; debitul față de
+   GUNICORN_TIMEOUT.
+5. API: răspuns în flux (chunked), un an întreg, parametri invalizi respinși; o eroare de
+   citire după status nu încheie răspunsul normal (clientul vede un răspuns incomplet).
+
+Utilizare:
+    python benchmarks/order_export.py [--per-day 50] [--products 3]
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from _harness import check, setup_api
+
+from app import api_server
+from app.config import GUNICORN_TIMEOUT
+import app.services.cleanup_service as cleanup_service
+import app.services.order_export as order_export
+from app.services.order_export import CSV_HEADER, archive_order_files, export_chunks, iter_orders
+
+YEAR_START = datetime(2025, 10, 1)
+
+
+class _SilentNotifications:
+    def send_notification(self, **kwargs):
+        return True
+
+
+def _order(order_id: str, moment: datetime, products: int) -> dict:
+    return {"comanda": {
+        "id_intern_comanda": order_id, "simbol_monetar": "RON", "nume_client": f"Client {order_id}",
+        "numar_telefon_client": "0712345678", "adresa_livrare_client": "Str. Exemplu 1",
+        "valoare_comanda": f"{10 * products:.2f}", "discounturi": [], "status_comanda": "processing",
+        "data_comanda": moment.strftime("%Y-%m-%d %H:%M:%S"),
+        "produse_comanda": [{"id_produs": f"P{index}", "denumire_produs": f"Produs, \"{index}\"",
+                             "cantitate_produs": 1, "pret_produs": "10.00", "id_intern_comanda": order_id,
+                             "observatii_produs": "", "extra": []} for index in range(products)]
+    }}
+
+
+def _write(folder: Path, order_id: str, moment: datetime, products: int) -> Path:
+    path = folder / f"{moment:%Y%m%d_%H%M%S}_comanda_{order_id}.json"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(_order(order_id, moment, products), f, indent=4, ensure_ascii=False)
+    return path
+
+
+def _generate(root: Path, per_day: int, products: int):
+    """Un an de comenzi: săptămânile vechi arhivate (ca de Cleanup Service), ultima săptămână în foldere."""
+    noi, procesate, anulate = root / "noi", root / "procesate", root / "anulate"
+    archive = root / "arhiva"
+    for folder in (noi, procesate, anulate):
+        folder.mkdir(parents=True)
+    expected = []
+    hot_from = YEAR_START + timedelta(days=358)
+    step = timedelta(seconds=86400 // per_day)
+    for day in range(365):
+        pending = []
+        for index in range(per_day):
+            moment = YEAR_START + timedelta(days=day) + index * step
+            order_id = f"{day:03d}{index:03d}"
+            folder_name, folder = ("anulate", anulate) if index % 10 == 0 else ("procesate", procesate)
+            if moment >= hot_from and index % 4 == 1:
+                folder_name, folder = "noi", noi
+            count = 0 if index % 25 == 7 else products  # Și comenzi fără produse
+            pending.append((folder_name, _write(folder, order_id, moment, count)))
+            expected.append((moment, order_id, count))
+        # Curățenia rulează zilnic, câte un folder, cu o săptămână de întârziere: arhivele
+        # procesate/anulate ale aceleiași luni au intervale suprapuse
+        if YEAR_START + timedelta(days=day) < hot_from:
+            for name in ("procesate", "anulate"):
+                archive_order_files([entry for entry in pending if entry[0] == name], archive)
+    # Arhivată, dar încă în folder (ștergerea eșuată): nu trebuie dublată
+    moment = hot_from - timedelta(days=1)
+    kept = _write(procesate, "DUP", moment, products)
+    archive_order_files([("procesate", kept)], archive)
+    _write(procesate, "DUP", moment, products)
+    expected.append((moment, "DUP", products))
+    expected.sort()
+    return ((("noi", noi), ("procesate", procesate), ("anulate", anulate)), archive, expected)
+
+
+def _export(folders, archive, fmt, start=None, end=None) -> bytes:
+    return b"".join(export_chunks(iter_orders(start, end, folders, archive), fmt))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--per-day", type=int, default=50, help="Comenzi pe zi")
+    parser.add_argument("--products", type=int, default=3, help="Produse per comandă")
+    args = parser.parse_args()
+
+    failures = []
+    root = Path(tempfile.mkdtemp())
+
+    print("Arhivare (Cleanup Service):")
+    cleanup_root = root / "cleanup"
+    procesate, anulate = cleanup_root / "procesate", cleanup_root / "anulate"
+    procesate.mkdir(parents=True)
+    anulate.mkdir()
+    old = time.time() - 30 * 86400
+    for index in range(20):
+        path = _write(procesate if index % 2 else anulate, f"C{index}", YEAR_START + timedelta(hours=index), 2)
+        os.utime(path, (old, old))
+    _write(procesate, "RECENTA", datetime.now(), 2)
+    cleanup_service.COMENZI_PROCESATE, cleanup_service.COMENZI_ANULATE = procesate, anulate
+    cleanup_service.get_notification_service = _SilentNotifications
+    order_export.COMENZI_ARHIVA = cleanup_root / "arhiva"
+    cleanup_service.CleanupService().cleanup_old_files()
+    archives = sorted((cleanup_root / "arhiva").rglob("*.ndjson.gz"))
+    remaining = sorted(path.name for path in procesate.iterdir()) + sorted(anulate.iterdir())
+    check("comenzile vechi arhivate și șterse din foldere, cea recentă păstrată",
+          len(archives) == 2 and len(remaining) == 1 and "RECENTA" in remaining[0], failures)
+    exported = [json.loads(line) for line in _export(
+        (("procesate", procesate), ("anulate", anulate)), cleanup_root / "arhiva", "ndjson").splitlines()]
+    check("comenzile arhivate rămân în export, cu folderul de origine",
+          len(exported) == 21 and exported[1]["folder"] == "procesate" and exported[0]["folder"] == "anulate",
+          failures)
+
+    print(f"Un an de comenzi ({args.per_day}/zi, {args.products} produse):")
+    started = time.perf_counter()
+    folders, archive, expected = _generate(root / "an", args.per_day, args.products)
+    archive_count = len(list(archive.rglob("*.ndjson.gz")))
+    hot_count = sum(len(os.listdir(path)) for _, path in folders)
+    print(f"  {len(expected)} comenzi: {archive_count} arhive, {hot_count} fișiere în foldere "
+          f"(generate în {time.perf_counter() - started:.1f}s)")
+
+    started = time.perf_counter()
+    ndjson = _export(folders, archive, "ndjson")
+    ndjson_seconds = time.perf_counter() - started
+    records = [json.loads(line) for line in ndjson.splitlines()]
+    saved = [record["salvata"] for record in records]
+    check("toate comenzile, o singură dată", sorted(record["comanda"]["id_intern_comanda"] for record in records)
+          == sorted(order_id for _, order_id, _ in expected), failures)
+    check("ordine cronologică (arhive suprapuse și foldere interclasate)", saved == sorted(saved), failures)
+    check("folderul comenzii păstrat (noi, procesate, anulate)",
+          {record["folder"] for record in records} == {"noi", "procesate", "anulate"}, failures)
+
+    start, end = YEAR_START + timedelta(days=40), YEAR_START + timedelta(days=70, hours=12)
+    ranged = [json.loads(line)["comanda"]["id_intern_comanda"]
+              for line in _export(folders, archive, "ndjson", start, end).splitlines()]
+    check("interval [from, to)", ranged == [order_id for moment, order_id, _ in expected if start <= moment < end],
+          failures)
+
+    started = time.perf_counter()
+    csv_data = _export(folders, archive, "csv")
+    csv_seconds = time.perf_counter() - started
+    rows = list(csv.reader(io.StringIO(csv_data.decode('utf-8'))))
+    header, rows = rows[0], rows[1:]
+    check("CSV: un rând per produs (unul pentru o comandă fără produse)",
+          len(rows) == sum(max(count, 1) for _, _, count in expected), failures)
+    product = header.index("denumire_produs")
+    check("CSV: valori cu virgule și ghilimele păstrate", rows[0][product] == 'Produs, "0"', failures)
+    check("CSV: toate rândurile au coloanele antetului", all(len(row) == len(CSV_HEADER) for row in rows), failures)
+    print(f"  {len(ndjson) / 1e6:.1f} MB NDJSON în {ndjson_seconds:.2f}s, {len(csv_data) / 1e6:.1f} MB CSV "
+          f"în {csv_seconds:.2f}s ({len(expected) / ndjson_seconds:.0f} comenzi/s)")
+    check(f"un an exportat de zeci de ori mai repede decât GUNICORN_TIMEOUT ({GUNICORN_TIMEOUT}s)",
+          max(ndjson_seconds, csv_seconds) < GUNICORN_TIMEOUT / 10, failures)
+
+    print("Memorie (tracemalloc, vârf):")
+    peaks = {}
+    for label, end in (("o lună", YEAR_START + timedelta(days=31)), ("un an", None)):
+        tracemalloc.start()
+        for _ in export_chunks(iter_orders(None, end, folders, archive), "csv"):
+            pass
+        peaks[label] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  {label}: {peaks[label] / 1024:.0f} KiB")
+    check("vârful memoriei nu crește cu intervalul exportat (< 1.5x pentru 12x mai multe comenzi)",
+          peaks["un an"] < 1.5 * peaks["o lună"], failures)
+
+    print("Comandă mutată în timpul exportului:")
+    noi, procesate = folders[0][1], folders[1][1]
+    moved = sorted(os.listdir(noi))[-1]
+    orders = iter_orders(None, None, folders, archive)
+    first = next(orders)
+    shutil.move(str(noi / moved), str(procesate / moved))
+    rest = [first] + list(orders)
+    matches = [record for record in rest if record["fisier"] == moved]
+    check("citită din folderul destinație, o singură dată",
+          len(matches) == 1 and matches[0]["folder"] == "procesate" and len(rest) == len(expected), failures)
+
+    print("API:")
+    order_export.COMENZI_NOI, order_export.COMENZI_PROCESATE, order_export.COMENZI_ANULATE = \
+        (path for _, path in folders)
+    order_export.COMENZI_ARHIVA = archive
+    setup_api(root)
+    client = api_server.app.test_client()
+    response = client.get('/api/export?from=2025-11-10&to=2025-12-09&format=csv', buffered=False)
+    chunk_sizes = [len(chunk) for chunk in response.response]
+    response.close()
+    body_rows = sum(chunk_sizes)
+    day_from, day_to = datetime(2025, 11, 10), datetime(2025, 12, 10)
+    month = [count for moment, _, count in expected if day_from <= moment < day_to]
+    rows = list(csv.reader(io.StringIO(client.get('/api/export?from=2025-11-10&to=2025-12-09&format=csv')
+                                       .get_data(as_text=True))))
+    check("răspuns în flux, în mai multe bucăți", response.status_code == 200 and response.is_streamed
+          and len(chunk_sizes) > 1, failures)
+    check("'to' include toată ziua; CSV un rând per produs",
+          len(rows) - 1 == sum(max(count, 1) for count in month), failures)
+    print(f"  {len(month)} comenzi: {body_rows / 1e6:.1f} MB în {len(chunk_sizes)} bucăți")
+    ndjson_response = client.get('/api/export?from=2026-09-20T00:00:00&to=2026-09-21')
+    check("NDJSON implicit, moment ISO acceptat", ndjson_response.mimetype == 'application/x-ndjson'
+          and len(ndjson_response.get_data().splitlines()) == args.per_day * 2, failures)
+    check("parametri invalizi: 400", all(client.get(url).status_code == 400 for url in (
+        '/api/export?format=xml', '/api/export?from=ieri', '/api/export?from=2026-01-02&to=2026-01-01')),
+        failures)
+    year = client.get('/api/export')
+    check("un an întreg, fără interval", year.status_code == 200
+          and len(year.get_data().splitlines()) == len(expected), failures)
+
+    def failing_orders(start, end):
+        yield from iter_orders(start, end, folders, archive)
+        raise OSError("arhivă ilizibilă")
+    api_server.iter_orders = failing_orders
+    response = client.get('/api/export', buffered=False)
+    received, interrupted = 0, False
+    try:
+        for chunk in response.response:
+            received += len(chunk)
+    except OSError:
+        interrupted = True
+    response.close()
+    api_server.iter_orders = iter_orders
+    check("eroare după status: răspunsul nu se încheie normal (fără ultimul chunk)",
+          response.status_code == 200 and received > 0 and interrupted, failures)
+
+    if failures:
+        print(f"❌ {len(failures)} verificări eșuate")
+        return 1
+    print("✅ Toate verificările au trecut")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
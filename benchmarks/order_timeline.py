@@ -0,0 +1,205 @@
+"""
+Benchmark și verificare pentru timpii comenzilor pe etape (GET /api/timpi).
+
+1. Un email din corpus trece prin EmailListener.process_new_email (IMAP simulat, cu
+   INTERNALDATE): comanda salvată are data emailului, sosirea IMAP, parsarea și salvarea.
+2. "Vineri seara": --orders comenzi sosesc în rafală, iar --terminals terminale POS (DISPATCH_MODE
+   "lease") le preiau, le procesează și le confirmă (10% anulate). Verifică faptul că /api/timpi
+   raportează toate comenzile, percentile ordonate și timpul operatorului POS simulat.
+3. Costul înregistrării (prima preluare, preluări repetate, confirmare) per request și
+   durata calculării percentilelor pentru 10.000 de comenzi în fereastră.
+
+Utilizare:
+    python benchmarks/order_timeline.py [--orders 200] [--terminals 8] [--work 0.02]
+"""
+
+import argparse
+import email.mime.text
+import functools
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from _harness import BASE_DIR, check, setup_api
+
+from app import api_server
+from app.config import EMAIL_SENDER
+import app.services.email_listener as email_listener_module
+import app.services.order_dispatch as order_dispatch
+import app.services.order_service as order_service
+import app.services.order_timeline as order_timeline
+import app.services.parse_memo as parse_memo
+import app.services.quarantine as quarantine
+from app.services.email_listener import EmailListener
+from app.services.order_dispatch import OrderLeases
+from app.services.order_timeline import OrderTimeline, OUTCOME_CONFIRMED
+from app.services.parse_memo import ParseMemo
+from app.services.quarantine import Quarantine
+
+CORPUS_EMAIL = BASE_DIR / "benchmarks" / "corpus" / "forwarded_cash.html"
+
+
+class FakeIMAP:
+    """Căsuța IMAP cu un singur email."""
+
+    def __init__(self, raw_email: bytes, internal_date: datetime):
+        self.raw_email = raw_email
+        self.internal_date = internal_date
+
+    def fetch(self, ids, items):
+        return {ids[0]: {b'RFC822': self.raw_email, b'INTERNALDATE': self.internal_date}}
+
+    def set_flags(self, ids, flags):
+        return {}
+
+
+def _setup(root: Path) -> None:
+    """Redirecționează folderele și bazele de date către directorul de test."""
+    setup_api(root)
+    for name in ("noi", "procesate", "anulate"):
+        (root / name).mkdir(parents=True, exist_ok=True)
+    order_service.COMENZI_NOI = root / "noi"
+    order_service.COMENZI_PROCESATE = root / "procesate"
+    order_service.COMENZI_ANULATE = root / "anulate"
+    # Folderul implicit al save_orders_batch este legat la definirea funcției
+    email_listener_module.save_orders_batch = functools.partial(order_service.save_orders_batch,
+                                                                output_folder=root / "noi")
+    email_listener_module.ORDER_COUNTER_FILE = root / "order_counter.txt"
+    api_server.DISPATCH_MODE = "lease"
+    order_timeline._order_timeline.set(OrderTimeline(root / "timeline.sqlite3"))
+    order_dispatch._order_leases.set(OrderLeases(root / "dispatch.sqlite3", lease_seconds=30))
+    parse_memo._parse_memo.set(ParseMemo(root / "parse_memo.sqlite3"))
+    quarantine._quarantine.set(Quarantine(root / "quarantine.sqlite3", dead_letter_dir=root / "dead_letter"))
+
+
+def _terminal(client, name: str, work: float, results: list) -> None:
+    """Un terminal: preia, procesează și confirmă (sau anulează) comenzi până când coada este goală."""
+    headers = {"X-Terminal-Id": name}
+    empty = 0
+    while empty < 3:
+        data = client.get('/api/comenzi', headers=headers).get_json()
+        if data.get("status") == "empty":
+            empty += 1
+            time.sleep(0.01)
+            continue
+        empty = 0
+        order_id = data["comanda"]["id_intern_comanda"]
+        time.sleep(work)  # Operatorul POS acceptă comanda
+        operation = "ANULEAZA" if int(order_id) % 10 == 0 else "CONFIRMA"
+        status = client.post('/api/comenzi', headers=headers,
+                             json={"id_comanda": order_id, "operatiune": operation}).status_code
+        results.append((order_id, status))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200, help="Comenzi în rafală")
+    parser.add_argument("--terminals", type=int, default=8, help="Terminale POS")
+    parser.add_argument("--work", type=float, default=0.02, help="Timpul operatorului POS per comandă (secunde)")
+    args = parser.parse_args()
+
+    failures = []
+    root = Path(tempfile.mkdtemp())
+    _setup(root)
+    client = api_server.app.test_client()
+
+    print("Email -> comenzi/noi:")
+    message = email.mime.text.MIMEText(CORPUS_EMAIL.read_text(encoding='utf-8'), 'html', 'utf-8')
+    message['From'] = EMAIL_SENDER
+    message['Subject'] = "Fwd: Comanda noua"
+    arrived = datetime.now().replace(microsecond=0)
+    listener = EmailListener()
+    listener.mail = FakeIMAP(message.as_bytes(), arrived)
+    check("emailul este procesat", listener.process_new_email(1), failures)
+    order_id = order_service.parse_orders(CORPUS_EMAIL.read_text(encoding='utf-8'))[0]["comanda"]["id_intern_comanda"]
+    stages = order_timeline._order_timeline.get().timeline(order_id) or {}
+    check("data emailului, sosirea IMAP, parsarea și salvarea sunt înregistrate, în ordine",
+          stages.get("email_date") is not None and stages.get("arrived") == arrived.timestamp()
+          and stages["arrived"] <= stages["parsed"] <= stages["saved"], failures)
+    client.get('/api/comenzi', headers={"X-Terminal-Id": "pos-0"})
+    client.post('/api/comenzi', headers={"X-Terminal-Id": "pos-0"},
+                json={"id_comanda": order_id, "operatiune": "CONFIRMA"})
+    detail = client.get(f'/api/timpi/{order_id}').get_json()
+    check("GET /api/timpi/<id>: toate etapele și durata totală",
+          detail.get("rezultat") == OUTCOME_CONFIRMED and None not in detail.get("etape", {None: None}).values()
+          and "total_confirmare" in detail.get("durate", {}), failures)
+
+    print("Rafală de comenzi:")
+    root = Path(tempfile.mkdtemp())
+    _setup(root)
+    random.seed(7)
+    for index in range(1, args.orders + 1):
+        order = {"comanda": {"id_intern_comanda": str(index), "status_comanda": "processing",
+                             "data_comanda": datetime.fromtimestamp(time.time() - 120).strftime("%Y-%m-%d %H:%M:%S")}}
+        now = time.time()
+        order_service.save_orders_batch([order], root / "noi",
+                                        stages={"arrived": now - random.uniform(5, 30), "parsed": now - 0.01})
+    results = []
+    threads = [threading.Thread(target=_terminal, args=(client, f"pos-{index}", args.work, results))
+               for index in range(args.terminals)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    summary = client.get('/api/timpi').get_json()
+    etape = summary["etape"]
+    for name, stats in etape.items():
+        if stats["numar"]:
+            print(f"  {name:20s} n={stats['numar']:4d}  p50 {stats['p50']:8.3f} s  p95 {stats['p95']:8.3f} s  "
+                  f"p99 {stats['p99']:8.3f} s  max {stats['max']:8.3f} s")
+    cancelled = sum(1 for index in range(1, args.orders + 1) if index % 10 == 0)
+    check("toate comenzile raportate, niciuna în așteptare",
+          summary["comenzi"] == args.orders and summary["in_asteptare"] == {"nepreluate": 0, "preluate_nefinalizate": 0}
+          and etape["asteptare_pos"]["numar"] == args.orders, failures)
+    check("confirmările și anulările sunt separate",
+          etape["preluare_confirmare"]["numar"] == args.orders - cancelled
+          and etape["preluare_anulare"]["numar"] == cancelled, failures)
+    check("percentilele sunt ordonate",
+          all(stats["p50"] <= stats["p95"] <= stats["p99"] <= stats["max"] for stats in etape.values() if stats["numar"]),
+          failures)
+    check(f"timpul operatorului POS este măsurat (p50 ≈ {args.work} s)",
+          args.work <= etape["preluare_confirmare"]["p50"] < args.work + 0.05, failures)
+    check("sosirea emailului (5-30 s înainte de salvare) apare în imap_parsare",
+          5 <= etape["imap_parsare"]["p50"] <= 30, failures)
+    check("fereastra invalidă: 400", client.get('/api/timpi?fereastra=abc').status_code == 400, failures)
+
+    print("Cost:")
+    timeline = OrderTimeline(root / "cost.sqlite3")
+    now = time.time()
+    timeline.record_saved([{"comanda": {"id_intern_comanda": str(index)}} for index in range(10000)],
+                          stages={"arrived": now - 20, "parsed": now - 1}, saved=now)
+    start = time.perf_counter()
+    for index in range(1000):
+        timeline.mark_served(str(index))
+    first_us = (time.perf_counter() - start) * 1e6 / 1000
+    start = time.perf_counter()
+    for _ in range(10):
+        for index in range(1000):
+            timeline.mark_served(str(index))
+    repeat_us = (time.perf_counter() - start) * 1e6 / 10000
+    start = time.perf_counter()
+    for index in range(1000):
+        timeline.mark_finished(str(index), OUTCOME_CONFIRMED)
+    finish_us = (time.perf_counter() - start) * 1e6 / 1000
+    start = time.perf_counter()
+    summary = timeline.summary(now=now)
+    summary_ms = (time.perf_counter() - start) * 1000
+    print(f"  prima preluare {first_us:.0f} µs, preluare repetată {repeat_us:.2f} µs, confirmare {finish_us:.0f} µs, "
+          f"percentile pentru {summary['comenzi']} comenzi {summary_ms:.1f} ms")
+    check("preluările repetate nu scriu în baza de date", repeat_us < 5, failures)
+    check("percentilele pentru 10.000 de comenzi sub 200 ms", summary_ms < 200, failures)
+
+    if failures:
+        print(f"❌ {len(failures)} verificări eșuate")
+        return 1
+    print("✅ Toate verificările au trecut")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
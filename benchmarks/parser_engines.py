@@ -0,0 +1,69 @@
+"""
+Test diferențial și benchmark pentru motoarele de parsare HTML (lxml vs BeautifulSoup).
+
+Pentru fiecare email din benchmarks/corpus/*.html verifică faptul că motorul lxml
+produce exact același JSON ca BeautifulSoup (inclusiv ordinea cheilor) și măsoară
+timpul mediu de parsare per email pentru fiecare motor.
+
+Utilizare:
+    python benchmarks/parser_engines.py [--iterations 200]
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from _harness import CORPUS_DIR
+
+from app.services import order_service
+from app.services import lxml_parser
+
+
+def time_engine(parse, html_doc: str, iterations: int) -> float:
+    """Return the mean parse time in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parse(html_doc)
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200, help="Parsări per email și motor")
+    args = parser.parse_args()
+
+    if not lxml_parser.LXML_AVAILABLE:
+        print("lxml nu este instalat - nimic de comparat")
+        return 1
+
+    failures = 0
+    total_bs4 = total_lxml = 0.0
+    print(f"{'email':<32} {'identic':<8} {'bs4 ms':>9} {'lxml ms':>9} {'speedup':>8}")
+
+    for path in sorted(CORPUS_DIR.glob("*.html")):
+        html_doc = path.read_text(encoding="utf-8")
+
+        expected = json.dumps(order_service._parse_order_bs4(html_doc), ensure_ascii=False)
+        actual = json.dumps(lxml_parser.parse_order_lxml(html_doc), ensure_ascii=False)
+        identical = expected == actual
+        if not identical:
+            failures += 1
+
+        bs4_ms = time_engine(order_service._parse_order_bs4, html_doc, args.iterations)
+        lxml_ms = time_engine(lxml_parser.parse_order_lxml, html_doc, args.iterations)
+        total_bs4 += bs4_ms
+        total_lxml += lxml_ms
+
+        print(f"{path.name:<32} {'DA' if identical else 'NU':<8} {bs4_ms:>9.3f} {lxml_ms:>9.3f} {bs4_ms / lxml_ms:>7.1f}x")
+
+    print(f"{'TOTAL':<32} {'':<8} {total_bs4:>9.3f} {total_lxml:>9.3f} {total_bs4 / total_lxml:>7.1f}x")
+
+    if failures:
+        print(f"❌ {failures} email(uri) cu rezultat diferit între motoare")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
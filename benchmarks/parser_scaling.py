@@ -0,0 +1,91 @@
+"""
+Micro-benchmark de scalare pentru parse_order_html pe emailuri forwardate mari.
+
+Pornește de la benchmarks/corpus/forwarded_cash.html și îl mărește artificial
+(fire de discuție citate înaintea comenzii, tabele imbricate, multe produse),
+apoi raportează timpul per KB pentru fiecare motor. Un cost liniar înseamnă
+un timp per KB aproximativ constant la toate dimensiunile.
+
+Utilizare:
+    python benchmarks/parser_scaling.py [--max-scale 32] [--iterations 20]
+"""
+
+import argparse
+import sys
+import time
+
+from _harness import CORPUS_DIR
+
+SAMPLE_EMAIL = CORPUS_DIR / "forwarded_cash.html"
+
+from app.services import order_service
+from app.services import lxml_parser
+
+QUOTED_MESSAGE = """
+<blockquote class="gmail_quote" style="margin:0 0 0 .8ex;border-left:1px #ccc solid;padding-left:1ex">
+<table width="100%"><tr><td style="font-family:Arial">Mesaj anterior {n}: confirmare program livrare, zona centru.</td>
+<td><a href="https://example.com/info/{n}">Detalii</a></td></tr></table>
+"""
+
+PRODUCT_ROW = """
+<tr>
+<td style="font-family:'Roboto Condensed',Arial,sans-serif;font-size:15px">Produs extra {n}</td>
+<td style="font-family:'Roboto Condensed',Arial,sans-serif;font-size:15px" align="center">1 x</td>
+<td style="font-family:'Roboto Condensed',Arial,sans-serif;font-size:15px" align="right">10.00 lei</td>
+</tr>"""
+
+
+def build_email(template: str, scale: int) -> str:
+    """Mărește emailul de bază de `scale` ori (mesaje citate imbricate + produse)."""
+    # Fire de câte 10 mesaje citate imbricate, ca într-o conversație Gmail reală
+    thread = "".join(QUOTED_MESSAGE.format(n=n) for n in range(10)) + "</blockquote>" * 10
+    quoted = thread * scale
+    products = "".join(PRODUCT_ROW.format(n=n) for n in range(scale * 10))
+
+    html_doc = template.replace('<div style="margin:0;padding:0">', quoted + '<div style="margin:0;padding:0">', 1)
+    marker = '<td style="font-family:\'Roboto Condensed\',Arial,sans-serif;font-size:15px">Tiramisu</td>'
+    row_start = html_doc.rindex("<tr>", 0, html_doc.index(marker))
+    return html_doc[:row_start] + products + html_doc[row_start:]
+
+
+def time_engine(parse, html_doc: str, iterations: int) -> float:
+    """Return the mean parse time in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parse(html_doc)
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-scale", type=int, default=32, help="Factorul maxim de mărire")
+    parser.add_argument("--iterations", type=int, default=20, help="Parsări per dimensiune și motor")
+    args = parser.parse_args()
+
+    template = SAMPLE_EMAIL.read_text(encoding="utf-8")
+    engines = [("bs4", order_service._parse_order_bs4)]
+    if lxml_parser.LXML_AVAILABLE:
+        engines.append(("lxml", lxml_parser.parse_order_lxml))
+
+    print(f"{'scale':>6} {'KB':>8} " + " ".join(f"{name + ' ms':>10} {name + ' ms/KB':>12}" for name, _ in engines))
+
+    per_kb = {name: [] for name, _ in engines}
+    scale = 1
+    while scale <= args.max_scale:
+        html_doc = build_email(template, scale)
+        size_kb = len(html_doc.encode("utf-8")) / 1024
+        row = f"{scale:>6} {size_kb:>8.1f} "
+        for name, parse in engines:
+            elapsed = time_engine(parse, html_doc, args.iterations)
+            per_kb[name].append(elapsed / size_kb)
+            row += f"{elapsed:>10.2f} {elapsed / size_kb:>12.4f} "
+        print(row)
+        scale *= 2
+
+    for name, values in per_kb.items():
+        print(f"{name}: cost per KB la dimensiunea maximă / minimă = {values[-1] / values[0]:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Test diferențial și benchmark pentru pre-decuparea zonei comenzii (PARSER_PRETRIM).
+
+Pentru fiecare email din benchmarks/corpus/*.html generează variante care forțează
+condițiile pre-scanner-ului (header-e cu ancore, tabele citate înainte/după comandă,
+entități, comentarii, tag-uri neînchise, script/style, date lipsă) și verifică faptul că
+parse_order_html produce exact același JSON cu și fără pre-decupare, pentru ambele motoare.
+Apoi măsoară timpul mediu și memoria maximă (tracemalloc) per email pe corpus.
+
+Utilizare:
+    python benchmarks/pretrim_differential.py [--iterations 100]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault("TEMPLATE_CACHE_ENABLED", "false")
+
+from _harness import CORPUS_DIR
+
+from app.services import order_service
+from app.services.order_region import trim_order_region
+
+QUOTED_TABLE = (
+    '<blockquote><table><tr><td>Mesaj anterior</td><td>{text}</td></tr></table></blockquote>\n'
+)
+
+# (nume, funcție care transformă documentul) - fiecare atinge o condiție a pre-scanner-ului
+MUTATIONS = [
+    ("original", lambda doc: doc),
+    ("head_style", lambda doc: doc.replace(
+        "<body>", "<head><style>td { color: #333 } /* Total: */</style><title>Date: x</title></head><body>", 1)),
+    ("quoted_before", lambda doc: QUOTED_TABLE.format(text="confirmare livrare") + doc),
+    ("quoted_after", lambda doc: doc + QUOTED_TABLE.format(text="alt mesaj")),
+    ("quoted_total_before", lambda doc: QUOTED_TABLE.format(text="Total: 99.00 lei") + doc),
+    ("split_total_before", lambda doc: QUOTED_TABLE.format(text="Tot<b>al:</b> 12.00") + doc),
+    ("split_total_after", lambda doc: doc + QUOTED_TABLE.format(text="TOT<i>AL:</i> 12.00")),
+    ("order_id_in_footer", lambda doc: doc + "<table><tr><td>Comanda #1</td></tr></table>"),
+    ("payment_before", lambda doc: "<table><tr><td>Plata:</td></tr><tr><td style=\"font-weight:700\">Card online</td></tr></table>" + doc),
+    ("entity_anchor_before", lambda doc: "<div>Pl&#97;ta: nimic</div>" + doc),
+    ("entity_safe_before", lambda doc: "<div>&copy; 2025 &mdash; &lt;ok&gt;</div>" + doc),
+    ("comment_table_before", lambda doc: "<!-- <table><tr><td>x</td></tr> -->" + doc),
+    ("comment_date_before", lambda doc: "<!-- Date: lun., 2 ian. 2023 la 10:00 -->" + doc),
+    ("entity_date_before", lambda doc: "<div>D&#97;te: lun., 2 ian. 2023 la 10:00</div>" + doc),
+    ("script_before", lambda doc: "<script>var s = '<table>';</script>" + doc),
+    ("unclosed_p_before", lambda doc: "<p>introducere " + doc),
+    ("unclosed_a_before", lambda doc: "<a href=\"https://example.com\">link " + doc),
+    ("unclosed_div_before", lambda doc: "<div><div>" + doc),
+    ("stray_div_close_inside", lambda doc: doc.replace("</td></tr>", "</td></div></tr>", 1)),
+    ("unclosed_span_inside", lambda doc: doc.replace("<td>", "<td><span>", 1)),
+    ("self_closing_inside", lambda doc: doc.replace("</tr>", "<div/></tr>", 1)),
+    ("comment_inside", lambda doc: doc.replace("</tr>", "<!-- x --></tr>", 1)),
+    ("no_date_line", lambda doc: doc.replace("Date:", "Data:")),
+    ("date_owner_block", lambda doc: doc.replace("Date:", "<div>x</div>Date:", 1)),
+    ("date_owner_entity", lambda doc: doc.replace("Date: ", "Date:&#32;", 1)),
+    ("forwarded_in_attribute", lambda doc: "<div title=\"Forwarded message\">x</div>" + doc),
+    ("uppercase_tags", lambda doc: doc.replace("<table", "<TABLE").replace("</table>", "</TABLE>")),
+    ("table_in_header", lambda doc: doc.replace("Date:", "<table><tr><td>x</td></tr></table>Date:", 1)),
+    ("unbalanced_tables", lambda doc: doc.replace("</table>", "", 1)),
+]
+
+
+def same_order(first, second) -> bool:
+    """Comparație exactă a JSON-ului; datele "acum" (fără dată în email) pot diferi cu câteva secunde."""
+    if first is None or second is None:
+        return first is second
+    first = json.loads(json.dumps(first, ensure_ascii=False))
+    second = json.loads(json.dumps(second, ensure_ascii=False))
+    first_date = first["comanda"].pop("data_comanda")
+    second_date = second["comanda"].pop("data_comanda")
+    if first_date != second_date:
+        delta = datetime.strptime(first_date, "%Y-%m-%d %H:%M:%S") - datetime.strptime(second_date, "%Y-%m-%d %H:%M:%S")
+        if abs(delta.total_seconds()) > 5:
+            return False
+    return json.dumps(first, ensure_ascii=False) == json.dumps(second, ensure_ascii=False)
+
+
+def parse(html_doc: str, pretrim: bool):
+    order_service.PARSER_PRETRIM = pretrim
+    return order_service.parse_order_html(html_doc)
+
+
+def measure(html_doc: str, pretrim: bool, iterations: int, rounds: int = 5):
+    """Return (mean ms of the best round, peak KB) for parse_order_html."""
+    parse(html_doc, pretrim)
+    elapsed = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            parse(html_doc, pretrim)
+        elapsed = min(elapsed, (time.perf_counter() - start) * 1000 / iterations)
+
+    tracemalloc.start()
+    parse(html_doc, pretrim)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100, help="Parsări per email la măsurarea timpului")
+    args = parser.parse_args()
+
+    documents = sorted(CORPUS_DIR.glob("*.html"))
+    failures = 0
+    checked = trimmed = 0
+    for engine in ("bs4", "auto"):
+        order_service.PARSER_ENGINE = engine
+        for path in documents:
+            template = path.read_text(encoding="utf-8")
+            for name, mutate in MUTATIONS:
+                html_doc = mutate(template)
+                checked += 1
+                trimmed += trim_order_region(html_doc) is not None
+                if not same_order(parse(html_doc, False), parse(html_doc, True)):
+                    failures += 1
+                    print(f"❌ {engine} {path.name} {name}: rezultat diferit cu pre-decupare")
+
+    print(f"Variante verificate: {checked}, decupate: {trimmed}, diferențe: {failures}")
+
+    order_service.PARSER_ENGINE = "auto"
+    print(f"\n{'email':<28} {'complet ms':>11} {'decupat ms':>11} {'complet KB':>11} {'decupat KB':>11}")
+    for engine in ("bs4", "auto"):
+        order_service.PARSER_ENGINE = engine
+        print(f"[motor {engine}]")
+        for path in documents:
+            html_doc = path.read_text(encoding="utf-8")
+            full_ms, full_kb = measure(html_doc, False, args.iterations)
+            trim_ms, trim_kb = measure(html_doc, True, args.iterations)
+            print(f"{path.name:<28} {full_ms:>11.3f} {trim_ms:>11.3f} {full_kb:>11.1f} {trim_kb:>11.1f}")
+
+    if failures:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+Verificare pentru profilarea CPU la cerere (PROFILING, app/services/profiler.py).
+
+1. Cu PROFILING=false: niciun middleware WSGI și niciun handler de semnal instalat.
+2. Profil prin eșantionare al unui proces cu un thread "EmailListener" care parsează emailuri
+   în buclă: fișierul .folded are formatul "stivă număr" și parsarea apare sub thread-ul ei.
+3. Semnalul PROFILE_SIGNAL într-un proces creat prin fork după instalarea handler-ului (ca un
+   worker Gunicorn) și în procesul curent (ca masterul).
+4. POST /api/admin/profil: autentificare, parametri, un singur profil per proces.
+5. cProfile pentru un request cu "X-Profile: 1": fișier pstats cu funcția endpoint-ului.
+6. Latența GET /api/comenzi cu și fără un profil prin eșantionare activ.
+
+Utilizare:
+    python benchmarks/profiling.py [--seconds 1] [--requests 500]
+"""
+
+import argparse
+import multiprocessing
+import os
+import pstats
+import re
+import signal
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from _harness import BASE_DIR, check, setup_api
+
+from werkzeug.test import Client
+
+from app import api_server
+import app.services.order_service as order_service
+import app.services.profiler as profiler
+from app.services.profiler import ProfilingMiddleware, install_signal_handler, start_sampling
+
+CORPUS_EMAIL = BASE_DIR / "benchmarks" / "corpus" / "forwarded_cash.html"
+FOLDED_LINE = re.compile(r"^\S.* \d+$")
+
+
+def _parse_loop(stop: threading.Event) -> None:
+    """Încărcare CPU ca în thread-ul Email Listener: parsarea emailurilor în buclă."""
+    html = CORPUS_EMAIL.read_text(encoding='utf-8')
+    while not stop.is_set():
+        order_service.parse_orders(html)
+
+
+def _wait_for(directory: Path, pattern: str, timeout: float) -> list:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        files = sorted(directory.glob(pattern))
+        if files:
+            return files
+        time.sleep(0.05)
+    return []
+
+
+def _worker(ready) -> None:
+    """Proces copil (ca un worker Gunicorn): lucrează până primește SIGTERM."""
+    stop = threading.Event()
+    thread = threading.Thread(target=_parse_loop, args=(stop,), name="EmailListener", daemon=True)
+    thread.start()
+    ready.set()
+    time.sleep(30)
+
+
+def _get_latencies(client, requests: int) -> list:
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.get('/api/comenzi')
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=1.0, help="Durata profilurilor prin eșantionare")
+    parser.add_argument("--requests", type=int, default=500, help="Request-uri pentru măsurarea latenței")
+    args = parser.parse_args()
+
+    failures = []
+    root = Path(tempfile.mkdtemp())
+    profiler.PROFILE_DIR = root / "profiles"
+    profiler.PROFILE_SECONDS = args.seconds
+    setup_api(root)
+    api_server.COMENZI_NOI.mkdir()
+    client = api_server.app.test_client()
+
+    print("PROFILING=false:")
+    check("niciun middleware WSGI", not isinstance(api_server.app.wsgi_app, ProfilingMiddleware), failures)
+    check("niciun handler de semnal", signal.getsignal(getattr(signal, profiler.PROFILE_SIGNAL)) == signal.SIG_DFL
+          and not install_signal_handler(), failures)
+    check("endpoint-ul de profilare răspunde 404", client.post('/api/admin/profil').status_code == 404, failures)
+
+    print("Profil prin eșantionare:")
+    stop = threading.Event()
+    worker = threading.Thread(target=_parse_loop, args=(stop,), name="EmailListener", daemon=True)
+    worker.start()
+    sampling = start_sampling(args.seconds, root / "sampling")
+    check("un al doilea profil în același proces este refuzat", start_sampling(args.seconds) is None, failures)
+    files = _wait_for(root / "sampling", "sample-*.folded", args.seconds + 5)
+    time.sleep(0.1)
+    lines = files[0].read_text(encoding='utf-8').splitlines() if files else []
+    listener = sum(int(line.rsplit(" ", 1)[1]) for line in lines
+                   if line.startswith("EmailListener;") and "parse_orders" in line)
+    print(f"  {sampling.samples} eșantioane, {len(lines)} stive distincte, "
+          f"{listener} eșantioane în parse_orders (EmailListener)")
+    check("fișierul .folded are formatul 'stivă număr'", lines and all(FOLDED_LINE.match(line) for line in lines),
+          failures)
+    check("parsarea apare sub thread-ul EmailListener", listener >= sampling.samples * 0.5, failures)
+    check("profilul se oprește după durata cerută", profiler.active_profile() is None, failures)
+
+    print("Semnal:")
+    profiler.PROFILING = True
+    check("handler-ul de semnal este instalat", install_signal_handler(), failures)
+    context = multiprocessing.get_context("fork")
+    ready = context.Event()
+    child = context.Process(target=_worker, args=(ready,))
+    child.start()
+    ready.wait(10)
+    os.kill(child.pid, getattr(signal, profiler.PROFILE_SIGNAL))
+    child_files = _wait_for(profiler.PROFILE_DIR, f"sample-{child.pid}-*.folded", args.seconds + 5)
+    child.terminate()
+    child.join()
+    check("procesul creat prin fork (worker) scrie propriul profil", bool(child_files), failures)
+    os.kill(os.getpid(), getattr(signal, profiler.PROFILE_SIGNAL))
+    own_files = _wait_for(profiler.PROFILE_DIR, f"sample-{os.getpid()}-*.folded", args.seconds + 5)
+    check("procesul curent (master) scrie propriul profil", bool(own_files), failures)
+    time.sleep(0.1)
+
+    print("POST /api/admin/profil:")
+    api_server.PROFILING = True
+    check("fără API_KEY configurat: 403", client.post('/api/admin/profil').status_code == 403, failures)
+    api_server.API_KEY = "benchmark-key"
+    headers = {"X-API-Key": "benchmark-key"}
+    check("fără X-API-Key: 401", client.post('/api/admin/profil').status_code == 401, failures)
+    check("secunde invalide: 400",
+          client.post('/api/admin/profil?secunde=abc', headers=headers).status_code == 400, failures)
+    os.environ.pop(profiler.MASTER_PID_ENV, None)
+    check("proces=master în afara Gunicorn: 409",
+          client.post('/api/admin/profil?proces=master', headers=headers).status_code == 409, failures)
+    started = client.post(f'/api/admin/profil?secunde={max(1, int(args.seconds))}', headers=headers)
+    again = client.post('/api/admin/profil', headers=headers)
+    check("pornit (202), al doilea refuzat (409)", started.status_code == 202 and again.status_code == 409
+          and again.get_json().get("fisier") == started.get_json().get("fisier"), failures)
+    check("fișierul anunțat este scris",
+          bool(_wait_for(profiler.PROFILE_DIR, started.get_json().get("fisier", "-"), args.seconds + 5)), failures)
+    time.sleep(0.1)
+
+    print("cProfile per request:")
+    middleware = ProfilingMiddleware(api_server.app.wsgi_app, "benchmark-key", root / "requests")
+    wsgi_client = Client(middleware)
+    plain = wsgi_client.get('/api/comenzi', headers=headers)
+    profiled = wsgi_client.get('/api/comenzi', headers={**headers, "X-Profile": "1"})
+    anonymous = wsgi_client.get('/api/comenzi', headers={"X-Profile": "1"})
+    request_files = sorted((root / "requests").glob("*.prof")) if (root / "requests").exists() else []
+    functions = {name for (_, _, name) in pstats.Stats(str(request_files[0])).stats} if request_files else set()
+    check("doar request-ul cu X-Profile și X-API-Key este profilat",
+          "X-Profile-File" not in plain.headers and "X-Profile-File" not in anonymous.headers
+          and len(request_files) == 1 and profiled.headers.get("X-Profile-File") == request_files[0].name, failures)
+    check("fișierul pstats conține endpoint-ul", "handle_comenzi" in functions, failures)
+    check("răspunsul profilat este identic", profiled.get_data() == plain.get_data(), failures)
+
+    print("Latență:")
+    api_server.API_KEY = None
+    _get_latencies(client, 50)
+    baseline = statistics.median(_get_latencies(client, args.requests))
+    start_sampling(60, root / "latency")
+    sampled = statistics.median(_get_latencies(client, args.requests))
+    profiler.active_profile().stop()
+    stop.set()
+    print(f"  GET p50 {baseline:.3f} ms fără profil, {sampled:.3f} ms cu profilul prin eșantionare activ")
+    check("profilul prin eșantionare nu dublează latența", sampled < baseline * 2, failures)
+
+    if failures:
+        print(f"❌ {len(failures)} verificări eșuate")
+        return 1
+    print("✅ Toate verificările au trecut")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
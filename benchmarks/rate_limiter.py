@@ -0,0 +1,110 @@
+"""
+Benchmark și verificare pentru rate limiter-ul partajat (token bucket în fișier mmap).
+
+Pornește mai multe procese (ca worker-ii Gunicorn) care consumă în paralel din același
+bucket și verifică faptul că numărul total de request-uri permise este exact limita
+(nu limita × numărul de procese, ca la storage-ul "memory://"). Măsoară apoi costul per
+request, verifică cotele individuale și răspunsul 429 al API-ului.
+
+Utilizare:
+    python benchmarks/rate_limiter.py [--processes 4] [--limit 20000]
+"""
+
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from _harness import check
+
+from app.services.rate_limiter import SharedRateLimiter
+
+
+def _worker(path: str, limit: str, attempts: int, start, results) -> None:
+    limiter = SharedRateLimiter(Path(path), slots=256, default_limit=limit)
+    start.wait()
+    allowed = sum(limiter.acquire("ip:10.0.0.1")[0] for _ in range(attempts))
+    results.put(allowed)
+
+
+def measure_exactness(processes: int, limit: int) -> list:
+    """Request-uri permise per proces, cu toate procesele consumând din același bucket."""
+    path = Path(tempfile.mkdtemp()) / "rate_limits.mmap"
+    SharedRateLimiter(path, slots=256).close()  # Tabelul este creat înainte de pornirea proceselor
+    context = multiprocessing.get_context("fork")
+    start = context.Event()
+    results = context.Queue()
+    # Limită pe zi: reumplerea în timpul testului este neglijabilă
+    workers = [context.Process(target=_worker, args=(str(path), f"{limit}/day", limit, start, results))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    start.set()
+    allowed = [results.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join()
+    return allowed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4, help="Procese care consumă în paralel")
+    parser.add_argument("--limit", type=int, default=20000, help="Capacitatea bucket-ului")
+    parser.add_argument("--iterations", type=int, default=50000, help="Request-uri pentru măsurarea costului")
+    args = parser.parse_args()
+
+    failures = []
+    allowed = measure_exactness(args.processes, args.limit)
+    print(f"{args.processes} procese × {args.limit} încercări, limită {args.limit}: "
+          f"{sum(allowed)} permise {allowed}")
+    check("limita este exactă între procese", sum(allowed) == args.limit, failures)
+
+    path = Path(tempfile.mkdtemp()) / "rate_limits.mmap"
+    limiter = SharedRateLimiter(path, slots=4096, default_limit="1000000/second", quotas={"pos-1": "5/minute"})
+    clients = [f"ip:10.0.{index // 256}.{index % 256}" for index in range(1000)]
+    start = time.perf_counter()
+    for index in range(args.iterations):
+        limiter.acquire(clients[index % len(clients)])
+    cost_us = (time.perf_counter() - start) * 1e6 / args.iterations
+    print(f"Cost per request: {cost_us:.2f} µs ({len(clients)} clienți)")
+    check("cost per request sub 20 µs", cost_us < 20, failures)
+
+    results = [limiter.acquire("terminal:pos-1") for _ in range(7)]
+    check("cotă individuală pentru terminalul pos-1 (5/minute)",
+          [allowed for allowed, _ in results] == [True] * 5 + [False] * 2 and 11 < results[-1][1] <= 12, failures)
+
+    small = SharedRateLimiter(Path(tempfile.mkdtemp()) / "rate_limits.mmap", slots=16, default_limit="3/minute")
+    for index in range(200):
+        small.acquire(f"ip:client-{index}")
+    check("tabel plin: clienții vechi sunt înlocuiți", small.acquire("ip:nou")[0], failures)
+
+    from app import api_server
+    import app.services.rate_limiter as rate_limiter_module
+    rate_limiter_module._rate_limiter = SharedRateLimiter(
+        Path(tempfile.mkdtemp()) / "rate_limits.mmap", slots=64, default_limit="3/minute"
+    )
+    client = api_server.app.test_client()
+    statuses = [client.get('/api/health').status_code for _ in range(4)]
+    response = client.get('/api/health')
+    check("API: 429 cu Retry-After peste limită",
+          statuses == [200, 200, 200, 429] and response.status_code == 429
+          and int(response.headers['Retry-After']) > 0, failures)
+    spoofed = client.get('/api/health', headers={"X-Terminal-Id": "pos-2"})
+    check("API: fără API_KEY, X-Terminal-Id nu schimbă bucket-ul IP", spoofed.status_code == 429, failures)
+    api_server.API_KEY = "benchmark-key"
+    wrong_key = client.get('/api/health', headers={"X-Terminal-Id": "pos-2", "X-API-Key": "greșită"})
+    other = client.get('/api/health', headers={"X-Terminal-Id": "pos-2", "X-API-Key": "benchmark-key"})
+    check("API: cu API Key valid, terminalele POS au bucket separat de IP",
+          wrong_key.status_code == 429 and other.status_code == 200, failures)
+
+    if failures:
+        print(f"❌ {len(failures)} verificări eșuate")
+        return 1
+    print("✅ Toate verificările au trecut")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
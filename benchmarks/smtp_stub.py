@@ -0,0 +1,193 @@
+"""
+Server SMTP local pentru teste (înlocuiește smtp.gmail.com).
+
+Acceptă orice login (AUTH PLAIN/LOGIN), nu oferă STARTTLS și păstrează mesajele primite
+în memorie. Poate simula un server lent (latency), erori temporare (fail_next) și
+închiderea sesiunilor inactive (drop_connections).
+
+Utilizare în benchmark-uri:
+    with SMTPStub() as stub:
+        dispatcher = NotificationDispatcher(host=stub.host, port=stub.port, starttls=False)
+        ...
+        stub.messages  # emailurile primite (email.message.EmailMessage)
+
+Sau separat, pentru rularea aplicației fără Gmail:
+    python benchmarks/smtp_stub.py --port 2525
+    SMTP_SERVER=127.0.0.1 SMTP_PORT=2525 SMTP_STARTTLS=false python run_dev.py
+"""
+
+import argparse
+import socketserver
+import sys
+import threading
+import time
+from email import policy
+from email.parser import BytesParser
+from typing import List
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """O sesiune SMTP (subsetul de comenzi folosit de smtplib)."""
+
+    def _reply(self, line: str) -> None:
+        self.wfile.write(line.encode('ascii') + b"\r\n")
+
+    def handle(self) -> None:
+        stub: "SMTPStub" = self.server.stub
+        stub._register(self.connection)
+        self._reply("220 smtp-stub ESMTP")
+        try:
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    break
+                command = line.decode('utf-8', 'replace').strip()
+                verb = command.split(' ', 1)[0].upper()
+
+                if verb in ("EHLO", "HELO"):
+                    self._reply("250-smtp-stub")
+                    self._reply("250-AUTH PLAIN LOGIN")
+                    self._reply("250 8BITMIME")
+                elif verb == "AUTH":
+                    if command.upper().startswith("AUTH LOGIN"):
+                        parts = command.split()
+                        if len(parts) < 3:
+                            self._reply("334 VXNlcm5hbWU6")
+                            self.rfile.readline()
+                        self._reply("334 UGFzc3dvcmQ6")
+                        self.rfile.readline()
+                    self._reply("235 2.7.0 Authentication successful")
+                elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                    self._reply("250 OK")
+                elif verb == "DATA":
+                    self._reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = []
+                    while True:
+                        chunk = self.rfile.readline()
+                        if not chunk or chunk in (b".\r\n", b".\n"):
+                            break
+                        data.append(chunk[1:] if chunk.startswith(b"..") else chunk)
+                    if stub.latency:
+                        time.sleep(stub.latency)
+                    if stub._take_failure():
+                        self._reply("451 4.3.0 Temporary failure (stub)")
+                    else:
+                        stub._store(b"".join(data))
+                        self._reply("250 OK queued")
+                elif verb == "QUIT":
+                    self._reply("221 Bye")
+                    break
+                else:
+                    self._reply("502 Command not implemented")
+        except OSError:
+            pass
+        finally:
+            stub._unregister(self.connection)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPStub:
+    """
+    Server SMTP local, pornit într-un thread de background.
+
+    Args:
+        host: Adresa de ascultare
+        port: Portul (0 = ales de sistem)
+        latency: Întârzierea răspunsului la DATA (secunde), ca un server lent
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.messages: List = []
+        self.connections = 0
+        self.fail_next = 0
+        self._lock = threading.Lock()
+        self._open = set()
+        self._server = _Server((host, port), _SMTPHandler)
+        self._server.stub = self
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="SMTPStub")
+
+    def start(self) -> "SMTPStub":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self.drop_connections()
+
+    def __enter__(self) -> "SMTPStub":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def drop_connections(self) -> None:
+        """Închide sesiunile deschise (ca un server care închide conexiunile inactive)."""
+        with self._lock:
+            sockets = list(self._open)
+        for sock in sockets:
+            try:
+                sock.shutdown(2)
+            except OSError:
+                pass
+
+    def wait_for(self, count: int, timeout: float = 10.0) -> bool:
+        """Așteaptă până când au fost primite cel puțin `count` emailuri."""
+        deadline = time.monotonic() + timeout
+        while len(self.messages) < count:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _register(self, sock) -> None:
+        with self._lock:
+            self.connections += 1
+            self._open.add(sock)
+
+    def _unregister(self, sock) -> None:
+        with self._lock:
+            self._open.discard(sock)
+
+    def _take_failure(self) -> bool:
+        with self._lock:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return True
+            return False
+
+    def _store(self, data: bytes) -> None:
+        message = BytesParser(policy=policy.default).parsebytes(data)
+        with self._lock:
+            self.messages.append(message)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--latency", type=float, default=0.0, help="Întârzierea la DATA (secunde)")
+    args = parser.parse_args()
+
+    stub = SMTPStub(args.host, args.port, args.latency).start()
+    print(f"SMTP stub pe {stub.host}:{stub.port} (Ctrl+C pentru oprire)")
+    seen = 0
+    try:
+        while True:
+            time.sleep(0.5)
+            for message in stub.messages[seen:]:
+                print(f"📨 {message['To']}: {message['Subject']}")
+            seen = len(stub.messages)
+    except KeyboardInterrupt:
+        stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
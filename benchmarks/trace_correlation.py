@@ -0,0 +1,192 @@
+"""
+Verificare și cost pentru trasarea per comandă (TRACE_FILE, trace_waterfall.py).
+
+1. Un email din corpus trece prin EmailListener.process_new_email (IMAP simulat), apoi un
+   terminal POS preia comanda (GET /api/comenzi) și o confirmă (POST /api/comenzi).
+   Verifică faptul că toate span-urile (email, imap.fetch, parse, store, api.get, api.post)
+   sunt în același trace, că răspunsurile API poartă X-Trace-Id-ul ingestiei, că liniile de
+   log din trace sunt prefixate cu ID-ul lui și că trace_waterfall.py afișează waterfall-ul.
+2. Costul unui span scris în fișier, al unui apel @traced în afara unui trace și rotația
+   fișierului de trace-uri.
+
+Utilizare:
+    python benchmarks/trace_correlation.py [--spans 20000]
+"""
+
+import argparse
+import email.mime.text
+import functools
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from _harness import BASE_DIR, check, setup_api
+
+import app.config as config
+from app.logging_config import initialize_logging
+
+LOG_FILE = Path(tempfile.mkdtemp()) / "eeatingh_benchmark.log"
+config.LOG_MODE = "sync"  # Liniile de log sunt verificate imediat după request-uri
+initialize_logging(LOG_FILE)
+logging.getLogger().handlers = [handler for handler in logging.getLogger().handlers
+                                if not isinstance(handler, logging.StreamHandler)
+                                or isinstance(handler, logging.FileHandler)]
+logging.disable(logging.NOTSET)  # Liniile de log din trace sunt verificate
+
+from app import api_server
+from app.config import EMAIL_SENDER
+import app.services.email_listener as email_listener_module
+import app.services.order_service as order_service
+import app.services.order_timeline as order_timeline
+import app.services.parse_memo as parse_memo
+import app.services.quarantine as quarantine
+import app.services.tracing as tracing
+from app.services.email_listener import EmailListener
+from app.services.order_timeline import OrderTimeline
+from app.services.parse_memo import ParseMemo
+from app.services.quarantine import Quarantine
+from app.services.tracing import TraceWriter, order_traces, read_spans, span, start_trace, traced
+
+CORPUS_EMAIL = BASE_DIR / "benchmarks" / "corpus" / "forwarded_cash.html"
+
+
+class FakeIMAP:
+    """Căsuța IMAP cu un singur email."""
+
+    def __init__(self, raw_email: bytes, internal_date: datetime):
+        self.raw_email = raw_email
+        self.internal_date = internal_date
+
+    def fetch(self, ids, items):
+        return {ids[0]: {b'RFC822': self.raw_email, b'INTERNALDATE': self.internal_date}}
+
+    def set_flags(self, ids, flags):
+        return {}
+
+
+def _setup(root: Path) -> None:
+    """Redirecționează folderele, bazele de date și fișierul de trace-uri către directorul de test."""
+    setup_api(root)
+    for name in ("noi", "procesate", "anulate"):
+        (root / name).mkdir(parents=True, exist_ok=True)
+    order_service.COMENZI_NOI = root / "noi"
+    order_service.COMENZI_PROCESATE = root / "procesate"
+    order_service.COMENZI_ANULATE = root / "anulate"
+    # Folderul implicit al save_orders_batch este legat la definirea funcției
+    email_listener_module.save_orders_batch = functools.partial(order_service.save_orders_batch,
+                                                                output_folder=root / "noi")
+    email_listener_module.ORDER_COUNTER_FILE = root / "order_counter.txt"
+    order_timeline._order_timeline.set(OrderTimeline(root / "timeline.sqlite3"))
+    parse_memo._parse_memo.set(ParseMemo(root / "parse_memo.sqlite3"))
+    quarantine._quarantine.set(Quarantine(root / "quarantine.sqlite3", dead_letter_dir=root / "dead_letter"))
+    tracing._trace_writer = TraceWriter(root / "traces.jsonl")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spans", type=int, default=20000, help="Span-uri pentru măsurarea costului")
+    args = parser.parse_args()
+
+    failures = []
+    root = Path(tempfile.mkdtemp())
+    _setup(root)
+    trace_file = root / "traces.jsonl"
+    client = api_server.app.test_client()
+
+    print("Email -> POS:")
+    message = email.mime.text.MIMEText(CORPUS_EMAIL.read_text(encoding='utf-8'), 'html', 'utf-8')
+    message['From'] = EMAIL_SENDER
+    message['Subject'] = "Fwd: Comanda noua"
+    listener = EmailListener()
+    listener.mail = FakeIMAP(message.as_bytes(), datetime.now().replace(microsecond=0))
+    check("emailul este procesat", listener.process_new_email(1), failures)
+    order_id = order_service.parse_orders(CORPUS_EMAIL.read_text(encoding='utf-8'))[0]["comanda"]["id_intern_comanda"]
+    trace_id = order_timeline._order_timeline.get().trace_of(order_id)
+    check("trace ID-ul ingestiei este păstrat lângă comandă", trace_id is not None, failures)
+
+    headers = {"X-Terminal-Id": "pos-1"}
+    served = client.get('/api/comenzi', headers=headers)
+    finished = client.post('/api/comenzi', headers=headers, json={"id_comanda": order_id, "operatiune": "CONFIRMA"})
+    check("GET și POST răspund cu X-Trace-Id-ul ingestiei",
+          served.headers.get("X-Trace-Id") == trace_id == finished.headers.get("X-Trace-Id"), failures)
+    detail = client.get(f'/api/timpi/{order_id}').get_json()
+    check("GET /api/timpi/<id> include trace ID-ul", detail.get("trace_id") == trace_id, failures)
+    check("request-urile fără comandă nu pornesc un trace",
+          "X-Trace-Id" not in client.get('/api/comenzi', headers=headers).headers, failures)
+
+    traces = order_traces(order_id, trace_file)
+    names = {record["n"] for record in traces.get(trace_id, [])}
+    expected = {"email", "imap.fetch", "parse", "store", "api.get", "api.post", "api.find"}
+    print(f"  span-uri: {', '.join(sorted(names))}")
+    check("un singur trace conține ingestia și request-urile API", list(traces) == [trace_id]
+          and expected <= names, failures)
+    by_id = {record["s"]: record for record in traces.get(trace_id, [])}
+    roots = [record for record in by_id.values() if record["p"] is None]
+    check("span-urile copil au părinți din același trace",
+          all(record["p"] in by_id for record in by_id.values() if record["p"] is not None)
+          and {record["n"] for record in roots} == {"email", "api.get", "api.post"}, failures)
+
+    log_lines = [line for line in LOG_FILE.read_text(encoding='utf-8').splitlines() if f"[{trace_id}]" in line]
+    check("liniile de log ale listener-ului și API-ului poartă trace ID-ul",
+          any("email_listener" in line for line in log_lines) and any("api_server" in line for line in log_lines),
+          failures)
+
+    output = subprocess.run([sys.executable, str(BASE_DIR / "trace_waterfall.py"), str(order_id),
+                             "--file", str(trace_file)], capture_output=True, text=True, env=os.environ)
+    print("\n".join("    " + line for line in output.stdout.splitlines()))
+    check("trace_waterfall.py afișează trace-ul comenzii",
+          output.returncode == 0 and f"Trace {trace_id}" in output.stdout and "imap.fetch" in output.stdout, failures)
+
+    print("Cost:")
+    cost_file = root / "cost.jsonl"
+    tracing._trace_writer = TraceWriter(cost_file)
+    with start_trace("cost"):
+        start = time.perf_counter()
+        for _ in range(args.spans):
+            with span("s", order="1"):
+                pass
+        span_us = (time.perf_counter() - start) * 1e6 / args.spans
+
+    @traced("noop")
+    def noop():
+        return None
+
+    start = time.perf_counter()
+    for _ in range(args.spans):
+        noop()
+    untraced_ns = (time.perf_counter() - start) * 1e9 / args.spans
+    start = time.perf_counter()
+    for _ in range(args.spans):
+        with span("noop"):
+            pass
+    no_trace_ns = (time.perf_counter() - start) * 1e9 / args.spans
+    print(f"  span scris {span_us:.1f} µs, @traced în afara unui trace {untraced_ns:.0f} ns, "
+          f"span în afara unui trace {no_trace_ns:.0f} ns")
+    check("un span scris costă sub 50 µs", span_us < 50, failures)
+    check("în afara unui trace nu se scrie nimic", sum(1 for _ in read_spans(cost_file)) == args.spans + 1, failures)
+
+    rotated = TraceWriter(root / "rotate.jsonl", max_bytes=64 * 1024)
+    tracing._trace_writer = rotated
+    with start_trace("rotate"):
+        for index in range(2000):
+            with span("s", index=index):
+                pass
+    spans = list(read_spans(root / "rotate.jsonl"))
+    check("rotația păstrează fișierul anterior în <fișier>.1",
+          Path(f"{root / 'rotate.jsonl'}.1").exists() and (root / "rotate.jsonl").stat().st_size < 64 * 1024
+          and spans[-1]["n"] == "rotate", failures)
+
+    if failures:
+        print(f"❌ {len(failures)} verificări eșuate")
+        return 1
+    print("✅ Toate verificările au trecut")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
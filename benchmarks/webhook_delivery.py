@@ -0,0 +1,117 @@
+"""
+Benchmark și verificare pentru livrarea comenzilor prin webhook (outbox).
+
+Rulează pe receptorul local din webhook_receiver.py și măsoară latența dintre salvarea
+comenzii (enqueue) și sosirea ei la POS, apoi verifică: conexiunea keep-alive reutilizată,
+semnătura HMAC, ordinea per abonat în timpul reîncercărilor, izolarea unui abonat căzut,
+livrarea după o repornire (outbox persistent) și abandonarea după erori 4xx.
+
+Utilizare:
+    python benchmarks/webhook_delivery.py [--count 50]
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from _harness import check
+
+from app.services.webhook_outbox import WebhookOutbox
+from benchmarks.webhook_receiver import WebhookReceiver
+
+SECRET = "benchmark-secret"
+
+
+def _order(order_id: int) -> dict:
+    return {"comanda": {"id_intern_comanda": str(order_id), "status_comanda": "processing", "total": "42.00"}}
+
+
+def _outbox(urls: list, **kwargs) -> WebhookOutbox:
+    options = {"secret": SECRET, "retry_delay": 0.05, "max_delay": 0.2, "poll_interval": 1.0, "timeout": 2}
+    options.update(kwargs)
+    return WebhookOutbox(Path(tempfile.mkdtemp()) / "outbox.sqlite3", urls, **options)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=50, help="Comenzi livrate în măsurătoarea de latență")
+    args = parser.parse_args()
+
+    failures = []
+    with WebhookReceiver(secret=SECRET) as receiver:
+        outbox = _outbox([receiver.url])
+        outbox.start()
+        latencies = []
+        for index in range(args.count):
+            start = time.perf_counter()
+            outbox.enqueue([_order(index)])
+            receiver.wait_for(index + 1)
+            latencies.append((receiver.deliveries[index][0] - start) * 1000)
+            time.sleep(0.005)  # Comenzi sosite separat, ca în producție
+        outbox.stop()
+        latencies.sort()
+        print(f"Latență salvare -> POS: p50 {statistics.median(latencies):.2f} ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms, max {latencies[-1]:.2f} ms")
+        check("comenzile ajung la POS în milisecunde", statistics.median(latencies) < 20, failures)
+        check(f"o singură conexiune keep-alive pentru {args.count} livrări", receiver.connections == 1, failures)
+        check("toate livrările au semnătura HMAC validă", all(valid for *_, valid in receiver.deliveries), failures)
+
+    print("Scenarii:")
+    with WebhookReceiver(secret=SECRET) as receiver:
+        outbox = _outbox([receiver.url])
+        outbox.start()
+        receiver.fail_next = 3
+        outbox.enqueue([_order(index) for index in range(1, 6)])
+        receiver.wait_for(5)
+        check("ordinea per abonat păstrată în timpul reîncercărilor (503 x3)",
+              receiver.order_ids() == ["1", "2", "3", "4", "5"], failures)
+
+        receiver.fail_next, receiver.fail_status = 1, 400
+        outbox.enqueue([_order(6), _order(7)])
+        receiver.wait_for(6)
+        time.sleep(0.1)
+        stats = outbox.stats()["subscribers"][receiver.url]
+        check("4xx: livrare marcată eșuată, următoarele continuă",
+              stats["failed"] == 1 and receiver.order_ids()[-1] == "7", failures)
+        outbox.stop()
+
+    with WebhookReceiver(secret=SECRET) as healthy, WebhookReceiver(secret=SECRET) as down:
+        down.fail_next = 1000
+        outbox = _outbox([healthy.url, down.url])
+        outbox.start()
+        outbox.enqueue([_order(index) for index in range(3)])
+        check("un abonat căzut nu îi întârzie pe ceilalți", healthy.wait_for(3, timeout=2), failures)
+        outbox.stop()
+
+    outbox_path = Path(tempfile.mkdtemp()) / "outbox.sqlite3"
+    with WebhookReceiver(secret=SECRET) as receiver:
+        stopped = WebhookOutbox(outbox_path, [receiver.url], secret=SECRET)
+        stopped.enqueue([_order(10), _order(11)])  # Salvate, dar procesul se oprește înainte de livrare
+        restarted = WebhookOutbox(outbox_path, [receiver.url], secret=SECRET, poll_interval=1.0)
+        restarted.start()
+        check("livrările din outbox sunt reluate după repornire",
+              receiver.wait_for(2, timeout=3) and receiver.order_ids() == ["10", "11"], failures)
+        restarted.stop()
+
+    with WebhookReceiver(secret="alta-cheie") as receiver:
+        outbox = _outbox([receiver.url], max_attempts=2)
+        outbox.start()
+        outbox.enqueue([_order(20)])
+        receiver.wait_for(2)
+        time.sleep(0.2)
+        check("semnătură invalidă respinsă de POS (401) -> livrare eșuată",
+              outbox.stats()["subscribers"][receiver.url]["failed"] == 1, failures)
+        outbox.stop()
+
+    if failures:
+        print(f"❌ {len(failures)} verificări eșuate")
+        return 1
+    print("✅ Toate verificările au trecut")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
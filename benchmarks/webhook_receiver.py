@@ -0,0 +1,166 @@
+"""
+Receptor webhook local pentru teste (înlocuiește POS-ul).
+
+Server HTTP/1.1 keep-alive care verifică semnătura HMAC a livrărilor, păstrează comenzile
+primite în memorie (cu momentul sosirii) și numără conexiunile. Poate simula erori
+(fail_next răspunsuri cu status-ul fail_status) și un POS lent (latency).
+
+Utilizare în benchmark-uri:
+    with WebhookReceiver(secret="...") as receiver:
+        outbox = WebhookOutbox(path, [receiver.url], secret="...")
+        ...
+        receiver.deliveries  # [(momentul sosirii, comanda, id livrare, semnătură validă), ...]
+
+Sau separat, pentru rularea aplicației cu un POS simulat:
+    python benchmarks/webhook_receiver.py --port 8600 --secret cheie
+    WEBHOOK_SUBSCRIBERS=http://127.0.0.1:8600/comenzi WEBHOOK_SECRET=cheie python run_dev.py
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+
+def expected_signature(secret: str, timestamp: str, body: bytes) -> str:
+    """Semnătura așteptată, calculată independent de aplicație (ca pe POS)."""
+    digest = hmac.new(secret.encode('utf-8'), timestamp.encode('ascii') + b"." + body, hashlib.sha256)
+    return "sha256=" + digest.hexdigest()
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+
+    def setup(self) -> None:
+        super().setup()
+        # Antetele și corpul răspunsului sunt scrise separat - fără TCP_NODELAY, Nagle + ACK întârziat adaugă ~40 ms
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.receiver._count_connection()
+
+    def do_POST(self) -> None:
+        receiver: "WebhookReceiver" = self.server.receiver
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if receiver.latency:
+            time.sleep(receiver.latency)
+
+        status = receiver._take_failure()
+        if status is None:
+            signature = self.headers.get("X-Eeatingh-Signature", "")
+            timestamp = self.headers.get("X-Eeatingh-Timestamp", "")
+            valid = bool(receiver.secret) and hmac.compare_digest(
+                signature, expected_signature(receiver.secret, timestamp, body)
+            )
+            receiver._store(json.loads(body), self.headers.get("X-Eeatingh-Delivery"), valid)
+            status = 200 if valid or not receiver.secret else 401
+
+        response = b'{"ok": true}' if status == 200 else b'{"ok": false}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+class WebhookReceiver:
+    """
+    Receptor webhook local, pornit într-un thread de background.
+
+    Args:
+        secret: Cheia HMAC așteptată (None = semnătura nu este verificată)
+        host: Adresa de ascultare
+        port: Portul (0 = ales de sistem)
+        latency: Întârzierea răspunsului (secunde)
+    """
+
+    def __init__(self, secret: Optional[str] = None, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.secret = secret
+        self.latency = latency
+        self.fail_next = 0
+        self.fail_status = 503
+        self.connections = 0
+        self.deliveries: List[tuple] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _WebhookHandler)
+        self._server.daemon_threads = True
+        self._server.receiver = self
+        self.host, self.port = self._server.server_address[:2]
+        self.url = f"http://{self.host}:{self.port}/comenzi"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="WebhookReceiver")
+
+    def start(self) -> "WebhookReceiver":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "WebhookReceiver":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def order_ids(self) -> List[str]:
+        """ID-urile comenzilor primite, în ordinea sosirii."""
+        with self._lock:
+            return [order["comanda"]["id_intern_comanda"] for _, order, _, _ in self.deliveries]
+
+    def wait_for(self, count: int, timeout: float = 10.0) -> bool:
+        """Așteaptă până când au sosit cel puțin `count` livrări."""
+        deadline = time.monotonic() + timeout
+        while len(self.deliveries) < count:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def _count_connection(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def _take_failure(self) -> Optional[int]:
+        with self._lock:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return self.fail_status
+            return None
+
+    def _store(self, order: dict, delivery_id: Optional[str], valid: bool) -> None:
+        with self._lock:
+            self.deliveries.append((time.perf_counter(), order, delivery_id, valid))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--secret", default=None, help="Cheia HMAC (WEBHOOK_SECRET)")
+    args = parser.parse_args()
+
+    receiver = WebhookReceiver(args.secret, args.host, args.port).start()
+    print(f"Receptor webhook pe {receiver.url} (Ctrl+C pentru oprire)")
+    seen = 0
+    try:
+        while True:
+            time.sleep(0.5)
+            for _, order, delivery_id, valid in receiver.deliveries[seen:]:
+                print(f"📦 Comanda #{order['comanda']['id_intern_comanda']} "
+                      f"(livrare {delivery_id}, semnătură {'validă' if valid else 'INVALIDĂ'})")
+            seen = len(receiver.deliveries)
+    except KeyboardInterrupt:
+        receiver.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
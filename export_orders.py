@@ -0,0 +1,85 @@
+"""
+Exportă comenzile salvate într-un interval (folderele curente și arhiva comenzi/arhiva), în
+ordine cronologică, ca NDJSON (o comandă per linie) sau CSV (un rând per produs) - ca
+GET /api/export, fără limita de timp a unui worker Gunicorn (exporturi de mai mulți ani).
+
+Numărul comenzilor exportate este afișat la final (stderr); un export eșuat se termină cu
+codul 1 și nu lasă fișierul --output.
+
+Utilizare:
+    python export_orders.py [--from 2026-01-01] [--to 2026-12-31] [--format csv] [--output comenzi.csv]
+"""
+
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Adaugă directorul curent în path
+sys.path.insert(0, os.path.dirname(__file__))
+
+# Modulele din app.services obțin logger-ele la import
+from app.config import LOG_FILE
+from app.logging_config import initialize_logging
+
+logging.disable(logging.INFO)  # Doar avertismentele, ieșirea este exportul
+initialize_logging(LOG_FILE)
+
+from app.services.order_export import EXPORT_FORMATS, export_chunks, iter_orders
+
+
+def parse_day(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="start", type=parse_day, help="Prima zi (YYYY-MM-DD, inclusiv)")
+    parser.add_argument("--to", dest="end", type=parse_day, help="Ultima zi (YYYY-MM-DD, inclusiv)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson", help="Formatul exportului")
+    parser.add_argument("--output", type=Path, help="Fișierul exportului (implicit ieșirea standard)")
+    args = parser.parse_args()
+
+    end = args.end + timedelta(days=1) if args.end else None
+    if args.start and end and args.start >= end:
+        parser.error("--from trebuie să fie înainte de --to")
+
+    exported = 0
+
+    def counted(records):
+        nonlocal exported
+        for record in records:
+            exported += 1
+            yield record
+
+    chunks = export_chunks(counted(iter_orders(args.start, end)), args.format)
+    # Scris într-un fișier .tmp: un export întrerupt nu lasă un fișier incomplet
+    tmp_output = args.output.with_name(args.output.name + '.tmp') if args.output else None
+    try:
+        if tmp_output is None:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+        else:
+            with open(tmp_output, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(tmp_output, args.output)
+    except Exception as e:
+        if tmp_output is not None:
+            tmp_output.unlink(missing_ok=True)
+        print(f"Export eșuat după {exported} comenzi: {e}", file=sys.stderr)
+        return 1
+
+    if tmp_output is None:
+        print(f"Export încheiat: {exported} comenzi", file=sys.stderr)
+    else:
+        print(f"Export salvat: {args.output} ({exported} comenzi, {args.output.stat().st_size} octeți)",
+              file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,70 +1,102 @@
 """
 Configurație Gunicorn pentru aplicația Eeatingh.
-Pornește serviciile de background o singură dată în procesul master.
+Pornește procesul de ingestie (serviciile de background) o singură dată, din procesul master.
 """
 
+import gc
 import os
 import sys
-from threading import Thread
 
 # Adaugă directorul curent în path
 sys.path.insert(0, os.path.dirname(__file__))
 
 # IMPORTANT: Inițializează logging-ul ÎNAINTE de a importa alte module
-from app.config import LOG_FILE
+from app.config import (
+    LOG_FILE, GUNICORN_BIND, GUNICORN_MODE, GUNICORN_WORKERS, GUNICORN_THREADS,
+    GUNICORN_TIMEOUT, GUNICORN_THREADED_THREADS, GUNICORN_WORKER_CONNECTIONS, GUNICORN_KEEPALIVE,
+    GUNICORN_PRELOAD, BACKGROUND_SERVICES, create_directories, require_email_credentials
+)
 from app.logging_config import initialize_logging
 
+create_directories()
 logger = initialize_logging(LOG_FILE)
 
-# Variabile globale pentru servicii
-email_listener = None
-cleanup_service = None
-
 
 def when_ready(server):
     """
     Hook Gunicorn - apelat o singură dată când serverul este gata.
     Rulează în procesul master, înainte de fork-area worker-ilor.
     """
-    from app.services.email_listener import EmailListener
-    from app.services.cleanup_service import CleanupService
+    from app.services.ingest import start_background_services
+    from app.services.profiler import register_master
+    
+    # Fără credențiale email, serverul nu pornește (procesul de ingestie nu s-ar putea conecta)
+    if BACKGROUND_SERVICES:
+        require_email_credentials()
     
-    global email_listener, cleanup_service
+    # Profilare la cerere (PROFILING=true): semnalul este moștenit de worker-i
+    register_master()
     
+    # Serviciile de background rulează în procesul de ingestie, supravegheat din master
     try:
-        logger.info("=" * 80)
-        logger.info("🚀 Pornire servicii background (Gunicorn Master Process)")
-        logger.info("=" * 80)
-        
-        # Pornește Email Listener
-        logger.info("📧 Pornire Email Listener...")
-        email_listener = EmailListener()
-        email_thread = Thread(target=email_listener.start, daemon=True, name="EmailListener")
-        email_thread.start()
-        
-        # Pornește Cleanup Service
-        logger.info("🧹 Pornire Cleanup Service...")
-        cleanup_service = CleanupService()
-        cleanup_thread = Thread(target=cleanup_service.start, daemon=True, name="CleanupService")
-        cleanup_thread.start()
-        
-        logger.info("=" * 80)
-        logger.info("✅ Servicii background pornite cu succes!")
-        logger.info("=" * 80)
-        
+        start_background_services()
     except Exception as e:
         logger.error(f"❌ Eroare la pornirea serviciilor background: {e}", exc_info=True)
+    
+    # Obiectele create până acum (modulele aplicației, cu preload_app) nu mai sunt parcurse de
+    # garbage collector: contoarele lor de referință din worker-i nu mai copiază paginile master-ului
+    gc.freeze()
+
+
+def on_exit(server):
+    """Hook Gunicorn - oprirea master-ului oprește și procesul de ingestie."""
+    from app.services.ingest import stop_background_services
+    
+    stop_background_services()
+
+
+def worker_settings(mode: str) -> dict:
+    """
+    Setările worker-ilor pentru modul ales (GUNICORN_MODE).
+    
+    Returns:
+        worker_class, threads, keepalive și worker_connections
+    """
+    if mode == "gevent":
+        try:
+            import gevent  # noqa: F401
+            return {"worker_class": "gevent", "threads": 1, "keepalive": GUNICORN_KEEPALIVE,
+                    "worker_connections": GUNICORN_WORKER_CONNECTIONS}
+        except ImportError:
+            logger.warning("⚠️  GUNICORN_MODE=gevent, dar pachetul gevent nu este instalat - folosesc modul threaded")
+            mode = "threaded"
+    if mode == "threaded":
+        return {"worker_class": "gthread", "threads": GUNICORN_THREADED_THREADS, "keepalive": GUNICORN_KEEPALIVE,
+                "worker_connections": GUNICORN_WORKER_CONNECTIONS}
+    if mode != "sync":
+        logger.warning(f"⚠️  GUNICORN_MODE necunoscut ({mode}) - folosesc modul sync")
+    return {"worker_class": "sync", "threads": GUNICORN_THREADS, "keepalive": 2, "worker_connections": 1000}
+
 
+_worker_settings = worker_settings(GUNICORN_MODE)
+logger.info(f"⚙️  Worker-i API: {GUNICORN_WORKERS} × {_worker_settings['worker_class']} "
+            f"(threads={_worker_settings['threads']}, keepalive={_worker_settings['keepalive']}s)")
 
 # Configurații Gunicorn
-bind = "0.0.0.0:5550"
-workers = 2
-threads = 2
-timeout = 120
-worker_class = "sync"
+bind = GUNICORN_BIND
+workers = GUNICORN_WORKERS
+threads = _worker_settings["threads"]
+timeout = GUNICORN_TIMEOUT
+worker_class = _worker_settings["worker_class"]
+keepalive = _worker_settings["keepalive"]
+worker_connections = _worker_settings["worker_connections"]
 accesslog = "-"
 errorlog = "-"
 loglevel = "info"
 
-# Preload app pentru a partaja codul între workeri (opțional, pentru performanță)
-preload_app = False
+# Preload app: aplicația este importată o dată în master, iar worker-ii o partajează copy-on-write
+# (un worker repornit nu mai reimportă Flask și modulele aplicației). Importul nu deschide conexiuni
+# sau socket-uri; singleton-urile (SQLite, mmap, socket-ul evenimentelor) sunt create în fiecare
+# worker la prima utilizare, iar thread-urile master-ului (logging, IngestSupervisor) sunt resetate
+# în worker-i prin os.register_at_fork
+preload_app = GUNICORN_PRELOAD
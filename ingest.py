@@ -0,0 +1,28 @@
+"""
+Procesul de ingestie: Email Listener, Cleanup Service, livrarea webhook-urilor, watchdog memorie.
+
+Pornit și repornit automat de IngestSupervisor (gunicorn_config.py, run_dev.py). Poate rula și
+separat (ex. într-un container propriu), cu BACKGROUND_SERVICES=false pentru instanța API.
+
+Utilizare:
+    python ingest.py
+"""
+
+import os
+import sys
+
+# Adaugă directorul curent în path
+sys.path.insert(0, os.path.dirname(__file__))
+
+# IMPORTANT: Inițializează logging-ul ÎNAINTE de a importa alte module
+from app.config import LOG_FILE, create_directories
+from app.logging_config import initialize_logging
+
+create_directories()
+logger = initialize_logging(LOG_FILE)
+
+from app.services.ingest import run_ingest
+
+
+if __name__ == "__main__":
+    sys.exit(run_ingest())
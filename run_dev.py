@@ -8,53 +8,19 @@ Utilizare:
 
 import os
 import sys
-from threading import Thread
 
 # Adaugă directorul curent în path
 sys.path.insert(0, os.path.dirname(__file__))
 
 # IMPORTANT: Inițializează logging-ul ÎNAINTE de a importa alte module
-from app.config import LOG_FILE
+from app.config import LOG_FILE, create_directories
 from app.logging_config import initialize_logging
 
+create_directories()
 logger = initialize_logging(LOG_FILE)
 
 from app.api_server import app
-from app.services.email_listener import EmailListener
-from app.services.cleanup_service import CleanupService
-
-# Instanțe globale
-email_listener = None
-cleanup_service = None
-
-
-def start_background_services():
-    """Pornește serviciile în background (Email Listener și Cleanup Service)."""
-    global email_listener, cleanup_service
-    
-    try:
-        logger.info("=" * 80)
-        logger.info("🚀 Pornire servicii background (MOD DEZVOLTARE)")
-        logger.info("=" * 80)
-        
-        # Pornește Email Listener
-        logger.info("📧 Pornire Email Listener...")
-        email_listener = EmailListener()
-        email_thread = Thread(target=email_listener.start, daemon=True, name="EmailListener")
-        email_thread.start()
-        
-        # Pornește Cleanup Service
-        logger.info("🧹 Pornire Cleanup Service...")
-        cleanup_service = CleanupService()
-        cleanup_thread = Thread(target=cleanup_service.start, daemon=True, name="CleanupService")
-        cleanup_thread.start()
-        
-        logger.info("=" * 80)
-        logger.info("✅ Servicii background pornite cu succes!")
-        logger.info("=" * 80)
-        
-    except Exception as e:
-        logger.error(f"❌ Eroare la pornirea serviciilor background: {e}", exc_info=True)
+from app.services.ingest import start_background_services
 
 
 if __name__ == "__main__":
@@ -65,12 +31,11 @@ if __name__ == "__main__":
     logger.info("⚠️  În producție folosește Docker cu Gunicorn")
     logger.info("=" * 80)
     
-    # Pornește serviciile în background
+    # Pornește procesul de ingestie (Email Listener, Cleanup), supravegheat din acest proces
     start_background_services()
     
     # Pornește serverul Flask de dezvoltare
-    # Acest server va menține aplicația activă și va permite
-    # serviciilor background (Email Listener, Cleanup) să ruleze continuu
+    # Acest server va menține aplicația activă; la oprire, procesul de ingestie este oprit (atexit)
     logger.info("🌐 Pornire API Server pe http://0.0.0.0:5550")
     logger.info("=" * 80)
     
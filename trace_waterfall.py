@@ -0,0 +1,46 @@
+"""
+Afișează trace-urile unei comenzi ca waterfall: ingestia emailului (fetch IMAP, parsare,
+salvare) și request-urile API ale terminalelor POS pentru comandă.
+
+Utilizare:
+    python trace_waterfall.py <id_comanda> [--file data/traces.jsonl] [--width 50]
+"""
+
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+
+# Adaugă directorul curent în path
+sys.path.insert(0, os.path.dirname(__file__))
+
+# Modulele din app.services obțin logger-ele la import
+from app.config import LOG_FILE, TRACE_FILE
+from app.logging_config import initialize_logging
+
+logging.disable(logging.INFO)  # Doar avertismentele, ieșirea este waterfall-ul
+initialize_logging(LOG_FILE)
+
+from app.services.tracing import order_traces, render_waterfall
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("id_comanda", help="ID-ul intern al comenzii")
+    parser.add_argument("--file", type=Path, default=TRACE_FILE, help="Fișierul de trace-uri")
+    parser.add_argument("--width", type=int, default=50, help="Lățimea barelor")
+    args = parser.parse_args()
+
+    traces = order_traces(args.id_comanda, args.file)
+    if not traces:
+        print(f"Niciun trace pentru comanda #{args.id_comanda} în {args.file}")
+        return 1
+    for spans in sorted(traces.values(), key=lambda spans: min(record["ts"] for record in spans)):
+        print(render_waterfall(spans, args.width))
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
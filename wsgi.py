@@ -2,8 +2,10 @@
 WSGI entry point pentru Gunicorn.
 Expune aplicația Flask.
 
-IMPORTANT: Serviciile de background (Email Listener, Cleanup Service) 
-sunt pornite prin gunicorn_config.py în procesul master Gunicorn.
+IMPORTANT: Serviciile de background (Email Listener, Cleanup Service) rulează în
+procesul de ingestie, pornit și supravegheat de gunicorn_config.py (app/services/ingest.py).
+Worker-ii API nu importă parserul (bs4) și nici clientul IMAP (imapclient) - vezi
+benchmarks/import_time.py.
 """
 
 import os
@@ -13,9 +15,10 @@ import sys
 sys.path.insert(0, os.path.dirname(__file__))
 
 # IMPORTANT: Inițializează logging-ul ÎNAINTE de a importa alte module
-from app.config import LOG_FILE
+from app.config import LOG_FILE, create_directories
 from app.logging_config import initialize_logging
 
+create_directories()
 logger = initialize_logging(LOG_FILE)
 
 from app.api_server import app